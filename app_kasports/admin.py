@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     Cliente, Administrador, Proveedor, Ropa, Tenis, Gorra,
-    Carrito, DetalleCarrito, Venta, DetalleEntrega, MensajeContacto
+    Carrito, DetalleCarrito, Venta, LineaPedido, DetalleEntrega, MensajeContacto,
+    ProductoCatalogo, ReservaStock, ContadorMetrica, ResumenDiario, ImagenDerivada, Tarea
 )
 
 @admin.register(Cliente)
@@ -58,11 +59,19 @@ class DetalleCarritoAdmin(admin.ModelAdmin):
     search_fields = ('carrito__id', 'talla_seleccionada')
 
 
+class LineaPedidoInline(admin.TabularInline):
+    model = LineaPedido
+    extra = 0
+    can_delete = False
+    readonly_fields = ('tipo', 'producto_id', 'nombre', 'talla', 'precio_unitario', 'cantidad', 'subtotal', 'imagen')
+
+
 @admin.register(Venta)
 class VentaAdmin(admin.ModelAdmin):
     list_display = ('id', 'cliente', 'fecha_venta', 'total', 'metodo_pago', 'estado')
     search_fields = ('cliente__user__username',)
     list_filter = ('estado', 'metodo_pago', 'fecha_venta')
+    inlines = [LineaPedidoInline]
 
 
 @admin.register(DetalleEntrega)
@@ -76,4 +85,41 @@ class DetalleEntregaAdmin(admin.ModelAdmin):
 class MensajeContactoAdmin(admin.ModelAdmin):
     list_display = ('nombre_remitente', 'email_remitente', 'fecha_envio', 'leido')
     search_fields = ('nombre_remitente', 'email_remitente', 'mensaje')
-    list_filter = ('leido', 'fecha_envio')
\ No newline at end of file
+    list_filter = ('leido', 'fecha_envio')
+
+
+@admin.register(ProductoCatalogo)
+class ProductoCatalogoAdmin(admin.ModelAdmin):
+    list_display = ('tipo', 'producto_id', 'modelo', 'proveedor_nombre', 'precio', 'stock', 'genero')
+    search_fields = ('modelo', 'color', 'proveedor_nombre')
+    list_filter = ('tipo', 'genero')
+
+
+@admin.register(ReservaStock)
+class ReservaStockAdmin(admin.ModelAdmin):
+    list_display = ('detalle', 'tipo', 'producto_id', 'talla', 'cantidad', 'expira')
+    list_filter = ('tipo', 'expira')
+
+
+@admin.register(ContadorMetrica)
+class ContadorMetricaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'valor', 'fecha_actualizacion')
+
+
+@admin.register(ResumenDiario)
+class ResumenDiarioAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'ventas', 'ingresos', 'impuesto', 'envio', 'unidades_ropa', 'unidades_tenis', 'unidades_gorra')
+    date_hierarchy = 'fecha'
+
+
+@admin.register(ImagenDerivada)
+class ImagenDerivadaAdmin(admin.ModelAdmin):
+    list_display = ('original', 'ancho', 'alto', 'anchos', 'formatos', 'fecha_creacion')
+    search_fields = ('original', 'huella')
+
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'funcion', 'estado', 'prioridad', 'intentos', 'disponible_en', 'fecha_fin')
+    list_filter = ('estado', 'funcion')
+    search_fields = ('funcion', 'error')
@@ -0,0 +1,195 @@
+"""API de lectura del catálogo (JSON) para integraciones y la app móvil.
+
+- `GET /api/productos/<tipo>/` (ropa, tenis, gorra) y `GET /api/proveedores/`.
+- Se serializa con `values()`: sin instancias de modelo, una página de 1,000
+  productos es una consulta (más una para `tallas`, si se piden).
+- Paginación por cursor sobre `id` (`?cursor=`, ver paginacion.py) y tamaño de
+  página con `?limite=` (hasta `LIMITE_MAXIMO`).
+- `?fields=id,modelo,precio` elige los campos; `id` siempre se incluye.
+- Filtros: `genero` y `proveedor` (varios separados por comas), `precio_min`,
+  `precio_max`, `talla` (con existencias en esa talla) y `disponibles=1`.
+
+El ETag sale de la versión de la tabla en la caché (`tabla:<tipo>` y
+`proveedores`, ver cache_tienda.py) y de los parámetros normalizados, así que
+se calcula sin consultar la base de datos; las vistas lo usan con
+`condition()` para responder 304 a `If-None-Match`. Solo se emite con una
+caché compartida: con una por proceso, un proceso que no vio la invalidación
+respondería 304 con datos viejos.
+"""
+import hashlib
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+
+from . import cache_tienda, paginacion
+from .catalogo import MODELOS_CATALOGO
+from .models import InventarioTalla, Proveedor
+
+LIMITE = 100
+LIMITE_MAXIMO = 1000
+
+# Campo público -> ruta para values(); `tallas` se arma aparte desde InventarioTalla
+CAMPOS_COMUNES = {
+    'id': 'id',
+    'modelo': 'modelo',
+    'color': 'color',
+    'genero': 'genero',
+    'precio': 'precio',
+    'stock': 'stock',
+    'imagen': 'imagen',
+    'proveedor_id': 'proveedor_id',
+    'proveedor': 'proveedor__nombre',
+}
+CAMPOS = {
+    'ropa': {**CAMPOS_COMUNES, 'estilo': 'estilo'},
+    'tenis': {**CAMPOS_COMUNES, 'estilo': 'estilo'},
+    'gorra': {**CAMPOS_COMUNES, 'coleccion': 'coleccion', 'silueta': 'silueta', 'visera': 'visera',
+              'broche': 'broche'},
+    'proveedores': {
+        'id': 'id', 'nombre': 'nombre', 'direccion': 'direccion', 'telefono': 'telefono', 'correo': 'correo',
+        'rfc_fiscal': 'rfc_fiscal', 'url_pagina_web': 'url_pagina_web', 'imagen': 'imagen',
+    },
+}
+TALLAS = 'tallas'
+RECURSOS = tuple(MODELOS_CATALOGO) + ('proveedores',)
+
+
+class ParametroInvalido(ValueError):
+    """Parámetro de la petición que no se puede aplicar (se responde 400)."""
+
+
+def _lista(valor):
+    return [parte.strip() for parte in (valor or '').split(',') if parte.strip()]
+
+
+def _decimal(request, nombre):
+    valor = request.GET.get(nombre)
+    if not valor:
+        return None
+    try:
+        numero = Decimal(valor)
+    except InvalidOperation:
+        raise ParametroInvalido(f'{nombre} debe ser un número')
+    # Decimal acepta 'nan', 'sNaN' e 'inf', que fallan al compararse en la consulta
+    if not numero.is_finite():
+        raise ParametroInvalido(f'{nombre} debe ser un número')
+    return numero
+
+
+def _en_rango(numero):
+    """True si cabe en un entero de 64 bits (SQLite no acepta parámetros más grandes)."""
+    return -2 ** 63 <= numero < 2 ** 63
+
+
+def _enteros(request, nombre):
+    try:
+        ids = [int(v) for v in _lista(request.GET.get(nombre))]
+    except ValueError:
+        raise ParametroInvalido(f'{nombre} debe ser una lista de ids')
+    if not all(_en_rango(pk) for pk in ids):
+        raise ParametroInvalido(f'{nombre} debe ser una lista de ids')
+    return ids
+
+
+def campos(recurso, request):
+    """Campos públicos pedidos con `?fields=` (todos si no se indica)."""
+    disponibles = list(CAMPOS[recurso]) + ([TALLAS] if recurso in MODELOS_CATALOGO else [])
+    pedidos = _lista(request.GET.get('fields'))
+    if not pedidos:
+        return disponibles
+    desconocidos = [c for c in pedidos if c not in disponibles]
+    if desconocidos:
+        raise ParametroInvalido(f'Campos no válidos: {", ".join(desconocidos)}. Disponibles: {", ".join(disponibles)}')
+    return ['id'] + [c for c in dict.fromkeys(pedidos) if c != 'id']
+
+
+def limite(request):
+    try:
+        return max(1, min(int(request.GET.get('limite', LIMITE)), LIMITE_MAXIMO))
+    except ValueError:
+        raise ParametroInvalido('limite debe ser un número')
+
+
+def filtrar(recurso, request):
+    """Queryset del recurso con los filtros de la petición aplicados."""
+    if recurso == 'proveedores':
+        return Proveedor.objects.all()
+    queryset = MODELOS_CATALOGO[recurso].objects.all()
+    generos = _lista(request.GET.get('genero'))
+    if generos:
+        queryset = queryset.filter(genero__in=generos)
+    proveedores = _enteros(request, 'proveedor')
+    if proveedores:
+        queryset = queryset.filter(proveedor_id__in=proveedores)
+    precio_min, precio_max = _decimal(request, 'precio_min'), _decimal(request, 'precio_max')
+    if precio_min is not None:
+        queryset = queryset.filter(precio__gte=precio_min)
+    if precio_max is not None:
+        queryset = queryset.filter(precio__lte=precio_max)
+    talla = request.GET.get('talla', '').strip()
+    if talla:
+        queryset = queryset.filter(id__in=InventarioTalla.objects.filter(
+            tipo=recurso, talla=talla, stock__gt=0,
+        ).values('producto_id'))
+    if request.GET.get('disponibles') == '1':
+        queryset = queryset.filter(stock__gt=0)
+    return queryset
+
+
+def _ultimo_id(cursor):
+    """Id de la última fila vista guardado en el cursor (solo avanza)."""
+    datos = paginacion.decodificar(cursor)
+    valores = datos.get('v') if datos and datos['d'] == paginacion.SIGUIENTE else None
+    if (not isinstance(valores, list) or len(valores) != 1 or not isinstance(valores[0], int)
+            or not _en_rango(valores[0])):
+        raise ParametroInvalido('cursor no válido')
+    return valores[0]
+
+
+def etag(recurso, request):
+    """ETag fuerte: versión de las tablas leídas más los parámetros normalizados.
+
+    None (sin ETag ni 304) si la caché no es compartida entre procesos.
+    """
+    if not cache_tienda.compartida():
+        return None
+    nombres = ['proveedores'] if recurso == 'proveedores' else [f'tabla:{recurso}', 'proveedores']
+    actuales = cache_tienda.versiones(nombres)
+    parametros = sorted((clave, request.GET.getlist(clave)) for clave in request.GET)
+    return hashlib.md5(repr((recurso, [actuales[n] for n in nombres], parametros)).encode('utf-8')).hexdigest()
+
+
+def pagina(recurso, request):
+    """Diccionario de la respuesta: resultados, cursor siguiente y cantidad."""
+    elegidos = campos(recurso, request)
+    por_pagina = limite(request)
+    queryset = filtrar(recurso, request)
+
+    if request.GET.get(paginacion.PARAMETRO):
+        queryset = queryset.filter(id__gt=_ultimo_id(request.GET[paginacion.PARAMETRO]))
+    rutas = CAMPOS[recurso]
+    filas = list(queryset.order_by('id').values(*(rutas[c] for c in elegidos if c in rutas))[:por_pagina + 1])
+    siguiente = None
+    if len(filas) > por_pagina:
+        filas = filas[:por_pagina]
+        siguiente = paginacion.codificar({'d': paginacion.SIGUIENTE, 'v': [filas[-1]['id']]})
+
+    renombrar = {ruta: campo for campo, ruta in rutas.items() if campo != ruta and campo in elegidos}
+    for fila in filas:
+        for ruta, campo in renombrar.items():
+            fila[campo] = fila.pop(ruta)
+        if fila.get('imagen'):
+            fila['imagen'] = settings.MEDIA_URL + fila['imagen']
+    if TALLAS in elegidos:
+        _adjuntar_tallas(recurso, filas)
+    return {'resultados': filas, 'siguiente': siguiente, 'cantidad': len(filas)}
+
+
+def _adjuntar_tallas(tipo, filas):
+    """Agrega [{'talla', 'stock'}] a cada fila con una consulta para toda la página."""
+    por_producto = {fila['id']: [] for fila in filas}
+    existencias = InventarioTalla.objects.filter(tipo=tipo, producto_id__in=list(por_producto)).order_by('pk')
+    for producto_id, talla, stock in existencias.values_list('producto_id', 'talla', 'stock'):
+        por_producto[producto_id].append({'talla': talla, 'stock': stock})
+    for fila in filas:
+        fila[TALLAS] = por_producto[fila['id']]
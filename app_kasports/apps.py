@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AppKasportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_kasports'
+
+    def ready(self):
+        # Registrar señales (catálogo unificado, etc.)
+        from . import signals  # noqa: F401
+        from . import checks  # noqa: F401
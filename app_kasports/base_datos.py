@@ -0,0 +1,75 @@
+"""Ajustes por conexión de la base de datos.
+
+El perfil se elige en settings con `KASPORTS_BD`:
+
+- `sqlite` (por defecto): conexiones persistentes (`CONN_MAX_AGE`) y los PRAGMA
+  de `KASPORTS_SQLITE_PRAGMAS`, que `aplicar_pragmas()` ejecuta cada vez que
+  Django abre una conexión (señal `connection_created`, ver `signals.py`).
+  `busy_timeout` hace que un escritor espere su turno en lugar de fallar con
+  "database is locked" (checkout, formulario de contacto, cola de tareas).
+  Con `KASPORTS_SQLITE_WAL=1` se usa además `journal_mode=WAL` (los lectores
+  no bloquean al escritor ni al revés); es opcional porque el modo queda
+  guardado en el archivo y el db.sqlite3 de desarrollo está en el repositorio.
+- `sqlite_basico`: la configuración original (diario DELETE, sin conexiones
+  persistentes); sirve como referencia en `carga_checkout`.
+- `postgres`: conexiones persistentes con `CONN_HEALTH_CHECKS` para descartar
+  las que el servidor cerró.
+"""
+import logging
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+def aplicar_pragmas(connection):
+    """Ejecuta los PRAGMA configurados en una conexión SQLite recién abierta."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'KASPORTS_SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for nombre, valor in pragmas.items():
+            cursor.execute(f'PRAGMA {nombre} = {valor}')
+        if 'journal_mode' in pragmas:
+            cursor.execute('PRAGMA journal_mode')
+            modo = cursor.fetchone()[0]
+            if modo.lower() != str(pragmas['journal_mode']).lower():
+                # Una base de datos en memoria o de solo lectura no admite WAL
+                logger.info('SQLite quedó en journal_mode=%s (se pidió %s)', modo, pragmas['journal_mode'])
+
+
+def pragmas_actuales(connection):
+    """Valores vigentes de los PRAGMA configurados (para `carga_checkout`)."""
+    if connection.vendor != 'sqlite':
+        return {}
+    valores = {}
+    with connection.cursor() as cursor:
+        for nombre in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store'):
+            cursor.execute(f'PRAGMA {nombre}')
+            valores[nombre] = cursor.fetchone()[0]
+    return valores
+
+
+def en_ejecutor(funcion):
+    """Versión asíncrona de `funcion` que corre en el ejecutor compartido (`thread_sensitive=False`).
+
+    Con el `sync_to_async` por defecto todo el código síncrono de una petición
+    ASGI va al mismo hilo dedicado, y la petición lo ocupa mientras espera. Aquí
+    cada llamada toma un hilo del ejecutor solo mientras corre. Las conexiones son
+    por hilo: se descartan al inicio y al final las que ya vencieron según
+    `CONN_MAX_AGE` (0 bajo ASGI), como hace Django al empezar y terminar una petición.
+    Solo para lecturas: cada llamada puede usar otra conexión y no comparte transacción.
+    """
+    @wraps(funcion)
+    def con_conexion(*args, **kwargs):
+        close_old_connections()
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(con_conexion, thread_sensitive=False)
@@ -0,0 +1,296 @@
+"""Utilidades compartidas por los comandos de benchmark (`benchmark_*`).
+
+Los datos sintéticos se crean dentro de `datos_temporales()`, una transacción
+que siempre se revierte, para no dejar rastro en la base de datos. Los
+benchmarks que necesitan otros procesos (un servidor, varios trabajadores)
+trabajan sobre una copia de la base SQLite (`copia_sqlite()`).
+"""
+import http.client
+import os
+import random
+import re
+import socket
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from importlib import import_module
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from . import busqueda
+from .catalogo import MODELOS_CATALOGO, entradas_para
+from .models import Carrito, Cliente, DetalleCarrito, LineaPedido, Proveedor, ProductoCatalogo, Ropa, Venta
+
+PALABRAS_MODELO = [
+    'Runner', 'Classic', 'Pro', 'Air', 'Street', 'Training', 'Urban', 'Sport',
+    'Retro', 'Elite', 'Camiseta', 'Sudadera', 'Short', 'Jogger', 'Chamarra',
+    'Dri-Fit', 'Térmica', 'Algodón', 'Básica', 'Edición',
+]
+COLORES = ['Negro', 'Blanco', 'Rojo', 'Azul', 'Verde', 'Gris', 'Café', 'Rosa', 'Amarillo', 'Morado']
+ESTILOS = ['Casual', 'Deportivo', 'Running', 'Urbano', 'Training', 'Lifestyle']
+GENEROS = ['Masculino', 'Femenino', 'Unisex']
+TALLAS = {
+    'ropa': 'XS,S,M,L,XL',
+    'tenis': '7,7.5,8,8.5,9,9.5,10',
+    'gorra': 'Única',
+}
+
+
+class _Revertir(Exception):
+    pass
+
+
+@contextmanager
+def datos_temporales():
+    """Ejecuta el bloque dentro de una transacción que siempre se revierte."""
+    try:
+        with transaction.atomic():
+            yield
+            raise _Revertir
+    except _Revertir:
+        pass
+
+
+@contextmanager
+def copia_sqlite(origen=None):
+    """Copia consistente de la base SQLite (aunque esté en modo WAL); se borra al salir."""
+    origen = str(origen or settings.DATABASES['default']['NAME'])
+    copia = tempfile.NamedTemporaryFile(prefix='kasports_bench_', suffix='.sqlite3', delete=False).name
+    try:
+        with sqlite3.connect(origen) as fuente, sqlite3.connect(copia) as destino:
+            fuente.backup(destino)
+        yield copia
+    finally:
+        for sufijo in ('', '-wal', '-shm'):
+            if os.path.exists(copia + sufijo):
+                os.remove(copia + sufijo)
+
+
+@contextmanager
+def servidor_local(comando, entorno=None, segundos=30):
+    """Arranca `comando` (con `{puerto}` por sustituir) y devuelve el puerto cuando ya acepta conexiones."""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        puerto = s.getsockname()[1]
+    servidor = subprocess.Popen([parte.format(puerto=puerto) for parte in comando], env=entorno,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        limite = time.monotonic() + segundos
+        while True:
+            if servidor.poll() is not None:
+                raise RuntimeError(f'El servidor local terminó al arrancar: {" ".join(comando)}')
+            try:
+                socket.create_connection(('127.0.0.1', puerto), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > limite:
+                    raise RuntimeError(f'El servidor local no respondió en {segundos} s')
+                time.sleep(0.2)
+        yield puerto
+    finally:
+        servidor.terminate()
+        servidor.wait(timeout=10)
+
+
+_RE_CONSULTAS = re.compile(r'"(\d+) consultas"')
+
+
+def peticion_http(puerto, metodo, url, datos=None, cabeceras=None):
+    """Una petición en una conexión nueva al servidor local.
+
+    Devuelve (estado, consultas); las consultas salen del encabezado Server-Timing
+    de la instrumentación (None si está desactivada).
+    """
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=60)
+    try:
+        cabeceras = dict(cabeceras or {}, Host=f'localhost:{puerto}')
+        cuerpo = None
+        if datos is not None:
+            cuerpo = urlencode(datos)
+            cabeceras['Content-Type'] = 'application/x-www-form-urlencoded'
+        conexion.request(metodo, url, body=cuerpo, headers=cabeceras)
+        respuesta = conexion.getresponse()
+        respuesta.read()
+        coincidencia = _RE_CONSULTAS.search(respuesta.getheader('Server-Timing') or '')
+        return respuesta.status, int(coincidencia.group(1)) if coincidencia else None
+    finally:
+        conexion.close()
+
+
+def percentiles(muestras):
+    """Resume una lista de duraciones (segundos) en milisegundos."""
+    ordenadas = sorted(muestras)
+    if not ordenadas:
+        return {'n': 0}
+
+    def p(q):
+        indice = min(len(ordenadas) - 1, int(round(q * (len(ordenadas) - 1))))
+        return round(ordenadas[indice] * 1000, 3)
+
+    return {
+        'n': len(ordenadas),
+        'media_ms': round(statistics.mean(ordenadas) * 1000, 3),
+        'p50_ms': p(0.50),
+        'p95_ms': p(0.95),
+        'p99_ms': p(0.99),
+    }
+
+
+def medir(funcion, repeticiones=20, calentamiento=2):
+    """Ejecuta `funcion` varias veces y devuelve sus percentiles de latencia."""
+    for _ in range(calentamiento):
+        funcion()
+    muestras = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        muestras.append(time.perf_counter() - inicio)
+    return percentiles(muestras)
+
+
+def sembrar_proveedores(n=10, prefijo='BENCH'):
+    """Crea `n` proveedores sintéticos y los devuelve."""
+    proveedores = [
+        Proveedor(
+            nombre=f'Marca {prefijo} {i}',
+            direccion='Dirección de prueba',
+            telefono='5500000000',
+            correo=f'marca{i}@example.com',
+            rfc_fiscal=f'{prefijo[:4]}{i:09d}'[:13],
+        )
+        for i in range(n)
+    ]
+    return Proveedor.objects.bulk_create(proveedores)
+
+
+def _producto_sintetico(tipo, modelo, proveedor, rnd):
+    campos = {
+        'proveedor': proveedor,
+        'modelo': ' '.join(rnd.sample(PALABRAS_MODELO, 2)) + f' {rnd.randint(1, 999)}',
+        'color': rnd.choice(COLORES),
+        'genero': rnd.choice(GENEROS),
+        'precio': Decimal(rnd.randint(199, 4999)) + Decimal('0.99'),
+        'stock': rnd.randint(0, 50),
+        'tallas_disponibles': TALLAS[tipo],
+    }
+    if tipo == 'gorra':
+        campos.update(coleccion=rnd.choice(ESTILOS), silueta='Curva', visera='Curva', broche='Ajustable')
+    else:
+        campos['estilo'] = rnd.choice(ESTILOS)
+    return modelo(**campos)
+
+
+def sembrar_productos(n, tipo='ropa', proveedores=None, tamano_lote=2000, semilla=0):
+    """Crea `n` productos sintéticos del tipo dado, con su catálogo e índice de búsqueda.
+
+    Usa `bulk_create` (sin señales), por lo que las tablas derivadas se llenan aquí.
+    """
+    rnd = random.Random(semilla)
+    modelo = MODELOS_CATALOGO[tipo]
+    proveedores = proveedores or sembrar_proveedores()
+    creados = 0
+    while creados < n:
+        cantidad = min(tamano_lote, n - creados)
+        lote = [_producto_sintetico(tipo, modelo, rnd.choice(proveedores), rnd) for _ in range(cantidad)]
+        lote = modelo.objects.bulk_create(lote)
+        entradas = ProductoCatalogo.objects.bulk_create(entradas_para(tipo, lote))
+        busqueda.indexar(entradas)
+        creados += cantidad
+    return creados
+
+
+def sembrar_cliente(username):
+    """Crea un usuario con su cliente y lo devuelve."""
+    usuario = User.objects.create(username=username)
+    return Cliente.objects.create(user=usuario, telefono='5500000000', direccion='Prueba')
+
+
+def sembrar_ventas(n, tamano_lote=5000, prefijo='bench'):
+    """Crea `n` ventas sintéticas de un mismo cliente y carrito; devuelve el cliente."""
+    cliente = sembrar_cliente(f'{prefijo}_ventas')
+    carrito = Carrito.objects.create(cliente=cliente, estado='Completado')
+    creadas = 0
+    while creadas < n:
+        cantidad = min(tamano_lote, n - creadas)
+        Venta.objects.bulk_create([
+            Venta(cliente=cliente, carrito=carrito, metodo_pago='Tarjeta', subtotal=Decimal('100.00'),
+                  impuesto=Decimal('8.00'), costo_envio=Decimal('80.00'), total=Decimal('188.00'))
+            for _ in range(cantidad)
+        ])
+        creadas += cantidad
+    return cliente
+
+
+def sembrar_clientes(n, ventas_por_cliente=0, prefijo='bench', tamano_lote=2000, semilla=0):
+    """Crea `n` clientes, cada uno con `ventas_por_cliente` pedidos de 1 a 3 líneas de ropa
+    (con las líneas del carrito y su copia en `LineaPedido`).
+
+    Usa `bulk_create` (sin señales ni movimientos de stock). Devuelve los clientes
+    con su `user` ya asignado.
+    """
+    rnd = random.Random(semilla)
+    contrasena = make_password(None)
+    usuarios = User.objects.bulk_create(
+        [User(username=f'{prefijo}_cliente_{i}', password=contrasena) for i in range(n)], batch_size=tamano_lote,
+    )
+    clientes = Cliente.objects.bulk_create(
+        [Cliente(user=u, telefono='5500000000', direccion='Prueba') for u in usuarios], batch_size=tamano_lote,
+    )
+    for cliente, usuario in zip(clientes, usuarios):
+        cliente.user = usuario
+    productos = list(Ropa.objects.values_list('pk', 'precio', 'modelo', 'color')[:500])
+    if not ventas_por_cliente or not productos:
+        return clientes
+
+    por_lote = max(1, tamano_lote // ventas_por_cliente)
+    for inicio in range(0, len(clientes), por_lote):
+        grupo = clientes[inicio:inicio + por_lote]
+        carritos = Carrito.objects.bulk_create(
+            [Carrito(cliente=c, estado='Completado') for c in grupo for _ in range(ventas_por_cliente)]
+        )
+        detalles, ventas, por_venta = [], [], []
+        for carrito in carritos:
+            subtotal = Decimal('0.00')
+            lineas = []
+            for producto_id, precio, modelo, color in rnd.sample(productos, min(len(productos), rnd.randint(1, 3))):
+                cantidad = rnd.randint(1, 2)
+                detalles.append(DetalleCarrito(carrito=carrito, ropa_id=producto_id, cantidad=cantidad,
+                                               subtotal=precio * cantidad, talla_seleccionada='M'))
+                lineas.append(LineaPedido(tipo='ropa', producto_id=producto_id, nombre=f'{modelo} - {color}',
+                                          talla='M', precio_unitario=precio, cantidad=cantidad,
+                                          subtotal=precio * cantidad))
+                subtotal += precio * cantidad
+            por_venta.append(lineas)
+            impuesto = (subtotal * Decimal('0.08')).quantize(Decimal('0.01'))
+            ventas.append(Venta(cliente_id=carrito.cliente_id, carrito=carrito, metodo_pago='Tarjeta',
+                                subtotal=subtotal, impuesto=impuesto, costo_envio=Decimal('80.00'),
+                                total=subtotal + impuesto + Decimal('80.00'), estado='Entregado'))
+        DetalleCarrito.objects.bulk_create(detalles, batch_size=tamano_lote)
+        Venta.objects.bulk_create(ventas, batch_size=tamano_lote)
+        for venta, lineas in zip(ventas, por_venta):
+            for linea in lineas:
+                linea.venta = venta
+        LineaPedido.objects.bulk_create([linea for lineas in por_venta for linea in lineas], batch_size=tamano_lote)
+    return clientes
+
+
+def abrir_sesion(usuario):
+    """Crea una sesión autenticada para `usuario` y devuelve su clave (cookie `sessionid`).
+
+    Equivale a `Client.force_login`, pero sirve para peticiones HTTP reales.
+    """
+    sesion = import_module(settings.SESSION_ENGINE).SessionStore()
+    sesion[SESSION_KEY] = usuario._meta.pk.value_to_string(usuario)
+    sesion[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    sesion[HASH_SESSION_KEY] = usuario.get_session_auth_hash()
+    sesion.save()
+    return sesion.session_key
@@ -0,0 +1,244 @@
+"""Motor de búsqueda de texto completo sobre el catálogo unificado.
+
+- SQLite: tabla virtual FTS5 (`app_kasports_busqueda_fts`) cuyo rowid es el id
+  de `ProductoCatalogo`, con tokenizador `unicode61 remove_diacritics 2`.
+- PostgreSQL: `to_tsvector('simple', texto_busqueda)` con índice GIN.
+- Otros motores: coincidencia por términos sobre `texto_busqueda`.
+
+El índice se mantiene de forma incremental desde `signals.py` y puede
+reconstruirse con `python manage.py reconstruir_busqueda`.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+
+from .models import ProductoCatalogo
+
+TABLA_FTS = 'app_kasports_busqueda_fts'
+
+# Columnas indexadas y su peso en el ranking (bm25 en SQLite)
+COLUMNAS = ('modelo', 'color', 'estilo', 'coleccion', 'silueta', 'proveedor')
+PESOS = (5.0, 2.0, 2.0, 2.0, 1.5, 3.0)
+
+# Máximo de resultados rankeados que se devuelven a los listados
+LIMITE_RESULTADOS = 500
+
+_RE_TERMINO = re.compile(r'\w+', re.UNICODE)
+
+_fts_disponible = None
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos: 'Camisón Rojo' -> 'camison rojo'."""
+    if not texto:
+        return ''
+    descompuesto = unicodedata.normalize('NFKD', str(texto))
+    sin_acentos = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return sin_acentos.lower()
+
+
+def terminos(consulta):
+    """Divide la consulta en términos normalizados (sin operadores ni comillas)."""
+    return _RE_TERMINO.findall(normalizar(consulta))
+
+
+def valores_columnas(entrada):
+    """Valores normalizados de las columnas indexadas de una entrada de catálogo."""
+    return (
+        normalizar(entrada.modelo),
+        normalizar(entrada.color),
+        normalizar(entrada.estilo),
+        normalizar(entrada.coleccion),
+        normalizar(entrada.silueta),
+        normalizar(entrada.proveedor_nombre),
+    )
+
+
+def texto_busqueda(datos):
+    """Texto normalizado que se guarda en `ProductoCatalogo.texto_busqueda`."""
+    partes = [datos.get(c, '') for c in ('modelo', 'color', 'estilo', 'coleccion', 'silueta', 'proveedor_nombre')]
+    return ' '.join(normalizar(p) for p in partes if p)
+
+
+def usa_fts():
+    """True si la base de datos es SQLite y la tabla FTS5 existe."""
+    global _fts_disponible
+    if connection.vendor != 'sqlite':
+        return False
+    if _fts_disponible is None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABLA_FTS]
+            )
+            _fts_disponible = cursor.fetchone() is not None
+    return _fts_disponible
+
+
+# ============================================
+# MANTENIMIENTO DEL ÍNDICE (SQLite FTS5)
+# ============================================
+
+def indexar(entradas):
+    """Inserta o reemplaza en el índice FTS las entradas de catálogo dadas."""
+    if not usa_fts():
+        return
+    filas = [(e.pk, *valores_columnas(e)) for e in entradas]
+    if not filas:
+        return
+    marcadores = ', '.join(['%s'] * (len(COLUMNAS) + 1))
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLA_FTS} WHERE rowid = %s', [(f[0],) for f in filas])
+        cursor.executemany(
+            f'INSERT INTO {TABLA_FTS} (rowid, {", ".join(COLUMNAS)}) VALUES ({marcadores})',
+            filas,
+        )
+
+
+def desindexar(ids):
+    """Elimina del índice FTS las entradas de catálogo con los ids dados."""
+    ids = list(ids)
+    if not ids or not usa_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLA_FTS} WHERE rowid = %s', [(i,) for i in ids])
+
+
+def reconstruir_indice(tamano_lote=1000):
+    """Vacía y vuelve a llenar el índice de búsqueda. Devuelve el número de entradas."""
+    total = 0
+    entradas = ProductoCatalogo.objects.order_by('pk').iterator(chunk_size=tamano_lote)
+    if usa_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLA_FTS}')
+        lote = []
+        for entrada in entradas:
+            lote.append(entrada)
+            if len(lote) >= tamano_lote:
+                indexar(lote)
+                total += len(lote)
+                lote = []
+        indexar(lote)
+        total += len(lote)
+    else:
+        # PostgreSQL y otros motores usan la columna `texto_busqueda`
+        lote = []
+        for entrada in entradas:
+            entrada.texto_busqueda = texto_busqueda(entrada.__dict__)
+            lote.append(entrada)
+            if len(lote) >= tamano_lote:
+                ProductoCatalogo.objects.bulk_update(lote, ['texto_busqueda'])
+                total += len(lote)
+                lote = []
+        if lote:
+            ProductoCatalogo.objects.bulk_update(lote, ['texto_busqueda'])
+            total += len(lote)
+    return total
+
+
+# ============================================
+# CONSULTAS
+# ============================================
+
+def _buscar_fts(lista_terminos, tipo, limite, solo_en_stock):
+    # Cada término se busca como prefijo y todos deben aparecer (AND implícito)
+    expresion = ' '.join(f'"{t}"*' for t in lista_terminos)
+    pesos = ', '.join(str(p) for p in PESOS)
+    sql = (
+        f'SELECT c.producto_id FROM {TABLA_FTS} f '
+        f'JOIN {ProductoCatalogo._meta.db_table} c ON c.id = f.rowid '
+        f'WHERE {TABLA_FTS} MATCH %s'
+    )
+    params = [expresion]
+    if tipo:
+        sql += ' AND c.tipo = %s'
+        params.append(tipo)
+    if solo_en_stock:
+        sql += ' AND c.stock > 0'
+    sql += f' ORDER BY bm25({TABLA_FTS}, {pesos}), c.id LIMIT %s'
+    params.append(limite)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def _buscar_postgres(lista_terminos, tipo, limite, solo_en_stock):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+    vector = SearchVector('texto_busqueda', config='simple')
+    consulta = SearchQuery(' & '.join(f'{t}:*' for t in lista_terminos), config='simple', search_type='raw')
+    # `vector @@ consulta` usa el índice GIN creado en la migración 0005
+    entradas = (
+        ProductoCatalogo.objects
+        .annotate(vector=vector)
+        .filter(vector=consulta)
+        .annotate(rango=SearchRank(vector, consulta))
+    )
+    if tipo:
+        entradas = entradas.filter(tipo=tipo)
+    if solo_en_stock:
+        entradas = entradas.filter(stock__gt=0)
+    return list(entradas.order_by('-rango', 'id').values_list('producto_id', flat=True)[:limite])
+
+
+def _buscar_generico(lista_terminos, tipo, limite, solo_en_stock):
+    entradas = ProductoCatalogo.objects.all()
+    if tipo:
+        entradas = entradas.filter(tipo=tipo)
+    if solo_en_stock:
+        entradas = entradas.filter(stock__gt=0)
+    for termino in lista_terminos:
+        entradas = entradas.filter(texto_busqueda__contains=termino)
+    return list(entradas.order_by('-precio', 'id').values_list('producto_id', flat=True)[:limite])
+
+
+def buscar(consulta, tipo=None, limite=LIMITE_RESULTADOS, solo_en_stock=False):
+    """Devuelve los ids de producto que coinciden con `consulta`, ordenados por relevancia.
+
+    La búsqueda cubre modelo, color, estilo, colección, silueta y proveedor,
+    ignorando mayúsculas y acentos. `tipo` restringe a 'ropa', 'tenis' o 'gorra'.
+    """
+    lista_terminos = terminos(consulta)
+    if not lista_terminos:
+        return []
+    if usa_fts():
+        return _buscar_fts(lista_terminos, tipo, limite, solo_en_stock)
+    if connection.vendor == 'postgresql':
+        return _buscar_postgres(lista_terminos, tipo, limite, solo_en_stock)
+    return _buscar_generico(lista_terminos, tipo, limite, solo_en_stock)
+
+
+class ResultadosBusqueda:
+    """Secuencia perezosa de productos ordenados por relevancia.
+
+    Guarda solo la lista de ids rankeados; al paginar (`Paginator` usa
+    `count()` y rebanadas) consulta únicamente los productos de la página.
+    """
+
+    def __init__(self, queryset, ids):
+        self.queryset = queryset
+        self.ids = ids
+
+    def count(self):
+        return len(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, indice):
+        if not isinstance(indice, slice):
+            return self[indice:indice + 1][0]
+        ids_pagina = self.ids[indice]
+        por_id = self.queryset.in_bulk(ids_pagina)
+        return [por_id[pk] for pk in ids_pagina if pk in por_id]
+
+
+def filtrar_por_relevancia(queryset, consulta, tipo):
+    """Busca con el motor y devuelve los productos de `queryset` ordenados por relevancia.
+
+    Solo se consideran productos con stock, igual que en los listados públicos.
+    """
+    return ResultadosBusqueda(queryset, buscar(consulta, tipo=tipo, solo_en_stock=True))
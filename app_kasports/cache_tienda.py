@@ -0,0 +1,241 @@
+"""Caché de páginas y fragmentos de la tienda pública.
+
+- `cache_anonimo(*grupos)`: cachea la página completa para visitantes anónimos.
+- `{% cache_tarjeta %}` (templatetags/cache_tienda.py): cachea la tarjeta de un
+  producto.
+
+La invalidación usa contadores de versión guardados en la caché: cada clave
+incluye la versión vigente de sus grupos (`catalogo`, `proveedores`) o del
+producto y proveedor de la tarjeta, y `signals.py` incrementa esas versiones
+al guardar o eliminar productos y proveedores, o al cambiar el stock. Las
+entradas viejas simplemente dejan de leerse y expiran solas. Cada tabla de
+productos tiene además su propia versión (`tabla:ropa`, ...), que usan los
+ETag de la API de productos (api_productos.py).
+
+Las páginas con formularios (agregar al carrito) se guardan sin el token CSRF
+del visitante que las generó: al servirlas se pone el token de quien las pide.
+"""
+import asyncio
+import hashlib
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from .base_datos import en_ejecutor
+
+SEGUNDOS = getattr(settings, 'KASPORTS_CACHE_SEGUNDOS', 300)
+PREFIJO = 'tienda'
+AREAS = ('paginas', 'fragmentos')
+TOKEN_CSRF = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]+(")')
+MARCA_CSRF = b'__kasports_csrf__'
+
+
+# ============================================
+# VERSIONES E INVALIDACIÓN
+# ============================================
+
+def compartida(backend=None):
+    """True si la caché la ven todos los procesos (no es LocMemCache ni DummyCache).
+
+    Con una caché por proceso, un `invalidar()` solo llega al proceso que lo
+    ejecuta y los demás siguen sirviendo versiones viejas.
+    """
+    return not isinstance(backend or caches['default'], (LocMemCache, DummyCache))
+
+
+def _clave_version(nombre):
+    return f'{PREFIJO}:version:{nombre}'
+
+
+def versiones(nombres):
+    """Devuelve {nombre: versión} leyendo todas las versiones en un solo viaje a la caché."""
+    claves = {_clave_version(n): n for n in nombres}
+    actuales = cache.get_many(list(claves))
+    faltantes = [c for c in claves if c not in actuales]
+    if faltantes:
+        # Versión inicial única: si la caché perdió el contador, no se reutilizan entradas viejas
+        for clave in faltantes:
+            cache.add(clave, time.time_ns(), None)
+        actuales.update(cache.get_many(faltantes))
+    return {claves[c]: v for c, v in actuales.items()}
+
+
+def invalidar(*nombres):
+    """Incrementa la versión de cada grupo.
+
+    En FileBasedCache y DatabaseCache `incr()` lee y vuelve a escribir (no es
+    atómico), pero aquí basta: aunque dos procesos escriban el mismo número, la
+    versión ya no es la anterior y las entradas viejas dejan de leerse.
+    """
+    for nombre in nombres:
+        clave = _clave_version(nombre)
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, time.time_ns(), None)
+
+
+def invalidar_producto(tipo, producto_id):
+    invalidar('catalogo', f'tabla:{tipo}', f'producto:{tipo}:{producto_id}')
+
+
+def invalidar_productos(tipo, ids):
+    """Como `invalidar_producto` para varios productos del mismo tipo."""
+    invalidar('catalogo', f'tabla:{tipo}', *(f'producto:{tipo}:{pk}' for pk in ids))
+
+
+def invalidar_proveedor(proveedor_id):
+    invalidar('catalogo', 'proveedores', f'proveedor:{proveedor_id}')
+
+
+def adjuntar_versiones(productos, tipo=None):
+    """Asigna `producto.version_cache` (versión del producto y de su proveedor).
+
+    Sirve para Ropa/Tenis/Gorra (indicando `tipo`) y para entradas de `ProductoCatalogo`.
+    """
+    productos = list(productos)
+
+    def claves(p):
+        if tipo:
+            return f'producto:{tipo}:{p.pk}', f'proveedor:{p.proveedor_id}'
+        return f'producto:{p.tipo}:{p.producto_id}', f'proveedor:{p.proveedor_id}'
+
+    actuales = versiones({n for p in productos for n in claves(p)})
+    for producto in productos:
+        de_producto, de_proveedor = claves(producto)
+        producto.version_cache = f'{actuales[de_producto]}.{actuales[de_proveedor]}'
+    return productos
+
+
+def _resumen(*partes):
+    return hashlib.md5(repr(partes).encode('utf-8')).hexdigest()
+
+
+# ============================================
+# ESTADÍSTICAS
+# ============================================
+# Aciertos y fallos se cuentan en la propia caché. `incr()` solo es atómico en
+# Redis (y dentro de un proceso con LocMemCache); en FileBasedCache, el backend
+# por defecto, y en DatabaseCache lee y vuelve a escribir, así que con peticiones
+# simultáneas se pierden incrementos y los totales quedan por debajo de los
+# reales. El porcentaje de aciertos sirve como aproximación, no como conteo exacto.
+
+def _clave_contador(area, acierto):
+    return f'{PREFIJO}:estadisticas:{area}:{"aciertos" if acierto else "fallos"}'
+
+
+def contar(area, acierto):
+    clave = _clave_contador(area, acierto)
+    if not cache.add(clave, 1, None):
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, 1, None)
+
+
+def estadisticas():
+    """Aciertos, fallos y porcentaje de aciertos por área."""
+    claves = [_clave_contador(a, acierto) for a in AREAS for acierto in (True, False)]
+    valores = cache.get_many(claves)
+    resultado = []
+    for area in AREAS:
+        aciertos = valores.get(_clave_contador(area, True), 0)
+        fallos = valores.get(_clave_contador(area, False), 0)
+        total = aciertos + fallos
+        resultado.append({
+            'area': area,
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'porcentaje': round(aciertos * 100 / total, 1) if total else 0,
+        })
+    return resultado
+
+
+def reiniciar_estadisticas():
+    cache.delete_many([_clave_contador(a, acierto) for a in AREAS for acierto in (True, False)])
+
+
+# ============================================
+# FRAGMENTOS Y PÁGINAS
+# ============================================
+
+def clave_tarjeta(tipo, producto, variaciones=()):
+    """Clave de la tarjeta de un producto; None si no tiene `version_cache`."""
+    version = getattr(producto, 'version_cache', None)
+    if version is None:
+        return None
+    producto_id = getattr(producto, 'producto_id', None) or producto.pk
+    return f'{PREFIJO}:tarjeta:{tipo}:{producto_id}:{version}:{_resumen(*variaciones)}'
+
+
+def _tiene_mensajes(request):
+    """True si hay mensajes pendientes (cookie o sesión) que la página debe mostrar."""
+    if request.COOKIES.get('messages'):
+        return True
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return bool(request.session.get('_messages'))
+    return False
+
+
+def _pagina_guardada(request, grupos):
+    """(clave, respuesta guardada o None); la clave es None si la petición no se cachea."""
+    if request.method != 'GET' or request.user.is_authenticated or _tiene_mensajes(request):
+        return None, None
+    actuales = versiones(grupos)
+    clave = f'{PREFIJO}:pagina:{_resumen(request.get_full_path(), *(actuales[g] for g in grupos))}'
+    guardada = cache.get(clave)
+    contar('paginas', guardada is not None)
+    if guardada is None:
+        return clave, None
+    contenido, tipo_contenido = guardada
+    if MARCA_CSRF in contenido:
+        # get_token() también hace que CsrfViewMiddleware envíe la cookie del visitante
+        contenido = contenido.replace(MARCA_CSRF, get_token(request).encode('ascii'))
+    return clave, HttpResponse(contenido, content_type=tipo_contenido)
+
+
+def _guardar_pagina(clave, response):
+    if response.status_code == 200 and not response.streaming and not response.cookies:
+        contenido = TOKEN_CSRF.sub(rb'\1' + MARCA_CSRF + rb'\2', response.content)
+        cache.set(clave, (contenido, response['Content-Type']), SEGUNDOS)
+
+
+def cache_anonimo(*grupos):
+    """Cachea la respuesta de una vista GET para visitantes anónimos.
+
+    La clave incluye la ruta completa (con parámetros de búsqueda y página) y
+    la versión de `grupos`, de modo que invalidar un grupo descarta sus páginas.
+    Funciona igual con vistas asíncronas (vistas_async.py).
+    """
+    def decorador(vista):
+        if asyncio.iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envuelta_async(request, *args, **kwargs):
+                # La sesión y el usuario se leen con el ORM síncrono
+                clave, guardada = await en_ejecutor(_pagina_guardada)(request, grupos)
+                if guardada is not None:
+                    return guardada
+                response = await vista(request, *args, **kwargs)
+                if clave is not None:
+                    await en_ejecutor(_guardar_pagina)(clave, response)
+                return response
+            return envuelta_async
+
+        @wraps(vista)
+        def envuelta(request, *args, **kwargs):
+            clave, guardada = _pagina_guardada(request, grupos)
+            if guardada is not None:
+                return guardada
+            response = vista(request, *args, **kwargs)
+            if clave is not None:
+                _guardar_pagina(clave, response)
+            return response
+        return envuelta
+    return decorador
@@ -0,0 +1,350 @@
+"""Almacenamiento del carrito de compras.
+
+- `CarritoSesion` (visitantes anónimos): las líneas viven en la sesión, sin
+  filas en `Carrito`/`DetalleCarrito` ni reservas de stock. Solo guarda
+  (tipo, producto, talla, cantidad), así que cabe también en una sesión de
+  cookie firmada (`signed_cookies`). Los precios se leen al mostrarlo.
+- `CarritoCliente` (clientes): las líneas son `DetalleCarrito` del carrito
+  activo, con su reserva de stock. Leerlo no escribe nada: el carrito activo
+  se crea al agregar la primera línea.
+- `fusionar()`: al iniciar sesión (`signals.py`, `user_logged_in`) pasa las
+  líneas de la sesión al carrito del cliente. Lee las líneas existentes una
+  vez, suma las del mismo producto y talla, y guarda todo con un
+  `bulk_update` y un `bulk_create`; después aparta el stock de lo fusionado.
+
+Los dos exponen la misma interfaz (`lineas`, `agregar`, `actualizar`,
+`eliminar`, `totales`) para que las vistas del carrito, las de formulario y
+las de la API JSON, no distingan entre ellos.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from . import precios, reservas
+from .catalogo import MODELOS_CATALOGO
+from .models import Carrito, DetalleCarrito
+from .reservas import StockInsuficiente
+from .tallas import existencias_por_talla
+
+SESION_CARRITO = 'carrito'
+
+
+class LineaInvalida(Exception):
+    """La talla o la cantidad pedidas no se pueden agregar al carrito."""
+
+
+def disponible_para(tipo, producto, talla):
+    """Existencias del producto en la talla pedida (o totales si no maneja tallas)."""
+    existencias = existencias_por_talla(tipo, producto.pk)
+    if existencias and talla:
+        return existencias.get(talla, 0)
+    return producto.stock
+
+
+def preparar_linea(tipo, producto, talla, cantidad):
+    """Valida la talla y la cantidad enviadas para agregar `producto`.
+
+    Devuelve (talla, cantidad, disponible) con la cantidad ajustada a las
+    existencias; lanza `LineaInvalida` con el mensaje para el cliente.
+    """
+    if producto.stock < 1:
+        raise LineaInvalida('Producto sin stock disponible')
+    talla = (talla or '').strip() or None
+    try:
+        cantidad = max(1, min(int(cantidad), producto.stock))
+    except (TypeError, ValueError):
+        cantidad = 1
+
+    # Validar la talla contra la matriz de existencias por talla
+    existencias = existencias_por_talla(tipo, producto.pk)
+    if not existencias:
+        return talla, cantidad, producto.stock
+    if not talla:
+        # Si el administrador definió tallas disponibles, requerimos que el cliente elija
+        raise LineaInvalida('Por favor selecciona una talla')
+    if talla not in existencias:
+        raise LineaInvalida('Talla inválida para este producto')
+    disponible = existencias[talla]
+    if disponible < 1:
+        raise LineaInvalida(f'La talla {talla} no tiene stock disponible')
+    return talla, min(cantidad, disponible), disponible
+
+
+# ============================================
+# CARRITO DE SESIÓN (ANÓNIMOS)
+# ============================================
+
+class LineaSesion:
+    """Línea del carrito de sesión con los atributos de `DetalleCarrito` que usan las plantillas."""
+
+    reserva = None
+
+    def __init__(self, id, tipo, producto, talla, cantidad):
+        self.id = id
+        self.tipo_producto = tipo
+        self.producto = producto
+        self.talla_seleccionada = talla
+        self.cantidad = cantidad
+        self.subtotal = producto.precio * cantidad
+
+
+class CarritoSesion:
+    """Carrito guardado en `request.session[SESION_CARRITO]`.
+
+    Formato: {'lineas': {'<id>': [tipo, producto_id, talla, cantidad]}, 'siguiente': <id>}.
+    Los ids no se reutilizan, así que un formulario viejo no modifica otra línea.
+    """
+
+    def __init__(self, request):
+        self.sesion = request.session
+
+    def _datos(self):
+        return self.sesion.get(SESION_CARRITO) or {'lineas': {}, 'siguiente': 1}
+
+    def _guardar(self, datos):
+        self.sesion[SESION_CARRITO] = datos
+
+    def vacio(self):
+        return not self._datos()['lineas']
+
+    def lineas(self):
+        """Líneas con su producto (una consulta por tipo); se omiten productos eliminados."""
+        guardadas = self._datos()['lineas']
+        ids = defaultdict(set)
+        for tipo, producto_id, _, _ in guardadas.values():
+            ids[tipo].add(producto_id)
+        productos = {tipo: MODELOS_CATALOGO[tipo].objects.in_bulk(list(pks)) for tipo, pks in ids.items()}
+        lineas = []
+        for clave in sorted(guardadas, key=int):
+            tipo, producto_id, talla, cantidad = guardadas[clave]
+            producto = productos[tipo].get(producto_id)
+            if producto is not None:
+                lineas.append(LineaSesion(int(clave), tipo, producto, talla, cantidad))
+        return lineas
+
+    def agregar(self, tipo, producto, talla, cantidad, disponible):
+        """Suma `cantidad` a la línea del producto y talla (o la crea).
+
+        Devuelve (línea, creada).
+        """
+        datos = self._datos()
+        clave = next((c for c, l in datos['lineas'].items() if l[:3] == [tipo, producto.pk, talla]), None)
+        total = cantidad + (datos['lineas'][clave][3] if clave else 0)
+        if total > disponible:
+            raise StockInsuficiente(producto.modelo, disponible, talla)
+        creada = clave is None
+        if creada:
+            clave = str(datos['siguiente'])
+            datos['siguiente'] += 1
+        datos['lineas'][clave] = [tipo, producto.pk, talla, total]
+        self._guardar(datos)
+        return LineaSesion(int(clave), tipo, producto, talla, total), creada
+
+    def actualizar(self, linea_id, cantidad):
+        """Cambia la cantidad de una línea; devuelve la línea o None si ya no existe."""
+        datos = self._datos()
+        linea = datos['lineas'].get(str(linea_id))
+        if linea is None:
+            return None
+        tipo, producto_id, talla, _ = linea
+        producto = MODELOS_CATALOGO[tipo].objects.filter(pk=producto_id).first()
+        if producto is None:
+            return None
+        disponible = disponible_para(tipo, producto, talla)
+        if cantidad > disponible:
+            raise StockInsuficiente(producto.modelo, disponible, talla)
+        linea[3] = cantidad
+        self._guardar(datos)
+        return LineaSesion(int(linea_id), tipo, producto, talla, cantidad)
+
+    def eliminar(self, linea_id):
+        """Quita una línea; devuelve el nombre del producto o None si no existía."""
+        datos = self._datos()
+        linea = datos['lineas'].pop(str(linea_id), None)
+        if linea is None:
+            return None
+        self._guardar(datos)
+        tipo, producto_id = linea[:2]
+        return MODELOS_CATALOGO[tipo].objects.filter(pk=producto_id).values_list('modelo', flat=True).first() or ''
+
+    def totales(self, codigo=None, lineas=None):
+        return precios.totales_lineas(self.lineas() if lineas is None else lineas, codigo)
+
+    def vaciar(self):
+        self.sesion.pop(SESION_CARRITO, None)
+
+
+# ============================================
+# CARRITO DE BASE DE DATOS (CLIENTES)
+# ============================================
+
+_SIN_LEER = object()
+
+
+class CarritoCliente:
+    """Carrito activo de un cliente (`Carrito` con estado 'Activo')."""
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self._carrito = _SIN_LEER
+        self._modificado = False
+
+    @property
+    def carrito(self):
+        """El carrito activo o None; no lo crea."""
+        if self._carrito is _SIN_LEER:
+            self._carrito = Carrito.objects.filter(cliente=self.cliente, estado='Activo').first()
+        return self._carrito
+
+    def carrito_para_escribir(self):
+        """El carrito activo, creándolo si hace falta (para agregar líneas)."""
+        if self.carrito is None:
+            try:
+                with transaction.atomic():
+                    self._carrito = Carrito.objects.create(cliente=self.cliente, estado='Activo')
+            except IntegrityError:
+                # Otra petición del mismo cliente lo creó primero (`carrito_activo_unico`)
+                self._carrito = Carrito.objects.get(cliente=self.cliente, estado='Activo')
+        return self._carrito
+
+    def vacio(self):
+        return self.carrito is None or not self.carrito.detalles.exists()
+
+    def lineas(self):
+        if self.carrito is None:
+            return []
+        return self.carrito.detalles.select_related('ropa', 'tenis', 'gorra', 'reserva')
+
+    def _linea(self, linea_id):
+        return (
+            DetalleCarrito.objects.select_related('ropa', 'tenis', 'gorra')
+            .filter(pk=linea_id, carrito__cliente=self.cliente, carrito__estado='Activo').first()
+        )
+
+    def agregar(self, tipo, producto, talla, cantidad, disponible=None):
+        """Suma `cantidad` a la línea del producto y talla (o la crea) y ajusta su reserva.
+
+        Devuelve (línea, creada). `disponible` no se usa: la reserva valida el
+        stock libre dentro de la transacción.
+        """
+        carrito = self.carrito_para_escribir()
+        filtro = {'carrito': carrito, tipo: producto}
+        if talla:
+            filtro['talla_seleccionada'] = talla
+        detalle = DetalleCarrito.objects.filter(**filtro).first()
+
+        # La línea y su reserva de stock se guardan juntas: si no alcanza, no se guarda nada
+        with transaction.atomic():
+            creada = detalle is None
+            if detalle:
+                detalle.cantidad += cantidad
+                detalle.subtotal = detalle.cantidad * producto.precio
+                # Si por alguna razón no tenía talla y ahora sí
+                if talla and not detalle.talla_seleccionada:
+                    detalle.talla_seleccionada = talla
+                detalle.save()
+            else:
+                detalle = DetalleCarrito.objects.create(
+                    carrito=carrito, cantidad=cantidad, subtotal=producto.precio * cantidad,
+                    talla_seleccionada=talla or None, **{tipo: producto},
+                )
+            detalle.reserva = reservas.reservar(detalle, detalle.cantidad)
+        self._modificado = True
+        return detalle, creada
+
+    def actualizar(self, linea_id, cantidad):
+        detalle = self._linea(linea_id)
+        if detalle is None:
+            return None
+        # Ajustar la reserva (valida el stock por talla si aplica) junto con la línea
+        with transaction.atomic():
+            detalle.reserva = reservas.reservar(detalle, cantidad)
+            detalle.cantidad = cantidad
+            detalle.subtotal = cantidad * detalle.producto.precio
+            detalle.save()
+        self._modificado = True
+        return detalle
+
+    def eliminar(self, linea_id):
+        detalle = self._linea(linea_id)
+        if detalle is None:
+            return None
+        nombre = detalle.producto.modelo
+        detalle.delete()
+        self._modificado = True
+        return nombre
+
+    def totales(self, codigo=None, lineas=None, usar_cache=True):
+        if self._modificado and self._carrito not in (_SIN_LEER, None):
+            # Las señales ya incrementaron la versión en la base: la copia leída antes es vieja
+            self.carrito.refresh_from_db(fields=['version'])
+        self._modificado = False
+        if self.carrito is None:
+            return precios.totales_lineas([], codigo)
+        return precios.totales_carrito(self.carrito, codigo, usar_cache=usar_cache)
+
+
+# ============================================
+# FUSIÓN AL INICIAR SESIÓN
+# ============================================
+
+def _clave(tipo, producto_id, talla):
+    return (tipo, producto_id, talla or None)
+
+
+def fusionar(request, cliente):
+    """Pasa el carrito de sesión al carrito activo de `cliente`.
+
+    Devuelve avisos (texto) de las líneas que se recortaron o quitaron porque
+    ya no hay stock suficiente para apartarlas.
+    """
+    sesion = CarritoSesion(request)
+    if sesion.vacio():
+        return []
+    lineas = sesion.lineas()
+    destino = CarritoCliente(cliente)
+    avisos = []
+    with transaction.atomic():
+        carrito = destino.carrito_para_escribir()
+        existentes = {
+            _clave(d.tipo_producto, getattr(d, f'{d.tipo_producto}_id'), d.talla_seleccionada): d
+            for d in carrito.detalles.all()
+        }
+        nuevas, sumadas = [], []
+        for linea in lineas:
+            clave = _clave(linea.tipo_producto, linea.producto.pk, linea.talla_seleccionada)
+            detalle = existentes.get(clave)
+            if detalle is None:
+                detalle = DetalleCarrito(
+                    carrito=carrito, cantidad=linea.cantidad, talla_seleccionada=linea.talla_seleccionada,
+                    **{linea.tipo_producto: linea.producto},
+                )
+                existentes[clave] = detalle
+                nuevas.append(detalle)
+            else:
+                detalle.cantidad += linea.cantidad
+                sumadas.append(detalle)
+            detalle.subtotal = detalle.cantidad * linea.producto.precio
+
+        DetalleCarrito.objects.bulk_update(sumadas, ['cantidad', 'subtotal'])
+        DetalleCarrito.objects.bulk_create(nuevas)
+        # bulk_* no envía post_save: se descartan aquí los totales en caché
+        Carrito.objects.filter(pk=carrito.pk).update(version=F('version') + 1)
+
+        for detalle in sumadas + nuevas:
+            nombre = detalle.producto.modelo
+            try:
+                reservas.reservar(detalle, detalle.cantidad)
+            except StockInsuficiente as error:
+                if error.disponible > 0:
+                    reservas.reservar(detalle, error.disponible)
+                    detalle.cantidad = error.disponible
+                    detalle.subtotal = detalle.cantidad * detalle.producto.precio
+                    detalle.save(update_fields=['cantidad', 'subtotal'])
+                    avisos.append(f'{nombre}: solo quedan {error.disponible} disponibles')
+                else:
+                    detalle.delete()
+                    avisos.append(f'{nombre} se quitó del carrito por falta de stock')
+    sesion.vaciar()
+    return avisos
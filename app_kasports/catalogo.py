@@ -0,0 +1,171 @@
+"""Capa de catálogo unificado para Ropa, Tenis y Gorra.
+
+`ProductoCatalogo` guarda una fila por producto con los datos que usan los
+listados cruzados (precio, stock, género, proveedor y tallas), de forma que
+las páginas de inicio, productos y el panel administrativo resuelven las tres
+categorías con una sola consulta indexada.
+"""
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .busqueda import ResultadosBusqueda, texto_busqueda
+from .models import Ropa, Tenis, Gorra, ProductoCatalogo
+
+# Clave de tipo -> modelo (mismas claves que usa la URL `agregar_carrito`)
+MODELOS_CATALOGO = {
+    'ropa': Ropa,
+    'tenis': Tenis,
+    'gorra': Gorra,
+}
+
+TIPO_POR_MODELO = {modelo: tipo for tipo, modelo in MODELOS_CATALOGO.items()}
+
+# Atributos que solo existen en algunas categorías
+CAMPOS_OPCIONALES = ('estilo', 'coleccion', 'silueta', 'visera', 'broche')
+
+TAMANO_LOTE = 500
+
+
+def tipo_de(producto):
+    """Devuelve la clave de tipo ('ropa', 'tenis', 'gorra') de una instancia."""
+    return TIPO_POR_MODELO.get(type(producto))
+
+
+def datos_catalogo(producto, proveedor_nombre=None):
+    """Construye el diccionario de campos de `ProductoCatalogo` para un producto."""
+    if proveedor_nombre is None:
+        proveedor_nombre = producto.proveedor.nombre
+    datos = {
+        'proveedor_id': producto.proveedor_id,
+        'proveedor_nombre': proveedor_nombre,
+        'modelo': producto.modelo,
+        'color': producto.color,
+        'genero': producto.genero,
+        'precio': producto.precio,
+        'stock': producto.stock,
+        'tallas_disponibles': producto.tallas_disponibles,
+        'imagen': producto.imagen.name if producto.imagen else None,
+    }
+    for campo in CAMPOS_OPCIONALES:
+        datos[campo] = getattr(producto, campo, '') or ''
+    datos['texto_busqueda'] = texto_busqueda(datos)
+    return datos
+
+
+def sincronizar_producto(producto):
+    """Crea o actualiza la entrada de catálogo de un producto."""
+    entrada, _ = ProductoCatalogo.objects.update_or_create(
+        tipo=tipo_de(producto),
+        producto_id=producto.pk,
+        defaults=datos_catalogo(producto),
+    )
+    return entrada
+
+
+def eliminar_producto(tipo, producto_id):
+    """Elimina la entrada de catálogo de un producto borrado."""
+    ProductoCatalogo.objects.filter(tipo=tipo, producto_id=producto_id).delete()
+
+
+def actualizar_proveedor(proveedor):
+    """Propaga el nombre del proveedor a sus entradas de catálogo.
+
+    Devuelve las entradas modificadas para que puedan reindexarse.
+    """
+    entradas = list(ProductoCatalogo.objects.filter(proveedor=proveedor).exclude(
+        proveedor_nombre=proveedor.nombre
+    ))
+    for entrada in entradas:
+        entrada.proveedor_nombre = proveedor.nombre
+        entrada.texto_busqueda = texto_busqueda(entrada.__dict__)
+    ProductoCatalogo.objects.bulk_update(entradas, ['proveedor_nombre', 'texto_busqueda'], batch_size=TAMANO_LOTE)
+    return entradas
+
+
+def entradas_para(tipo, productos):
+    """Genera instancias (sin guardar) de `ProductoCatalogo` para un iterable de productos."""
+    for producto in productos:
+        yield ProductoCatalogo(tipo=tipo, producto_id=producto.pk, **datos_catalogo(producto))
+
+
+def reconstruir_catalogo(tamano_lote=TAMANO_LOTE):
+    """Regenera el catálogo completo a partir de Ropa, Tenis y Gorra.
+
+    Devuelve un diccionario con el número de entradas creadas por tipo.
+    """
+    totales = {}
+    with transaction.atomic():
+        ProductoCatalogo.objects.all().delete()
+        for tipo, modelo in MODELOS_CATALOGO.items():
+            productos = modelo.objects.select_related('proveedor').order_by('pk').iterator(chunk_size=tamano_lote)
+            lote = []
+            total = 0
+            for entrada in entradas_para(tipo, productos):
+                lote.append(entrada)
+                if len(lote) >= tamano_lote:
+                    ProductoCatalogo.objects.bulk_create(lote)
+                    total += len(lote)
+                    lote = []
+            if lote:
+                ProductoCatalogo.objects.bulk_create(lote)
+                total += len(lote)
+            totales[tipo] = total
+    return totales
+
+
+def top_por_tipo(n=3):
+    """Devuelve los `n` productos en stock más caros de cada tipo en una sola consulta.
+
+    Resultado: {'ropa': [...], 'tenis': [...], 'gorra': [...]}
+    """
+    resultado = {tipo: [] for tipo in MODELOS_CATALOGO}
+    entradas = (
+        ProductoCatalogo.objects
+        .filter(stock__gt=0)
+        .annotate(posicion=Window(
+            expression=RowNumber(),
+            partition_by=[F('tipo')],
+            order_by=[F('precio').desc(), F('id').asc()],
+        ))
+        .filter(posicion__lte=n)
+        .order_by('tipo', 'posicion')
+    )
+    for entrada in entradas:
+        resultado[entrada.tipo].append(entrada)
+    return resultado
+
+
+# ============================================
+# ORDEN DE LOS LISTADOS
+# ============================================
+
+# `?orden=` -> (etiqueta, campos). Cada orden tiene su índice parcial (stock > 0) en
+# Ropa, Tenis y Gorra; `paginar()` agrega `id` como desempate en la misma dirección
+ORDENES = {
+    'recientes': ('Más recientes', ('-id',)),
+    'precio': ('Precio: menor a mayor', ('precio',)),
+    'precio_desc': ('Precio: mayor a menor', ('-precio',)),
+    'vendidos': ('Más vendidos', ('-ventas_totales',)),
+    'existencias': ('Más existencias', ('-stock',)),
+}
+ORDEN_PREDETERMINADO = 'recientes'
+# Orden propio de la búsqueda de texto completo
+RELEVANCIA = 'relevancia'
+
+
+def ordenar(request, listado):
+    """Devuelve (listado, clave del orden, campos para `paginar`) según `?orden=`.
+
+    Los resultados de una búsqueda conservan el orden por relevancia salvo que se
+    elija otro; entonces sus ids (a lo más `busqueda.LIMITE_RESULTADOS`) pasan a
+    un queryset que se pagina con el índice del orden elegido.
+    """
+    clave = request.GET.get('orden', '')
+    if isinstance(listado, ResultadosBusqueda):
+        if clave not in ORDENES:
+            return listado, RELEVANCIA, ()
+        listado = listado.queryset.filter(id__in=listado.ids)
+    elif clave not in ORDENES:
+        clave = ORDEN_PREDETERMINADO
+    return listado, clave, ORDENES[clave][1]
@@ -0,0 +1,17 @@
+"""Verificaciones de `python manage.py check` propias de la tienda."""
+from django.core.checks import Error, Tags, register
+
+from . import cache_tienda
+
+
+@register(Tags.caches, deploy=True)
+def cache_compartida(app_configs, **kwargs):
+    """Con varios procesos la caché debe ser compartida (ver `cache_tienda.compartida`)."""
+    if cache_tienda.compartida():
+        return []
+    return [Error(
+        'La caché predeterminada es local a cada proceso.',
+        hint='Las invalidaciones, los roles en sesión y los ETag no llegarían a los demás procesos. '
+             'Use KASPORTS_CACHE=archivo, base_datos o redis.',
+        id='app_kasports.E001',
+    )]
@@ -0,0 +1,285 @@
+"""Servicio de archivos estáticos y de media sin pasar por Django.
+
+- `AlmacenamientoComprimido` (STATICFILES_STORAGE): además de los nombres con
+  hash de `ManifestStaticFilesStorage`, `collectstatic` escribe junto a cada
+  archivo de texto una copia `.gz` (y `.br` si está instalado `brotli`).
+- `ServidorArchivos` envuelve la aplicación WSGI (ver `backend_kasports/wsgi.py`)
+  y responde `/static/` antes de que la petición llegue a los middlewares y
+  vistas de Django. `/media/` solo con `KASPORTS_SERVIR_MEDIA` y solo las
+  carpetas de `KASPORTS_MEDIA_PUBLICA` (imágenes de productos, proveedores y
+  variantes); las evidencias de entrega de los clientes nunca se sirven aquí:
+    * los archivos con hash del manifiesto se marcan como `immutable` por un año;
+    * se elige la copia comprimida según `Accept-Encoding`;
+    * `ETag`/`Last-Modified` con respuestas 304 y peticiones `Range` (206).
+
+Los estáticos se indexan una sola vez al iniciar; si `collectstatic` no se ha
+ejecutado (desarrollo), la petición sigue de largo hacia Django.
+"""
+import gzip
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin brotli solo se generan copias gzip
+    brotli = None
+
+# Extensiones que vale la pena comprimir (las imágenes ya vienen comprimidas)
+COMPRIMIBLES = ('.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico', '.ttf', '.otf')
+TAMANO_MINIMO = 256
+# (codificación, extensión) en orden de preferencia
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+UN_ANO = 365 * 24 * 60 * 60
+CACHE_INMUTABLE = f'public, max-age={UN_ANO}, immutable'
+CACHE_ESTATICO = getattr(settings, 'KASPORTS_CACHE_ESTATICOS', 'public, max-age=300')
+CACHE_MEDIA = getattr(settings, 'KASPORTS_CACHE_MEDIA', 'public, max-age=86400')
+# Carpetas de media cuyo contenido nunca cambia (las variantes se nombran por su huella)
+MEDIA_INMUTABLE = ('derivadas/',)
+# Carpetas de media que pueden servirse sin sesión. Las variantes de `derivadas/`
+# solo se alcanzan conociendo la huella SHA-256 del original.
+MEDIA_PUBLICA = ('ropa/', 'tenis/', 'gorras/', 'proveedores/', 'derivadas/')
+TAMANO_BLOQUE = 64 * 1024
+
+# Tipos que `mimetypes` no conoce en todas las versiones de Python
+for _tipo, _extension in (('image/avif', '.avif'), ('image/webp', '.webp'), ('font/woff2', '.woff2')):
+    mimetypes.add_type(_tipo, _extension)
+
+
+# ============================================
+# COMPRESIÓN EN COLLECTSTATIC
+# ============================================
+
+def comprimir(ruta):
+    """Escribe `ruta.gz` (y `ruta.br`) si el resultado es al menos 5% más chico."""
+    with open(ruta, 'rb') as archivo:
+        contenido = archivo.read()
+    escritos = []
+    if len(contenido) < TAMANO_MINIMO:
+        return escritos
+    variantes = [('.gz', gzip.compress(contenido, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variantes.append(('.br', brotli.compress(contenido, quality=11)))
+    for extension, comprimido in variantes:
+        if len(comprimido) < len(contenido) * 0.95:
+            with open(ruta + extension, 'wb') as archivo:
+                archivo.write(comprimido)
+            escritos.append(ruta + extension)
+    return escritos
+
+
+class AlmacenamientoComprimido(ManifestStaticFilesStorage):
+    """`ManifestStaticFilesStorage` que además deja copias precomprimidas."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for carpeta, _, archivos in os.walk(self.location):
+            for nombre in archivos:
+                if nombre.lower().endswith(COMPRIMIBLES):
+                    comprimir(os.path.join(carpeta, nombre))
+
+
+# ============================================
+# SERVIDOR WSGI
+# ============================================
+
+class Archivo:
+    """Datos de un archivo servible y de sus copias comprimidas."""
+
+    def __init__(self, ruta, info, cache_control):
+        self.ruta = ruta
+        self.tamano = info.st_size
+        self.modificado = http_date(info.st_mtime)
+        self.mtime = int(info.st_mtime)
+        self.etag = f'"{info.st_mtime_ns:x}-{info.st_size:x}"'
+        self.cache_control = cache_control
+        tipo, _ = mimetypes.guess_type(ruta)
+        tipo = tipo or 'application/octet-stream'
+        if tipo.startswith('text/') or tipo in ('application/javascript', 'application/json', 'image/svg+xml'):
+            tipo += '; charset=utf-8'
+        self.tipo = tipo
+        self.comprimidos = {}
+        for codificacion, extension in CODIFICACIONES:
+            try:
+                info_comprimido = os.stat(ruta + extension)
+            except OSError:
+                continue
+            self.comprimidos[codificacion] = (ruta + extension, info_comprimido.st_size)
+
+
+def _archivo(ruta, cache_control):
+    try:
+        info = os.stat(ruta)
+    except OSError:
+        return None
+    if not stat.S_ISREG(info.st_mode):
+        return None
+    return Archivo(ruta, info, cache_control)
+
+
+def rango_solicitado(encabezado, tamano):
+    """(inicio, fin) inclusivos de un `Range: bytes=...` simple; None si no aplica, False si es inválido."""
+    coincidencia = re.fullmatch(r'\s*bytes=(\d*)-(\d*)\s*', encabezado or '')
+    if not coincidencia:
+        return None
+    inicio, fin = coincidencia.groups()
+    if not inicio and not fin:
+        return False
+    if not inicio:
+        # Sufijo: los últimos N bytes
+        largo = int(fin)
+        if largo == 0:
+            return False
+        return max(0, tamano - largo), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or fin < inicio:
+        return False
+    return inicio, fin
+
+
+def _leer(archivo, restante):
+    try:
+        while restante > 0:
+            bloque = archivo.read(min(TAMANO_BLOQUE, restante))
+            if not bloque:
+                break
+            restante -= len(bloque)
+            yield bloque
+    finally:
+        archivo.close()
+
+
+class ServidorArchivos:
+    """Middleware WSGI que sirve estáticos y media antes de llegar a Django."""
+
+    def __init__(self, aplicacion, raiz_estaticos=None, url_estaticos=None, raiz_media=None, url_media=None,
+                 servir_media=None, media_publica=None):
+        self.aplicacion = aplicacion
+        self.raiz_estaticos = str(raiz_estaticos or settings.STATIC_ROOT or '')
+        self.url_estaticos = url_estaticos or settings.STATIC_URL
+        self.raiz_media = str(raiz_media or settings.MEDIA_ROOT or '')
+        self.url_media = url_media or settings.MEDIA_URL
+        if servir_media is None:
+            servir_media = getattr(settings, 'KASPORTS_SERVIR_MEDIA', False)
+        self.servir_media = servir_media and bool(self.raiz_media)
+        self.media_publica = tuple(
+            media_publica if media_publica is not None else getattr(settings, 'KASPORTS_MEDIA_PUBLICA', MEDIA_PUBLICA)
+        )
+        self.estaticos = self.indexar_estaticos()
+
+    def indexar_estaticos(self):
+        """{url: Archivo} de todo STATIC_ROOT; los nombres del manifiesto son inmutables."""
+        if not self.raiz_estaticos or not os.path.isdir(self.raiz_estaticos):
+            return {}
+        try:
+            with open(os.path.join(self.raiz_estaticos, 'staticfiles.json'), encoding='utf-8') as archivo:
+                con_hash = set(json.load(archivo).get('paths', {}).values())
+        except (OSError, ValueError):
+            con_hash = set()
+        indice = {}
+        for carpeta, _, nombres in os.walk(self.raiz_estaticos):
+            for nombre in nombres:
+                if nombre.endswith(('.gz', '.br')):
+                    continue
+                ruta = os.path.join(carpeta, nombre)
+                relativa = os.path.relpath(ruta, self.raiz_estaticos).replace(os.sep, '/')
+                archivo = _archivo(ruta, CACHE_INMUTABLE if relativa in con_hash else CACHE_ESTATICO)
+                if archivo:
+                    indice[self.url_estaticos + relativa] = archivo
+        return indice
+
+    def archivo_media(self, ruta_url):
+        # normpath antes de revisar la carpeta: "ropa/../entregas/x.jpg" no es pública
+        relativa = posixpath.normpath(ruta_url[len(self.url_media):])
+        if not relativa.startswith(self.media_publica):
+            return None  # Que Django decida (404 fuera de DEBUG)
+        try:
+            ruta = safe_join(self.raiz_media, relativa)
+        except (SuspiciousFileOperation, ValueError):
+            return None  # Fuera de MEDIA_ROOT: que Django responda
+        inmutable = relativa.startswith(MEDIA_INMUTABLE)
+        return _archivo(ruta, CACHE_INMUTABLE if inmutable else CACHE_MEDIA)
+
+    def __call__(self, environ, start_response):
+        metodo = environ.get('REQUEST_METHOD')
+        ruta = environ.get('PATH_INFO', '')
+        archivo = None
+        if metodo in ('GET', 'HEAD'):
+            if ruta.startswith(self.url_estaticos):
+                archivo = self.estaticos.get(ruta)
+            elif self.servir_media and ruta.startswith(self.url_media):
+                archivo = self.archivo_media(ruta)
+        if archivo is None:
+            return self.aplicacion(environ, start_response)
+        return self.responder(archivo, environ, start_response, metodo == 'HEAD')
+
+    def responder(self, archivo, environ, start_response, solo_encabezados=False):
+        encabezados = [
+            ('Cache-Control', archivo.cache_control),
+            ('Last-Modified', archivo.modificado),
+            ('X-Content-Type-Options', 'nosniff'),
+        ]
+        if archivo.comprimidos:
+            encabezados.append(('Vary', 'Accept-Encoding'))
+
+        aceptadas = environ.get('HTTP_ACCEPT_ENCODING', '')
+        codificacion = None
+        if 'HTTP_RANGE' not in environ:
+            codificacion = next((c for c in archivo.comprimidos if re.search(rf'\b{c}\b', aceptadas)), None)
+        etag = archivo.etag if codificacion is None else f'{archivo.etag[:-1]}-{codificacion}"'
+        encabezados.append(('ETag', etag))
+
+        # Validación condicional: If-None-Match tiene prioridad sobre If-Modified-Since
+        si_no_coincide = environ.get('HTTP_IF_NONE_MATCH')
+        if si_no_coincide is not None:
+            etiquetas = [e.strip().removeprefix('W/') for e in si_no_coincide.split(',')]
+            no_modificado = '*' in etiquetas or etag in etiquetas
+        else:
+            desde = parse_http_date_safe(environ.get('HTTP_IF_MODIFIED_SINCE', ''))
+            no_modificado = desde is not None and archivo.mtime <= desde
+        if no_modificado:
+            start_response('304 Not Modified', encabezados)
+            return []
+
+        ruta, tamano = (archivo.ruta, archivo.tamano) if codificacion is None else archivo.comprimidos[codificacion]
+        estado, inicio, fin = '200 OK', 0, tamano - 1
+        encabezados += [('Content-Type', archivo.tipo), ('Accept-Ranges', 'bytes')]
+        if codificacion:
+            encabezados.append(('Content-Encoding', codificacion))
+
+        rango = rango_solicitado(environ.get('HTTP_RANGE'), tamano)
+        si_rango = environ.get('HTTP_IF_RANGE')
+        if rango is not None and si_rango and si_rango not in (etag, archivo.modificado):
+            rango = None  # El archivo cambió: se envía completo
+        if rango is False:
+            start_response('416 Range Not Satisfiable', encabezados + [
+                ('Content-Range', f'bytes */{tamano}'), ('Content-Length', '0'),
+            ])
+            return []
+        if rango:
+            estado, (inicio, fin) = '206 Partial Content', rango
+            encabezados.append(('Content-Range', f'bytes {inicio}-{fin}/{tamano}'))
+
+        largo = fin - inicio + 1
+        encabezados.append(('Content-Length', str(largo)))
+        start_response(estado, encabezados)
+        if solo_encabezados:
+            return []
+        contenido = open(ruta, 'rb')
+        if inicio == 0 and largo == tamano and 'wsgi.file_wrapper' in environ:
+            return environ['wsgi.file_wrapper'](contenido, TAMANO_BLOQUE)
+        contenido.seek(inicio)
+        return _leer(contenido, largo)
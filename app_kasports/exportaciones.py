@@ -0,0 +1,323 @@
+"""Exportación de ventas, clientes y entregas del panel en CSV o XLSX.
+
+Los archivos se generan por partes para `StreamingHttpResponse`: las filas se
+leen con `values_list(...).iterator(chunk_size=...)` (tuplas, sin instanciar
+modelos) y se entregan en bloques de `TAMANO_LOTE` filas, así que la memoria
+no depende del número de filas exportadas.
+
+El XLSX se escribe como un ZIP en flujo (`zipfile` sobre un destino sin
+`seek`, con descriptores de datos): cada hoja se comprime mientras se genera y
+el libro, que lista las hojas, se escribe al final. Una hoja de Excel admite
+1 048 576 filas; pasado ese límite se abre otra hoja.
+
+Las búsquedas `q`/`campo` son las mismas de los listados del panel
+(`filtrar`), más un rango de fechas opcional `desde`/`hasta` (AAAA-MM-DD,
+inclusivo).
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Cliente, DetalleEntrega, Venta
+
+FORMATOS = ('csv', 'xlsx')
+TIPOS_CONTENIDO = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+TAMANO_LOTE = 2000
+# Filas de datos por hoja (la primera fila de cada hoja son los encabezados)
+FILAS_POR_HOJA = 1048575
+
+EXPORTACIONES = {
+    'ventas': {
+        'modelo': Venta,
+        'orden': ('fecha_venta', 'id'),
+        'fecha': 'fecha_venta',
+        'columnas': [
+            ('id', 'id'), ('fecha_venta', 'fecha_venta'), ('cliente', 'cliente__user__username'),
+            ('correo', 'cliente__user__email'), ('metodo_pago', 'metodo_pago'), ('estado', 'estado'),
+            ('subtotal', 'subtotal'), ('descuento', 'descuento'), ('impuesto', 'impuesto'),
+            ('costo_envio', 'costo_envio'), ('total', 'total'),
+        ],
+        'busqueda': {
+            'cliente': 'cliente__user__username__icontains',
+            'id': 'id__icontains',
+            'estado': 'estado__icontains',
+            'metodo_pago': 'metodo_pago__icontains',
+        },
+    },
+    'clientes': {
+        'modelo': Cliente,
+        'orden': ('id',),
+        'fecha': 'fecha_registro',
+        'columnas': [
+            ('id', 'id'), ('usuario', 'user__username'), ('nombre', 'user__first_name'),
+            ('apellido', 'user__last_name'), ('correo', 'user__email'), ('telefono', 'telefono'),
+            ('direccion', 'direccion'), ('fecha_registro', 'fecha_registro'), ('activo', 'user__is_active'),
+        ],
+        'busqueda': {
+            'username': 'user__username__icontains',
+            'nombre': 'user__first_name__icontains',
+            'correo': 'user__email__icontains',
+            'telefono': 'telefono__icontains',
+        },
+    },
+    'entregas': {
+        'modelo': DetalleEntrega,
+        'orden': ('id',),
+        'fecha': 'fecha_envio',
+        'columnas': [
+            ('id', 'id'), ('venta', 'venta_id'), ('cliente', 'venta__cliente__user__username'),
+            ('direccion_entrega', 'direccion_entrega'), ('fecha_envio', 'fecha_envio'),
+            ('fecha_entrega', 'fecha_entrega'), ('estado_entrega', 'estado_entrega'),
+            ('total_venta', 'venta__total'),
+        ],
+        'busqueda': {
+            'venta': 'venta__id__icontains',
+            'estado': 'estado_entrega__icontains',
+            'cliente': 'venta__cliente__user__username__icontains',
+        },
+    },
+}
+
+
+def _fecha(texto):
+    try:
+        return parse_date(texto or '')
+    except ValueError:
+        return None
+
+
+def filtrar(nombre, queryset, query='', campo='', desde=None, hasta=None):
+    """Aplica la búsqueda del listado y el rango de fechas de `nombre` a `queryset`."""
+    exportacion = EXPORTACIONES[nombre]
+    busqueda = exportacion['busqueda'].get(campo)
+    if query and busqueda:
+        queryset = queryset.filter(**{busqueda: query})
+
+    campo_fecha = exportacion['fecha']
+    desde, hasta = _fecha(desde), _fecha(hasta)
+    if exportacion['modelo']._meta.get_field(campo_fecha).get_internal_type() == 'DateTimeField':
+        # Límites en la zona local para que la comparación use el índice de la columna
+        if desde:
+            queryset = queryset.filter(**{f'{campo_fecha}__gte': timezone.make_aware(datetime.combine(desde, time.min))})
+        if hasta:
+            siguiente = datetime.combine(hasta + timedelta(days=1), time.min)
+            queryset = queryset.filter(**{f'{campo_fecha}__lt': timezone.make_aware(siguiente)})
+    else:
+        if desde:
+            queryset = queryset.filter(**{f'{campo_fecha}__gte': desde})
+        if hasta:
+            queryset = queryset.filter(**{f'{campo_fecha}__lte': hasta})
+    return queryset
+
+
+def encabezados(nombre):
+    return [columna for columna, _ in EXPORTACIONES[nombre]['columnas']]
+
+
+def filas(nombre, tamano_lote=TAMANO_LOTE, **filtros):
+    """Tuplas de la exportación `nombre`, leídas de la base de datos por bloques."""
+    exportacion = EXPORTACIONES[nombre]
+    consulta = filtrar(nombre, exportacion['modelo'].objects.all(), **filtros)
+    return (
+        consulta.order_by(*exportacion['orden'])
+        .values_list(*[ruta for _, ruta in exportacion['columnas']])
+        .iterator(chunk_size=tamano_lote)
+    )
+
+
+def exportar(nombre, formato='csv', tamano_lote=TAMANO_LOTE, **filtros):
+    """Genera el archivo por partes (texto para CSV, bytes para XLSX)."""
+    generador = _csv if formato == 'csv' else _xlsx
+    return generador(encabezados(nombre), filas(nombre, tamano_lote, **filtros), tamano_lote, nombre)
+
+
+# ============================================
+# CSV
+# ============================================
+
+class Eco:
+    """Pseudo-archivo para `csv.writer`: devuelve lo escrito en lugar de guardarlo."""
+
+    def write(self, valor):
+        return valor
+
+
+def _texto(valor, zona):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.astimezone(zona).strftime('%Y-%m-%d %H:%M')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
+
+
+def _csv(nombres, tuplas, tamano_lote, titulo=None):
+    escritor = csv.writer(Eco())
+    zona = timezone.get_current_timezone()
+    yield escritor.writerow(nombres)
+    partes = []
+    for fila in tuplas:
+        partes.append(escritor.writerow([_texto(valor, zona) for valor in fila]))
+        if len(partes) >= tamano_lote:
+            yield ''.join(partes)
+            partes = []
+    if partes:
+        yield ''.join(partes)
+
+
+# ============================================
+# XLSX
+# ============================================
+
+_NS_HOJA = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_NS_PAQUETE = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_TIPO_HOJA = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+# Estilos 1 (fecha y hora) y 2 (fecha) para que Excel muestre las fechas como fechas
+_ESTILOS = (
+    _XML + f'<styleSheet xmlns="{_NS_HOJA}">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+# Caracteres de control que XML 1.0 no admite
+_RE_NO_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _Salida:
+    """Destino de `zipfile` sin `seek`: guarda lo escrito hasta que se vacía."""
+
+    def __init__(self):
+        self.partes = []
+        self.posicion = 0
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        self.posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self.posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes = []
+        return datos
+
+
+def _celda(valor, zona):
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, Decimal, float)):
+        return f'<c><v>{valor}</v></c>'
+    if isinstance(valor, datetime):
+        serie = (timezone.make_naive(valor, zona) - _EPOCA_EXCEL) / timedelta(days=1)
+        return f'<c s="1"><v>{serie:.6f}</v></c>'
+    if isinstance(valor, date):
+        return f'<c s="2"><v>{(valor - _EPOCA_EXCEL.date()).days}</v></c>'
+    texto = escape(_RE_NO_XML.sub('', str(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila(valores, zona):
+    return '<row>' + ''.join(_celda(valor, zona) for valor in valores) + '</row>'
+
+
+def _xlsx(nombres, tuplas, tamano_lote, titulo='Hoja'):
+    salida = _Salida()
+    zona = timezone.get_current_timezone()
+    libro = zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED)
+    encabezado = _fila(nombres, zona)
+    hojas = 0
+    hoja = None
+    en_hoja = FILAS_POR_HOJA
+    partes = []
+
+    def escribir():
+        hoja.write(''.join(partes).encode('utf-8'))
+        partes.clear()
+
+    for fila in tuplas:
+        if en_hoja >= FILAS_POR_HOJA:
+            if hoja is not None:
+                partes.append('</sheetData></worksheet>')
+                escribir()
+                hoja.close()
+            hojas += 1
+            # Sin force_zip64 zipfile no deja pasar de 2 GiB en un archivo de tamaño desconocido
+            hoja = libro.open(f'xl/worksheets/sheet{hojas}.xml', 'w', force_zip64=True)
+            partes.append(f'{_XML}<worksheet xmlns="{_NS_HOJA}"><sheetData>{encabezado}')
+            en_hoja = 0
+        partes.append(_fila(fila, zona))
+        en_hoja += 1
+        if len(partes) >= tamano_lote:
+            escribir()
+            yield salida.vaciar()
+
+    if hoja is None:
+        hojas = 1
+        hoja = libro.open('xl/worksheets/sheet1.xml', 'w')
+        partes.append(f'{_XML}<worksheet xmlns="{_NS_HOJA}"><sheetData>{encabezado}')
+    partes.append('</sheetData></worksheet>')
+    escribir()
+    hoja.close()
+
+    numeros = range(1, hojas + 1)
+    libro.writestr('[Content_Types].xml', (
+        _XML + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        + ''.join(f'<Override PartName="/xl/worksheets/sheet{n}.xml" ContentType="{_TIPO_HOJA}"/>' for n in numeros)
+        + '</Types>'
+    ))
+    libro.writestr('_rels/.rels', (
+        _XML + f'<Relationships xmlns="{_NS_PAQUETE}">'
+        f'<Relationship Id="rId1" Type="{_NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ))
+    libro.writestr('xl/workbook.xml', (
+        _XML + f'<workbook xmlns="{_NS_HOJA}" xmlns:r="{_NS_REL}"><sheets>'
+        + ''.join(f'<sheet name="{escape(titulo)}{"" if n == 1 else f" {n}"}" sheetId="{n}" r:id="rId{n}"/>'
+                  for n in numeros)
+        + '</sheets></workbook>'
+    ))
+    libro.writestr('xl/_rels/workbook.xml.rels', (
+        _XML + f'<Relationships xmlns="{_NS_PAQUETE}">'
+        + ''.join(f'<Relationship Id="rId{n}" Type="{_NS_REL}/worksheet" Target="worksheets/sheet{n}.xml"/>'
+                  for n in numeros)
+        + f'<Relationship Id="rId{hojas + 1}" Type="{_NS_REL}/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ))
+    libro.writestr('xl/styles.xml', _ESTILOS)
+    libro.close()
+    yield salida.vaciar()
@@ -0,0 +1,223 @@
+"""Navegación por facetas de los listados de ropa, tenis y gorras.
+
+Los filtros llegan en la URL como parámetros repetidos (`?genero=Unisex&genero=Femenino&talla=M`):
+los valores de una misma faceta se combinan con OR y las facetas entre sí con
+AND. La talla admite además `talla_modo=todas` (el producto debe tener
+existencias en todas las tallas elegidas).
+
+Cada faceta se cuenta con todos los filtros menos el suyo, para que al elegir
+un género sigan apareciendo los demás con su número de productos. Son cinco
+consultas agrupadas (una por faceta, y los rangos de precio en una sola con
+agregados condicionales) sin importar cuántos valores se elijan. El resultado
+se guarda en caché con la versión de la tabla (`tabla:<tipo>`) y de
+proveedores, que `signals.py` incrementa al cambiar productos o stock. Con una
+caché por proceso (locmem) los demás procesos no ven ese incremento, así que
+ahí los conteos solo se conservan `SEGUNDOS_SIN_COMPARTIR`.
+"""
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from . import cache_tienda
+from .busqueda import ResultadosBusqueda
+from .models import InventarioTalla, Proveedor
+
+SEGUNDOS = getattr(settings, 'KASPORTS_CACHE_SEGUNDOS', 300)
+SEGUNDOS_SIN_COMPARTIR = 5
+# Colores más frecuentes que se muestran (los elegidos siempre aparecen)
+MAXIMO_COLORES = 12
+# Límites de los rangos de precio; el primero es "hasta" y el último "más de"
+LIMITES_PRECIO = [Decimal(v) for v in getattr(settings, 'KASPORTS_RANGOS_PRECIO', ['500', '1000', '2000', '3500'])]
+ORDEN_TALLAS = ['XXS', 'XS', 'S', 'M', 'L', 'XL', '2XL', 'XXL', '3XL']
+
+FACETAS = [
+    ('genero', 'Género'),
+    ('proveedor', 'Marca'),
+    ('talla', 'Talla'),
+    ('color', 'Color'),
+    ('precio', 'Precio'),
+]
+
+
+def _rangos():
+    """[(clave, etiqueta, mínimo o None, máximo o None)] a partir de LIMITES_PRECIO."""
+    rangos = []
+    for minimo, maximo in zip([None] + LIMITES_PRECIO, LIMITES_PRECIO + [None]):
+        if minimo is None:
+            rangos.append((f'-{maximo}', f'Hasta ${maximo:,.0f}', None, maximo))
+        elif maximo is None:
+            rangos.append((f'{minimo}-', f'Más de ${minimo:,.0f}', minimo, None))
+        else:
+            rangos.append((f'{minimo}-{maximo}', f'${minimo:,.0f} a ${maximo:,.0f}', minimo, maximo))
+    return rangos
+
+
+RANGOS_PRECIO = _rangos()
+
+
+def _q_rango(minimo, maximo):
+    condicion = Q()
+    if minimo is not None:
+        condicion &= Q(precio__gte=minimo)
+    if maximo is not None:
+        condicion &= Q(precio__lt=maximo)
+    return condicion
+
+
+def _ids(valores):
+    """Ids válidos de la lista. `isdecimal()` y no `isdigit()`: '²' es dígito pero `int()` lo rechaza."""
+    ids = {int(v) for v in valores if v.isdecimal()}
+    # SQLite no admite enteros de más de 64 bits en los parámetros
+    return sorted(pk for pk in ids if pk < 2 ** 63)
+
+
+class Seleccion:
+    """Valores elegidos en cada faceta, leídos de `request.GET`."""
+
+    def __init__(self, request):
+        datos = request.GET
+        self.valores = {
+            'genero': sorted(set(v for v in datos.getlist('genero') if v)),
+            'proveedor': _ids(datos.getlist('proveedor')),
+            'talla': sorted(set(v.strip() for v in datos.getlist('talla') if v.strip())),
+            'color': sorted(set(v for v in datos.getlist('color') if v)),
+            'precio': [r[0] for r in RANGOS_PRECIO if r[0] in datos.getlist('precio')],
+        }
+        self.todas_las_tallas = datos.get('talla_modo') == 'todas'
+
+    def activa(self):
+        return any(self.valores.values())
+
+    def firma(self):
+        return repr((sorted(self.valores.items()), self.todas_las_tallas))
+
+    def aplicar(self, queryset, tipo, excepto=None):
+        """Filtra `queryset` con todas las facetas elegidas menos `excepto`."""
+        v = self.valores
+        if v['genero'] and excepto != 'genero':
+            queryset = queryset.filter(genero__in=v['genero'])
+        if v['proveedor'] and excepto != 'proveedor':
+            queryset = queryset.filter(proveedor_id__in=v['proveedor'])
+        if v['color'] and excepto != 'color':
+            queryset = queryset.filter(color__in=v['color'])
+        if v['talla'] and excepto != 'talla':
+            existencias = InventarioTalla.objects.filter(tipo=tipo, stock__gt=0)
+            if self.todas_las_tallas:
+                for talla in v['talla']:
+                    queryset = queryset.filter(id__in=existencias.filter(talla=talla).values('producto_id'))
+            else:
+                queryset = queryset.filter(id__in=existencias.filter(talla__in=v['talla']).values('producto_id'))
+        if v['precio'] and excepto != 'precio':
+            condicion = Q()
+            for clave, _, minimo, maximo in RANGOS_PRECIO:
+                if clave in v['precio']:
+                    condicion |= _q_rango(minimo, maximo)
+            queryset = queryset.filter(condicion)
+        return queryset
+
+
+def _orden_talla(talla):
+    try:
+        return (0, float(talla), '')
+    except ValueError:
+        pass
+    if talla.upper() in ORDEN_TALLAS:
+        return (1, ORDEN_TALLAS.index(talla.upper()), '')
+    return (2, 0, talla)
+
+
+def contar(tipo, base, seleccion):
+    """{faceta: [(valor, etiqueta, n)]} con una consulta agrupada por faceta."""
+    conteos = {}
+    por_genero = seleccion.aplicar(base, tipo, excepto='genero').values('genero').annotate(n=Count('id'))
+    conteos['genero'] = sorted((f['genero'], f['genero'], f['n']) for f in por_genero.order_by())
+
+    por_proveedor = (
+        seleccion.aplicar(base, tipo, excepto='proveedor')
+        .values('proveedor_id', 'proveedor__nombre').annotate(n=Count('id')).order_by()
+    )
+    conteos['proveedor'] = sorted(
+        ((f['proveedor_id'], f['proveedor__nombre'], f['n']) for f in por_proveedor), key=lambda o: o[1].lower(),
+    )
+
+    ids = seleccion.aplicar(base, tipo, excepto='talla').values('id')
+    por_talla = (
+        InventarioTalla.objects.filter(tipo=tipo, stock__gt=0, producto_id__in=ids)
+        .values('talla').annotate(n=Count('producto_id')).order_by()
+    )
+    conteos['talla'] = sorted(((f['talla'], f['talla'], f['n']) for f in por_talla), key=lambda o: _orden_talla(o[0]))
+
+    por_color = seleccion.aplicar(base, tipo, excepto='color').values('color').annotate(n=Count('id')).order_by('-n', 'color')
+    conteos['color'] = [(f['color'], f['color'], f['n']) for f in por_color[:MAXIMO_COLORES]]
+
+    por_rango = seleccion.aplicar(base, tipo, excepto='precio').aggregate(**{
+        f'r{i}': Count('id', filter=_q_rango(minimo, maximo))
+        for i, (_, _, minimo, maximo) in enumerate(RANGOS_PRECIO)
+    })
+    conteos['precio'] = [(clave, etiqueta, por_rango[f'r{i}'])
+                         for i, (clave, etiqueta, _, _) in enumerate(RANGOS_PRECIO)]
+    _agregar_elegidos(conteos, seleccion, por_color)
+    return conteos
+
+
+def _agregar_elegidos(conteos, seleccion, por_color):
+    """Los valores elegidos siempre aparecen (aunque ya no tengan productos) para poder quitarlos."""
+    for nombre, elegidos in seleccion.valores.items():
+        presentes = {o[0] for o in conteos[nombre]}
+        faltantes = [v for v in elegidos if v not in presentes]
+        if not faltantes:
+            continue
+        if nombre == 'color':
+            # Colores elegidos fuera de los más frecuentes: se cuentan solo esos
+            n = dict(por_color.filter(color__in=faltantes).values_list('color', 'n'))
+            conteos[nombre] += [(c, c, n.get(c, 0)) for c in faltantes]
+        elif nombre == 'proveedor':
+            nombres = dict(Proveedor.objects.filter(id__in=faltantes).values_list('id', 'nombre'))
+            conteos[nombre] += [(pk, nombres[pk], 0) for pk in faltantes if pk in nombres]
+        else:
+            conteos[nombre] += [(v, v, 0) for v in faltantes]
+
+
+def _clave(tipo, request, seleccion):
+    actuales = cache_tienda.versiones([f'tabla:{tipo}', 'proveedores'])
+    busqueda = (request.GET.get('q', ''), request.GET.get('campo', 'todos'))
+    firma = hashlib.md5(repr((busqueda, seleccion.firma())).encode('utf-8')).hexdigest()
+    return f'facetas:{tipo}:{actuales[f"tabla:{tipo}"]}:{actuales["proveedores"]}:{firma}'
+
+
+def filtrar(request, tipo, listado):
+    """Aplica las facetas de la petición a `listado` (queryset o búsqueda por relevancia).
+
+    Devuelve (listado filtrado, facetas para la plantilla).
+    """
+    seleccion = Seleccion(request)
+    busqueda = isinstance(listado, ResultadosBusqueda)
+    base = listado.queryset.filter(id__in=listado.ids) if busqueda else listado
+
+    clave = _clave(tipo, request, seleccion)
+    conteos = cache.get(clave)
+    if conteos is None:
+        conteos = contar(tipo, base, seleccion)
+        cache.set(clave, conteos, SEGUNDOS if cache_tienda.compartida() else SEGUNDOS_SIN_COMPARTIR)
+
+    if seleccion.activa():
+        if busqueda:
+            # Se conserva el orden por relevancia; solo se quitan los que no cumplen los filtros
+            validos = set(seleccion.aplicar(base, tipo).values_list('id', flat=True))
+            listado = ResultadosBusqueda(listado.queryset, [pk for pk in listado.ids if pk in validos])
+        else:
+            listado = seleccion.aplicar(listado, tipo)
+
+    grupos = []
+    for nombre, titulo in FACETAS:
+        elegidos = {str(v) for v in seleccion.valores[nombre]}
+        opciones = [
+            {'valor': valor, 'etiqueta': etiqueta, 'n': n, 'elegida': str(valor) in elegidos}
+            for valor, etiqueta, n in conteos[nombre]
+        ]
+        if opciones:
+            grupos.append({'nombre': nombre, 'titulo': titulo, 'opciones': opciones})
+    return listado, {'grupos': grupos, 'activa': seleccion.activa(), 'todas_las_tallas': seleccion.todas_las_tallas}
@@ -0,0 +1,241 @@
+"""Miniaturas y variantes WebP/AVIF de las imágenes subidas.
+
+Al guardar un producto, proveedor o evidencia de entrega, `signals.py` llama a
+`encolar()` con el nombre del archivo y el proceso de tareas (`tareas.py`)
+genera fuera de la petición una variante por cada ancho de `ANCHOS` y cada
+formato de `FORMATOS`.
+
+Las variantes se guardan por contenido en
+`derivadas/<h[:2]>/<h>/<ancho>.<formato>` (h = SHA-256 del original): subir la
+misma imagen dos veces no las duplica y sus URLs nunca cambian de contenido.
+`ImagenDerivada` registra qué se generó para cada original y
+`{% imagen_responsive %}` (templatetags/imagenes.py) arma `<picture>` con
+`srcset`/`sizes`. Las imágenes ya existentes se procesan con
+`python manage.py procesar_imagenes`.
+"""
+import hashlib
+import io
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from . import cache_tienda
+from .tareas import PRIORIDAD_NORMAL, encolar as encolar_tarea, tarea
+from .models import DetalleEntrega, Gorra, ImagenDerivada, ProductoCatalogo, Proveedor, Ropa, Tenis
+
+logger = logging.getLogger(__name__)
+
+ANCHOS = tuple(getattr(settings, 'KASPORTS_IMAGENES_ANCHOS', (160, 320, 640, 960)))
+FORMATOS = tuple(getattr(settings, 'KASPORTS_IMAGENES_FORMATOS', ('avif', 'webp')))
+CARPETA = 'derivadas'
+SEGUNDOS = getattr(settings, 'KASPORTS_CACHE_SEGUNDOS', 300)
+
+# Opciones de Pillow por formato
+OPCIONES = {
+    'webp': {'quality': 80, 'method': 4},
+    'avif': {'quality': 55, 'speed': 6},
+}
+TIPOS_MIME = {'webp': 'image/webp', 'avif': 'image/avif'}
+
+# (modelo, campo) de todas las imágenes que se procesan
+CAMPOS_IMAGEN = (
+    (Ropa, 'imagen'),
+    (Tenis, 'imagen'),
+    (Gorra, 'imagen'),
+    (Proveedor, 'imagen'),
+    (DetalleEntrega, 'imagen_evidencia'),
+)
+
+
+def formatos_soportados():
+    """Formatos de `FORMATOS` que la instalación de Pillow puede escribir."""
+    Image.init()
+    return [f for f in FORMATOS if f.upper() in Image.SAVE]
+
+
+def huella(nombre):
+    """SHA-256 del contenido del archivo."""
+    resumen = hashlib.sha256()
+    with default_storage.open(nombre, 'rb') as archivo:
+        for bloque in archivo.chunks():
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+
+def ruta_variante(huella_original, ancho, formato):
+    return f'{CARPETA}/{huella_original[:2]}/{huella_original}/{ancho}.{formato}'
+
+
+def anchos_para(ancho_original):
+    """Anchos a generar: los de `ANCHOS` menores al original (nunca se amplía)."""
+    anchos = [a for a in ANCHOS if a < ancho_original]
+    if len(anchos) < len(ANCHOS):
+        anchos.append(min(ancho_original, ANCHOS[-1]))
+    return anchos
+
+
+# ============================================
+# PROCESAMIENTO
+# ============================================
+
+def _abrir(nombre):
+    with default_storage.open(nombre, 'rb') as archivo:
+        imagen = Image.open(archivo)
+        imagen.load()
+    # Respeta la orientación de la cámara y deja la imagen en un modo que aceptan WebP/AVIF
+    imagen = ImageOps.exif_transpose(imagen)
+    if imagen.mode not in ('RGB', 'RGBA'):
+        imagen = imagen.convert('RGBA' if 'transparency' in imagen.info or 'A' in imagen.mode else 'RGB')
+    return imagen
+
+
+def procesar(nombre, forzar=False):
+    """Genera las variantes de un archivo y actualiza su `ImagenDerivada`.
+
+    Las variantes ya escritas se reutilizan (salvo con `forzar`). Devuelve la
+    `ImagenDerivada` o None si el archivo no existe o no es una imagen.
+    """
+    if not nombre or not default_storage.exists(nombre):
+        return None
+    # El almacenamiento nunca sobrescribe un archivo (agrega un sufijo), así que el
+    # nombre identifica el contenido: si ya tiene registro no hay nada que hacer
+    registro = ImagenDerivada.objects.filter(original=nombre).first()
+    if registro and not forzar:
+        return registro
+    huella_original = huella(nombre)
+
+    try:
+        imagen = _abrir(nombre)
+    except (OSError, SyntaxError, Image.DecompressionBombError) as error:
+        logger.warning('No se pudo leer la imagen %s: %s', nombre, error)
+        return None
+
+    formatos = formatos_soportados()
+    anchos = anchos_para(imagen.width)
+    for ancho in anchos:
+        alto = max(1, round(imagen.height * ancho / imagen.width))
+        reducida = None
+        for formato in formatos:
+            ruta = ruta_variante(huella_original, ancho, formato)
+            if default_storage.exists(ruta):
+                if not forzar:
+                    continue
+                default_storage.delete(ruta)
+            if reducida is None:
+                reducida = imagen.resize((ancho, alto), Image.LANCZOS) if ancho != imagen.width else imagen
+            contenido = io.BytesIO()
+            reducida.save(contenido, formato.upper(), **OPCIONES.get(formato, {}))
+            default_storage.save(ruta, ContentFile(contenido.getvalue()))
+
+    registro, _ = ImagenDerivada.objects.update_or_create(original=nombre, defaults={
+        'huella': huella_original,
+        'ancho': imagen.width,
+        'alto': imagen.height,
+        'anchos': ','.join(str(a) for a in anchos),
+        'formatos': ','.join(formatos),
+    })
+    cache.set(_clave(nombre), _variantes_de(registro), SEGUNDOS)
+    _invalidar_paginas(nombre)
+    return registro
+
+
+def _invalidar_paginas(nombre):
+    """Descarta las tarjetas y páginas cacheadas que mostraban la imagen sin variantes."""
+    for tipo, producto_id in ProductoCatalogo.objects.filter(imagen=nombre).values_list('tipo', 'producto_id'):
+        cache_tienda.invalidar_producto(tipo, producto_id)
+    for proveedor_id in Proveedor.objects.filter(imagen=nombre).values_list('pk', flat=True):
+        cache_tienda.invalidar_proveedor(proveedor_id)
+
+
+@tarea(prioridad=PRIORIDAD_NORMAL, max_intentos=3)
+def procesar_tarea(nombre, forzar=False):
+    """Tarea de la cola que ejecuta `procesar()`."""
+    registro = procesar(nombre, forzar=forzar)
+    if registro is None:
+        return {'procesada': False}
+    return {'procesada': True, 'anchos': registro.anchos, 'formatos': registro.formatos}
+
+
+def encolar(nombre, forzar=False):
+    """Encola la generación de variantes de `nombre` si todavía no las tiene."""
+    if nombre and (forzar or not variantes(nombre)):
+        encolar_tarea(procesar_tarea, {'nombre': nombre, 'forzar': forzar})
+
+
+def nombres_existentes():
+    """Nombres de todos los archivos de imagen referenciados por los modelos, sin repetir."""
+    nombres = set()
+    for modelo, campo in CAMPOS_IMAGEN:
+        nombres.update(modelo.objects.exclude(**{campo: ''}).exclude(**{f'{campo}__isnull': True})
+                       .values_list(campo, flat=True))
+    return sorted(nombres)
+
+
+def nombres_sin_variantes():
+    """Imágenes referenciadas que todavía no tienen `ImagenDerivada`."""
+    procesadas = set(ImagenDerivada.objects.values_list('original', flat=True))
+    return [nombre for nombre in nombres_existentes() if nombre not in procesadas]
+
+
+@tarea(prioridad=PRIORIDAD_NORMAL, max_intentos=1)
+def encolar_pendientes():
+    """Encola una tarea por cada imagen sin variantes (respaldo desde el panel)."""
+    nombres = nombres_sin_variantes()
+    for nombre in nombres:
+        encolar(nombre)
+    return {'encoladas': len(nombres)}
+
+
+# ============================================
+# LECTURA
+# ============================================
+
+def _clave(nombre):
+    return 'imagenes:variantes:' + hashlib.md5(nombre.encode('utf-8')).hexdigest()
+
+
+def _variantes_de(registro):
+    """Datos para la plantilla: tamaño original y `srcset` por tipo MIME ({} si no hay variantes)."""
+    if registro is None or not registro.anchos:
+        return {}
+    anchos = [int(a) for a in registro.anchos.split(',')]
+    fuentes = []
+    for formato in registro.formatos.split(','):
+        if formato:
+            srcset = ', '.join(
+                f'{default_storage.url(ruta_variante(registro.huella, a, formato))} {a}w' for a in anchos
+            )
+            fuentes.append((TIPOS_MIME.get(formato, f'image/{formato}'), srcset))
+    return {'ancho': registro.ancho, 'alto': registro.alto, 'fuentes': fuentes}
+
+
+def precargar(objetos, campo='imagen'):
+    """Deja en caché las variantes de las imágenes de `objetos` con una sola consulta.
+
+    Se llama en las vistas de listado antes de renderizar, igual que
+    `adjuntar_tallas`, para que `{% imagen_responsive %}` no consulte por tarjeta.
+    """
+    objetos = list(objetos)
+    nombres = {getattr(o, campo).name for o in objetos if getattr(o, campo, None)}
+    claves = {_clave(n): n for n in nombres}
+    faltantes = [n for c, n in claves.items() if c not in cache.get_many(list(claves))]
+    if faltantes:
+        registros = {r.original: r for r in ImagenDerivada.objects.filter(original__in=faltantes)}
+        cache.set_many({_clave(n): _variantes_de(registros.get(n)) for n in faltantes}, SEGUNDOS)
+    return objetos
+
+
+def variantes(nombre):
+    """Variantes de un archivo (de la caché o de la base de datos); {} si aún no se generan."""
+    if not nombre:
+        return {}
+    clave = _clave(nombre)
+    datos = cache.get(clave)
+    if datos is None:
+        datos = _variantes_de(ImagenDerivada.objects.filter(original=nombre).first())
+        cache.set(clave, datos, SEGUNDOS)
+    return datos
@@ -0,0 +1,385 @@
+"""Importación y exportación masiva de Ropa, Tenis y Gorra.
+
+Los archivos (CSV o JSON Lines) se leen en streaming y se procesan por
+lotes: cada fila se valida con los validadores de los campos del modelo, el
+proveedor se resuelve por `rfc_fiscal` con un diccionario cargado una sola
+vez, y los productos se guardan con `bulk_create`/`bulk_update`. Como
+`bulk_create` no dispara señales, aquí mismo se llenan las tablas derivadas
+(catálogo, índice de búsqueda y tallas) y se invalida la caché.
+
+Las filas con `id` actualizan ese producto; las demás lo crean. Una fila
+inválida se reporta con su número de línea sin detener la importación.
+
+La columna `stock` son las existencias físicas: al importar se les resta lo
+apartado en carritos (`ReservaStock`), que ya está descontado del inventario,
+y al exportar se les vuelve a sumar.
+"""
+import csv
+import io
+import json
+import os
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from . import busqueda, cache_tienda, imagenes, metricas, reservas
+from .reportes import almacenamiento
+from .catalogo import MODELOS_CATALOGO, datos_catalogo, entradas_para
+from .exportaciones import Eco
+from .models import InventarioTalla, ProductoCatalogo, Proveedor, ReservaStock
+from .tallas import calcular_existencias, parsear_tallas
+from .tareas import PRIORIDAD_BAJA, tarea
+
+FORMATOS = ('csv', 'jsonl')
+TAMANO_LOTE = 1000
+# Errores que se conservan con detalle; los demás solo se cuentan
+MAX_ERRORES = 1000
+
+CAMPOS_POR_TIPO = {
+    'ropa': ['estilo'],
+    'tenis': ['estilo'],
+    'gorra': ['coleccion', 'silueta', 'visera', 'broche'],
+}
+
+
+def campos(tipo):
+    """Campos del modelo que se importan y exportan, en orden."""
+    return ['modelo', 'color', 'genero'] + CAMPOS_POR_TIPO[tipo] + ['precio', 'stock', 'tallas_disponibles', 'imagen']
+
+
+def columnas(tipo):
+    return ['id', 'proveedor_rfc'] + campos(tipo)
+
+
+def formato_de(nombre):
+    """Formato a partir de la extensión del archivo ('csv' o 'jsonl')."""
+    extension = os.path.splitext(nombre or '')[1].lower()
+    return 'jsonl' if extension in ('.jsonl', '.ndjson', '.json') else 'csv'
+
+
+class ResultadoImportacion:
+
+    def __init__(self):
+        self.filas = 0
+        self.creados = 0
+        self.actualizados = 0
+        self.total_errores = 0
+        self.errores = []
+
+    def error(self, linea, mensaje):
+        self.total_errores += 1
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append((linea, mensaje))
+
+    def como_dict(self):
+        return {
+            'filas': self.filas,
+            'creados': self.creados,
+            'actualizados': self.actualizados,
+            'total_errores': self.total_errores,
+            'errores': self.errores,
+        }
+
+
+# ============================================
+# LECTURA Y VALIDACIÓN
+# ============================================
+
+def leer_filas(archivo, formato):
+    """Genera (número de línea, fila o None, error) leyendo un archivo de texto."""
+    if formato == 'csv':
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            yield lector.line_num, fila, None
+        return
+    for numero, linea in enumerate(archivo, 1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            fila = json.loads(linea)
+        except ValueError as error:
+            yield numero, None, f'JSON inválido: {error}'
+            continue
+        if not isinstance(fila, dict):
+            yield numero, None, 'Cada línea debe ser un objeto JSON'
+            continue
+        yield numero, fila, None
+
+
+def _valor(fila, campo):
+    valor = fila.get(campo)
+    return '' if valor is None else str(valor).strip()
+
+
+def validar_fila(tipo, fila, proveedores):
+    """Devuelve (id o None, proveedor, {campo: valor}); lanza ValidationError si algo no es válido."""
+    modelo = MODELOS_CATALOGO[tipo]
+    errores = []
+
+    producto_id = _valor(fila, 'id')
+    if producto_id:
+        if not producto_id.isdigit():
+            errores.append(f'id: "{producto_id}" no es un número')
+        producto_id = int(producto_id) if producto_id.isdigit() else None
+    else:
+        producto_id = None
+
+    rfc = _valor(fila, 'proveedor_rfc').upper()
+    proveedor = proveedores.get(rfc)
+    if proveedor is None:
+        errores.append(f'proveedor_rfc: no existe un proveedor con RFC "{rfc}"')
+
+    valores = {}
+    for campo in campos(tipo):
+        valor = _valor(fila, campo)
+        if campo == 'imagen':
+            valores[campo] = valor or None
+            continue
+        field = modelo._meta.get_field(campo)
+        if not valor and field.null:
+            valores[campo] = None
+            continue
+        try:
+            valores[campo] = field.clean(valor, None)
+        except ValidationError as error:
+            errores.append(f'{campo}: {" ".join(error.messages)}')
+
+    if errores:
+        raise ValidationError(errores)
+    return producto_id, proveedor, valores
+
+
+def normalizar_tallas(producto, actuales=None):
+    """Aplica al producto el texto de tallas y stock normalizados; devuelve {talla: stock}."""
+    entradas = parsear_tallas(producto.tallas_disponibles)
+    if not entradas:
+        return {}
+    existencias, total = calcular_existencias(entradas, producto.stock, actuales)
+    producto.tallas_disponibles = ','.join(existencias)
+    producto.stock = total
+    return existencias
+
+
+def descontar_apartadas(producto, existencias, apartadas):
+    """Resta de las existencias importadas lo apartado en carritos.
+
+    Las reservas ya descontaron esas unidades del inventario; sin restarlas,
+    importar el conteo físico las volvería a ofrecer.
+    """
+    if not apartadas:
+        return
+    for talla in existencias:
+        existencias[talla] = max(0, existencias[talla] - apartadas.get(talla, 0))
+    producto.stock = max(0, producto.stock - sum(apartadas.values()))
+
+
+# ============================================
+# IMPORTACIÓN
+# ============================================
+
+def mapa_proveedores():
+    """{RFC: Proveedor} con solo los campos que necesita el catálogo."""
+    return {p.rfc_fiscal.upper(): p for p in Proveedor.objects.only('id', 'nombre', 'rfc_fiscal')}
+
+
+def insertar_tallas(filas):
+    """Inserta filas (tipo, producto_id, talla, stock) de `InventarioTalla` con `executemany`.
+
+    Son varias por producto; el INSERT directo evita el costo por valor de `bulk_create`.
+    """
+    if not filas:
+        return
+    opts = InventarioTalla._meta
+    columnas_sql = ', '.join(
+        connection.ops.quote_name(opts.get_field(c).column) for c in ('tipo', 'producto_id', 'talla', 'stock')
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {connection.ops.quote_name(opts.db_table)} ({columnas_sql}) VALUES (%s, %s, %s, %s)',
+            filas,
+        )
+
+
+def _guardar_lote(tipo, validos, resultado):
+    """Guarda un lote de filas válidas [(linea, id, proveedor, valores)] en una transacción."""
+    modelo = MODELOS_CATALOGO[tipo]
+    ids = [producto_id for _, producto_id, _, _ in validos if producto_id]
+    existentes = modelo.objects.in_bulk(ids) if ids else {}
+    apartadas = reservas.apartadas(tipo, list(existentes)) if existentes else {}
+    # Existencias físicas por talla: las libres más las apartadas
+    actuales = defaultdict(dict)
+    for fila in InventarioTalla.objects.filter(tipo=tipo, producto_id__in=list(existentes)):
+        actuales[fila.producto_id][fila.talla] = fila.stock + apartadas.get(fila.producto_id, {}).get(fila.talla, 0)
+
+    nuevos, cambiados, tallas, imagenes_nuevas = [], {}, {}, set()
+    for linea, producto_id, proveedor, valores in validos:
+        if producto_id:
+            producto = existentes.get(producto_id)
+            if producto is None:
+                resultado.error(linea, f'id: no existe {tipo} con id {producto_id}')
+                continue
+            imagen_anterior = producto.imagen.name if producto.imagen else None
+            for campo, valor in valores.items():
+                setattr(producto, campo, valor)
+            producto.proveedor = proveedor
+            cambiados[producto_id] = producto
+        else:
+            imagen_anterior = None
+            producto = modelo(proveedor=proveedor, **valores)
+            nuevos.append(producto)
+        tallas[id(producto)] = normalizar_tallas(producto, actuales.get(producto_id))
+        if producto_id:
+            descontar_apartadas(producto, tallas[id(producto)], apartadas.get(producto_id))
+        if valores['imagen'] and valores['imagen'] != imagen_anterior:
+            imagenes_nuevas.add(valores['imagen'])
+
+    with transaction.atomic():
+        nuevos = modelo.objects.bulk_create(nuevos)
+        entradas = ProductoCatalogo.objects.bulk_create(entradas_para(tipo, nuevos))
+
+        if cambiados:
+            modelo.objects.bulk_update(list(cambiados.values()), ['proveedor'] + campos(tipo))
+            catalogo = {
+                e.producto_id: e
+                for e in ProductoCatalogo.objects.filter(tipo=tipo, producto_id__in=list(cambiados))
+            }
+            por_actualizar, campos_catalogo = [], []
+            for producto_id, producto in cambiados.items():
+                entrada = catalogo.get(producto_id)
+                if entrada is None:
+                    entradas.extend(ProductoCatalogo.objects.bulk_create(entradas_para(tipo, [producto])))
+                    continue
+                datos = datos_catalogo(producto)
+                for campo, valor in datos.items():
+                    setattr(entrada, campo, valor)
+                campos_catalogo = list(datos)
+                por_actualizar.append(entrada)
+            if por_actualizar:
+                ProductoCatalogo.objects.bulk_update(por_actualizar, campos_catalogo)
+                entradas.extend(por_actualizar)
+            InventarioTalla.objects.filter(tipo=tipo, producto_id__in=list(cambiados)).delete()
+
+        insertar_tallas([
+            (tipo, producto.pk, talla, stock)
+            for producto in nuevos + list(cambiados.values())
+            for talla, stock in tallas[id(producto)].items()
+        ])
+        busqueda.indexar(entradas)
+        metricas.sumar(productos=len(nuevos))
+        # Igual que `generar_variantes_imagen` en signals.py, que bulk_create no dispara
+        for nombre in sorted(imagenes_nuevas):
+            imagenes.encolar(nombre)
+
+    cache_tienda.invalidar_productos(tipo, cambiados)
+    resultado.creados += len(nuevos)
+    resultado.actualizados += len(cambiados)
+
+
+def _procesar_lote(tipo, lote, proveedores, resultado):
+    validos = []
+    for linea, fila in lote:
+        try:
+            validos.append((linea, *validar_fila(tipo, fila, proveedores)))
+        except ValidationError as error:
+            resultado.error(linea, '; '.join(error.messages))
+    if not validos:
+        return
+    try:
+        _guardar_lote(tipo, validos, resultado)
+    except DatabaseError as error:
+        # El lote se revirtió completo: se reportan sus filas y se sigue con el siguiente
+        for linea, *_ in validos:
+            resultado.error(linea, f'Error al guardar el lote: {error}')
+
+
+def importar(archivo, tipo, formato='csv', tamano_lote=TAMANO_LOTE, al_avanzar=None):
+    """Importa productos de `tipo` desde un archivo de texto abierto.
+
+    Solo mantiene en memoria un lote a la vez. `al_avanzar(resultado)` se
+    llama después de cada lote. Devuelve un `ResultadoImportacion`.
+    """
+    if tipo not in MODELOS_CATALOGO:
+        raise ValueError(f'Tipo de producto desconocido: {tipo}')
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato desconocido: {formato}')
+
+    resultado = ResultadoImportacion()
+    proveedores = mapa_proveedores()
+    lote = []
+    for linea, fila, error in leer_filas(archivo, formato):
+        resultado.filas += 1
+        if error:
+            resultado.error(linea, error)
+            continue
+        lote.append((linea, fila))
+        if len(lote) >= tamano_lote:
+            _procesar_lote(tipo, lote, proveedores, resultado)
+            lote = []
+            if al_avanzar:
+                al_avanzar(resultado)
+    if lote:
+        _procesar_lote(tipo, lote, proveedores, resultado)
+        if al_avanzar:
+            al_avanzar(resultado)
+    return resultado
+
+
+@tarea(prioridad=PRIORIDAD_BAJA, max_intentos=1)
+def importar_tarea(archivo, tipo, formato):
+    """Importa un archivo guardado en el almacenamiento privado y luego lo elimina.
+
+    No se reintenta: un segundo intento volvería a crear los productos nuevos.
+    """
+    try:
+        with almacenamiento.open(archivo, 'rb') as binario:
+            texto = io.TextIOWrapper(binario.file, encoding='utf-8-sig', newline='')
+            resultado = importar(texto, tipo, formato).como_dict()
+    finally:
+        almacenamiento.delete(archivo)
+    resultado['errores'] = resultado['errores'][:100]
+    return resultado
+
+
+# ============================================
+# EXPORTACIÓN
+# ============================================
+
+def exportar(tipo, formato='csv', tamano_lote=TAMANO_LOTE):
+    """Genera el archivo de exportación por partes (para StreamingHttpResponse o un archivo).
+
+    El resultado puede volver a importarse: la columna `id` actualiza los mismos
+    productos y `stock` incluye lo apartado en carritos (existencias físicas).
+    """
+    modelo = MODELOS_CATALOGO[tipo]
+    nombres = columnas(tipo)
+    apartado = (
+        ReservaStock.objects.filter(tipo=tipo, producto_id=OuterRef('pk'))
+        .values('producto_id').annotate(total=Sum('cantidad')).values('total')
+    )
+    filas = (
+        modelo.objects.order_by('pk')
+        .annotate(existencias=F('stock') + Coalesce(Subquery(apartado), 0))
+        .values_list('id', 'proveedor__rfc_fiscal', *[
+            'existencias' if campo == 'stock' else campo for campo in campos(tipo)
+        ])
+        .iterator(chunk_size=tamano_lote)
+    )
+    escritor = csv.writer(Eco())
+    if formato == 'csv':
+        yield escritor.writerow(nombres)
+
+    partes = []
+    for fila in filas:
+        if formato == 'csv':
+            partes.append(escritor.writerow(['' if v is None else v for v in fila]))
+        else:
+            partes.append(json.dumps(dict(zip(nombres, fila)), default=str, ensure_ascii=False) + '\n')
+        if len(partes) >= tamano_lote:
+            yield ''.join(partes)
+            partes = []
+    if partes:
+        yield ''.join(partes)
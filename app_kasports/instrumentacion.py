@@ -0,0 +1,223 @@
+"""Instrumentación de consultas SQL por vista.
+
+Middleware opcional (`KASPORTS_INSTRUMENTAR_CONSULTAS = True`) que registra,
+por cada petición, cuántas consultas se ejecutaron, el tiempo en base de datos,
+las consultas repetidas y los patrones N+1 (la misma consulta con distintos
+parámetros muchas veces). Los totales se agregan por nombre de vista y se
+vuelcan a `KASPORTS_REPORTE_CONSULTAS` (JSON), que lee el comando
+`python manage.py reporte_consultas`.
+
+Los presupuestos por vista se configuran en `KASPORTS_PRESUPUESTO_CONSULTAS`;
+con `KASPORTS_PRESUPUESTO_ESTRICTO = True` (pensado para pruebas) exceder un
+presupuesto lanza `PresupuestoExcedido`, en otro caso solo se registra un aviso.
+"""
+import atexit
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Repeticiones de una misma consulta (con distintos parámetros) que se consideran N+1
+UMBRAL_N1 = getattr(settings, 'KASPORTS_UMBRAL_N1', 3)
+# Cada cuántas peticiones se vuelca el reporte a disco
+VOLCAR_CADA = 50
+
+_RE_LISTA = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_RE_CADENA = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r'\b\d+\b')
+_RE_ESPACIOS = re.compile(r'\s+')
+
+
+class PresupuestoExcedido(Exception):
+    """Una vista ejecutó más consultas que su presupuesto configurado."""
+
+
+def huella(sql):
+    """Normaliza una consulta para agrupar las que solo difieren en sus valores."""
+    sql = _RE_CADENA.sub('?', sql)
+    sql = _RE_NUMERO.sub('?', sql)
+    sql = _RE_LISTA.sub('(...)', sql)
+    return _RE_ESPACIOS.sub(' ', sql).strip()
+
+
+class Registro:
+    """Envoltorio de `connection.execute_wrapper` que anota cada consulta ejecutada."""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append((sql, params, time.perf_counter() - inicio))
+
+    @property
+    def total(self):
+        return len(self.consultas)
+
+    @property
+    def tiempo_db(self):
+        return sum(c[2] for c in self.consultas)
+
+    def analizar(self, umbral_n1=UMBRAL_N1):
+        """Devuelve (duplicadas, n1): huellas repetidas con los mismos o con distintos parámetros."""
+        por_huella = Counter()
+        exactas = Counter()
+        for sql, params, _ in self.consultas:
+            por_huella[huella(sql)] += 1
+            exactas[(sql, repr(params))] += 1
+        duplicadas = Counter()
+        for (sql, _), veces in exactas.items():
+            if veces > 1:
+                duplicadas[huella(sql)] += veces - 1
+        # N+1: la misma huella ejecutada con al menos `umbral_n1` parámetros distintos
+        n1 = {h: veces for h, veces in por_huella.items() if veces - duplicadas[h] >= umbral_n1}
+        return dict(duplicadas), n1
+
+
+def presupuesto_de(vista):
+    presupuestos = getattr(settings, 'KASPORTS_PRESUPUESTO_CONSULTAS', {})
+    return presupuestos.get(vista, getattr(settings, 'KASPORTS_PRESUPUESTO_POR_DEFECTO', None))
+
+
+# ============================================
+# REPORTE AGREGADO POR VISTA
+# ============================================
+
+class Reporte:
+    """Totales por vista acumulados en memoria y volcados a JSON."""
+
+    def __init__(self):
+        self.vistas = {}
+        self.bloqueo = threading.Lock()
+        self.pendientes = 0
+
+    def agregar(self, vista, registro, duracion):
+        duplicadas, n1 = registro.analizar()
+        with self.bloqueo:
+            datos = self.vistas.setdefault(vista, {
+                'peticiones': 0, 'consultas': 0, 'consultas_max': 0,
+                'tiempo_db_ms': 0.0, 'tiempo_total_ms': 0.0, 'excedidas': 0,
+                'duplicadas': {}, 'n1': {},
+            })
+            datos['peticiones'] += 1
+            datos['consultas'] += registro.total
+            datos['consultas_max'] = max(datos['consultas_max'], registro.total)
+            datos['tiempo_db_ms'] += registro.tiempo_db * 1000
+            datos['tiempo_total_ms'] += duracion * 1000
+            presupuesto = presupuesto_de(vista)
+            if presupuesto is not None and registro.total > presupuesto:
+                datos['excedidas'] += 1
+            for destino, origen in (('duplicadas', duplicadas), ('n1', n1)):
+                for h, veces in origen.items():
+                    datos[destino][h] = max(datos[destino].get(h, 0), veces)
+            self.pendientes += 1
+        return duplicadas, n1
+
+    def como_dict(self):
+        with self.bloqueo:
+            resultado = {}
+            for vista, datos in self.vistas.items():
+                resultado[vista] = dict(
+                    datos,
+                    presupuesto=presupuesto_de(vista),
+                    consultas_promedio=round(datos['consultas'] / datos['peticiones'], 2),
+                    tiempo_db_ms=round(datos['tiempo_db_ms'], 3),
+                    tiempo_total_ms=round(datos['tiempo_total_ms'], 3),
+                )
+            return resultado
+
+    def volcar(self, ruta=None):
+        """Combina los totales en memoria con el archivo JSON existente y lo reescribe."""
+        ruta = ruta or getattr(settings, 'KASPORTS_REPORTE_CONSULTAS', None)
+        if not ruta or not self.vistas:
+            return
+        actual = cargar_reporte(ruta)
+        for vista, datos in self.como_dict().items():
+            actual[vista] = combinar(actual.get(vista), datos)
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump(actual, archivo, indent=2, ensure_ascii=False)
+        with self.bloqueo:
+            self.vistas = {}
+            self.pendientes = 0
+
+
+def cargar_reporte(ruta):
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def combinar(anterior, nuevo):
+    """Suma dos entradas de reporte de la misma vista."""
+    if not anterior:
+        return nuevo
+    combinado = dict(nuevo)
+    for campo in ('peticiones', 'consultas', 'tiempo_db_ms', 'tiempo_total_ms', 'excedidas'):
+        combinado[campo] = round(anterior.get(campo, 0) + nuevo[campo], 3)
+    combinado['consultas_max'] = max(anterior.get('consultas_max', 0), nuevo['consultas_max'])
+    combinado['consultas_promedio'] = round(combinado['consultas'] / combinado['peticiones'], 2)
+    for campo in ('duplicadas', 'n1'):
+        huellas = dict(anterior.get(campo, {}))
+        for h, veces in nuevo[campo].items():
+            huellas[h] = max(huellas.get(h, 0), veces)
+        combinado[campo] = huellas
+    return combinado
+
+
+reporte = Reporte()
+atexit.register(reporte.volcar)
+
+
+def nombre_vista(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else request.path
+
+
+def registrar(request, registro, duracion):
+    """Agrega una petición al reporte y aplica su presupuesto de consultas."""
+    vista = nombre_vista(request)
+    _, n1 = reporte.agregar(vista, registro, duracion)
+    for h, veces in n1.items():
+        logger.warning('Posible N+1 en %s (%s veces): %s', vista, veces, h)
+
+    presupuesto = presupuesto_de(vista)
+    if presupuesto is not None and registro.total > presupuesto:
+        mensaje = f'{vista} ejecutó {registro.total} consultas (presupuesto: {presupuesto})'
+        if getattr(settings, 'KASPORTS_PRESUPUESTO_ESTRICTO', False):
+            raise PresupuestoExcedido(mensaje)
+        logger.warning(mensaje)
+
+    if reporte.pendientes >= VOLCAR_CADA:
+        reporte.volcar()
+    return vista
+
+
+def instrumentar_consultas(get_response):
+    """Middleware que mide las consultas SQL de cada petición"""
+    if not getattr(settings, 'KASPORTS_INSTRUMENTAR_CONSULTAS', False):
+        raise MiddlewareNotUsed
+
+    def middleware(request):
+        registro = Registro()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(registro):
+            response = get_response(request)
+        registrar(request, registro, time.perf_counter() - inicio)
+        response['Server-Timing'] = (
+            f'db;dur={registro.tiempo_db * 1000:.1f};desc="{registro.total} consultas"'
+        )
+        return response
+    return middleware
@@ -0,0 +1,75 @@
+import json
+
+from django.core import serializers
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.http import HttpResponse
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from app_kasports.bench import datos_temporales, medir, sembrar_productos, sembrar_proveedores
+from app_kasports.catalogo import MODELOS_CATALOGO
+
+# (nombre, parámetros extra de la petición)
+VARIANTES = [
+    ('todos_los_campos', {}),
+    ('tres_campos', {'fields': 'id,modelo,precio'}),
+    ('filtrado', {'genero': 'Unisex,Femenino', 'precio_min': '500', 'precio_max': '3000'}),
+]
+# Lo que haría un serializador de instancias (django.core.serializers con select_related)
+REFERENCIA = 'instancias'
+
+
+class Command(BaseCommand):
+    help = ('Mide productos por segundo de la API de lectura (/api/productos/<tipo>/) con páginas de '
+            'distintos tamaños, contra la serialización de instancias y la respuesta 304 con ETag')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=20000, help='Productos sintéticos de ropa')
+        parser.add_argument('--limites', type=int, nargs='+', default=[100, 1000], help='Tamaños de página')
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--salida', help='Ruta de un archivo JSON para guardar los resultados')
+
+    def handle(self, *args, **options):
+        resultados = []
+        # Todo corre en una transacción que se revierte: no quedan productos de prueba
+        with datos_temporales():
+            sembrar_productos(options['productos'], tipo='ropa', proveedores=sembrar_proveedores(10, prefijo='API'))
+            http = Client(HTTP_HOST='localhost')
+            url = reverse('app_kasports:api_productos', args=['ropa'])
+            for limite in options['limites']:
+                casos = [(nombre, lambda p=dict(extra, limite=limite): http.get(url, p)) for nombre, extra in VARIANTES]
+                etag = http.get(url, {'limite': limite})['ETag']
+                casos.append(('304', lambda: http.get(url, {'limite': limite}, HTTP_IF_NONE_MATCH=etag)))
+                casos.append((REFERENCIA, lambda: self.con_instancias(limite)))
+                for nombre, funcion in casos:
+                    # El registro de consultas guarda 9000 como máximo y la siembra ya lo llenó
+                    reset_queries()
+                    with CaptureQueriesContext(connection) as consultas:
+                        respuesta = funcion()
+                    if respuesta.status_code not in (200, 304):
+                        raise RuntimeError(f'{nombre} respondió {respuesta.status_code}')
+                    stats = medir(funcion, repeticiones=options['repeticiones'])
+                    productos = limite if respuesta.status_code == 200 else 0
+                    resultado = {
+                        'variante': nombre, 'limite': limite, 'estado': respuesta.status_code,
+                        'consultas': len(consultas), 'kb': round(len(respuesta.content) / 1024, 1),
+                        'peticiones_por_segundo': round(1000 / stats['p50_ms'], 1) if stats['p50_ms'] else 0,
+                        'productos_por_segundo': round(productos * 1000 / stats['p50_ms']) if stats['p50_ms'] else 0,
+                        **stats,
+                    }
+                    resultados.append(resultado)
+                    self.stdout.write(
+                        f"limite={limite:<5} {nombre:<17} {resultado['estado']}  {resultado['consultas']} consultas  "
+                        f"p50={resultado['p50_ms']:>8.2f} ms  {resultado['peticiones_por_segundo']:>7.1f} pet/s  "
+                        f"{resultado['productos_por_segundo']:>8} productos/s  {resultado['kb']:>7.1f} KB"
+                    )
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+    def con_instancias(self, limite):
+        productos = MODELOS_CATALOGO['ropa'].objects.select_related('proveedor').order_by('id')[:limite]
+        return HttpResponse(serializers.serialize('json', productos), content_type='application/json')
@@ -0,0 +1,227 @@
+import asyncio
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from app_kasports.bench import (
+    abrir_sesion, copia_sqlite, percentiles, peticion_http, sembrar_clientes, sembrar_productos,
+    sembrar_proveedores, servidor_local,
+)
+
+MODOS = ('wsgi', 'asgi')
+# (nombre de la URL, con sesión de cliente)
+PAGINAS = [
+    ('index_cliente', False), ('productos', False), ('ropa_lista', False), ('proveedores_lista', False),
+    ('index_cliente', True), ('productos', True), ('ropa_lista', True), ('tenis_lista', True),
+    ('gorras_lista', True), ('proveedores_lista', True), ('historial_pedidos', True),
+]
+
+
+class Command(BaseCommand):
+    help = ('Compara las peticiones por segundo de las páginas de lectura con varias conexiones '
+            'simultáneas: vistas síncronas bajo WSGI contra vistas_async.py bajo ASGI')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conexiones', type=int, nargs='+', default=[1, 8, 32],
+                            help='Conexiones simultáneas (hilos en WSGI, tareas en ASGI)')
+        parser.add_argument('--peticiones', type=int, default=200, help='Peticiones por nivel de concurrencia')
+        parser.add_argument('--productos', type=int, default=3000, help='Productos sintéticos en total')
+        parser.add_argument('--clientes', type=int, default=20)
+        parser.add_argument('--servidor', action='store_true',
+                            help='Mide por HTTP contra runserver (WSGI) y uvicorn (ASGI) en lugar de '
+                                 'llamar a los manejadores en el mismo proceso')
+        parser.add_argument('--salida', help='Ruta de un archivo JSON para guardar los resultados')
+        # Uso interno: cada modo corre en su propio proceso con KASPORTS_VISTAS_ASYNC
+        parser.add_argument('--modo', choices=MODOS, help='(interno) mide solo este modo')
+
+    def handle(self, *args, **options):
+        if options['modo']:
+            self.stdout.write(json.dumps(self.corrida(options)))
+            return
+        if connection.vendor != 'sqlite':
+            raise CommandError('El benchmark trabaja sobre una copia de la base SQLite.')
+        if options['servidor'] and importlib.util.find_spec('uvicorn') is None:
+            raise CommandError('Instala uvicorn para medir el modo ASGI con --servidor.')
+
+        resultados = []
+        for modo in MODOS:
+            for resultado in self.medir_modo(modo, options):
+                resultados.append(resultado)
+                self.stdout.write(
+                    f"{modo}  conexiones={resultado['conexiones']:<3} {resultado['por_segundo']:>7.1f} pet/s  "
+                    f"p50={resultado['p50_ms']:.1f}ms p95={resultado['p95_ms']:.1f}ms  errores={resultado['errores']}"
+                )
+        self.resumir(resultados)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+    def medir_modo(self, modo, options):
+        """Lanza `--modo` en otro proceso sobre su propia copia de la base de datos."""
+        comando = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_asgi', '--modo', modo,
+            '--peticiones', str(options['peticiones']), '--productos', str(options['productos']),
+            '--clientes', str(options['clientes']), '--conexiones', *[str(c) for c in options['conexiones']],
+        ]
+        if options['servidor']:
+            comando.append('--servidor')
+        with copia_sqlite() as copia:
+            entorno = dict(os.environ, KASPORTS_BD_NOMBRE=copia, KASPORTS_VISTAS_ASYNC='1' if modo == 'asgi' else '0')
+            proceso = subprocess.run(comando, env=entorno, capture_output=True, text=True)
+        if proceso.returncode != 0:
+            raise CommandError(f'Falló el modo {modo}:\n{proceso.stderr[-3000:]}')
+        resultados = json.loads(proceso.stdout.strip().splitlines()[-1])
+        for resultado in resultados:
+            resultado['modo'] = modo
+        return resultados
+
+    def resumir(self, resultados):
+        por_modo = {(r['modo'], r['conexiones']): r['por_segundo'] for r in resultados}
+        for (modo, conexiones), por_segundo in sorted(por_modo.items()):
+            if modo == 'asgi' and por_modo.get(('wsgi', conexiones)):
+                cambio = (por_segundo / por_modo[('wsgi', conexiones)] - 1) * 100
+                self.stdout.write(f'ASGI contra WSGI con {conexiones} conexiones: {cambio:+.0f}%')
+
+    # ============================================
+    # CORRIDA (DENTRO DEL PROCESO DE CADA MODO)
+    # ============================================
+
+    def corrida(self, options):
+        call_command('migrate', interactive=False, verbosity=0)
+        with transaction.atomic():
+            proveedores = sembrar_proveedores(10, prefijo='ASGI')
+            for tipo in ('ropa', 'tenis', 'gorra'):
+                sembrar_productos(options['productos'] // 3, tipo=tipo, proveedores=proveedores)
+            clientes = sembrar_clientes(options['clientes'], ventas_por_cliente=10, prefijo='asgi')
+        sesiones = [abrir_sesion(c.user) for c in clientes]
+        urls = [(reverse(f'app_kasports:{nombre}'), con_sesion) for nombre, con_sesion in PAGINAS]
+        connection.close()
+
+        if options['servidor']:
+            return self.con_servidor(options, urls, sesiones)
+        medir = self.en_proceso_asgi if options['modo'] == 'asgi' else self.en_proceso_wsgi
+        # El cliente asíncrono siempre envía Host: testserver
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            # Una vuelta previa llena la caché de páginas anónimas y de tarjetas
+            medir(1, len(urls), urls, sesiones)
+            return [dict(medir(c, options['peticiones'], urls, sesiones), conexiones=c)
+                    for c in options['conexiones']]
+
+    def resumen(self, tiempos, estados, segundos):
+        return dict(
+            percentiles(tiempos),
+            errores=sum(n for estado, n in estados.items() if not isinstance(estado, int) or estado >= 400),
+            estados={str(estado): n for estado, n in estados.items()},
+            por_segundo=round(len(tiempos) / segundos, 1) if segundos else 0,
+        )
+
+    def en_proceso_wsgi(self, conexiones, peticiones, urls, sesiones):
+        """`conexiones` hilos con el cliente de pruebas (WSGIHandler), como un servidor con hilos."""
+        tiempos, estados = [], Counter()
+        candado = threading.Lock()
+        siguiente = iter(range(peticiones))
+
+        def trabajador(n):
+            clientes = {False: Client(), True: Client()}
+            clientes[True].cookies[settings.SESSION_COOKIE_NAME] = sesiones[n % len(sesiones)]
+            try:
+                while True:
+                    with candado:
+                        i = next(siguiente, None)
+                    if i is None:
+                        break
+                    url, con_sesion = urls[i % len(urls)]
+                    inicio = time.perf_counter()
+                    respuesta = clientes[con_sesion].get(url)
+                    duracion = time.perf_counter() - inicio
+                    with candado:
+                        tiempos.append(duracion)
+                        estados[respuesta.status_code] += 1
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=trabajador, args=(n,)) for n in range(conexiones)]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return self.resumen(tiempos, estados, time.perf_counter() - inicio)
+
+    def en_proceso_asgi(self, conexiones, peticiones, urls, sesiones):
+        """`conexiones` tareas en un bucle de eventos con el cliente asíncrono (ASGIHandler)."""
+        tiempos, estados = [], Counter()
+
+        async def trabajador(n, pendientes):
+            clientes = {False: AsyncClient(), True: AsyncClient()}
+            clientes[True].cookies[settings.SESSION_COOKIE_NAME] = sesiones[n % len(sesiones)]
+            while pendientes:
+                i = pendientes.pop()
+                url, con_sesion = urls[i % len(urls)]
+                inicio = time.perf_counter()
+                respuesta = await clientes[con_sesion].get(url)
+                tiempos.append(time.perf_counter() - inicio)
+                estados[respuesta.status_code] += 1
+
+        async def todos():
+            pendientes = list(range(peticiones))
+            await asyncio.gather(*(trabajador(n, pendientes) for n in range(conexiones)))
+
+        inicio = time.perf_counter()
+        asyncio.run(todos())
+        return self.resumen(tiempos, estados, time.perf_counter() - inicio)
+
+    def con_servidor(self, options, urls, sesiones):
+        """Carga HTTP con hilos contra runserver (WSGI) o uvicorn (ASGI)."""
+        if options['modo'] == 'asgi':
+            comando = [sys.executable, '-m', 'uvicorn', 'backend_kasports.asgi:application',
+                       '--host', '127.0.0.1', '--port', '{puerto}', '--no-access-log']
+        else:
+            comando = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'runserver', '127.0.0.1:{puerto}',
+                       '--noreload', '--skip-checks']
+        resultados = []
+        with servidor_local(comando, dict(os.environ, KASPORTS_REPORTE_CONSULTAS='')) as puerto:
+            for conexiones in options['conexiones']:
+                tiempos, estados = [], Counter()
+                candado = threading.Lock()
+                siguiente = iter(range(options['peticiones']))
+
+                def trabajador(n):
+                    cookie = {'Cookie': f'{settings.SESSION_COOKIE_NAME}={sesiones[n % len(sesiones)]}'}
+                    while True:
+                        with candado:
+                            i = next(siguiente, None)
+                        if i is None:
+                            break
+                        url, con_sesion = urls[i % len(urls)]
+                        inicio = time.perf_counter()
+                        try:
+                            estado, _ = peticion_http(puerto, 'GET', url, cabeceras=cookie if con_sesion else None)
+                        except OSError as error:
+                            estado = type(error).__name__
+                        with candado:
+                            tiempos.append(time.perf_counter() - inicio)
+                            estados[estado] += 1
+
+                hilos = [threading.Thread(target=trabajador, args=(n,)) for n in range(conexiones)]
+                inicio = time.perf_counter()
+                for hilo in hilos:
+                    hilo.start()
+                for hilo in hilos:
+                    hilo.join()
+                resultados.append(dict(self.resumen(tiempos, estados, time.perf_counter() - inicio),
+                                       conexiones=conexiones))
+        return resultados
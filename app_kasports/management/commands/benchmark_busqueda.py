@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+from app_kasports.bench import datos_temporales, medir, sembrar_productos
+from app_kasports.busqueda import filtrar_por_relevancia
+from app_kasports.models import Ropa
+
+CONSULTAS = ['runner', 'negro', 'camiseta pro', 'algodon']
+
+
+def busqueda_icontains(consulta):
+    """Ruta anterior: `icontains` sobre varios campos (LIKE '%q%')."""
+    ropa = Ropa.objects.filter(stock__gt=0).filter(
+        Q(modelo__icontains=consulta) | Q(color__icontains=consulta) |
+        Q(estilo__icontains=consulta) | Q(proveedor__nombre__icontains=consulta)
+    ).order_by('id')
+    return list(Paginator(ropa, 9).get_page(1))
+
+
+def busqueda_motor(consulta):
+    """Ruta nueva: índice de texto completo con ranking."""
+    ropa = filtrar_por_relevancia(Ropa.objects.filter(stock__gt=0), consulta, 'ropa')
+    return list(Paginator(ropa, 9).get_page(1))
+
+
+class Command(BaseCommand):
+    help = 'Compara la latencia de la búsqueda con icontains contra el motor de texto completo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help='Número de productos sintéticos por corrida')
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--salida', help='Ruta de un archivo JSON para guardar los resultados')
+
+    def handle(self, *args, **options):
+        resultados = []
+        for tamano in options['tamanos']:
+            self.stdout.write(f'Sembrando {tamano} productos...')
+            with datos_temporales():
+                sembrar_productos(tamano, tipo='ropa')
+                for consulta in CONSULTAS:
+                    for nombre, funcion in (('icontains', busqueda_icontains), ('motor', busqueda_motor)):
+                        stats = medir(lambda: funcion(consulta), repeticiones=options['repeticiones'])
+                        resultados.append({'productos': tamano, 'consulta': consulta, 'ruta': nombre, **stats})
+                        self.stdout.write(
+                            f'{tamano:>9} {consulta!r:<16} {nombre:<10} '
+                            f"p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms"
+                        )
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
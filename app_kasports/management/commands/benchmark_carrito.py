@@ -0,0 +1,128 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from app_kasports.bench import datos_temporales, sembrar_cliente, sembrar_productos, sembrar_proveedores
+from app_kasports.models import Ropa
+
+VISITANTES = ('cliente', 'anonimo')
+ESCENARIOS = ('cantidad', 'agregar', 'eliminar', 'lote')
+
+
+class Command(BaseCommand):
+    help = ('Compara el trabajo del servidor por interacción con el carrito: formulario con redirección '
+            '(POST más la página completa que se vuelve a mostrar) contra la API JSON del carrito')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lineas', type=int, default=10, help='Líneas en el carrito durante la medición')
+        parser.add_argument('--productos', type=int, default=300, help='Productos sintéticos en el listado')
+        parser.add_argument('--repeticiones', type=int, default=30)
+        parser.add_argument('--visitantes', nargs='+', choices=VISITANTES, default=list(VISITANTES))
+        parser.add_argument('--salida', help='Ruta de un archivo JSON para guardar los resultados')
+
+    def handle(self, *args, **options):
+        resultados = []
+        # Todo corre en una transacción que se revierte: no quedan productos ni carritos de prueba
+        with datos_temporales():
+            sembrar_productos(options['productos'], tipo='ropa', proveedores=sembrar_proveedores(5, prefijo='CARRITO'))
+            productos = list(Ropa.objects.order_by('-id')[:options['lineas'] + 1])
+            # Existencias de sobra para que ninguna repetición falle por stock
+            Ropa.objects.filter(pk__in=[p.pk for p in productos]).update(stock=100000)
+            for visitante in options['visitantes']:
+                http = Client(HTTP_HOST='localhost')
+                if visitante == 'cliente':
+                    http.force_login(sembrar_cliente('bench_carrito').user)
+                for producto in productos[1:]:
+                    http.post(reverse('app_kasports:api_carrito_agregar', args=['ropa', producto.pk]))
+                for escenario in ESCENARIOS:
+                    for via in ('formulario', 'api'):
+                        resultado = self.medir(http, escenario, via, productos[0], options['repeticiones'])
+                        resultados.append({'visitante': visitante, 'escenario': escenario, 'via': via, **resultado})
+                        self.stdout.write(
+                            f"{visitante:<8} {escenario:<9} {via:<11} {resultado['consultas']:>5.1f} consultas  "
+                            f"{resultado['peticiones']} pet  {resultado['p50_ms']:>7.1f} ms  {resultado['kb']:>7.1f} KB"
+                        )
+        self.resumir(resultados)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+    def lineas(self, http, extra):
+        """(ids de las líneas, id de la línea del producto extra o None), leídos por la API."""
+        detalles = http.get(reverse('app_kasports:api_carrito')).json()['detalles']
+        de_extra = next((d['id'] for d in detalles if d['producto_id'] == extra.pk), None)
+        return [d['id'] for d in detalles if d['id'] != de_extra], de_extra
+
+    def interaccion(self, http, escenario, via, extra, lineas, de_extra, n):
+        """Peticiones de una interacción; devuelve las respuestas finales de cada una."""
+        cantidad = 1 + n % 2
+        if escenario == 'cantidad':
+            if via == 'api':
+                return [http.post(reverse('app_kasports:api_carrito_linea', args=[lineas[0]]), {'cantidad': cantidad})]
+            return [http.post(reverse('app_kasports:actualizar_carrito', args=[lineas[0]]), {'cantidad': cantidad},
+                              follow=True)]
+        if escenario == 'agregar':
+            if via == 'api':
+                return [http.post(reverse('app_kasports:api_carrito_agregar', args=['ropa', extra.pk]))]
+            # El formulario del listado regresa al listado (HTTP_REFERER) y lo vuelve a mostrar completo
+            return [http.post(reverse('app_kasports:agregar_carrito', args=['ropa', extra.pk]),
+                              HTTP_REFERER=reverse('app_kasports:ropa_lista'), follow=True)]
+        if escenario == 'eliminar':
+            if via == 'api':
+                return [http.post(reverse('app_kasports:api_carrito_eliminar', args=[de_extra]))]
+            return [http.post(reverse('app_kasports:eliminar_carrito', args=[de_extra]), follow=True)]
+        # lote: cambiar todas las cantidades; sin la API es un formulario (y una página) por línea
+        if via == 'api':
+            cuerpo = json.dumps({'lineas': [{'id': i, 'cantidad': cantidad} for i in lineas]})
+            return [http.post(reverse('app_kasports:api_carrito_lote'), cuerpo, content_type='application/json')]
+        return [http.post(reverse('app_kasports:actualizar_carrito', args=[i]), {'cantidad': cantidad}, follow=True)
+                for i in lineas]
+
+    def preparar(self, http, escenario, extra):
+        """Deja el producto extra en el carrito antes de cada medición de `eliminar`."""
+        if escenario == 'eliminar':
+            http.post(reverse('app_kasports:api_carrito_agregar', args=['ropa', extra.pk]))
+
+    def medir(self, http, escenario, via, extra, repeticiones):
+        consultas, tiempos, tamanos, peticiones = [], [], [], 0
+        for n in range(repeticiones):
+            self.preparar(http, escenario, extra)
+            lineas, de_extra = self.lineas(http, extra)
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                respuestas = self.interaccion(http, escenario, via, extra, lineas, de_extra, n)
+                tiempos.append(time.perf_counter() - inicio)
+            consultas.append(len(capturadas))
+            tamanos.append(sum(len(r.content) for r in respuestas))
+            peticiones = sum(1 + len(getattr(r, 'redirect_chain', [])) for r in respuestas)
+            for respuesta in respuestas:
+                if respuesta.status_code != 200:
+                    raise RuntimeError(f'{escenario}/{via} respondió {respuesta.status_code}')
+        if escenario == 'agregar':
+            # Devolver el carrito a sus líneas iniciales para los siguientes escenarios
+            http.post(reverse('app_kasports:api_carrito_eliminar', args=[self.lineas(http, extra)[1]]))
+        return {
+            'peticiones': peticiones,
+            'consultas': round(statistics.mean(consultas), 1),
+            'p50_ms': round(statistics.median(tiempos) * 1000, 2),
+            'kb': round(statistics.mean(tamanos) / 1024, 1),
+        }
+
+    def resumir(self, resultados):
+        indice = {(r['visitante'], r['escenario'], r['via']): r for r in resultados}
+        for (visitante, escenario, via), api in sorted(indice.items()):
+            formulario = indice.get((visitante, escenario, 'formulario'))
+            if via != 'api' or not formulario or not formulario['consultas']:
+                continue
+            self.stdout.write(
+                f'{visitante} {escenario}: {100 - api["consultas"] * 100 / formulario["consultas"]:.0f}% menos '
+                f'consultas, {formulario["p50_ms"] / api["p50_ms"]:.1f}x más rápido, '
+                f'{formulario["kb"] / max(api["kb"], 0.1):.0f}x menos bytes con la API'
+            )
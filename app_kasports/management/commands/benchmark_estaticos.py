@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test import override_settings
+
+from app_kasports.estaticos import ServidorArchivos
+
+ARCHIVOS = ['css/style.css', 'js/main.js', 'images/l.png']
+
+
+def sin_cache(aplicacion):
+    """Lo que hacía `add_cache_headers` (urls.py): estáticos con `no-cache, no-store`."""
+    def envoltura(environ, start_response):
+        def inicio(estado, encabezados, exc_info=None):
+            if environ['PATH_INFO'].startswith(settings.STATIC_URL):
+                encabezados = [(k, v) for k, v in encabezados if k not in ('Cache-Control', 'Expires')]
+                encabezados += [
+                    ('Cache-Control', 'no-cache, no-store, must-revalidate'), ('Pragma', 'no-cache'), ('Expires', '0'),
+                ]
+            return start_response(estado, encabezados, exc_info)
+        return aplicacion(environ, inicio)
+    return envoltura
+
+
+def peticion(aplicacion, ruta, **encabezados):
+    """Llama a la aplicación WSGI en el mismo proceso; devuelve (estado, encabezados, bytes del cuerpo)."""
+    environ = {'PATH_INFO': ruta, 'REQUEST_METHOD': 'GET', 'SERVER_NAME': 'localhost'}
+    environ.update({'HTTP_' + k.upper(): v for k, v in encabezados.items()})
+    setup_testing_defaults(environ)
+    respuesta = {}
+
+    def start_response(estado, lista, exc_info=None):
+        respuesta['estado'] = int(estado.split()[0])
+        respuesta['encabezados'] = dict(lista)
+
+    cuerpo = aplicacion(environ, start_response)
+    try:
+        largo = sum(len(bloque) for bloque in cuerpo)
+    finally:
+        if hasattr(cuerpo, 'close'):
+            cuerpo.close()
+    return respuesta['estado'], respuesta['encabezados'], largo
+
+
+class Command(BaseCommand):
+    help = 'Compara peticiones por segundo de estáticos y media: vista de Django sin caché vs ServidorArchivos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=500, help='Peticiones por escenario')
+        parser.add_argument('--salida', help='Ruta de un archivo JSON para guardar los resultados')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG:
+            raise CommandError('La ruta anterior (django.views.static.serve) solo existe con DEBUG = True.')
+        destino = tempfile.mkdtemp(prefix='kasports_estaticos_')
+        try:
+            with override_settings(STATIC_ROOT=destino):
+                call_command('collectstatic', interactive=False, verbosity=0)
+                resultados = self.medir_todo(destino, options['peticiones'])
+        finally:
+            shutil.rmtree(destino, ignore_errors=True)
+
+        for r in resultados:
+            self.stdout.write(
+                f"{r['escenario']:<28} {r['ruta']:<16} antes={r['antes_por_segundo']:>7.0f}/s "
+                f"({r['antes_estado']}, {r['antes_bytes']} B)  "
+                f"después={r['despues_por_segundo']:>7.0f}/s ({r['despues_estado']}, {r['despues_bytes']} B)  "
+                f"x{r['mejora']}"
+            )
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+    def medir_todo(self, destino, repeticiones):
+        django_app = get_wsgi_application()
+        antes = sin_cache(django_app)
+        despues = ServidorArchivos(django_app, raiz_estaticos=destino, servir_media=True)
+        with open(os.path.join(destino, 'staticfiles.json'), encoding='utf-8') as archivo:
+            manifiesto = json.load(archivo)['paths']
+
+        escenarios = []
+        for nombre in ARCHIVOS:
+            if nombre not in manifiesto:
+                continue
+            original = settings.STATIC_URL + nombre
+            con_hash = settings.STATIC_URL + manifiesto[nombre]
+            _, encabezados, _ = peticion(despues, con_hash)
+            escenarios += [
+                ('completo', original, con_hash, {}),
+                ('completo gzip', original, con_hash, {'accept_encoding': 'gzip, deflate, br'}),
+                # El navegador revalida cada vez con no-cache; con immutable ni siquiera pregunta
+                ('revalidación 304', original, con_hash, {
+                    'if_modified_since': encabezados['Last-Modified'], 'if_none_match': encabezados['ETag'],
+                }),
+            ]
+        media = next((m for m in sorted(
+            os.path.join(carpeta, n)[len(str(settings.MEDIA_ROOT)) + 1:].replace(os.sep, '/')
+            for carpeta, _, nombres in os.walk(settings.MEDIA_ROOT) for n in nombres
+            if n.lower().endswith(('.png', '.jpg', '.jpeg'))
+        ) if m.startswith(despues.media_publica) and not m.startswith('derivadas/')), None)
+        if media:
+            ruta_media = settings.MEDIA_URL + media
+            escenarios += [
+                ('media completo', ruta_media, ruta_media, {}),
+                ('media Range 0-1023', ruta_media, ruta_media, {'range': 'bytes=0-1023'}),
+            ]
+
+        resultados = []
+        for escenario, ruta_antes, ruta_despues, encabezados in escenarios:
+            fila = {'escenario': escenario, 'ruta': ruta_antes.rsplit('/', 1)[-1]}
+            for etiqueta, aplicacion, ruta in (('antes', antes, ruta_antes), ('despues', despues, ruta_despues)):
+                estado, respuesta, largo = peticion(aplicacion, ruta, **encabezados)
+                inicio = time.perf_counter()
+                for _ in range(repeticiones):
+                    peticion(aplicacion, ruta, **encabezados)
+                segundos = time.perf_counter() - inicio
+                fila.update({
+                    f'{etiqueta}_estado': estado,
+                    f'{etiqueta}_bytes': largo,
+                    f'{etiqueta}_cache_control': respuesta.get('Cache-Control', ''),
+                    f'{etiqueta}_por_segundo': round(repeticiones / segundos, 1),
+                })
+            fila['mejora'] = round(fila['despues_por_segundo'] / fila['antes_por_segundo'], 1)
+            resultados.append(fila)
+        return resultados
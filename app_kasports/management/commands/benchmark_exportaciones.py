@@ -0,0 +1,162 @@
+import csv
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+
+from app_kasports import exportaciones
+from app_kasports.bench import copia_sqlite, sembrar_ventas
+from app_kasports.models import Administrador, Venta
+
+ADMINISTRADOR = 'bench_exportaciones'
+# Lo que haría una exportación ingenua: instancias completas y el archivo entero en memoria
+REFERENCIA = 'instancias'
+
+
+def rss_pico_mb():
+    """Memoria residente máxima del proceso hasta ahora (ru_maxrss está en KiB en Linux)."""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def rss_anonima_mb():
+    """Memoria residente propia del proceso, sin las páginas de archivos mapeados.
+
+    El perfil `sqlite` mapea la base de datos (`mmap_size`): esas páginas cuentan en
+    el RSS total y crecen con el tamaño de la tabla leída, aunque el sistema puede
+    liberarlas. Solo en Linux; en otros sistemas devuelve 0.
+    """
+    try:
+        with open('/proc/self/status') as estado:
+            for linea in estado:
+                if linea.startswith('RssAnon:'):
+                    return round(int(linea.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return 0
+
+
+class Command(BaseCommand):
+    help = ('Mide filas por segundo y memoria pico (RSS) de la exportación de ventas en CSV y XLSX '
+            'con tablas de distintos tamaños, sobre una copia de la base SQLite')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, nargs='+', default=[100000, 1000000],
+                            help='Ventas en la tabla para cada medición (se siembran de forma incremental)')
+        parser.add_argument('--formatos', nargs='+', choices=exportaciones.FORMATOS, default=list(exportaciones.FORMATOS))
+        parser.add_argument('--referencia', action='store_true',
+                            help='Mide también la exportación ingenua (instancias y archivo en memoria)')
+        parser.add_argument('--salida', help='Ruta de un archivo JSON para guardar los resultados')
+        # Uso interno: cada medición corre en un proceso nuevo para que su RSS pico sea solo suyo
+        parser.add_argument('--interno', choices=['sembrar', 'medir'], help='(interno)')
+        parser.add_argument('--formato', help='(interno) formato a medir')
+
+    def handle(self, *args, **options):
+        if options['interno'] == 'sembrar':
+            self.sembrar(options['filas'][0])
+            return
+        if options['interno'] == 'medir':
+            self.stdout.write(json.dumps(self.medir(options['formato'])))
+            return
+        if connection.vendor != 'sqlite':
+            raise CommandError('El benchmark trabaja sobre una copia de la base SQLite.')
+
+        formatos = options['formatos'] + ([REFERENCIA] if options['referencia'] else [])
+        resultados = []
+        with copia_sqlite() as copia:
+            entorno = dict(os.environ, KASPORTS_BD_NOMBRE=copia, KASPORTS_REPORTE_CONSULTAS='')
+            for filas in sorted(options['filas']):
+                inicio = time.perf_counter()
+                self.interno(['--interno', 'sembrar', '--filas', str(filas)], entorno)
+                self.stdout.write(f'{filas} ventas sembradas en {time.perf_counter() - inicio:.0f} s')
+                for formato in formatos:
+                    resultado = self.interno(['--interno', 'medir', '--formato', formato], entorno)
+                    resultados.append(resultado)
+                    self.stdout.write(
+                        f"  {formato:<10} {resultado['filas']:>8} filas  {resultado['filas_por_segundo']:>9.0f} filas/s  "
+                        f"{resultado['megabytes']:>7.1f} MB  RSS {resultado['rss_inicio_mb']:.0f} -> "
+                        f"{resultado['rss_pico_mb']:.0f} MB  anónima {resultado['anonima_inicio_mb']:.0f} -> "
+                        f"{resultado['anonima_pico_mb']:.0f} MB (+{resultado['anonima_crecimiento_mb']:.1f})"
+                    )
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+    def interno(self, argumentos, entorno):
+        comando = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_exportaciones', *argumentos]
+        proceso = subprocess.run(comando, env=entorno, capture_output=True, text=True)
+        if proceso.returncode != 0:
+            raise CommandError(f'Falló {" ".join(argumentos)}:\n{proceso.stderr[-3000:]}')
+        salida = proceso.stdout.strip().splitlines()
+        return json.loads(salida[-1]) if salida else None
+
+    # ============================================
+    # PROCESOS INTERNOS
+    # ============================================
+
+    def sembrar(self, filas):
+        """Completa la tabla de ventas de la copia hasta `filas`."""
+        call_command('migrate', interactive=False, verbosity=0)
+        with transaction.atomic():
+            if not User.objects.filter(username=ADMINISTRADOR).exists():
+                usuario = User.objects.create(username=ADMINISTRADOR)
+                Administrador.objects.create(user=usuario, telefono='5500000000')
+            existentes = Venta.objects.count()
+            if filas > existentes:
+                sembrar_ventas(filas - existentes, prefijo=f'exportar_{existentes}')
+
+    def medir(self, formato):
+        """Descarga la exportación completa por el panel (o la referencia) y mide tiempo y memoria."""
+        filas = Venta.objects.count()
+        rss_inicio = rss_pico_mb()
+        anonima_inicio = anonima_pico = rss_anonima_mb()
+        inicio = time.perf_counter()
+        if formato == REFERENCIA:
+            tamano, anonima_pico = self.exportar_con_instancias()
+        else:
+            http = Client(HTTP_HOST='localhost')
+            http.force_login(User.objects.get(username=ADMINISTRADOR))
+            respuesta = http.get(reverse('app_kasports:exportar_reporte', args=['ventas']), {'formato': formato})
+            if respuesta.status_code != 200:
+                raise CommandError(f'La exportación respondió {respuesta.status_code}')
+            # El contenido se descarta bloque a bloque, como lo haría el servidor al enviarlo
+            tamano = 0
+            for parte in respuesta.streaming_content:
+                tamano += len(parte)
+                anonima_pico = max(anonima_pico, rss_anonima_mb())
+        segundos = time.perf_counter() - inicio
+        return {
+            'formato': formato,
+            'filas': filas,
+            'segundos': round(segundos, 2),
+            'filas_por_segundo': round(filas / segundos, 1) if segundos else 0,
+            'megabytes': round(tamano / 2 ** 20, 1),
+            'rss_inicio_mb': rss_inicio,
+            'rss_pico_mb': rss_pico_mb(),
+            'anonima_inicio_mb': anonima_inicio,
+            'anonima_pico_mb': anonima_pico,
+            'anonima_crecimiento_mb': round(anonima_pico - anonima_inicio, 1),
+        }
+
+    def exportar_con_instancias(self):
+        contenido = io.StringIO()
+        escritor = csv.writer(contenido)
+        escritor.writerow(exportaciones.encabezados('ventas'))
+        for v in list(Venta.objects.select_related('cliente__user').order_by('fecha_venta', 'id')):
+            escritor.writerow([
+                v.id, v.fecha_venta, v.cliente.user.username, v.cliente.user.email, v.metodo_pago, v.estado,
+                v.subtotal, v.descuento, v.impuesto, v.costo_envio, v.total,
+            ])
+        return len(contenido.getvalue().encode('utf-8')), rss_anonima_mb()
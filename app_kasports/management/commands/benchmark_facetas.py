@@ -0,0 +1,71 @@
+import json
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from app_kasports import views
+from app_kasports.bench import datos_temporales, medir, sembrar_productos, sembrar_proveedores
+
+# (nombre, parámetros de la petición): cada variante agrega filtros a la anterior
+VARIANTES = [
+    ('sin_filtros', {}),
+    ('genero', {'genero': ['Unisex', 'Femenino']}),
+    ('genero_precio', {'genero': ['Unisex', 'Femenino'], 'precio': ['500-1000', '1000-2000']}),
+    ('genero_precio_color', {'genero': ['Unisex', 'Femenino'], 'precio': ['500-1000', '1000-2000'],
+                             'color': ['Negro', 'Blanco', 'Rojo']}),
+]
+
+
+class Command(BaseCommand):
+    help = ('Mide el listado de ropa con facetas: consultas y latencia al calcular los conteos (caché vacía) '
+            'y al leerlos de la caché, con cada vez más filtros')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=20000, help='Productos sintéticos de ropa')
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--salida', help='Ruta de un archivo JSON para guardar los resultados')
+
+    def handle(self, *args, **options):
+        resultados = []
+        fabrica = RequestFactory()
+        # Todo corre en una transacción que se revierte: no quedan productos de prueba
+        with datos_temporales():
+            proveedores = sembrar_proveedores(10, prefijo='FACETAS')
+            sembrar_productos(options['productos'], tipo='ropa', proveedores=proveedores)
+            variantes = VARIANTES + [(
+                'con_marcas', dict(VARIANTES[-1][1], proveedor=[str(p.pk) for p in proveedores[:3]]),
+            )]
+            for nombre, parametros in variantes:
+                def listado(parametros=parametros):
+                    peticion = fabrica.get('/ropa/', parametros)
+                    peticion.user = AnonymousUser()
+                    return views.contexto_ropa(peticion)
+
+                def sin_cache():
+                    cache.clear()
+                    return listado()
+
+                for modo, funcion in (('calculo', sin_cache), ('cache', listado)):
+                    funcion()
+                    # El registro de consultas guarda 9000 como máximo y la siembra ya lo llenó
+                    reset_queries()
+                    with CaptureQueriesContext(connection) as consultas:
+                        contexto = funcion()
+                    stats = medir(funcion, repeticiones=options['repeticiones'])
+                    resultado = {
+                        'variante': nombre, 'modo': modo, 'consultas': len(consultas),
+                        'productos': contexto['page_obj'].total, **stats,
+                    }
+                    resultados.append(resultado)
+                    self.stdout.write(
+                        f"{nombre:<20} {modo:<8} {resultado['consultas']:>3} consultas  "
+                        f"p50={resultado['p50_ms']:>8.2f} ms  {resultado['productos']} productos"
+                    )
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
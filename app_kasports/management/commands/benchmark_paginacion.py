@@ -0,0 +1,71 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.test import RequestFactory
+
+from app_kasports.bench import datos_temporales, medir, sembrar_ventas
+from app_kasports.models import Venta
+from app_kasports.paginacion import SIGUIENTE, codificar, con_desempate, firma, paginar, valores_de
+
+ORDEN = ('-fecha_venta',)
+POR_PAGINA = 10
+
+
+def pagina_offset(numero):
+    """Ruta anterior: `Paginator` con COUNT(*) y OFFSET."""
+    ventas = Venta.objects.order_by('-fecha_venta', '-id')
+    return list(Paginator(ventas, POR_PAGINA).page(numero))
+
+
+def cursor_para(numero):
+    """Cursor que lleva a la página `numero` (se calcula una sola vez, fuera de la medición)."""
+    if numero == 1:
+        return None
+    orden = con_desempate(ORDEN)
+    frontera = Venta.objects.order_by(*orden)[(numero - 1) * POR_PAGINA - 1]
+    return codificar({'d': SIGUIENTE, 'o': firma(orden), 'v': valores_de(frontera, orden)})
+
+
+class Command(BaseCommand):
+    help = 'Compara la latencia de páginas profundas con Paginator (OFFSET) contra la paginación por cursor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help='Número de ventas sintéticas por corrida')
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--salida', help='Ruta de un archivo JSON para guardar los resultados')
+
+    def handle(self, *args, **options):
+        fabrica = RequestFactory()
+        resultados = []
+        for tamano in options['tamanos']:
+            self.stdout.write(f'Sembrando {tamano} ventas...')
+            with datos_temporales():
+                sembrar_ventas(tamano)
+                ultima = max(1, tamano // POR_PAGINA)
+                for numero in sorted({1, max(1, ultima // 2), ultima}):
+                    cursor = cursor_para(numero)
+                    request = fabrica.get('/', {'cursor': cursor} if cursor else {})
+                    pagina = paginar(request, Venta.objects.all(), ORDEN, POR_PAGINA)
+                    # Misma página por ambos caminos
+                    assert [v.pk for v in pagina] == [v.pk for v in pagina_offset(numero)]
+
+                    rutas = (
+                        ('offset', lambda: pagina_offset(numero)),
+                        ('cursor', lambda: list(paginar(request, Venta.objects.all(), ORDEN, POR_PAGINA))),
+                        ('cursor+total', lambda: list(paginar(request, Venta.objects.all(), ORDEN, POR_PAGINA,
+                                                              contar=True))),
+                    )
+                    for nombre, funcion in rutas:
+                        stats = medir(funcion, repeticiones=options['repeticiones'])
+                        resultados.append({'ventas': tamano, 'pagina': numero, 'ruta': nombre, **stats})
+                        self.stdout.write(
+                            f'{tamano:>9} página {numero:>7} {nombre:<13} '
+                            f"p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms"
+                        )
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
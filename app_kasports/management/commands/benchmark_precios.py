@@ -0,0 +1,106 @@
+import json
+import random
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from app_kasports import precios
+from app_kasports.bench import datos_temporales, medir, sembrar_cliente, sembrar_productos
+from app_kasports.models import Carrito, DetalleCarrito, Ropa
+
+# El motor redondea a centavos descuento e impuesto por separado; el cálculo anterior no redondeaba
+TOLERANCIA = Decimal('0.02')
+
+# Montos en los límites de los descuentos y tramos de envío
+LIMITES = ['0', '0.01', '1249.99', '1250', '2500', '2500.01', '5000', '5000.01', '10000', '10000.01']
+
+
+def totales_anteriores(subtotal):
+    """Cálculo que tenían `carrito_view` y `confirmar_pedido` antes del motor de precios."""
+    descuento = Decimal('0.00')
+    if subtotal > 10000:
+        descuento = subtotal * Decimal('0.10')
+    elif subtotal > 5000:
+        descuento = subtotal * Decimal('0.05')
+    subtotal_con_descuento = subtotal - descuento
+    if subtotal_con_descuento < 1250:
+        costo_envio = Decimal('80.00')
+    elif subtotal_con_descuento <= 2500:
+        costo_envio = Decimal('50.00')
+    else:
+        costo_envio = Decimal('0.00')
+    impuesto = subtotal_con_descuento * Decimal('0.08')
+    return subtotal_con_descuento + costo_envio + impuesto
+
+
+def precio_anterior(carrito):
+    """Ruta anterior: materializar todas las líneas y sumar en Python."""
+    detalles = list(carrito.detalles.select_related('ropa', 'tenis', 'gorra'))
+    return totales_anteriores(sum((d.subtotal for d in detalles), Decimal('0.00')))
+
+
+class Command(BaseCommand):
+    help = 'Mide el cálculo de totales del carrito (1, 50 y 500 líneas) y verifica el motor de precios'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lineas', type=int, nargs='+', default=[1, 50, 500])
+        parser.add_argument('--repeticiones', type=int, default=50)
+        parser.add_argument('--casos', type=int, default=5000,
+                            help='Subtotales aleatorios con los que se comparan ambos cálculos')
+        parser.add_argument('--salida', help='Ruta de un archivo JSON para guardar los resultados')
+
+    def handle(self, *args, **options):
+        self.verificar(options['casos'])
+        resultados = []
+        with datos_temporales():
+            sembrar_productos(max(options['lineas']), tipo='ropa')
+            productos = list(Ropa.objects.order_by('-id')[:max(options['lineas'])])
+            for lineas in options['lineas']:
+                # Un cliente por corrida: solo puede tener un carrito activo (carrito_activo_unico)
+                carrito = Carrito.objects.create(cliente=sembrar_cliente(f'bench_precios_{lineas}'))
+                DetalleCarrito.objects.bulk_create([
+                    DetalleCarrito(carrito=carrito, ropa=p, cantidad=2, subtotal=p.precio * 2)
+                    for p in productos[:lineas]
+                ])
+                totales = precios.totales_carrito(carrito, usar_cache=False)
+                if abs(totales.total - precio_anterior(carrito)) > TOLERANCIA:
+                    raise CommandError(f'Los totales no coinciden con {lineas} líneas')
+                # Dentro de la transacción del benchmark no se guarda en caché: se precarga a mano
+                cache.set(precios.clave_cache(carrito), totales)
+
+                rutas = (
+                    ('python', lambda: precio_anterior(carrito)),
+                    ('agregado', lambda: precios.totales_carrito(carrito, usar_cache=False)),
+                    ('cache', lambda: precios.totales_carrito(carrito)),
+                )
+                for nombre, funcion in rutas:
+                    stats = medir(funcion, repeticiones=options['repeticiones'])
+                    resultados.append({'lineas': lineas, 'ruta': nombre, **stats})
+                    self.stdout.write(
+                        f'{lineas:>5} líneas {nombre:<9} p50={stats["p50_ms"]}ms p95={stats["p95_ms"]}ms'
+                    )
+                cache.delete(precios.clave_cache(carrito))
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+    def verificar(self, casos):
+        """Compara el motor con el cálculo anterior y revisa sus invariantes."""
+        rnd = random.Random(0)
+        montos = [Decimal(m) for m in LIMITES]
+        montos += [Decimal(rnd.randint(0, 3000000)) / 100 for _ in range(casos)]
+        for subtotal in montos:
+            totales = precios.calcular(precios.Totales(subtotal), reglas_precio=precios.cargar_reglas([
+                precios.descuento_por_monto, precios.envio_por_monto,
+            ]))
+            esperado = totales_anteriores(subtotal)
+            if abs(totales.total - esperado) > TOLERANCIA:
+                raise CommandError(f'Subtotal {subtotal}: motor {totales.total}, anterior {esperado}')
+            if not (0 <= totales.descuento <= totales.subtotal and totales.total >= 0):
+                raise CommandError(f'Subtotal {subtotal}: totales inválidos')
+            if totales.total.as_tuple().exponent != -2:
+                raise CommandError(f'Subtotal {subtotal}: el total no está en centavos')
+        self.stdout.write(self.style.SUCCESS(f'{len(montos)} subtotales verificados contra el cálculo anterior'))
@@ -0,0 +1,104 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from app_kasports.bench import datos_temporales, medir, sembrar_cliente
+from app_kasports.models import (
+    Administrador, Carrito, Cliente, DetalleEntrega, Gorra, MensajeContacto, Proveedor, Ropa, Tenis, Venta,
+)
+
+# (nombre de la URL, modelo cuyo primer registro se usa como argumento)
+VISTAS_ADMIN = [
+    ('index_admin', None),
+    ('ver_clientes', None), ('agregar_cliente', None), ('actualizar_cliente', Cliente),
+    ('ver_administradores', None), ('actualizar_administrador', Administrador),
+    ('ver_proveedores', None), ('actualizar_proveedor', Proveedor),
+    ('ver_ropa', None), ('agregar_ropa', None), ('actualizar_ropa', Ropa),
+    ('ver_tenis', None), ('actualizar_tenis', Tenis),
+    ('ver_gorras', None), ('actualizar_gorra', Gorra),
+    ('ver_carritos', None), ('actualizar_carrito_admin', Carrito),
+    ('ver_ventas', None), ('actualizar_venta', Venta),
+    ('ver_detalle_entrega', None), ('actualizar_detalle_entrega', DetalleEntrega),
+    ('ver_mensajes', None), ('actualizar_mensaje', MensajeContacto),
+    ('ver_tareas', None),
+]
+VISTAS_CLIENTE = [('index_cliente', None), ('carrito', None), ('historial_pedidos', None), ('ropa_lista', None)]
+
+# Configuración anterior: sesión en la tabla y rol consultado en cada petición
+ANTES = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'MIDDLEWARE': [m for m in settings.MIDDLEWARE if m != 'app_kasports.roles.rol_en_sesion'],
+}
+TABLAS_AUTH = ('django_session', 'app_kasports_cliente', 'app_kasports_administrador')
+
+
+class Command(BaseCommand):
+    help = ('Compara las consultas por petición de las vistas del panel y del carrito con la sesión en '
+            'base de datos contra la sesión en caché con el rol resuelto una vez')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=10)
+        parser.add_argument('--salida', help='Ruta de un archivo JSON para guardar los resultados')
+
+    def handle(self, *args, **options):
+        administrador = User.objects.filter(administrador__isnull=False).first()
+        if administrador is None:
+            raise CommandError('Se necesita al menos un administrador para medir el panel.')
+
+        resultados = []
+        with datos_temporales():
+            cliente = sembrar_cliente('bench_sesiones').user
+            for usuario, vistas in ((administrador, VISTAS_ADMIN), (cliente, VISTAS_CLIENTE)):
+                for nombre, modelo in vistas:
+                    url = self.url(nombre, modelo)
+                    if url is None:
+                        continue
+                    fila = {'vista': nombre}
+                    for etiqueta, ajustes in (('antes', ANTES), ('despues', {})):
+                        with override_settings(**ajustes):
+                            fila.update(self.medir_vista(usuario, url, etiqueta, options['repeticiones']))
+                    fila['ahorro'] = fila['antes_consultas'] - fila['despues_consultas']
+                    resultados.append(fila)
+                    self.stdout.write(
+                        f"{nombre:<28} consultas {fila['antes_consultas']:>3} -> {fila['despues_consultas']:<3} "
+                        f"(sesión/rol {fila['antes_auth']} -> {fila['despues_auth']})  "
+                        f"p50 {fila['antes_p50_ms']:.1f} -> {fila['despues_p50_ms']:.1f} ms"
+                    )
+
+        if resultados:
+            ahorro = sum(r['ahorro'] for r in resultados) / len(resultados)
+            self.stdout.write(self.style.SUCCESS(f'Consultas ahorradas por petición (promedio): {ahorro:.2f}'))
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+    def url(self, nombre, modelo):
+        if modelo is None:
+            return reverse(f'app_kasports:{nombre}')
+        objeto = modelo.objects.order_by('pk').first()
+        return reverse(f'app_kasports:{nombre}', args=[objeto.pk]) if objeto else None
+
+    def medir_vista(self, usuario, url, etiqueta, repeticiones):
+        http = Client()
+        http.force_login(usuario)
+        # La primera petición guarda el rol en la sesión; se mide una petición ya en régimen
+        http.get(url)
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = http.get(url)
+        # Se cuentan antes de las repeticiones: cada petición nueva reinicia `connection.queries`
+        total = len(consultas)
+        auth = sum(1 for c in consultas.captured_queries if any(t in c['sql'] for t in TABLAS_AUTH))
+        stats = medir(lambda: http.get(url), repeticiones=repeticiones, calentamiento=0)
+        return {
+            f'{etiqueta}_estado': respuesta.status_code,
+            f'{etiqueta}_consultas': total,
+            f'{etiqueta}_auth': auth,
+            f'{etiqueta}_p50_ms': stats['p50_ms'],
+        }
@@ -0,0 +1,83 @@
+import json
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min, Sum
+
+from app_kasports import tareas
+from app_kasports.models import Tarea
+
+
+class Command(BaseCommand):
+    help = 'Mide el rendimiento de la cola de tareas con 1, 4 y 8 procesos trabajadores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tareas', type=int, default=2000, help='Tareas por corrida')
+        parser.add_argument('--procesos', type=int, nargs='+', default=[1, 4, 8])
+        parser.add_argument('--espera-ms', type=int, default=0,
+                            help='Trabajo simulado por tarea (milisegundos de espera)')
+        parser.add_argument('--lote', type=int, default=1, help='Tareas que reclama cada proceso por consulta')
+        parser.add_argument('--salida', help='Ruta de un archivo JSON para guardar los resultados')
+
+    def handle(self, *args, **options):
+        # Los trabajadores son procesos aparte: las tareas deben quedar confirmadas
+        # en la base de datos, así que se crean de verdad y se eliminan al terminar.
+        ruta_eco = tareas.ruta(tareas.eco)
+        if Tarea.objects.filter(estado=Tarea.PENDIENTE).exclude(funcion=ruta_eco).exists():
+            self.stderr.write('Aviso: hay tareas reales pendientes; los trabajadores también las ejecutarán.')
+
+        resultados = []
+        for procesos in options['procesos']:
+            resultado = self.corrida(ruta_eco, options['tareas'], procesos, options['espera_ms'], options['lote'])
+            resultados.append(resultado)
+            self.stdout.write(
+                f"procesos={procesos:<2} tareas={resultado['completadas']}/{options['tareas']} "
+                f"total={resultado['segundos']:.2f}s ({resultado['tareas_por_segundo']:.0f}/s) "
+                f"sin arranque={resultado['segundos_ejecucion']:.2f}s "
+                f"({resultado['tareas_por_segundo_ejecucion']:.0f}/s) "
+                f"duplicadas={resultado['ejecuciones_extra']}"
+            )
+
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+    def corrida(self, ruta_eco, total, procesos, espera_ms, lote):
+        Tarea.objects.filter(funcion=ruta_eco).delete()
+        Tarea.objects.bulk_create(
+            [Tarea(funcion=ruta_eco, argumentos={'n': i, 'espera_ms': espera_ms}, max_intentos=1) for i in range(total)],
+            batch_size=1000,
+        )
+        comando = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'procesar_tareas',
+            '--vaciar', '--intervalo', '0.05', '--lote', str(lote), '--verbosity', '0',
+        ]
+        inicio = time.perf_counter()
+        trabajadores = [subprocess.Popen(comando) for _ in range(procesos)]
+        for trabajador in trabajadores:
+            trabajador.wait()
+        segundos = time.perf_counter() - inicio
+
+        hechas = Tarea.objects.filter(funcion=ruta_eco, estado=Tarea.COMPLETADA)
+        datos = hechas.aggregate(
+            intentos=Sum('intentos'), primera=Min('fecha_inicio'), ultima=Max('fecha_fin'),
+        )
+        completadas = hechas.count()
+        ejecucion = (datos['ultima'] - datos['primera']).total_seconds() if completadas else 0
+        Tarea.objects.filter(funcion=ruta_eco).delete()
+        return {
+            'procesos': procesos,
+            'lote': lote,
+            'espera_ms': espera_ms,
+            'completadas': completadas,
+            # Una tarea ejecutada por dos procesos tendría más de un intento
+            'ejecuciones_extra': (datos['intentos'] or 0) - completadas,
+            'segundos': round(segundos, 3),
+            'tareas_por_segundo': round(completadas / segundos, 1) if segundos else 0,
+            'segundos_ejecucion': round(ejecucion, 3),
+            'tareas_por_segundo_ejecucion': round(completadas / ejecucion, 1) if ejecucion else 0,
+        }
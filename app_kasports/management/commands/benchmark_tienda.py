@@ -0,0 +1,285 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from app_kasports.bench import (
+    PALABRAS_MODELO, abrir_sesion, copia_sqlite, percentiles, peticion_http, sembrar_clientes,
+    sembrar_productos, sembrar_proveedores, servidor_local,
+)
+from app_kasports.models import Ropa
+
+TIPOS = ('ropa', 'tenis', 'gorra')
+LISTADOS = ('ropa_lista', 'tenis_lista', 'gorras_lista', 'productos')
+ESCENARIOS = ('listado', 'listado_anonimo', 'busqueda', 'agregar_carrito', 'confirmar_pedido', 'historial_pedidos')
+
+
+def commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+class Command(BaseCommand):
+    help = ('Siembra datos sintéticos en una copia de la base de datos y mide latencia (p50/p95/p99), '
+            'consultas por petición y peticiones por segundo del listado, la búsqueda, agregar al '
+            'carrito, confirmar pedido y el historial, con el cliente de pruebas y con varios hilos '
+            'contra un servidor local')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--productos', type=int, default=10000,
+                            help='Productos sintéticos en total (repartidos entre ropa, tenis y gorras)')
+        parser.add_argument('--proveedores', type=int, default=20)
+        parser.add_argument('--clientes', type=int, default=50)
+        parser.add_argument('--ventas', type=int, default=20, help='Pedidos anteriores por cliente')
+        parser.add_argument('--repeticiones', type=int, default=50,
+                            help='Peticiones por escenario con el cliente de pruebas')
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos del generador de carga HTTP (0 = omitir)')
+        parser.add_argument('--peticiones', type=int, default=25, help='Peticiones por hilo y escenario')
+        parser.add_argument('--escenarios', nargs='+', choices=ESCENARIOS, default=list(ESCENARIOS))
+        parser.add_argument('--salida', help='Ruta de un archivo JSON para guardar los resultados')
+        parser.add_argument('--comparar', help='JSON de una corrida anterior para mostrar las diferencias')
+        parser.add_argument('--sin-copia', action='store_true',
+                            help='Siembra en la base de datos configurada (solo para una base de pruebas)')
+        # Uso interno: la medición corre en otro proceso apuntando a la copia
+        parser.add_argument('--interno', action='store_true', help='(interno) mide sobre la base actual')
+
+    def handle(self, *args, **options):
+        if options['clientes'] < 1:
+            raise CommandError('Se necesita al menos un cliente.')
+        if options['interno'] or options['sin_copia']:
+            resultado = self.corrida(options)
+            if options['interno']:
+                self.stdout.write(json.dumps(resultado))
+                return
+        else:
+            resultado = self.en_copia(options)
+
+        resultado = dict({
+            'commit': commit_actual(),
+            'fecha': timezone.now().isoformat(timespec='seconds'),
+            'parametros': {c: options[c] for c in ('productos', 'proveedores', 'clientes', 'ventas',
+                                                   'repeticiones', 'hilos', 'peticiones')},
+        }, **resultado)
+        anterior = None
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as archivo:
+                anterior = json.load(archivo)
+        self.imprimir(resultado, anterior)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+    def en_copia(self, options):
+        """Repite el comando con `--interno` sobre una copia de la base SQLite."""
+        if connection.vendor != 'sqlite':
+            raise CommandError('Sin --sin-copia el benchmark necesita una base de datos SQLite.')
+        argumentos = []
+        for opcion in ('productos', 'proveedores', 'clientes', 'ventas', 'repeticiones', 'hilos', 'peticiones'):
+            argumentos += [f'--{opcion}', str(options[opcion])]
+        comando = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_tienda', '--interno',
+                   *argumentos, '--escenarios', *options['escenarios']]
+        with copia_sqlite() as copia:
+            # La salida de error (avance) se muestra tal cual; el JSON llega en la última línea
+            proceso = subprocess.run(comando, env=dict(os.environ, KASPORTS_BD_NOMBRE=copia),
+                                     stdout=subprocess.PIPE, text=True)
+        if proceso.returncode != 0:
+            raise CommandError('Falló la corrida del benchmark')
+        return json.loads(proceso.stdout.strip().splitlines()[-1])
+
+    def avance(self, mensaje):
+        self.stderr.write(mensaje)
+        self.stderr.flush()
+
+    # ============================================
+    # CORRIDA (SOBRE LA COPIA)
+    # ============================================
+
+    def corrida(self, options):
+        if options['interno']:
+            call_command('migrate', interactive=False, verbosity=0)
+        inicio = time.perf_counter()
+        producto, clientes = self.sembrar(options)
+        self.avance(f'Datos sembrados en {time.perf_counter() - inicio:.1f} s')
+
+        resultado = {
+            'datos': {'productos': options['productos'], 'clientes': len(clientes),
+                      'ventas': len(clientes) * options['ventas']},
+            'cliente_pruebas': {},
+            'http': {},
+        }
+        for escenario in options['escenarios']:
+            self.avance(f'Cliente de pruebas: {escenario}')
+            resultado['cliente_pruebas'][escenario] = self.con_cliente_pruebas(
+                escenario, producto, clientes, options['repeticiones'])
+        if options['hilos']:
+            resultado['http'] = self.con_servidor(options, producto, clientes)
+        return resultado
+
+    def sembrar(self, options):
+        with transaction.atomic():
+            proveedores = sembrar_proveedores(options['proveedores'], prefijo='TIENDA')
+            por_tipo, resto = divmod(options['productos'], len(TIPOS))
+            for i, tipo in enumerate(TIPOS):
+                sembrar_productos(por_tipo + (1 if i < resto else 0), tipo=tipo, proveedores=proveedores)
+            clientes = sembrar_clientes(options['clientes'], options['ventas'], prefijo='tienda')
+        # Producto con stock de sobra para agregar al carrito y confirmar pedidos (las señales
+        # lo agregan al catálogo y al índice de búsqueda)
+        producto = Ropa.objects.create(
+            proveedor=proveedores[0], modelo='Producto benchmark', color='Negro', genero='Unisex',
+            estilo='Prueba', precio=Decimal('100.00'), stock=10 ** 7, tallas_disponibles='M',
+        )
+        return producto, clientes
+
+    def peticiones(self, escenario, producto, i):
+        """(método, url, datos) de la petición `i` del escenario."""
+        if escenario in ('listado', 'listado_anonimo'):
+            return 'GET', reverse(f'app_kasports:{LISTADOS[i % len(LISTADOS)]}'), None
+        if escenario == 'busqueda':
+            vista = LISTADOS[i % 3]
+            consulta = urlencode({'q': PALABRAS_MODELO[i % len(PALABRAS_MODELO)], 'campo': 'todos'})
+            return 'GET', f"{reverse(f'app_kasports:{vista}')}?{consulta}", None
+        if escenario == 'historial_pedidos':
+            return 'GET', reverse('app_kasports:historial_pedidos'), None
+        agregar = ('POST', reverse('app_kasports:agregar_carrito', args=['ropa', producto.pk]),
+                   {'talla': 'M', 'cantidad': '1'})
+        if escenario == 'agregar_carrito':
+            return agregar
+        # confirmar_pedido: se agrega una línea (sin medir) y se confirma
+        return ('POST', reverse('app_kasports:confirmar_pedido'),
+                {'metodo_pago': 'Tarjeta', 'direccion_entrega': 'Prueba'}, agregar)
+
+    def con_cliente_pruebas(self, escenario, producto, clientes, repeticiones):
+        sesiones = []
+        for cliente in clientes[:10]:
+            http = Client(HTTP_HOST='localhost', raise_request_exception=False)
+            if escenario != 'listado_anonimo':
+                http.force_login(cliente.user)
+            sesiones.append(http)
+        tiempos, consultas, estados = [], [], Counter()
+        total = time.perf_counter()
+        for i in range(repeticiones):
+            http = sesiones[i % len(sesiones)]
+            metodo, url, datos, *preparar = self.peticiones(escenario, producto, i)
+            if preparar:
+                http.post(preparar[0][1], preparar[0][2])
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                respuesta = http.get(url) if metodo == 'GET' else http.post(url, datos)
+                tiempos.append(time.perf_counter() - inicio)
+            consultas.append(len(capturadas))
+            estados[respuesta.status_code] += 1
+        return self.resumen(tiempos, consultas, estados, time.perf_counter() - total)
+
+    def resumen(self, tiempos, consultas, estados, segundos):
+        return dict(
+            percentiles(tiempos),
+            errores=sum(n for estado, n in estados.items() if not isinstance(estado, int) or estado >= 400),
+            estados={str(estado): n for estado, n in estados.items()},
+            por_segundo=round(len(tiempos) / segundos, 1) if segundos else 0,
+            consultas_media=round(sum(consultas) / len(consultas), 2) if consultas else None,
+        )
+
+    # ============================================
+    # CARGA HTTP CONTRA UN SERVIDOR LOCAL
+    # ============================================
+
+    def con_servidor(self, options, producto, clientes):
+        entorno = dict(os.environ, KASPORTS_INSTRUMENTAR_CONSULTAS='1', KASPORTS_REPORTE_CONSULTAS='')
+        # Las sesiones se guardan en la base para que el servidor (otro proceso) las encuentre
+        cookies = [f'{settings.SESSION_COOKIE_NAME}={abrir_sesion(c.user)}' for c in clientes[:options['hilos']]]
+        connection.close()
+        comando = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'runserver', '127.0.0.1:{puerto}',
+                   '--noreload', '--skip-checks']
+        resultados = {}
+        with servidor_local(comando, entorno) as puerto:
+            for escenario in options['escenarios']:
+                self.avance(f"HTTP ({options['hilos']} hilos): {escenario}")
+                resultados[escenario] = self.carga(escenario, producto, cookies, puerto, options)
+        return resultados
+
+    def carga(self, escenario, producto, cookies, puerto, options):
+        hilos = options['hilos']
+        barrera = threading.Barrier(hilos)
+        tiempos, consultas, estados = [], [], Counter()
+        candado = threading.Lock()
+
+        def trabajador(n):
+            token = get_random_string(32)
+            cabeceras = {'X-CSRFToken': token, 'Cookie': f'{settings.CSRF_COOKIE_NAME}={token}'}
+            if escenario != 'listado_anonimo':
+                cabeceras['Cookie'] += f'; {cookies[n % len(cookies)]}'
+            propios_tiempos, propias_consultas, propios_estados = [], [], Counter()
+            barrera.wait(timeout=60)
+            for i in range(options['peticiones']):
+                metodo, url, datos, *preparar = self.peticiones(escenario, producto, n * options['peticiones'] + i)
+                try:
+                    if preparar:
+                        peticion_http(puerto, *preparar[0], cabeceras)
+                    inicio = time.perf_counter()
+                    estado, servidor_consultas = peticion_http(puerto, metodo, url, datos, cabeceras)
+                    propios_tiempos.append(time.perf_counter() - inicio)
+                    propios_estados[estado] += 1
+                    if servidor_consultas is not None:
+                        propias_consultas.append(servidor_consultas)
+                except OSError as error:
+                    propios_estados[type(error).__name__] += 1
+            with candado:
+                tiempos.extend(propios_tiempos)
+                consultas.extend(propias_consultas)
+                estados.update(propios_estados)
+
+        trabajadores = [threading.Thread(target=trabajador, args=(n,)) for n in range(hilos)]
+        inicio = time.perf_counter()
+        for hilo in trabajadores:
+            hilo.start()
+        for hilo in trabajadores:
+            hilo.join()
+        # En confirmar_pedido el tiempo total incluye agregar la línea que se confirma
+        return self.resumen(tiempos, consultas, estados, time.perf_counter() - inicio)
+
+    # ============================================
+    # SALIDA
+    # ============================================
+
+    def imprimir(self, resultado, anterior=None):
+        self.stdout.write(f"commit {resultado['commit'] or '?'}  {resultado['datos']}")
+        for modo in ('cliente_pruebas', 'http'):
+            if not resultado.get(modo):
+                continue
+            self.stdout.write(f'\n{modo}')
+            for escenario, datos in resultado[modo].items():
+                linea = (f"  {escenario:<18} p50 {datos['p50_ms']:>7.1f}  p95 {datos['p95_ms']:>7.1f}  "
+                         f"p99 {datos['p99_ms']:>7.1f} ms  {datos['por_segundo']:>7.1f}/s  "
+                         f"consultas {datos['consultas_media'] if datos['consultas_media'] is not None else '-':>5}  "
+                         f"errores {datos['errores']}")
+                previo = ((anterior or {}).get(modo) or {}).get(escenario)
+                if previo:
+                    linea += (f"  | p95 {self.cambio(previo['p95_ms'], datos['p95_ms'])}"
+                              f"  /s {self.cambio(previo['por_segundo'], datos['por_segundo'])}")
+                self.stdout.write(linea)
+        if anterior:
+            self.stdout.write(f"\n(diferencias contra el commit {anterior.get('commit') or '?'})")
+
+    def cambio(self, antes, despues):
+        if not antes:
+            return '-'
+        return f'{(despues - antes) / antes * 100:+.0f}%'
@@ -0,0 +1,202 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from app_kasports import base_datos, notificaciones, tareas
+from app_kasports.bench import copia_sqlite, percentiles
+from app_kasports.models import Carrito, Cliente, DetalleCarrito, MensajeContacto, Proveedor, Ropa, Tarea, Venta
+
+PREFIJO = 'carga_checkout'
+RFC_PRUEBA = 'CARGA00000000'
+PERFILES = ('sqlite_basico', 'sqlite', 'postgres')
+
+
+class Command(BaseCommand):
+    help = ('Mide pedidos por segundo con varios escritores simultáneos (checkout y formulario '
+            'de contacto) en cada perfil de base de datos (KASPORTS_BD)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--perfiles', nargs='+', choices=PERFILES, default=['sqlite_basico', 'sqlite'])
+        parser.add_argument('--escritores', type=int, nargs='+', default=[1, 4, 8],
+                            help='Hilos que confirman pedidos al mismo tiempo')
+        parser.add_argument('--pedidos', type=int, default=25, help='Pedidos por escritor')
+        parser.add_argument('--contacto', type=int, default=2,
+                            help='Mensajes de contacto que envía cada escritor por pedido')
+        parser.add_argument('--host', default='localhost', help='Host permitido por ALLOWED_HOSTS')
+        parser.add_argument('--salida', help='Ruta de un archivo JSON para guardar los resultados')
+        # Uso interno: la corrida de un perfil se ejecuta en un proceso con su propio settings
+        parser.add_argument('--corrida', action='store_true', help='(interno) mide solo el perfil actual')
+        parser.add_argument('--migrar', action='store_true', help='(interno) aplica migraciones a la copia')
+
+    def handle(self, *args, **options):
+        if options['corrida']:
+            if options['migrar']:
+                call_command('migrate', interactive=False, verbosity=0)
+            resultados = [self.corrida(escritores, options) for escritores in options['escritores']]
+            self.stdout.write(json.dumps(resultados))
+            return
+
+        resultados = []
+        for perfil in options['perfiles']:
+            for resultado in self.medir_perfil(perfil, options):
+                resultados.append(resultado)
+                self.stdout.write(
+                    f"{perfil:<14} escritores={resultado['escritores']:<2} "
+                    f"pedidos={resultado['pedidos']:<4} {resultado['pedidos_por_segundo']:>6.1f} pedidos/s  "
+                    f"p50={resultado['checkout']['p50_ms']:.0f}ms p95={resultado['checkout']['p95_ms']:.0f}ms  "
+                    f"errores={resultado['errores']}"
+                )
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+    # ============================================
+    # PROCESO POR PERFIL
+    # ============================================
+
+    def medir_perfil(self, perfil, options):
+        """Lanza `--corrida` en otro proceso con KASPORTS_BD=perfil; SQLite trabaja sobre una copia."""
+        # El perfil `sqlite` se mide con WAL, como se despliega (la copia se borra al terminar)
+        entorno = dict(os.environ, KASPORTS_BD=perfil, KASPORTS_SQLITE_WAL='1')
+        comando = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'carga_checkout', '--corrida',
+            '--pedidos', str(options['pedidos']), '--contacto', str(options['contacto']),
+            '--host', options['host'], '--escritores', *[str(e) for e in options['escritores']],
+        ]
+        if perfil.startswith('sqlite'):
+            if connection.vendor != 'sqlite':
+                raise CommandError('Los perfiles SQLite necesitan que la base de datos actual sea SQLite.')
+            with copia_sqlite() as copia:
+                entorno['KASPORTS_BD_NOMBRE'] = copia
+                proceso = subprocess.run(comando + ['--migrar'], env=entorno, capture_output=True, text=True)
+        else:
+            proceso = subprocess.run(comando, env=entorno, capture_output=True, text=True)
+        if proceso.returncode != 0:
+            raise CommandError(f'Falló el perfil {perfil}:\n{proceso.stderr[-3000:]}')
+        resultados = json.loads(proceso.stdout.strip().splitlines()[-1])
+        for resultado in resultados:
+            resultado['perfil'] = perfil
+        return resultados
+
+    # ============================================
+    # CORRIDA (DENTRO DEL PROCESO DEL PERFIL)
+    # ============================================
+
+    def corrida(self, escritores, options):
+        self.limpiar()
+        try:
+            producto, clientes = self.preparar(escritores, options)
+            url_checkout = reverse('app_kasports:confirmar_pedido')
+            url_contacto = reverse('app_kasports:contacto')
+            barrera = threading.Barrier(escritores)
+            tiempos_checkout, tiempos_contacto, estados = [], [], Counter()
+            candado = threading.Lock()
+
+            def escritor(cliente):
+                http = Client(HTTP_HOST=options['host'], raise_request_exception=False)
+                http.force_login(cliente.user)
+                propios_checkout, propios_contacto, propios_estados = [], [], Counter()
+                try:
+                    barrera.wait(timeout=30)
+                    for n in range(options['pedidos']):
+                        # Un carrito nuevo con una línea por pedido (como tras "agregar al carrito")
+                        carrito = Carrito.objects.create(cliente=cliente, estado='Activo')
+                        DetalleCarrito.objects.create(
+                            carrito=carrito, ropa=producto, cantidad=1, subtotal=producto.precio,
+                            talla_seleccionada='M',
+                        )
+                        inicio = time.perf_counter()
+                        respuesta = http.post(url_checkout, {'metodo_pago': 'Tarjeta', 'direccion_entrega': 'Prueba'})
+                        propios_checkout.append(time.perf_counter() - inicio)
+                        propios_estados[f'checkout {respuesta.status_code}'] += 1
+                        for m in range(options['contacto']):
+                            inicio = time.perf_counter()
+                            respuesta = http.post(url_contacto, {
+                                'nombre': 'Carga', 'email': f'{PREFIJO}@example.com', 'mensaje': f'{n}-{m}',
+                            })
+                            propios_contacto.append(time.perf_counter() - inicio)
+                            propios_estados[f'contacto {respuesta.status_code}'] += 1
+                except Exception as error:  # "database is locked" fuera de la vista (al crear el carrito)
+                    propios_estados[type(error).__name__] += 1
+                finally:
+                    connection.close()
+                    with candado:
+                        tiempos_checkout.extend(propios_checkout)
+                        tiempos_contacto.extend(propios_contacto)
+                        estados.update(propios_estados)
+
+            hilos = [threading.Thread(target=escritor, args=(c,)) for c in clientes]
+            inicio = time.perf_counter()
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            segundos = time.perf_counter() - inicio
+
+            pedidos = Venta.objects.filter(cliente__in=clientes).count()
+            stock_final = Ropa.objects.get(pk=producto.pk).stock
+            errores = sum(total for clave, total in estados.items() if not clave.endswith(' 302'))
+            return {
+                'escritores': escritores,
+                'pedidos': pedidos,
+                'segundos': round(segundos, 3),
+                'pedidos_por_segundo': round(pedidos / segundos, 1) if segundos else 0,
+                'escrituras_por_segundo': round((pedidos + len(tiempos_contacto)) / segundos, 1) if segundos else 0,
+                'checkout': percentiles(tiempos_checkout),
+                'contacto': percentiles(tiempos_contacto),
+                'estados': dict(estados),
+                'errores': errores,
+                'stock_consistente': stock_final == producto.stock - pedidos,
+                'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE', 0),
+                'pragmas': base_datos.pragmas_actuales(connection),
+            }
+        finally:
+            self.limpiar()
+
+    def preparar(self, escritores, options):
+        proveedor = Proveedor.objects.create(
+            nombre=f'Proveedor {PREFIJO}', direccion='Prueba', telefono='5500000000',
+            correo=f'{PREFIJO}@example.com', rfc_fiscal=RFC_PRUEBA,
+        )
+        # Stock de sobra: aquí se mide el rendimiento, la sobreventa la cubre `estres_checkout`
+        producto = Ropa.objects.create(
+            proveedor=proveedor, modelo=f'Producto {PREFIJO}', color='Negro', genero='Unisex',
+            estilo='Prueba', precio=Decimal('100.00'), stock=escritores * options['pedidos'] * 10,
+            tallas_disponibles='M',
+        )
+        contrasena = make_password(None)
+        usuarios = User.objects.bulk_create([
+            User(username=f'{PREFIJO}_{i}', password=contrasena) for i in range(escritores)
+        ])
+        clientes = Cliente.objects.bulk_create([
+            Cliente(user=u, telefono='5500000000', direccion='Prueba') for u in usuarios
+        ])
+        for cliente, usuario in zip(clientes, usuarios):
+            cliente.user = usuario
+        return producto, clientes
+
+    def limpiar(self):
+        ventas = list(Venta.objects.filter(cliente__user__username__startswith=f'{PREFIJO}_')
+                      .values_list('pk', flat=True))
+        Tarea.objects.filter(
+            funcion=tareas.ruta(notificaciones.correo_confirmacion), argumentos__venta_id__in=ventas,
+        ).delete()
+        # Borrar los usuarios elimina en cascada clientes, carritos y ventas
+        User.objects.filter(username__startswith=f'{PREFIJO}_').delete()
+        Proveedor.objects.filter(rfc_fiscal=RFC_PRUEBA).delete()
+        MensajeContacto.objects.filter(email_remitente=f'{PREFIJO}@example.com').delete()
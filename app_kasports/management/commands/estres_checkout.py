@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from app_kasports.models import (
+    Carrito, Cliente, DetalleCarrito, InventarioTalla, ProductoCatalogo, Proveedor, Ropa, Venta
+)
+
+PREFIJO = 'estres_checkout'
+RFC_PRUEBA = 'ESTRES0000000'
+
+
+class Command(BaseCommand):
+    help = ('Lanza cientos de confirmaciones de pedido simultáneas sobre el mismo producto '
+            'y verifica que no se venda más stock del disponible')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=200, help='Carritos que compiten por el producto')
+        parser.add_argument('--stock', type=int, default=50, help='Existencias iniciales del producto')
+        parser.add_argument('--cantidad', type=int, default=1, help='Unidades por carrito')
+        parser.add_argument('--hilos', type=int, default=32)
+        parser.add_argument('--host', default='localhost', help='Host permitido por ALLOWED_HOSTS')
+
+    def handle(self, *args, **options):
+        # Restos de una corrida anterior interrumpida
+        self.limpiar([])
+        clientes_http = []
+        try:
+            producto, carritos, usuarios = self.preparar(options)
+            for usuario in usuarios:
+                cliente_http = Client(HTTP_HOST=options['host'], raise_request_exception=False)
+                cliente_http.force_login(usuario)
+                clientes_http.append(cliente_http)
+
+            url = reverse('app_kasports:confirmar_pedido')
+            barrera = threading.Barrier(min(options['hilos'], len(clientes_http)))
+
+            def confirmar(cliente_http):
+                try:
+                    try:
+                        barrera.wait(timeout=5)
+                    except threading.BrokenBarrierError:
+                        pass
+                    respuesta = cliente_http.post(url, {'metodo_pago': 'Tarjeta', 'direccion_entrega': 'Prueba'})
+                    return respuesta.status_code
+                finally:
+                    connection.close()
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['hilos']) as ejecutor:
+                estados = Counter(ejecutor.map(confirmar, clientes_http))
+            duracion = time.perf_counter() - inicio
+
+            self.verificar(producto, carritos, options, estados, duracion)
+        finally:
+            self.limpiar(clientes_http)
+
+    def preparar(self, options):
+        proveedor = Proveedor.objects.create(
+            nombre=f'Proveedor {PREFIJO}', direccion='Prueba', telefono='5500000000',
+            correo=f'{PREFIJO}@example.com', rfc_fiscal=RFC_PRUEBA,
+        )
+        producto = Ropa.objects.create(
+            proveedor=proveedor, modelo=f'Producto {PREFIJO}', color='Negro', genero='Unisex',
+            estilo='Prueba', precio=Decimal('100.00'), stock=options['stock'], tallas_disponibles='M',
+        )
+        # Usuarios sin contraseña utilizable: se autentican con force_login
+        contrasena = make_password(None)
+        usuarios = User.objects.bulk_create([
+            User(username=f'{PREFIJO}_{i}', password=contrasena) for i in range(options['clientes'])
+        ])
+        clientes = Cliente.objects.bulk_create([
+            Cliente(user=u, telefono='5500000000', direccion='Prueba') for u in usuarios
+        ])
+        carritos = Carrito.objects.bulk_create([Carrito(cliente=c, estado='Activo') for c in clientes])
+        # Líneas sin reserva previa: todas compiten por el stock al confirmar
+        DetalleCarrito.objects.bulk_create([
+            DetalleCarrito(carrito=c, ropa=producto, cantidad=options['cantidad'],
+                           subtotal=producto.precio * options['cantidad'], talla_seleccionada='M')
+            for c in carritos
+        ])
+        return producto, carritos, usuarios
+
+    def verificar(self, producto, carritos, options, estados, duracion):
+        ventas = Venta.objects.filter(carrito__in=carritos).count()
+        stock = Ropa.objects.get(pk=producto.pk).stock
+        stock_talla = InventarioTalla.objects.get(tipo='ropa', producto_id=producto.pk, talla='M').stock
+        stock_catalogo = ProductoCatalogo.objects.get(tipo='ropa', producto_id=producto.pk).stock
+        vendidas = ventas * options['cantidad']
+
+        self.stdout.write(f'Respuestas HTTP: {dict(estados)} en {duracion:.2f}s')
+        self.stdout.write(f'Ventas: {ventas} ({vendidas} unidades) de {options["stock"]} en stock')
+        self.stdout.write(f'Stock final: producto={stock} talla={stock_talla} catálogo={stock_catalogo}')
+
+        errores = []
+        if vendidas > options['stock']:
+            errores.append(f'Sobreventa: {vendidas} unidades vendidas con {options["stock"]} en stock')
+        if stock < 0 or stock_talla < 0 or stock_catalogo < 0:
+            errores.append('Stock negativo')
+        if stock != options['stock'] - vendidas:
+            errores.append(f'El stock ({stock}) no coincide con las ventas ({vendidas})')
+        if not stock == stock_talla == stock_catalogo:
+            errores.append('El stock del producto, la talla y el catálogo no coinciden')
+        if errores:
+            raise CommandError('; '.join(errores))
+        self.stdout.write(self.style.SUCCESS('Sin sobreventa'))
+
+    def limpiar(self, clientes_http):
+        for cliente_http in clientes_http:
+            cliente_http.logout()
+        # Borrar los usuarios elimina en cascada clientes, carritos y ventas
+        User.objects.filter(username__startswith=f'{PREFIJO}_').delete()
+        Proveedor.objects.filter(rfc_fiscal=RFC_PRUEBA).delete()
@@ -0,0 +1,25 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from app_kasports.catalogo import MODELOS_CATALOGO
+from app_kasports.importacion import FORMATOS, exportar
+
+
+class Command(BaseCommand):
+    help = 'Exporta Ropa, Tenis o Gorras a CSV o JSON Lines (el archivo puede volver a importarse)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', required=True, choices=list(MODELOS_CATALOGO))
+        parser.add_argument('--formato', choices=FORMATOS, default='csv')
+        parser.add_argument('--salida', help='Ruta del archivo; por defecto la salida estándar')
+
+    def handle(self, *args, **options):
+        if not options['salida']:
+            for parte in exportar(options['tipo'], options['formato']):
+                sys.stdout.write(parte)
+            return
+        with open(options['salida'], 'w', encoding='utf-8', newline='') as archivo:
+            for parte in exportar(options['tipo'], options['formato']):
+                archivo.write(parte)
+        self.stdout.write(self.style.SUCCESS(f"Exportado a {options['salida']}"))
@@ -0,0 +1,50 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app_kasports.catalogo import MODELOS_CATALOGO
+from app_kasports.importacion import FORMATOS, TAMANO_LOTE, formato_de, importar
+
+
+class Command(BaseCommand):
+    help = 'Importa Ropa, Tenis o Gorras desde un archivo CSV o JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo a importar')
+        parser.add_argument('--tipo', required=True, choices=list(MODELOS_CATALOGO))
+        parser.add_argument('--formato', choices=FORMATOS, help='Por defecto se deduce de la extensión')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por lote')
+        parser.add_argument('--errores', help='Ruta de un CSV donde guardar las filas con error')
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or formato_de(options['archivo'])
+        inicio = time.perf_counter()
+
+        def al_avanzar(resultado):
+            self.stdout.write(
+                f'  {resultado.filas} filas: {resultado.creados} creadas, '
+                f'{resultado.actualizados} actualizadas, {resultado.total_errores} con error'
+            )
+
+        try:
+            with open(options['archivo'], encoding='utf-8-sig', newline='') as archivo:
+                resultado = importar(archivo, options['tipo'], formato, options['lote'], al_avanzar)
+        except OSError as error:
+            raise CommandError(f'No se pudo leer el archivo: {error}')
+
+        for linea, mensaje in resultado.errores[:20]:
+            self.stdout.write(self.style.ERROR(f'  Línea {linea}: {mensaje}'))
+        if resultado.total_errores > 20:
+            self.stdout.write(f'  ... y {resultado.total_errores - 20} error(es) más')
+        if options['errores']:
+            with open(options['errores'], 'w', encoding='utf-8', newline='') as salida:
+                escritor = csv.writer(salida)
+                escritor.writerow(['linea', 'error'])
+                escritor.writerows(resultado.errores)
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.creados} creados y {resultado.actualizados} actualizados de {resultado.filas} filas '
+            f'en {segundos:.1f} s ({resultado.total_errores} con error)'
+        ))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_kasports.reservas import liberar_expiradas
+
+
+class Command(BaseCommand):
+    help = 'Devuelve al inventario las reservas de stock vencidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=int, default=0,
+                            help='Segundos entre pasadas; si se indica, el comando se queda ejecutando')
+        parser.add_argument('--lote', type=int, default=200, help='Reservas por transacción')
+
+    def handle(self, *args, **options):
+        while True:
+            total = liberar_expiradas(tamano_lote=options['lote'])
+            if total or not options['intervalo']:
+                self.stdout.write(self.style.SUCCESS(f'Reservas liberadas: {total}'))
+            if not options['intervalo']:
+                return
+            time.sleep(options['intervalo'])
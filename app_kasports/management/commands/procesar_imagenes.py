@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app_kasports import imagenes
+
+
+class Command(BaseCommand):
+    help = 'Genera miniaturas y variantes WebP/AVIF de las imágenes ya subidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forzar', action='store_true',
+                            help='Vuelve a generar las variantes aunque ya existan')
+        parser.add_argument('--hilos', type=int, default=4, help='Imágenes que se procesan en paralelo')
+        parser.add_argument('--encolar', action='store_true',
+                            help='En lugar de procesarlas aquí, crea una tarea por imagen para procesar_tareas')
+
+    def handle(self, *args, **options):
+        forzar = options['forzar']
+        if options['encolar']:
+            nombres = imagenes.nombres_existentes() if forzar else imagenes.nombres_sin_variantes()
+            for nombre in nombres:
+                imagenes.encolar(nombre, forzar=forzar)
+            self.stdout.write(self.style.SUCCESS(f'Tareas encoladas: {len(nombres)}'))
+            return
+
+        nombres = imagenes.nombres_existentes()
+        self.stdout.write(
+            f'{len(nombres)} imágenes; anchos {list(imagenes.ANCHOS)}; '
+            f'formatos {imagenes.formatos_soportados()}'
+        )
+
+        def procesar(nombre):
+            try:
+                return nombre, imagenes.procesar(nombre, forzar=forzar)
+            finally:
+                connection.close()
+
+        inicio = time.perf_counter()
+        procesadas = omitidas = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['hilos'])) as grupo:
+            for nombre, registro in grupo.map(procesar, nombres):
+                if registro is None:
+                    omitidas += 1
+                    self.stderr.write(f'  {nombre}: no existe o no es una imagen')
+                else:
+                    procesadas += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Imágenes procesadas: {procesadas}, omitidas: {omitidas} '
+            f'({time.perf_counter() - inicio:.1f} s)'
+        ))
@@ -0,0 +1,47 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from app_kasports import tareas
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta las tareas en segundo plano de la cola (se pueden iniciar varios procesos a la vez)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1, help='Tareas que se reclaman por consulta')
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help='Segundos de espera cuando no hay tareas disponibles')
+        parser.add_argument('--vaciar', action='store_true',
+                            help='Termina en cuanto no quedan tareas disponibles')
+        parser.add_argument('--maximo', type=int, default=None, help='Termina después de ejecutar N tareas')
+        parser.add_argument('--purgar-dias', type=int, default=None,
+                            help='Antes de empezar elimina las tareas completadas hace más de N días')
+
+    def handle(self, *args, **options):
+        detener = []
+
+        def al_recibir_senal(numero, marco):
+            # Termina la tarea en curso y sale
+            detener.append(numero)
+
+        signal.signal(signal.SIGTERM, al_recibir_senal)
+        signal.signal(signal.SIGINT, al_recibir_senal)
+
+        if options['purgar_dias'] is not None:
+            eliminadas = tareas.purgar(options['purgar_dias'])
+            self.stdout.write(f'Tareas completadas eliminadas: {eliminadas}')
+
+        trabajador = tareas.nombre_trabajador()
+        if options['verbosity'] > 1:
+            self.stdout.write(f'Trabajador {trabajador} esperando tareas...')
+        total = tareas.trabajar(
+            trabajador,
+            lote=max(1, options['lote']),
+            intervalo=options['intervalo'],
+            vaciar=options['vaciar'],
+            maximo=options['maximo'],
+            continuar=lambda: not detener,
+        )
+        if options['verbosity'] > 0:
+            self.stdout.write(self.style.SUCCESS(f'Tareas ejecutadas por {trabajador}: {total}'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app_kasports import mas_vendidos
+from app_kasports.catalogo import MODELOS_CATALOGO
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la columna ventas_totales (ranking de más vendidos) desde las líneas de los pedidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true',
+                            help='Solo compara los valores guardados con los calculados, sin escribir')
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            diferencias = self.verificar()
+            if diferencias:
+                raise CommandError(f'{diferencias} producto(s) con ventas_totales desfasado')
+            self.stdout.write(self.style.SUCCESS('El ranking de más vendidos coincide con los pedidos'))
+            return
+
+        for tipo, total in mas_vendidos.recalcular().items():
+            self.stdout.write(f'{tipo}: {total} productos')
+        self.stdout.write(self.style.SUCCESS('Ranking de más vendidos reconstruido'))
+
+    def verificar(self):
+        reales = mas_vendidos.calcular()
+        diferencias = 0
+        for tipo, modelo in MODELOS_CATALOGO.items():
+            for pk, guardado in modelo.objects.values_list('pk', 'ventas_totales').iterator():
+                real = reales.get((tipo, pk), 0)
+                if guardado != real:
+                    diferencias += 1
+                    self.stdout.write(self.style.ERROR(f'{tipo} {pk}: guardado {guardado}, real {real}'))
+        return diferencias
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app_kasports import metricas
+from app_kasports.models import ContadorMetrica, ResumenDiario
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero los contadores y resúmenes diarios del tablero'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true',
+                            help='Solo compara los valores guardados con los calculados, sin escribir')
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            diferencias = self.verificar()
+            if diferencias:
+                raise CommandError(f'{diferencias} diferencia(s) entre las métricas y los datos')
+            self.stdout.write(self.style.SUCCESS('Las métricas coinciden con los datos'))
+            return
+
+        contadores = metricas.reconciliar()
+        for nombre, valor in contadores.items():
+            self.stdout.write(f'{nombre}: {valor}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Métricas reconciliadas ({ResumenDiario.objects.count()} días con ventas)'
+        ))
+
+    def verificar(self):
+        contadores, dias = metricas.calcular()
+        guardados = dict(ContadorMetrica.objects.values_list('nombre', 'valor'))
+        diferencias = 0
+        for nombre, valor in contadores.items():
+            if guardados.get(nombre) != valor:
+                diferencias += 1
+                self.stdout.write(self.style.ERROR(f'{nombre}: guardado {guardados.get(nombre)}, real {valor}'))
+
+        campos = list(metricas.CAMPOS_VENTA) + ['ventas'] + [f'unidades_{t}' for t in metricas.TIPOS]
+        resumenes = {r['fecha']: r for r in ResumenDiario.objects.values('fecha', *campos)}
+        for fecha in sorted(set(dias) | set(resumenes)):
+            real = dias.get(fecha, {})
+            guardado = resumenes.get(fecha, {})
+            for campo in campos:
+                if (real.get(campo) or 0) != (guardado.get(campo) or 0):
+                    diferencias += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'{fecha} {campo}: guardado {guardado.get(campo) or 0}, real {real.get(campo) or 0}'
+                    ))
+        return diferencias
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app_kasports.busqueda import reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de texto completo del catálogo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Entradas por lote')
+
+    def handle(self, *args, **options):
+        total = reconstruir_indice(tamano_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'Índice de búsqueda reconstruido: {total} entradas'))
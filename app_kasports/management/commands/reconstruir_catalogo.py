@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from app_kasports.busqueda import reconstruir_indice
+from app_kasports.catalogo import reconstruir_catalogo, TAMANO_LOTE
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el catálogo unificado (ProductoCatalogo) desde Ropa, Tenis y Gorra'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Tamaño de lote para bulk_create')
+
+    def handle(self, *args, **options):
+        totales = reconstruir_catalogo(tamano_lote=options['lote'])
+        for tipo, total in totales.items():
+            self.stdout.write(f'{tipo}: {total} entradas')
+        self.stdout.write(self.style.SUCCESS(f'Catálogo reconstruido: {sum(totales.values())} productos'))
+        # Los ids del catálogo cambian al reconstruirlo: regenerar también el índice de búsqueda
+        indexadas = reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(f'Índice de búsqueda reconstruido: {indexadas} entradas'))
@@ -0,0 +1,98 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from app_kasports import instrumentacion
+from app_kasports.urls import app_name, urlpatterns
+
+# Vistas sin parámetros que modifican el estado con un GET y no deben recorrerse
+EXCLUIDAS = {'logout', 'confirmar_pedido'}
+
+
+class Command(BaseCommand):
+    help = 'Muestra el reporte de consultas por vista; con --recorrer lo genera visitando las vistas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archivo', help='Reporte JSON (por defecto KASPORTS_REPORTE_CONSULTAS)')
+        parser.add_argument('--recorrer', action='store_true',
+                            help='Visita con GET las vistas sin parámetros y agrega sus mediciones')
+        parser.add_argument('--usuario', action='append', default=[],
+                            help='Usuario con el que se recorre (repetible); sin él se recorre como anónimo')
+        parser.add_argument('--repeticiones', type=int, default=3)
+        parser.add_argument('--host', default='localhost', help='Host permitido por ALLOWED_HOSTS')
+        parser.add_argument('--reiniciar', action='store_true', help='Descarta el reporte anterior')
+        parser.add_argument('--orden', default='consultas_max',
+                            choices=['consultas_max', 'consultas_promedio', 'tiempo_db_ms', 'n1'])
+        parser.add_argument('--detalle', action='store_true', help='Muestra las consultas N+1 y duplicadas')
+        parser.add_argument('--fallar-si-excede', action='store_true',
+                            help='Termina con error si alguna vista excede su presupuesto o tiene N+1')
+
+    def handle(self, *args, **options):
+        ruta = options['archivo'] or getattr(settings, 'KASPORTS_REPORTE_CONSULTAS', None)
+        if not ruta:
+            raise CommandError('Indica --archivo o configura KASPORTS_REPORTE_CONSULTAS')
+        if options['reiniciar']:
+            open(ruta, 'w', encoding='utf-8').write('{}')
+        if options['recorrer']:
+            self.recorrer(options)
+            instrumentacion.reporte.volcar(ruta)
+
+        datos = instrumentacion.cargar_reporte(ruta)
+        if not datos:
+            self.stdout.write('El reporte está vacío')
+            return
+        problemas = self.imprimir(datos, options)
+        if problemas and options['fallar_si_excede']:
+            raise CommandError(f'{problemas} vista(s) exceden su presupuesto o tienen N+1')
+
+    def recorrer(self, options):
+        usuarios = [None] + [User.objects.get(username=u) for u in options['usuario']]
+        nombres = [p.name for p in urlpatterns if p.name and not p.pattern.converters and p.name not in EXCLUIDAS]
+        for usuario in usuarios:
+            cliente = Client(HTTP_HOST=options['host'], raise_request_exception=False)
+            if usuario:
+                cliente.force_login(usuario)
+            for nombre in nombres:
+                url = reverse(f'{app_name}:{nombre}')
+                for _ in range(options['repeticiones']):
+                    registro = instrumentacion.Registro()
+                    inicio = time.perf_counter()
+                    with connection.execute_wrapper(registro):
+                        respuesta = cliente.get(url)
+                    instrumentacion.reporte.agregar(
+                        respuesta.wsgi_request.resolver_match.view_name, registro, time.perf_counter() - inicio
+                    )
+                self.stdout.write(f'  {respuesta.status_code} {url} ({usuario or "anónimo"}): {registro.total} consultas')
+
+    def imprimir(self, datos, options):
+        orden = options['orden']
+        if orden == 'n1':
+            def clave(item):
+                return len(item[1].get('n1', {}))
+        else:
+            def clave(item):
+                return item[1].get(orden, 0)
+
+        self.stdout.write(f'{"Vista":<45} {"Pet.":>5} {"Prom.":>6} {"Máx.":>5} {"Presup.":>7} {"DB ms":>9} {"N+1":>4}')
+        problemas = 0
+        for vista, d in sorted(datos.items(), key=clave, reverse=True):
+            presupuesto = d.get('presupuesto')
+            excede = d.get('excedidas', 0) > 0 or bool(d.get('n1'))
+            problemas += excede
+            db_promedio = d['tiempo_db_ms'] / d['peticiones']
+            linea = (
+                f'{vista:<45} {d["peticiones"]:>5} {d["consultas_promedio"]:>6} {d["consultas_max"]:>5} '
+                f'{"-" if presupuesto is None else presupuesto:>7} {db_promedio:>9.2f} {len(d.get("n1", {})):>4}'
+            )
+            self.stdout.write(self.style.ERROR(linea) if excede else linea)
+            if options['detalle']:
+                for h, veces in d.get('n1', {}).items():
+                    self.stdout.write(f'    N+1 x{veces}: {h[:160]}')
+                for h, veces in d.get('duplicadas', {}).items():
+                    self.stdout.write(f'    duplicada x{veces}: {h[:160]}')
+        return problemas
@@ -0,0 +1,176 @@
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from app_kasports.bench import datos_temporales, sembrar_cliente, sembrar_productos, sembrar_proveedores
+from app_kasports.catalogo import MODELOS_CATALOGO, ORDENES
+from app_kasports.models import Carrito, MensajeContacto, Tarea
+from app_kasports.paginacion import con_desempate, condicion, valores_de
+
+# Consultas que no salen de una vista pero corren en cada petición o ciclo de trabajo
+CONSULTAS_ADICIONALES = [
+    ('carrito activo del cliente', lambda c: Carrito.objects.filter(cliente=c, estado='Activo')),
+    ('mensajes sin leer', lambda c: MensajeContacto.objects.filter(leido=False).values('id')),
+    ('cola de tareas', lambda c: Tarea.objects.filter(
+        estado=Tarea.PENDIENTE, disponible_en__lte=timezone.now(),
+    ).order_by('-prioridad', 'disponible_en', 'id')[:10]),
+]
+
+# Listados de la tienda con cada `?orden=`: primera página y la siguiente (por cursor)
+POR_PAGINA_LISTADO = 9
+
+# Alias de Django en subconsultas ("app_kasports_ropa" U0)
+_RE_ALIAS = re.compile(r'"(\w+)"\s+(?:AS\s+)?"?([A-Z]\d+)"?\b')
+_RE_SCAN_SQLITE = re.compile(r'^SCAN (\w+)$')
+_RE_SCAN_POSTGRES = re.compile(r'Seq Scan on (\w+)')
+_RE_ORDEN_SQLITE = re.compile(r'USE TEMP B-TREE FOR (?:RIGHT PART OF )?ORDER BY')
+_RE_ORDEN_POSTGRES = re.compile(r'^\s*(?:->\s*)?Sort\b')
+
+
+def tamanos_tablas():
+    """{tabla: filas} de los modelos instalados."""
+    return {m._meta.db_table: m._default_manager.count() for m in apps.get_models() if m._meta.managed}
+
+
+def plan(sql):
+    """Líneas del plan de ejecución de una consulta ya interpolada."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [fila[-1] for fila in cursor.fetchall()]
+        cursor.execute('EXPLAIN ' + sql)
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def recorridos_completos(sql, lineas):
+    """Tablas que el plan recorre completas (sin índice)."""
+    alias = dict((a, t) for t, a in _RE_ALIAS.findall(sql))
+    tablas = []
+    for linea in lineas:
+        if connection.vendor == 'sqlite':
+            coincidencia = _RE_SCAN_SQLITE.match(linea.strip())
+        else:
+            coincidencia = _RE_SCAN_POSTGRES.search(linea)
+        if coincidencia:
+            tablas.append(alias.get(coincidencia.group(1), coincidencia.group(1)))
+    return tablas
+
+
+def ordena_sin_indice(lineas):
+    """True si el plan ordena las filas aparte en lugar de leerlas en el orden de un índice."""
+    patron = _RE_ORDEN_SQLITE if connection.vendor == 'sqlite' else _RE_ORDEN_POSTGRES
+    return any(patron.search(linea) for linea in lineas)
+
+
+def consultas_de_orden():
+    """[(origen, tabla, queryset)] de cada listado con cada orden, en la forma en que los pagina `paginar()`."""
+    consultas = []
+    for tipo, modelo in MODELOS_CATALOGO.items():
+        base = modelo.objects.filter(stock__gt=0).prefetch_related('proveedor')
+        for clave, (_, campos) in ORDENES.items():
+            orden = con_desempate(campos)
+            primera = base.order_by(*orden)[:POR_PAGINA_LISTADO + 1]
+            consultas.append((f'{tipo} orden={clave}', modelo._meta.db_table, primera))
+            frontera = list(primera[:1])
+            if frontera:
+                siguiente = base.filter(condicion(orden, valores_de(frontera[0], orden))).order_by(*orden)
+                consultas.append((f'{tipo} orden={clave} (cursor)', modelo._meta.db_table,
+                                  siguiente[:POR_PAGINA_LISTADO + 1]))
+    return consultas
+
+
+class Command(BaseCommand):
+    help = ('Ejecuta EXPLAIN sobre las consultas de las vistas principales y falla si alguna '
+            'recorre completa una tabla con más filas que el umbral o si un orden de los listados '
+            'de la tienda no sale de un índice')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--umbral', type=int, default=1000,
+                            help='Filas a partir de las cuales un recorrido completo es un error')
+        parser.add_argument('--sembrar', type=int, default=0,
+                            help='Productos sintéticos por tipo (se revierten al terminar) para revisar '
+                                 'los planes con tablas grandes')
+        parser.add_argument('--analizar', action='store_true',
+                            help='Ejecuta ANALYZE antes (planes con estadísticas de la distribución actual)')
+        parser.add_argument('--mostrar', action='store_true', help='Imprime el plan de cada consulta')
+
+    def handle(self, *args, **options):
+        with datos_temporales():
+            if options['sembrar']:
+                proveedores = sembrar_proveedores()
+                for tipo in ('ropa', 'tenis', 'gorra'):
+                    sembrar_productos(options['sembrar'], tipo=tipo, proveedores=proveedores)
+            if options['analizar']:
+                # Estadísticas para el planificador (dentro de la transacción que se revierte)
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            consultas = self.capturar()
+            tamanos = tamanos_tablas()
+            ordenadas = []
+            for origen, tabla, queryset in consultas_de_orden():
+                with CaptureQueriesContext(connection) as capturadas:
+                    list(queryset)
+                ordenadas += [(origen, tabla, c['sql']) for c in capturadas.captured_queries]
+                consultas += [(origen, c['sql']) for c in capturadas.captured_queries]
+
+            problemas = []
+            vistos = set()
+            for origen, sql in consultas:
+                if not sql.lstrip().upper().startswith('SELECT') or sql in vistos:
+                    continue
+                vistos.add(sql)
+                lineas = plan(sql)
+                completas = [t for t in recorridos_completos(sql, lineas) if tamanos.get(t, 0) > options['umbral']]
+                if options['mostrar'] or completas:
+                    self.stdout.write(f'\n[{origen}] {sql[:300]}')
+                    for linea in lineas:
+                        self.stdout.write(f'    {linea}')
+                for tabla in completas:
+                    problemas.append(f'{origen}: recorrido completo de {tabla} ({tamanos[tabla]} filas)')
+
+            # Cada orden de los listados debe leerse de su índice, sin un paso de ordenamiento.
+            # SQLite lo decide igual con cualquier tamaño de tabla; PostgreSQL puede ordenar
+            # tablas pequeñas en memoria, así que ahí solo cuenta por encima del umbral
+            for origen, tabla, sql in ordenadas:
+                if not ordena_sin_indice(plan(sql)):
+                    continue
+                if connection.vendor == 'sqlite' or tamanos.get(tabla, 0) > options['umbral']:
+                    problemas.append(f'{origen}: ordena {tabla} sin índice')
+
+        self.stdout.write(f'\n{len(vistos)} consultas revisadas')
+        if problemas:
+            raise CommandError('Consultas sin índice adecuado:\n  ' + '\n  '.join(problemas))
+        self.stdout.write(self.style.SUCCESS(f"Sin recorridos completos en tablas de más de {options['umbral']} filas"))
+
+    def capturar(self):
+        """(origen, sql) de las vistas con presupuesto de consultas y de `CONSULTAS_ADICIONALES`."""
+        cliente = sembrar_cliente('verificar_planes')
+        administrador = User.objects.filter(administrador__isnull=False).first()
+        consultas = []
+        for vista in getattr(settings, 'KASPORTS_PRESUPUESTO_CONSULTAS', {}):
+            usuario = administrador if vista.endswith('_admin') else cliente.user
+            if usuario is None:
+                self.stderr.write(f'Se omite {vista}: no hay administradores')
+                continue
+            # Con sesión iniciada para no leer la página de la caché de anónimos
+            http = Client()
+            http.force_login(usuario)
+            with CaptureQueriesContext(connection) as capturadas:
+                respuesta = http.get(reverse(vista))
+            if respuesta.status_code != 200:
+                self.stderr.write(f'{vista} respondió {respuesta.status_code}')
+            consultas += [(vista, c['sql']) for c in capturadas.captured_queries]
+        for nombre, consulta in CONSULTAS_ADICIONALES:
+            queryset = consulta(cliente)
+            with CaptureQueriesContext(connection) as capturadas:
+                list(queryset)
+            consultas += [(nombre, c['sql']) for c in capturadas.captured_queries]
+        return consultas
@@ -0,0 +1,68 @@
+"""Ranking de más vendidos: columna `ventas_totales` de Ropa, Tenis y Gorra.
+
+Son las unidades de las líneas (`LineaPedido`) de los pedidos no cancelados.
+Se ajusta con `UPDATE ... SET ventas_totales = ventas_totales + n` al confirmar
+un pedido y cuando una venta entra o sale del estado 'Cancelado' o se borra
+(ver signals.py), así que ordenar por más vendidos es recorrer un índice.
+`recalcular()` (o `python manage.py recalcular_mas_vendidos`) la reconstruye
+desde las líneas.
+"""
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from . import cache_tienda
+from .catalogo import MODELOS_CATALOGO
+from .models import LineaPedido
+
+CANCELADO = 'Cancelado'
+
+
+def cuenta(venta):
+    """True si las unidades de la venta forman parte del ranking."""
+    return venta.estado != CANCELADO
+
+
+def unidades_por_producto(lineas):
+    """{(tipo, producto_id): unidades} de un queryset de `LineaPedido`."""
+    filas = (
+        lineas.filter(tipo__in=list(MODELOS_CATALOGO), producto_id__isnull=False)
+        .values('tipo', 'producto_id').annotate(unidades=Sum('cantidad')).order_by()
+    )
+    return {(f['tipo'], f['producto_id']): f['unidades'] for f in filas}
+
+
+def sumar_venta(venta, signo=1):
+    """Suma (o resta con `signo=-1`) las unidades de la venta a sus productos.
+
+    Un solo UPDATE por tipo, sin importar cuántas líneas tenga el pedido.
+    """
+    por_tipo = {}
+    for (tipo, producto_id), unidades in unidades_por_producto(LineaPedido.objects.filter(venta=venta)).items():
+        por_tipo.setdefault(tipo, {})[producto_id] = signo * unidades
+    for tipo, unidades in por_tipo.items():
+        MODELOS_CATALOGO[tipo].objects.filter(pk__in=list(unidades)).update(ventas_totales=F('ventas_totales') + Case(
+            *[When(pk=pk, then=Value(n)) for pk, n in unidades.items()], output_field=IntegerField(),
+        ))
+        cache_tienda.invalidar_productos(tipo, list(unidades))
+
+
+def _vendidas(tipo):
+    """Subconsulta con las unidades vendidas del producto de la fila externa."""
+    return (
+        LineaPedido.objects.filter(tipo=tipo, producto_id=OuterRef('pk')).exclude(venta__estado=CANCELADO)
+        .values('producto_id').annotate(unidades=Sum('cantidad')).values('unidades')
+    )
+
+
+def calcular():
+    """{(tipo, producto_id): unidades} de todos los pedidos no cancelados."""
+    return unidades_por_producto(LineaPedido.objects.exclude(venta__estado=CANCELADO))
+
+
+def recalcular():
+    """Reconstruye `ventas_totales` con un UPDATE por tipo. Devuelve {tipo: productos actualizados}."""
+    actualizados = {}
+    for tipo, modelo in MODELOS_CATALOGO.items():
+        actualizados[tipo] = modelo.objects.update(ventas_totales=Coalesce(Subquery(_vendidas(tipo)), Value(0)))
+        cache_tienda.invalidar('catalogo', f'tabla:{tipo}')
+    return actualizados
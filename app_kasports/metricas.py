@@ -0,0 +1,210 @@
+"""Métricas del tablero del administrador.
+
+Los totales (clientes, productos, ventas, ingresos, unidades vendidas por
+categoría, mensajes sin leer) se guardan en `ContadorMetrica` y los totales
+por día en `ResumenDiario`. `signals.py` los ajusta de forma incremental con
+`UPDATE ... SET valor = valor + delta` dentro de la misma transacción que
+modifica los datos, así que el tablero lee siempre un número fijo de filas.
+
+`reconciliar()` (o `python manage.py reconciliar_metricas`) los reconstruye
+desde cero; se ejecuta sola la primera vez que el tablero encuentra los
+contadores vacíos.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DateTimeField, DecimalField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .catalogo import MODELOS_CATALOGO
+from .models import Cliente, ContadorMetrica, DetalleCarrito, MensajeContacto, ResumenDiario, Venta
+from .tareas import PRIORIDAD_BAJA, tarea
+
+TIPOS = tuple(MODELOS_CATALOGO)
+CONTADORES = (
+    'clientes', 'productos', 'ventas', 'ingresos', 'impuesto', 'envio', 'mensajes_sin_leer',
+) + tuple(f'unidades_{tipo}' for tipo in TIPOS)
+
+# Campos de `ResumenDiario` que se acumulan por venta
+CAMPOS_VENTA = {'ingresos': 'total', 'impuesto': 'impuesto', 'envio': 'costo_envio'}
+
+
+# ============================================
+# ACTUALIZACIÓN INCREMENTAL
+# ============================================
+
+def sumar(**deltas):
+    """Suma los deltas a los contadores con un solo `UPDATE ... CASE`.
+
+    Si un contador aún no existe no se crea desde cero (quedaría desfasado):
+    la siguiente reconciliación lo generará con el valor correcto.
+    """
+    deltas = {nombre: delta for nombre, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    ContadorMetrica.objects.filter(nombre__in=deltas).update(
+        valor=F('valor') + Case(
+            *[When(nombre=nombre, then=Value(delta)) for nombre, delta in deltas.items()],
+            output_field=DecimalField(),
+        ),
+        fecha_actualizacion=timezone.now(),
+    )
+
+
+def sumar_dia(fecha, **deltas):
+    """Suma los deltas al resumen del día indicado (datetime o date)."""
+    deltas = {campo: delta for campo, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if hasattr(fecha, 'hour'):
+        fecha = timezone.localdate(fecha)
+    ResumenDiario.objects.get_or_create(fecha=fecha)
+    ResumenDiario.objects.filter(fecha=fecha).update(**{c: F(c) + d for c, d in deltas.items()})
+
+
+def unidades_de_carrito(carrito_id, signo=1):
+    """{'unidades_ropa': n, ...} de las líneas de un carrito en una sola consulta."""
+    totales = DetalleCarrito.objects.filter(carrito_id=carrito_id).aggregate(**{
+        f'unidades_{tipo}': Sum('cantidad', filter=Q(**{f'{tipo}__isnull': False})) for tipo in TIPOS
+    })
+    return {campo: signo * (valor or 0) for campo, valor in totales.items()}
+
+
+def fecha_primera_venta(carrito_id, excluir=None):
+    """Fecha de la primera venta del carrito (a ella se atribuyen sus unidades) o None."""
+    ventas = Venta.objects.filter(carrito_id=carrito_id)
+    if excluir is not None:
+        ventas = ventas.exclude(pk=excluir)
+    return ventas.order_by('fecha_venta').values_list('fecha_venta', flat=True).first()
+
+
+def registrar_venta(venta, signo=1, con_unidades=True):
+    """Suma (o resta con `signo=-1`) una venta a los contadores y a su día."""
+    importes = {campo: signo * getattr(venta, origen) for campo, origen in CAMPOS_VENTA.items()}
+    unidades = {}
+    # Las unidades de un carrito se cuentan una sola vez aunque tenga más de una venta
+    if con_unidades and fecha_primera_venta(venta.carrito_id, excluir=venta.pk) is None:
+        unidades = unidades_de_carrito(venta.carrito_id, signo)
+    sumar(ventas=signo, **importes, **unidades)
+    sumar_dia(venta.fecha_venta, ventas=signo, **importes, **unidades)
+
+
+def ajustar_venta(venta, previos):
+    """Aplica la diferencia de importes al editar una venta existente."""
+    deltas = {campo: getattr(venta, origen) - previos[origen] for campo, origen in CAMPOS_VENTA.items()}
+    sumar(**deltas)
+    sumar_dia(venta.fecha_venta, **deltas)
+
+
+def ajustar_unidades(carrito_id, tipo, cantidad):
+    """Suma `cantidad` unidades de `tipo` si el carrito ya se vendió."""
+    if not tipo or not cantidad:
+        return
+    fecha = fecha_primera_venta(carrito_id)
+    if fecha is not None:
+        sumar(**{f'unidades_{tipo}': cantidad})
+        sumar_dia(fecha, **{f'unidades_{tipo}': cantidad})
+
+
+# ============================================
+# RECONCILIACIÓN
+# ============================================
+
+def calcular():
+    """Calcula contadores y resúmenes diarios desde las tablas de origen.
+
+    Devuelve (contadores, {fecha: {campo: valor}}).
+    """
+    contadores = dict.fromkeys(CONTADORES, 0)
+    contadores['clientes'] = Cliente.objects.count()
+    contadores['productos'] = sum(modelo.objects.count() for modelo in MODELOS_CATALOGO.values())
+    contadores['mensajes_sin_leer'] = MensajeContacto.objects.filter(leido=False).count()
+
+    dias = {}
+    por_dia = (
+        Venta.objects.annotate(dia=TruncDate('fecha_venta')).values('dia')
+        .annotate(ventas=Count('id'), **{c: Sum(o) for c, o in CAMPOS_VENTA.items()})
+    )
+    for fila in por_dia:
+        dias[fila.pop('dia')] = fila
+
+    primera_venta = Venta.objects.filter(carrito=OuterRef('carrito')).order_by('fecha_venta').values('fecha_venta')[:1]
+    unidades_por_dia = (
+        DetalleCarrito.objects.annotate(vendida=Subquery(primera_venta, output_field=DateTimeField()))
+        .filter(vendida__isnull=False)
+        .annotate(dia=TruncDate('vendida')).values('dia')
+        .annotate(**{
+            f'unidades_{tipo}': Sum('cantidad', filter=Q(**{f'{tipo}__isnull': False})) for tipo in TIPOS
+        })
+    )
+    for fila in unidades_por_dia:
+        dias.setdefault(fila.pop('dia'), {}).update({c: v or 0 for c, v in fila.items()})
+
+    centavos = Decimal('0.01')
+    for fila in dias.values():
+        for campo, valor in fila.items():
+            if campo in CAMPOS_VENTA:
+                fila[campo] = valor = Decimal(valor or 0).quantize(centavos)
+            contadores[campo] += valor or 0
+    return contadores, dias
+
+
+@tarea(prioridad=PRIORIDAD_BAJA, max_intentos=1)
+def reconciliar():
+    """Reconstruye contadores y resúmenes diarios. Devuelve los contadores calculados.
+
+    También puede encolarse desde el panel de tareas.
+    """
+    with transaction.atomic():
+        contadores, dias = calcular()
+        ContadorMetrica.objects.all().delete()
+        ContadorMetrica.objects.bulk_create([
+            ContadorMetrica(nombre=nombre, valor=valor) for nombre, valor in contadores.items()
+        ])
+        ResumenDiario.objects.all().delete()
+        ResumenDiario.objects.bulk_create([
+            ResumenDiario(fecha=fecha, **{c: v or 0 for c, v in fila.items()}) for fecha, fila in dias.items()
+        ], batch_size=500)
+    return contadores
+
+
+# ============================================
+# LECTURA
+# ============================================
+
+def contadores():
+    """{nombre: valor} de todos los contadores; reconcilia si faltan."""
+    valores = dict(ContadorMetrica.objects.values_list('nombre', 'valor'))
+    if len(valores) < len(CONTADORES):
+        valores = reconciliar()
+    return {nombre: Decimal(valor) for nombre, valor in valores.items()}
+
+
+def serie_diaria(dias=30):
+    """Resumen de los últimos `dias` días (incluye los días sin ventas) con el % de barra."""
+    hoy = timezone.localdate()
+    inicio = hoy - timedelta(days=dias - 1)
+    guardados = {r.fecha: r for r in ResumenDiario.objects.filter(fecha__gte=inicio, fecha__lte=hoy)}
+    serie = []
+    for i in range(dias):
+        fecha = inicio + timedelta(days=i)
+        serie.append(guardados.get(fecha) or ResumenDiario(fecha=fecha))
+    maximo = max((r.ingresos for r in serie), default=0)
+    for resumen in serie:
+        resumen.porcentaje = round(resumen.ingresos * 100 / maximo, 1) if maximo else 0
+    return serie
+
+
+def tablero(dias=30):
+    """Datos del tablero: contadores y serie diaria (lecturas de tamaño fijo)."""
+    valores = contadores()
+    serie = serie_diaria(dias)
+    return {
+        'contadores': valores,
+        'serie': serie,
+        'ingresos_periodo': sum((r.ingresos for r in serie), Decimal('0')),
+        'ventas_periodo': sum(r.ventas for r in serie),
+        'unidades': [(tipo, int(valores.get(f'unidades_{tipo}', 0))) for tipo in TIPOS],
+    }
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def poblar_catalogo(apps, schema_editor):
+    """Crea las entradas de catálogo para los productos existentes."""
+    ProductoCatalogo = apps.get_model('app_kasports', 'ProductoCatalogo')
+    entradas = []
+    for tipo, nombre_modelo in (('ropa', 'Ropa'), ('tenis', 'Tenis'), ('gorra', 'Gorra')):
+        modelo = apps.get_model('app_kasports', nombre_modelo)
+        for p in modelo.objects.select_related('proveedor').iterator():
+            entradas.append(ProductoCatalogo(
+                tipo=tipo,
+                producto_id=p.pk,
+                proveedor_id=p.proveedor_id,
+                proveedor_nombre=p.proveedor.nombre,
+                modelo=p.modelo,
+                color=p.color,
+                genero=p.genero,
+                estilo=getattr(p, 'estilo', '') or '',
+                coleccion=getattr(p, 'coleccion', '') or '',
+                silueta=getattr(p, 'silueta', '') or '',
+                visera=getattr(p, 'visera', '') or '',
+                broche=getattr(p, 'broche', '') or '',
+                precio=p.precio,
+                stock=p.stock,
+                tallas_disponibles=p.tallas_disponibles,
+                imagen=p.imagen.name if p.imagen else None,
+            ))
+    ProductoCatalogo.objects.bulk_create(entradas, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_kasports', '0003_remove_gorra_talla_remove_ropa_talla_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductoCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('ropa', 'Ropa'), ('tenis', 'Tenis'), ('gorra', 'Gorra')], max_length=10)),
+                ('producto_id', models.PositiveBigIntegerField()),
+                ('proveedor_nombre', models.CharField(max_length=200)),
+                ('modelo', models.CharField(max_length=200)),
+                ('color', models.CharField(max_length=100)),
+                ('genero', models.CharField(max_length=20)),
+                ('estilo', models.CharField(blank=True, default='', max_length=100)),
+                ('coleccion', models.CharField(blank=True, default='', max_length=200)),
+                ('silueta', models.CharField(blank=True, default='', max_length=100)),
+                ('visera', models.CharField(blank=True, default='', max_length=100)),
+                ('broche', models.CharField(blank=True, default='', max_length=100)),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('stock', models.IntegerField()),
+                ('tallas_disponibles', models.TextField(blank=True, null=True)),
+                ('imagen', models.ImageField(blank=True, null=True, upload_to='')),
+                ('proveedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='productos_catalogo', to='app_kasports.proveedor')),
+            ],
+            options={
+                'verbose_name': 'Producto de Catálogo',
+                'verbose_name_plural': 'Catálogo de Productos',
+                'indexes': [models.Index(fields=['tipo', '-precio'], name='catalogo_tipo_precio_idx'), models.Index(fields=['-precio'], name='catalogo_precio_idx'), models.Index(fields=['genero'], name='catalogo_genero_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productocatalogo',
+            constraint=models.UniqueConstraint(fields=('tipo', 'producto_id'), name='catalogo_tipo_producto_unico'),
+        ),
+        migrations.RunPython(poblar_catalogo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.30 on 2026-10-17 01:59
+
+import unicodedata
+
+from django.db import migrations, models
+
+TABLA_FTS = 'app_kasports_busqueda_fts'
+
+
+def _normalizar(texto):
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def crear_indice(apps, schema_editor):
+    """Crea el índice de texto completo según el motor y lo llena."""
+    ProductoCatalogo = apps.get_model('app_kasports', 'ProductoCatalogo')
+    vendor = schema_editor.connection.vendor
+    columnas = ('modelo', 'color', 'estilo', 'coleccion', 'silueta', 'proveedor_nombre')
+
+    entradas = list(ProductoCatalogo.objects.all())
+    for e in entradas:
+        e.texto_busqueda = ' '.join(_normalizar(getattr(e, c)) for c in columnas if getattr(e, c))
+    ProductoCatalogo.objects.bulk_update(entradas, ['texto_busqueda'], batch_size=500)
+
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5("
+            "modelo, color, estilo, coleccion, silueta, proveedor, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        for e in entradas:
+            schema_editor.execute(
+                f"INSERT INTO {TABLA_FTS} (rowid, modelo, color, estilo, coleccion, silueta, proveedor) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                [e.pk] + [_normalizar(getattr(e, c)) for c in columnas],
+            )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS catalogo_busqueda_gin ON app_kasports_productocatalogo "
+            "USING gin (to_tsvector('simple'::regconfig, COALESCE(texto_busqueda, '')))"
+        )
+
+
+def eliminar_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLA_FTS}")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS catalogo_busqueda_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_kasports', '0004_productocatalogo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productocatalogo',
+            name='texto_busqueda',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:01
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def poblar_inventario(apps, schema_editor):
+    """Reparte el stock actual de cada producto entre las tallas de su CSV."""
+    InventarioTalla = apps.get_model('app_kasports', 'InventarioTalla')
+    filas = []
+    for tipo, nombre_modelo in (('ropa', 'Ropa'), ('tenis', 'Tenis'), ('gorra', 'Gorra')):
+        modelo = apps.get_model('app_kasports', nombre_modelo)
+        for producto in modelo.objects.iterator():
+            tallas = []
+            for parte in (producto.tallas_disponibles or '').split(','):
+                talla = parte.strip()[:20]
+                if talla and talla not in tallas:
+                    tallas.append(talla)
+            if not tallas:
+                continue
+            base, resto = divmod(max(producto.stock, 0), len(tallas))
+            for i, talla in enumerate(tallas):
+                filas.append(InventarioTalla(
+                    tipo=tipo,
+                    producto_id=producto.pk,
+                    talla=talla,
+                    stock=base + (1 if i < resto else 0),
+                ))
+    InventarioTalla.objects.bulk_create(filas, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_kasports', '0005_busqueda_texto_completo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventarioTalla',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('ropa', 'Ropa'), ('tenis', 'Tenis'), ('gorra', 'Gorra')], max_length=10)),
+                ('producto_id', models.PositiveBigIntegerField()),
+                ('talla', models.CharField(max_length=20)),
+                ('stock', models.IntegerField(default=0, validators=[django.core.validators.MinValueValidator(0)])),
+            ],
+            options={
+                'verbose_name': 'Inventario por Talla',
+                'verbose_name_plural': 'Inventario por Talla',
+                'indexes': [models.Index(fields=['tipo', 'talla', 'stock'], name='inventario_tipo_talla_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='inventariotalla',
+            constraint=models.UniqueConstraint(fields=('tipo', 'producto_id', 'talla'), name='inventario_talla_unico'),
+        ),
+        migrations.RunPython(poblar_inventario, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_kasports', '0006_inventariotalla'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('ropa', 'Ropa'), ('tenis', 'Tenis'), ('gorra', 'Gorra')], max_length=10)),
+                ('producto_id', models.PositiveBigIntegerField()),
+                ('talla', models.CharField(blank=True, max_length=20, null=True)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('expira', models.DateTimeField(db_index=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('detalle', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reserva', to='app_kasports.detallecarrito')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Stock',
+                'verbose_name_plural': 'Reservas de Stock',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_kasports', '0007_reservastock'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carrito',
+            index=models.Index(fields=['-fecha_creacion', '-id'], name='carrito_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mensajecontacto',
+            index=models.Index(fields=['-fecha_envio', '-id'], name='mensaje_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['-fecha_venta', '-id'], name='venta_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['cliente', '-fecha_venta', '-id'], name='venta_cliente_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_kasports', '0008_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorMetrica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Contador de Métrica',
+                'verbose_name_plural': 'Contadores de Métricas',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('ventas', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('impuesto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('envio', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('unidades_ropa', models.IntegerField(default=0)),
+                ('unidades_tenis', models.IntegerField(default=0)),
+                ('unidades_gorra', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario',
+                'verbose_name_plural': 'Resúmenes Diarios',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
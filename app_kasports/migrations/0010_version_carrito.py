@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_kasports', '0009_metricas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carrito',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
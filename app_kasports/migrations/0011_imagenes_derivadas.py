@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_kasports', '0010_version_carrito'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImagenDerivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original', models.CharField(max_length=255, unique=True)),
+                ('huella', models.CharField(db_index=True, max_length=64)),
+                ('ancho', models.PositiveIntegerField()),
+                ('alto', models.PositiveIntegerField()),
+                ('anchos', models.CharField(max_length=100)),
+                ('formatos', models.CharField(max_length=50)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Imagen Derivada',
+                'verbose_name_plural': 'Imágenes Derivadas',
+            },
+        ),
+    ]
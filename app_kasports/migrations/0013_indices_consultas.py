@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:49
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max
+
+
+def unificar_carritos_activos(apps, schema_editor):
+    """Deja un solo carrito activo por cliente: las líneas de los demás pasan al más reciente."""
+    Carrito = apps.get_model('app_kasports', 'Carrito')
+    DetalleCarrito = apps.get_model('app_kasports', 'DetalleCarrito')
+    duplicados = (
+        Carrito.objects.filter(estado='Activo').values('cliente_id')
+        .annotate(total=Count('id'), ultimo=Max('id')).filter(total__gt=1)
+    )
+    for fila in duplicados:
+        otros = list(
+            Carrito.objects.filter(cliente_id=fila['cliente_id'], estado='Activo')
+            .exclude(pk=fila['ultimo']).values_list('pk', flat=True)
+        )
+        DetalleCarrito.objects.filter(carrito_id__in=otros).update(carrito_id=fila['ultimo'])
+        Carrito.objects.filter(pk__in=otros).update(estado='Cancelado')
+        Carrito.objects.filter(pk=fila['ultimo']).update(version=F('version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_kasports', '0012_tareas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gorra',
+            index=models.Index(condition=models.Q(('stock__gt', 0)), fields=['id'], name='gorra_en_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mensajecontacto',
+            index=models.Index(condition=models.Q(('leido', False)), fields=['-fecha_envio'], name='mensaje_sin_leer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productocatalogo',
+            index=models.Index(condition=models.Q(('stock__gt', 0)), fields=['tipo', '-precio', 'id'], name='catalogo_stock_precio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ropa',
+            index=models.Index(condition=models.Q(('stock__gt', 0)), fields=['id'], name='ropa_en_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tenis',
+            index=models.Index(condition=models.Q(('stock__gt', 0)), fields=['id'], name='tenis_en_stock_idx'),
+        ),
+        migrations.RunPython(unificar_carritos_activos, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='carrito',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado', 'Activo')), fields=('cliente',), name='carrito_activo_unico'),
+        ),
+    ]
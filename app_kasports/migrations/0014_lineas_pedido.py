@@ -0,0 +1,81 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:00
+
+from decimal import Decimal
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+TAMANO_LOTE = 500
+
+
+def copiar_lineas(apps, schema_editor):
+    """Crea las líneas de las ventas existentes a partir de las líneas de su carrito."""
+    Venta = apps.get_model('app_kasports', 'Venta')
+    DetalleCarrito = apps.get_model('app_kasports', 'DetalleCarrito')
+    LineaPedido = apps.get_model('app_kasports', 'LineaPedido')
+    ventas = list(Venta.objects.order_by('pk').values_list('pk', 'carrito_id'))
+    for inicio in range(0, len(ventas), TAMANO_LOTE):
+        lote = dict(ventas[inicio:inicio + TAMANO_LOTE])
+        por_carrito = {}
+        for venta_id, carrito_id in lote.items():
+            por_carrito.setdefault(carrito_id, []).append(venta_id)
+        detalles = (
+            DetalleCarrito.objects.filter(carrito_id__in=por_carrito)
+            .select_related('ropa', 'tenis', 'gorra').order_by('pk')
+        )
+        lineas = []
+        for detalle in detalles:
+            tipo, producto = next(
+                ((t, getattr(detalle, t)) for t in ('ropa', 'tenis', 'gorra') if getattr(detalle, f'{t}_id')),
+                ('', None),
+            )
+            for venta_id in por_carrito[detalle.carrito_id]:
+                lineas.append(LineaPedido(
+                    venta_id=venta_id,
+                    tipo=tipo,
+                    producto_id=producto.pk if producto else None,
+                    nombre=f'{producto.modelo} - {producto.color}' if producto else '',
+                    talla=detalle.talla_seleccionada or '',
+                    precio_unitario=(detalle.subtotal / (detalle.cantidad or 1)).quantize(Decimal('0.01')),
+                    cantidad=detalle.cantidad,
+                    subtotal=detalle.subtotal,
+                    imagen=producto.imagen.name if producto and producto.imagen else '',
+                ))
+        LineaPedido.objects.bulk_create(lineas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_kasports', '0013_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='descuento',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='LineaPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=10)),
+                ('producto_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('nombre', models.CharField(max_length=255)),
+                ('talla', models.CharField(blank=True, max_length=20)),
+                ('precio_unitario', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('subtotal', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('imagen', models.CharField(blank=True, max_length=255)),
+                ('venta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='app_kasports.venta')),
+            ],
+            options={
+                'verbose_name': 'Línea de Pedido',
+                'verbose_name_plural': 'Líneas de Pedido',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['venta', 'id'], name='linea_pedido_venta_idx')],
+            },
+        ),
+        migrations.RunPython(copiar_lineas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:30
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def calcular_ventas_totales(apps, schema_editor):
+    """Unidades vendidas por producto a partir de las líneas de los pedidos no cancelados."""
+    LineaPedido = apps.get_model('app_kasports', 'LineaPedido')
+    for tipo, nombre in (('ropa', 'Ropa'), ('tenis', 'Tenis'), ('gorra', 'Gorra')):
+        vendidas = (
+            LineaPedido.objects.filter(tipo=tipo, producto_id=OuterRef('pk')).exclude(venta__estado='Cancelado')
+            .values('producto_id').annotate(unidades=Sum('cantidad')).values('unidades')
+        )
+        apps.get_model('app_kasports', nombre).objects.update(
+            ventas_totales=Coalesce(Subquery(vendidas), Value(0)),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_kasports', '0014_lineas_pedido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gorra',
+            name='ventas_totales',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='ropa',
+            name='ventas_totales',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tenis',
+            name='ventas_totales',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='gorra',
+            index=models.Index(condition=models.Q(('stock__gt', 0)), fields=['precio', 'id'], name='gorra_stock_precio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gorra',
+            index=models.Index(condition=models.Q(('stock__gt', 0)), fields=['ventas_totales', 'id'], name='gorra_stock_vendidos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gorra',
+            index=models.Index(condition=models.Q(('stock__gt', 0)), fields=['stock', 'id'], name='gorra_stock_cantidad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ropa',
+            index=models.Index(condition=models.Q(('stock__gt', 0)), fields=['precio', 'id'], name='ropa_stock_precio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ropa',
+            index=models.Index(condition=models.Q(('stock__gt', 0)), fields=['ventas_totales', 'id'], name='ropa_stock_vendidos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ropa',
+            index=models.Index(condition=models.Q(('stock__gt', 0)), fields=['stock', 'id'], name='ropa_stock_cantidad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tenis',
+            index=models.Index(condition=models.Q(('stock__gt', 0)), fields=['precio', 'id'], name='tenis_stock_precio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tenis',
+            index=models.Index(condition=models.Q(('stock__gt', 0)), fields=['ventas_totales', 'id'], name='tenis_stock_vendidos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tenis',
+            index=models.Index(condition=models.Q(('stock__gt', 0)), fields=['stock', 'id'], name='tenis_stock_cantidad_idx'),
+        ),
+        migrations.RunPython(calcular_ventas_totales, migrations.RunPython.noop),
+    ]
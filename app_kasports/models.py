@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
 
 class Cliente(models.Model):
@@ -75,6 +76,8 @@ class Ropa(models.Model):
     # Lista de tallas disponibles para este modelo, separadas por comas.
     # Ejemplo: "XS,S,M,L,XL" o para tenis: "8,8.5,9,9.5"
     tallas_disponibles = models.TextField(null=True, blank=True, help_text='Separar tallas con comas. Ej: XS,S,M,L')
+    # Unidades vendidas en pedidos no cancelados; la mantiene mas_vendidos.py
+    ventas_totales = models.IntegerField(default=0, editable=False)
     
     def __str__(self):
         return f"{self.modelo} - {self.color}"
@@ -82,6 +85,15 @@ class Ropa(models.Model):
     class Meta:
         verbose_name = "Ropa"
         verbose_name_plural = "Ropa"
+        # Listado de la tienda: solo con existencias, paginado por id o por el orden
+        # elegido (catalogo.ORDENES; las descendentes recorren el índice al revés)
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(stock__gt=0), name='ropa_en_stock_idx'),
+            models.Index(fields=['precio', 'id'], condition=models.Q(stock__gt=0), name='ropa_stock_precio_idx'),
+            models.Index(fields=['ventas_totales', 'id'], condition=models.Q(stock__gt=0),
+                         name='ropa_stock_vendidos_idx'),
+            models.Index(fields=['stock', 'id'], condition=models.Q(stock__gt=0), name='ropa_stock_cantidad_idx'),
+        ]
 
 
 class Tenis(models.Model):
@@ -104,6 +116,8 @@ class Tenis(models.Model):
     # Opcionalmente el administrador puede especificar tallas disponibles
     # como una lista separada por comas (por ejemplo "8,8.5,9").
     tallas_disponibles = models.TextField(null=True, blank=True, help_text='Separar tallas con comas. Ej: 8,8.5,9')
+    # Unidades vendidas en pedidos no cancelados; la mantiene mas_vendidos.py
+    ventas_totales = models.IntegerField(default=0, editable=False)
     
     def __str__(self):
         return f"{self.modelo} - {self.color}"
@@ -111,6 +125,15 @@ class Tenis(models.Model):
     class Meta:
         verbose_name = "Tenis"
         verbose_name_plural = "Tenis"
+        # Listado de la tienda: solo con existencias, paginado por id o por el orden
+        # elegido (catalogo.ORDENES; las descendentes recorren el índice al revés)
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(stock__gt=0), name='tenis_en_stock_idx'),
+            models.Index(fields=['precio', 'id'], condition=models.Q(stock__gt=0), name='tenis_stock_precio_idx'),
+            models.Index(fields=['ventas_totales', 'id'], condition=models.Q(stock__gt=0),
+                         name='tenis_stock_vendidos_idx'),
+            models.Index(fields=['stock', 'id'], condition=models.Q(stock__gt=0), name='tenis_stock_cantidad_idx'),
+        ]
 
 
 class Gorra(models.Model):
@@ -134,6 +157,8 @@ class Gorra(models.Model):
     imagen = models.ImageField(upload_to='gorras/', null=True, blank=True)
     # Tallaje disponible (ej. "Única" o "CH,M,G,EG") configurable por admin
     tallas_disponibles = models.TextField(null=True, blank=True, help_text='Separar tallas con comas. Ej: Única,CH,M,G')
+    # Unidades vendidas en pedidos no cancelados; la mantiene mas_vendidos.py
+    ventas_totales = models.IntegerField(default=0, editable=False)
     
     def __str__(self):
         return f"{self.modelo} - {self.color}"
@@ -141,6 +166,15 @@ class Gorra(models.Model):
     class Meta:
         verbose_name = "Gorra"
         verbose_name_plural = "Gorras"
+        # Listado de la tienda: solo con existencias, paginado por id o por el orden
+        # elegido (catalogo.ORDENES; las descendentes recorren el índice al revés)
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(stock__gt=0), name='gorra_en_stock_idx'),
+            models.Index(fields=['precio', 'id'], condition=models.Q(stock__gt=0), name='gorra_stock_precio_idx'),
+            models.Index(fields=['ventas_totales', 'id'], condition=models.Q(stock__gt=0),
+                         name='gorra_stock_vendidos_idx'),
+            models.Index(fields=['stock', 'id'], condition=models.Q(stock__gt=0), name='gorra_stock_cantidad_idx'),
+        ]
 
 
 class Carrito(models.Model):
@@ -155,6 +189,8 @@ class Carrito(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='Activo')
+    # Se incrementa al cambiar sus líneas; invalida los totales en caché (ver precios.py)
+    version = models.PositiveIntegerField(default=0, editable=False)
     
     def __str__(self):
         return f"Carrito {self.id} - {self.cliente.user.username}"
@@ -162,6 +198,16 @@ class Carrito(models.Model):
     class Meta:
         verbose_name = "Carrito"
         verbose_name_plural = "Carritos"
+        # Paginación por cursor de los listados (ver paginacion.py)
+        indexes = [
+            models.Index(fields=['-fecha_creacion', '-id'], name='carrito_fecha_idx'),
+        ]
+        # Un solo carrito activo por cliente; también es el índice de `obtener_carrito_activo`
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cliente'], condition=models.Q(estado='Activo'), name='carrito_activo_unico',
+            ),
+        ]
 
 
 class DetalleCarrito(models.Model):
@@ -175,8 +221,23 @@ class DetalleCarrito(models.Model):
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
     
     def __str__(self):
-        producto = self.ropa or self.tenis or self.gorra
-        return f"{producto} x {self.cantidad}"
+        return f"{self.producto} x {self.cantidad}"
+
+    @property
+    def producto(self):
+        """Producto asociado a la línea (Ropa, Tenis o Gorra)."""
+        return self.ropa or self.tenis or self.gorra
+
+    @property
+    def tipo_producto(self):
+        """Tipo de producto de la línea con las mismas claves que `ProductoCatalogo.tipo`."""
+        if self.ropa_id:
+            return 'ropa'
+        if self.tenis_id:
+            return 'tenis'
+        if self.gorra_id:
+            return 'gorra'
+        return None
 
     @property
     def unit_price(self):
@@ -217,7 +278,9 @@ class Venta(models.Model):
     carrito = models.ForeignKey(Carrito, on_delete=models.CASCADE, related_name='ventas')
     fecha_venta = models.DateTimeField(auto_now_add=True)
     metodo_pago = models.CharField(max_length=50, choices=METODO_PAGO_CHOICES)
+    # Subtotal de las líneas antes de descuentos: total = subtotal - descuento + impuesto + envío
     subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    descuento = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     impuesto = models.DecimalField(max_digits=10, decimal_places=2)
     costo_envio = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     total = models.DecimalField(max_digits=10, decimal_places=2)
@@ -229,6 +292,55 @@ class Venta(models.Model):
     class Meta:
         verbose_name = "Venta"
         verbose_name_plural = "Ventas"
+        indexes = [
+            models.Index(fields=['-fecha_venta', '-id'], name='venta_fecha_idx'),
+            models.Index(fields=['cliente', '-fecha_venta', '-id'], name='venta_cliente_fecha_idx'),
+        ]
+
+
+class LineaPedido(models.Model):
+    """Copia inmutable de una línea del carrito al confirmar la venta.
+
+    El historial y el correo de confirmación leen estas filas en lugar de las
+    líneas del carrito: no dependen de que el producto siga existiendo ni de
+    su precio actual. `producto_id` no es llave foránea por la misma razón.
+    """
+    venta = models.ForeignKey(Venta, on_delete=models.CASCADE, related_name='lineas')
+    tipo = models.CharField(max_length=10)
+    producto_id = models.PositiveIntegerField(null=True, blank=True)
+    nombre = models.CharField(max_length=255)
+    talla = models.CharField(max_length=20, blank=True)
+    precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    cantidad = models.PositiveIntegerField()
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+    imagen = models.CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        return f"{self.nombre} x {self.cantidad}"
+
+    @classmethod
+    def desde_detalle(cls, venta, detalle):
+        """Línea sin guardar a partir de un DetalleCarrito con su producto cargado."""
+        producto = detalle.producto
+        return cls(
+            venta=venta,
+            tipo=detalle.tipo_producto or '',
+            producto_id=producto.pk if producto else None,
+            nombre=str(producto) if producto else '',
+            talla=detalle.talla_seleccionada or '',
+            precio_unitario=detalle.unit_price,
+            cantidad=detalle.cantidad,
+            subtotal=detalle.subtotal,
+            imagen=producto.imagen.name if producto and producto.imagen else '',
+        )
+
+    class Meta:
+        verbose_name = "Línea de Pedido"
+        verbose_name_plural = "Líneas de Pedido"
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['venta', 'id'], name='linea_pedido_venta_idx'),
+        ]
 
 
 class DetalleEntrega(models.Model):
@@ -267,4 +379,219 @@ class MensajeContacto(models.Model):
     class Meta:
         verbose_name = "Mensaje de Contacto"
         verbose_name_plural = "Mensajes de Contacto"
-        ordering = ['-fecha_envio']
\ No newline at end of file
+        ordering = ['-fecha_envio']
+        indexes = [
+            models.Index(fields=['-fecha_envio', '-id'], name='mensaje_fecha_idx'),
+            # Contador de mensajes sin leer (metricas.reconciliar) y filtro del panel
+            models.Index(fields=['-fecha_envio'], condition=models.Q(leido=False), name='mensaje_sin_leer_idx'),
+        ]
+
+
+class ProductoCatalogo(models.Model):
+    """Índice desnormalizado de Ropa, Tenis y Gorra.
+
+    Se mantiene sincronizado mediante señales (ver `signals.py`) y puede
+    reconstruirse con `python manage.py reconstruir_catalogo`. Permite listar
+    productos de las tres categorías con una sola consulta indexada.
+    """
+    TIPO_CHOICES = [
+        ('ropa', 'Ropa'),
+        ('tenis', 'Tenis'),
+        ('gorra', 'Gorra'),
+    ]
+
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    producto_id = models.PositiveBigIntegerField()
+    proveedor = models.ForeignKey(Proveedor, on_delete=models.CASCADE, related_name='productos_catalogo')
+    proveedor_nombre = models.CharField(max_length=200)
+    modelo = models.CharField(max_length=200)
+    color = models.CharField(max_length=100)
+    genero = models.CharField(max_length=20)
+    # Atributos propios de cada categoría (vacíos cuando no aplican)
+    estilo = models.CharField(max_length=100, blank=True, default='')
+    coleccion = models.CharField(max_length=200, blank=True, default='')
+    silueta = models.CharField(max_length=100, blank=True, default='')
+    visera = models.CharField(max_length=100, blank=True, default='')
+    broche = models.CharField(max_length=100, blank=True, default='')
+    precio = models.DecimalField(max_digits=10, decimal_places=2)
+    stock = models.IntegerField()
+    tallas_disponibles = models.TextField(null=True, blank=True)
+    # Misma ruta que la imagen del producto original (no se duplica el archivo)
+    imagen = models.ImageField(null=True, blank=True)
+    # Texto normalizado (minúsculas, sin acentos) usado por el motor de búsqueda
+    texto_busqueda = models.TextField(blank=True, default='')
+
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.modelo} - {self.color}"
+
+    class Meta:
+        verbose_name = "Producto de Catálogo"
+        verbose_name_plural = "Catálogo de Productos"
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'producto_id'], name='catalogo_tipo_producto_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['tipo', '-precio'], name='catalogo_tipo_precio_idx'),
+            models.Index(fields=['-precio'], name='catalogo_precio_idx'),
+            models.Index(fields=['genero'], name='catalogo_genero_idx'),
+            # Más caros en stock por tipo (top_por_tipo) y búsqueda sin texto (busqueda.py)
+            models.Index(fields=['tipo', '-precio', 'id'], condition=models.Q(stock__gt=0),
+                         name='catalogo_stock_precio_idx'),
+        ]
+
+
+class InventarioTalla(models.Model):
+    """Existencias por talla de un producto (Ropa, Tenis o Gorra).
+
+    Se genera a partir de `tallas_disponibles` (ver `tallas.py`) y la suma de
+    sus existencias coincide con el `stock` del producto.
+    """
+    tipo = models.CharField(max_length=10, choices=ProductoCatalogo.TIPO_CHOICES)
+    producto_id = models.PositiveBigIntegerField()
+    talla = models.CharField(max_length=20)
+    stock = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+
+    def __str__(self):
+        return f"{self.tipo} #{self.producto_id} - {self.talla}: {self.stock}"
+
+    class Meta:
+        verbose_name = "Inventario por Talla"
+        verbose_name_plural = "Inventario por Talla"
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'producto_id', 'talla'], name='inventario_talla_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['tipo', 'talla', 'stock'], name='inventario_tipo_talla_idx'),
+        ]
+
+
+class ReservaStock(models.Model):
+    """Apartado temporal de existencias para una línea de carrito.
+
+    El stock se descuenta al agregar al carrito; si el pedido no se confirma
+    antes de `expira`, `liberar_reservas` lo devuelve al inventario.
+    """
+    detalle = models.OneToOneField(DetalleCarrito, on_delete=models.CASCADE, related_name='reserva')
+    tipo = models.CharField(max_length=10, choices=ProductoCatalogo.TIPO_CHOICES)
+    producto_id = models.PositiveBigIntegerField()
+    talla = models.CharField(max_length=20, null=True, blank=True)
+    cantidad = models.PositiveIntegerField()
+    expira = models.DateTimeField(db_index=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Reserva {self.tipo} #{self.producto_id} x {self.cantidad}"
+
+    class Meta:
+        verbose_name = "Reserva de Stock"
+        verbose_name_plural = "Reservas de Stock"
+
+
+class ContadorMetrica(models.Model):
+    """Contador acumulado del tablero (clientes, ventas, ingresos, mensajes sin leer...).
+
+    Se actualiza de forma incremental desde `metricas.py` y se reconstruye con
+    `python manage.py reconciliar_metricas`.
+    """
+    nombre = models.CharField(max_length=50, unique=True)
+    valor = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.valor}"
+
+    class Meta:
+        verbose_name = "Contador de Métrica"
+        verbose_name_plural = "Contadores de Métricas"
+
+
+class ResumenDiario(models.Model):
+    """Totales de ventas de un día (fecha local de la venta)."""
+    fecha = models.DateField(unique=True)
+    ventas = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    impuesto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    envio = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    unidades_ropa = models.IntegerField(default=0)
+    unidades_tenis = models.IntegerField(default=0)
+    unidades_gorra = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.fecha}: {self.ventas} ventas, ${self.ingresos}"
+
+    class Meta:
+        verbose_name = "Resumen Diario"
+        verbose_name_plural = "Resúmenes Diarios"
+        ordering = ['-fecha']
+
+
+class ImagenDerivada(models.Model):
+    """Miniaturas WebP/AVIF generadas para una imagen subida (ver `imagenes.py`).
+
+    Las variantes se guardan en `derivadas/<huella>/<ancho>.<formato>`, donde
+    la huella es el SHA-256 del archivo original.
+    """
+    original = models.CharField(max_length=255, unique=True)
+    huella = models.CharField(max_length=64, db_index=True)
+    ancho = models.PositiveIntegerField()
+    alto = models.PositiveIntegerField()
+    # Anchos y formatos generados, separados por comas (ej. "160,320,640" y "avif,webp")
+    anchos = models.CharField(max_length=100)
+    formatos = models.CharField(max_length=50)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.original} ({self.anchos})"
+
+    class Meta:
+        verbose_name = "Imagen Derivada"
+        verbose_name_plural = "Imágenes Derivadas"
+
+
+class Tarea(models.Model):
+    """Trabajo pendiente para el proceso `procesar_tareas` (ver `tareas.py`).
+
+    La fila se inserta en la misma transacción que la origina, así que solo
+    existe si esa transacción se confirma.
+    """
+    PENDIENTE = 'Pendiente'
+    EN_PROCESO = 'En proceso'
+    COMPLETADA = 'Completada'
+    FALLIDA = 'Fallida'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_PROCESO, 'En proceso'),
+        (COMPLETADA, 'Completada'),
+        (FALLIDA, 'Fallida'),
+    ]
+
+    # Ruta de la función (ej. "app_kasports.imagenes.procesar_tarea")
+    funcion = models.CharField(max_length=200)
+    argumentos = models.JSONField(default=dict, blank=True)
+    prioridad = models.SmallIntegerField(default=0, help_text="Las de mayor prioridad se ejecutan primero")
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+    disponible_en = models.DateTimeField(default=timezone.now)
+    trabajador = models.CharField(max_length=100, blank=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    resultado = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.funcion} ({self.estado})"
+
+    @property
+    def nombre(self):
+        return self.funcion.rsplit('.', 1)[-1]
+
+    class Meta:
+        verbose_name = "Tarea"
+        verbose_name_plural = "Tareas"
+        indexes = [
+            # Siguiente tarea a reclamar: pendientes por prioridad y disponibilidad
+            models.Index(fields=['estado', '-prioridad', 'disponible_en'], name='tarea_cola_idx'),
+            models.Index(fields=['-fecha_creacion'], name='tarea_creacion_idx'),
+        ]
@@ -0,0 +1,43 @@
+"""Correos a clientes enviados desde la cola de tareas (ver `tareas.py`).
+
+El envío ocurre fuera de la petición: si el servidor de correo falla, la
+tarea se reintenta con espera exponencial sin afectar al pedido.
+"""
+from django.conf import settings
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+
+from .models import Venta
+from .tareas import PRIORIDAD_ALTA, encolar, tarea
+
+
+@tarea(prioridad=PRIORIDAD_ALTA, max_intentos=8)
+def correo_confirmacion(venta_id):
+    """Envía al cliente el resumen de su pedido."""
+    venta = (
+        Venta.objects.select_related('cliente__user', 'detalle_entrega')
+        .filter(pk=venta_id).first()
+    )
+    if venta is None:
+        return {'enviado': False, 'motivo': 'La venta ya no existe'}
+    correo = venta.cliente.user.email
+    if not correo:
+        return {'enviado': False, 'motivo': 'El cliente no tiene correo'}
+
+    contexto = {
+        'venta': venta,
+        'cliente': venta.cliente,
+        'lineas': venta.lineas.all(),
+        'entrega': getattr(venta, 'detalle_entrega', None),
+    }
+    send_mail(
+        f'KA.Sports - Pedido #{venta.id} confirmado',
+        render_to_string('correos/confirmacion_pedido.txt', contexto),
+        settings.DEFAULT_FROM_EMAIL,
+        [correo],
+    )
+    return {'enviado': True, 'correo': correo}
+
+
+def encolar_confirmacion(venta):
+    encolar(correo_confirmacion, {'venta_id': venta.pk})
@@ -0,0 +1,286 @@
+"""Paginación por cursor (keyset) para los listados.
+
+En lugar de `OFFSET` + `COUNT(*)` (cuyo costo crece con el número de página),
+cada página se obtiene filtrando a partir de la última fila vista:
+`WHERE (fecha, id) < (x, y) ORDER BY fecha DESC, id DESC LIMIT n`, que usa el
+índice de la columna de orden sin importar qué tan profunda sea la página.
+
+El cursor viaja en la URL (`?cursor=...`) como JSON en base64 con la dirección,
+el orden con que se generó y los valores de orden de la fila frontera; si el
+orden ya no es el mismo (otro `?orden=`), se ignora. El total es opcional y, cuando se
+pide, sale de la caché (o de la estadística de la tabla en PostgreSQL).
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+
+from .busqueda import ResultadosBusqueda
+
+PARAMETRO = 'cursor'
+SEGUNDOS_TOTAL = 60
+
+# Direcciones del cursor
+SIGUIENTE = 's'
+ANTERIOR = 'a'
+ULTIMA = 'u'
+
+
+def codificar(datos):
+    texto = json.dumps(datos, separators=(',', ':'), default=_serializar)
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar(cursor):
+    """Devuelve el diccionario del cursor o None si no es válido."""
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode('utf-8'))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(datos, dict) or datos.get('d') not in (SIGUIENTE, ANTERIOR, ULTIMA):
+        return None
+    return datos
+
+
+def _serializar(valor):
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return str(valor)
+
+
+class Pagina:
+    """Página de resultados con enlaces por cursor.
+
+    Expone la misma interfaz que usan las plantillas con `Paginator`
+    (`has_next`, `has_previous`, `has_other_pages`, iteración) más las URLs
+    de navegación ya armadas con el resto de los parámetros GET.
+    """
+
+    def __init__(self, request, object_list, cursor_anterior=None, cursor_siguiente=None,
+                 total=None, total_aproximado=False):
+        self.request = request
+        self.object_list = object_list
+        self.cursor_anterior = cursor_anterior
+        self.cursor_siguiente = cursor_siguiente
+        self.total = total
+        self.total_aproximado = total_aproximado
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def url(self, cursor=None):
+        parametros = self.request.GET.copy()
+        parametros.pop(PARAMETRO, None)
+        parametros.pop('page', None)
+        if cursor:
+            parametros[PARAMETRO] = cursor
+        return f'?{parametros.urlencode()}'
+
+    @property
+    def url_primera(self):
+        return self.url()
+
+    @property
+    def url_anterior(self):
+        return self.url(self.cursor_anterior)
+
+    @property
+    def url_siguiente(self):
+        return self.url(self.cursor_siguiente)
+
+    @property
+    def url_ultima(self):
+        return self.url(codificar({'d': ULTIMA}))
+
+
+# ============================================
+# CONSULTAS
+# ============================================
+
+def con_desempate(orden):
+    """Agrega `id` al final del orden (en la dirección del primer campo) si no está."""
+    orden = list(orden)
+    if not any(c.lstrip('-') in ('id', 'pk') for c in orden):
+        orden.append('-id' if orden and orden[0].startswith('-') else 'id')
+    return orden
+
+
+def firma(orden):
+    """Orden completo (con desempate) que se guarda en el cursor."""
+    return ','.join(con_desempate(orden))
+
+
+def invertir(orden):
+    return [c[1:] if c.startswith('-') else f'-{c}' for c in orden]
+
+
+def condicion(orden, valores, adelante=True):
+    """Filtro "después de `valores`" (o antes, si `adelante` es False) para el orden dado.
+
+    (a, b) > (x, y) se expresa como `a >= x AND (a > x OR (a = x AND b > y))`,
+    respetando la dirección de cada campo, para que funcione en cualquier base de
+    datos; la cota `a >= x` permite al planificador recorrer el índice por rango.
+    """
+    resultado = Q()
+    for i, campo in enumerate(orden):
+        nombre = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') == adelante else 'gt'
+        parte = Q(**{f'{nombre}__{operador}': valores[i]})
+        for previo, valor in zip(orden[:i], valores[:i]):
+            parte &= Q(**{previo.lstrip('-'): valor})
+        resultado |= parte
+    if len(orden) > 1:
+        primero = orden[0]
+        operador = 'lte' if primero.startswith('-') == adelante else 'gte'
+        resultado &= Q(**{f'{primero.lstrip("-")}__{operador}': valores[0]})
+    return resultado
+
+
+def valores_de(objeto, orden):
+    valores = []
+    for campo in orden:
+        valor = objeto
+        for parte in campo.lstrip('-').split('__'):
+            valor = getattr(valor, parte)
+        valores.append(valor)
+    return valores
+
+
+def _campo(queryset, nombre):
+    """El campo del modelo (o de la anotación) por el que se ordena."""
+    if nombre in queryset.query.annotations:
+        return queryset.query.annotations[nombre].output_field
+    actual = queryset.model
+    for parte in nombre.split('__'):
+        field = actual._meta.get_field('id' if parte == 'pk' else parte)
+        actual = field.related_model
+    return field
+
+
+def _convertir(queryset, orden, valores):
+    """Valores del cursor convertidos con el `to_python()` de cada campo del orden.
+
+    El cursor viene de la URL: un valor alterado (o fuera del rango de la
+    columna) lanza ValueError, TypeError o ValidationError en lugar de llegar a
+    la consulta.
+    """
+    convertidos = []
+    for campo, valor in zip(orden, valores):
+        field = _campo(queryset, campo.lstrip('-'))
+        if valor is None or isinstance(valor, (list, dict)):
+            raise ValueError(f'Valor inválido para {campo}')
+        valor = field.to_python(valor)
+        field.run_validators(valor)
+        # SQLite no declara rangos en los validadores de enteros
+        if isinstance(valor, int) and not -2 ** 63 <= valor < 2 ** 63:
+            raise ValueError(f'Valor fuera de rango para {campo}')
+        convertidos.append(valor)
+    return convertidos
+
+
+def total_en_cache(queryset, segundos=SEGUNDOS_TOTAL):
+    """Total de filas del queryset; devuelve (total, aproximado).
+
+    En PostgreSQL, una tabla sin filtros usa `pg_class.reltuples` (aproximado).
+    En los demás casos el `COUNT(*)` se guarda en caché unos segundos.
+    """
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [queryset.model._meta.db_table])
+            fila = cursor.fetchone()
+        if fila and fila[0] >= 0:
+            return int(fila[0]), True
+    clave = 'paginacion:total:' + hashlib.md5(str(queryset.query).encode('utf-8')).hexdigest()
+    total = cache.get(clave)
+    if total is None:
+        total = queryset.count()
+        cache.set(clave, total, segundos)
+    return total, False
+
+
+def _paginar_queryset(queryset, orden, por_pagina, datos):
+    orden = con_desempate(orden)
+    actual = firma(orden)
+    direccion = datos['d'] if datos else None
+    valores = datos.get('v') if datos else None
+    if direccion in (SIGUIENTE, ANTERIOR):
+        try:
+            if datos.get('o') != actual:
+                raise ValueError('Cursor de otro orden')
+            if not isinstance(valores, list) or len(valores) != len(orden):
+                raise ValueError('Cursor incompleto')
+            valores = _convertir(queryset, orden, valores)
+        except (ValueError, TypeError, ValidationError):
+            # Cursor alterado: se muestra la primera página
+            direccion = None
+
+    if direccion == SIGUIENTE:
+        filas = list(queryset.filter(condicion(orden, valores)).order_by(*orden)[:por_pagina + 1])
+        hay_siguiente, hay_anterior = len(filas) > por_pagina, True
+        filas = filas[:por_pagina]
+    elif direccion in (ANTERIOR, ULTIMA):
+        consulta = queryset
+        if direccion == ANTERIOR:
+            consulta = consulta.filter(condicion(orden, valores, adelante=False))
+        filas = list(consulta.order_by(*invertir(orden))[:por_pagina + 1])
+        hay_anterior, hay_siguiente = len(filas) > por_pagina, direccion == ANTERIOR
+        filas = filas[:por_pagina][::-1]
+    else:
+        filas = list(queryset.order_by(*orden)[:por_pagina + 1])
+        hay_siguiente, hay_anterior = len(filas) > por_pagina, False
+        filas = filas[:por_pagina]
+
+    if not filas:
+        return filas, None, None
+    anterior = codificar({'d': ANTERIOR, 'o': actual, 'v': valores_de(filas[0], orden)}) if hay_anterior else None
+    siguiente = codificar({'d': SIGUIENTE, 'o': actual, 'v': valores_de(filas[-1], orden)}) if hay_siguiente else None
+    return filas, anterior, siguiente
+
+
+def _paginar_lista(resultados, por_pagina, datos):
+    """Pagina una lista ya rankeada (búsqueda) por posición."""
+    total = len(resultados)
+    inicio = datos.get('p', 0) if datos else 0
+    if not isinstance(inicio, int) or inicio < 0:
+        inicio = 0
+    if datos and datos['d'] == ULTIMA:
+        inicio = max(0, total - por_pagina)
+    filas = resultados[inicio:inicio + por_pagina]
+    anterior = codificar({'d': ANTERIOR, 'p': max(0, inicio - por_pagina)}) if inicio > 0 else None
+    siguiente = codificar({'d': SIGUIENTE, 'p': inicio + por_pagina}) if inicio + por_pagina < total else None
+    return filas, anterior, siguiente
+
+
+def paginar(request, fuente, orden=('id',), por_pagina=10, contar=False):
+    """Devuelve la `Pagina` indicada por `?cursor=` de un queryset o de resultados de búsqueda.
+
+    `orden` debe empezar por una columna indexada; `id` se agrega como desempate.
+    Con `contar=True` se calcula el total (en caché o aproximado).
+    """
+    datos = decodificar(request.GET.get(PARAMETRO))
+    if isinstance(fuente, ResultadosBusqueda):
+        filas, anterior, siguiente = _paginar_lista(fuente, por_pagina, datos)
+        return Pagina(request, filas, anterior, siguiente, total=len(fuente))
+
+    filas, anterior, siguiente = _paginar_queryset(fuente, orden, por_pagina, datos)
+    total, aproximado = total_en_cache(fuente) if contar else (None, False)
+    return Pagina(request, filas, anterior, siguiente, total=total, total_aproximado=aproximado)
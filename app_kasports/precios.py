@@ -0,0 +1,230 @@
+"""Cálculo de totales del carrito (descuentos, envío e impuesto).
+
+`totales_carrito()` obtiene subtotal, líneas y unidades con un solo
+`aggregate()` y aplica en orden las reglas de `KASPORTS_REGLAS_PRECIO`; el
+impuesto se calcula al final sobre el subtotal con descuento. El resultado se
+guarda en caché con la versión del carrito (`Carrito.version`, que
+`signals.py` incrementa al cambiar sus líneas), de modo que volver a mostrar
+el mismo carrito no consulta sus líneas. El carrito de sesión de los
+visitantes anónimos usa `totales_lineas()` con las mismas reglas.
+
+Una regla es una función `regla(totales, contexto)` que modifica `totales`
+con `descontar()`, `costo_envio` o `envio_gratis`; `contexto` trae el
+carrito y el código promocional. Para agregar reglas basta listarlas en
+`settings.KASPORTS_REGLAS_PRECIO`.
+"""
+import hashlib
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.utils.module_loading import import_string
+
+from .catalogo import MODELOS_CATALOGO
+from .models import DetalleCarrito
+
+CENTAVOS = Decimal('0.01')
+CERO = Decimal('0.00')
+SEGUNDOS = getattr(settings, 'KASPORTS_CACHE_SEGUNDOS', 300)
+
+# (monto mínimo exclusivo, porcentaje) del mayor al menor
+DESCUENTOS_POR_MONTO = getattr(settings, 'KASPORTS_DESCUENTOS_POR_MONTO', [
+    ('10000', '0.10'),
+    ('5000', '0.05'),
+])
+# (monto máximo inclusivo, costo); arriba del último el envío es gratis
+TARIFAS_ENVIO = getattr(settings, 'KASPORTS_TARIFAS_ENVIO', [
+    ('1249.99', '80.00'),
+    ('2500.00', '50.00'),
+])
+TASA_IMPUESTO = Decimal(getattr(settings, 'KASPORTS_TASA_IMPUESTO', '0.08'))
+# {'CODIGO': {'porcentaje': '10', 'monto': '100', 'envio_gratis': True, 'minimo': '500'}}
+CODIGOS_PROMOCIONALES = getattr(settings, 'KASPORTS_CODIGOS_PROMOCIONALES', {})
+REGLAS = getattr(settings, 'KASPORTS_REGLAS_PRECIO', [
+    'app_kasports.precios.descuento_por_monto',
+    'app_kasports.precios.codigo_promocional',
+    'app_kasports.precios.envio_por_monto',
+])
+
+
+def redondear(monto):
+    return Decimal(monto).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+class Totales:
+    """Totales de un carrito; las reglas los modifican en orden."""
+
+    def __init__(self, subtotal=CERO, lineas=0, unidades=0, por_tipo=None):
+        self.subtotal = redondear(subtotal)
+        self.lineas = lineas
+        self.unidades = unidades
+        self.por_tipo = por_tipo or {}
+        self.descuento = CERO
+        self.costo_envio = CERO
+        self.envio_gratis = False
+        self.impuesto = CERO
+        self.codigo = None
+        self.aplicadas = []
+
+    @property
+    def subtotal_con_descuento(self):
+        return self.subtotal - self.descuento
+
+    @property
+    def total(self):
+        return self.subtotal_con_descuento + self.costo_envio + self.impuesto
+
+    def descontar(self, monto, descripcion):
+        """Aplica un descuento (sin dejar el subtotal en negativo)."""
+        monto = min(redondear(monto), self.subtotal_con_descuento)
+        if monto > 0:
+            self.descuento += monto
+            self.aplicadas.append((descripcion, monto))
+        return monto
+
+    def como_contexto(self):
+        """Valores con los nombres que usan las plantillas del carrito."""
+        return {
+            'subtotal': self.subtotal,
+            'descuento': self.descuento,
+            'subtotal_con_descuento': self.subtotal_con_descuento,
+            'costo_envio': self.costo_envio,
+            'impuesto': self.impuesto,
+            'total': self.total,
+            'codigo_promocional': self.codigo,
+            'descuentos_aplicados': self.aplicadas,
+            'tasa_impuesto': TASA_IMPUESTO * 100,
+        }
+
+
+# ============================================
+# REGLAS
+# ============================================
+
+def descuento_por_monto(totales, contexto):
+    """Descuento escalonado por subtotal (10% arriba de $10,000; 5% arriba de $5,000)."""
+    for minimo, porcentaje in DESCUENTOS_POR_MONTO:
+        if totales.subtotal > Decimal(minimo):
+            porcentaje = Decimal(porcentaje)
+            totales.descontar(totales.subtotal * porcentaje, f'Descuento por compra ({porcentaje * 100:.0f}%)')
+            return
+
+
+def promocion(codigo):
+    """Configuración del código promocional o None si no existe."""
+    return CODIGOS_PROMOCIONALES.get((codigo or '').strip().upper())
+
+
+def codigo_promocional(totales, contexto):
+    """Aplica el código promocional del contexto (porcentaje, monto fijo o envío gratis)."""
+    codigo = (contexto.get('codigo') or '').strip().upper()
+    datos = promocion(codigo)
+    if not datos or totales.subtotal < Decimal(datos.get('minimo', '0')):
+        return
+    totales.codigo = codigo
+    if 'porcentaje' in datos:
+        totales.descontar(totales.subtotal_con_descuento * Decimal(datos['porcentaje']) / 100, f'Código {codigo}')
+    if 'monto' in datos:
+        totales.descontar(Decimal(datos['monto']), f'Código {codigo}')
+    if datos.get('envio_gratis'):
+        totales.envio_gratis = True
+
+
+def envio_por_monto(totales, contexto):
+    """Costo de envío por tramos del subtotal con descuento; gratis arriba del último tramo."""
+    totales.costo_envio = CERO
+    if totales.envio_gratis:
+        return
+    for maximo, costo in TARIFAS_ENVIO:
+        if totales.subtotal_con_descuento <= Decimal(maximo):
+            totales.costo_envio = Decimal(costo)
+            return
+
+
+def cargar_reglas(rutas=None):
+    return [import_string(ruta) if isinstance(ruta, str) else ruta for ruta in (rutas or REGLAS)]
+
+
+_REGLAS_CARGADAS = None
+
+
+def reglas():
+    global _REGLAS_CARGADAS
+    if _REGLAS_CARGADAS is None:
+        _REGLAS_CARGADAS = cargar_reglas()
+    return _REGLAS_CARGADAS
+
+
+# Cambia si cambia la configuración: la caché no reutiliza totales calculados con otras reglas
+FIRMA_REGLAS = hashlib.md5(repr((
+    REGLAS, DESCUENTOS_POR_MONTO, TARIFAS_ENVIO, str(TASA_IMPUESTO), sorted(CODIGOS_PROMOCIONALES.items()),
+)).encode('utf-8')).hexdigest()[:12]
+
+
+# ============================================
+# CÁLCULO
+# ============================================
+
+def calcular(totales, contexto=None, reglas_precio=None):
+    """Aplica las reglas a unos totales ya agregados y calcula el impuesto."""
+    contexto = contexto or {}
+    for regla in (reglas_precio if reglas_precio is not None else reglas()):
+        regla(totales, contexto)
+    totales.impuesto = redondear(totales.subtotal_con_descuento * TASA_IMPUESTO)
+    return totales
+
+
+def agregar_lineas(carrito):
+    """Subtotal, líneas, unidades y subtotal por tipo de un carrito en una sola consulta."""
+    datos = DetalleCarrito.objects.filter(carrito=carrito).aggregate(
+        suma=Sum('subtotal'),
+        lineas=Count('id'),
+        unidades=Sum('cantidad'),
+        **{f'suma_{tipo}': Sum('subtotal', filter=Q(**{f'{tipo}__isnull': False})) for tipo in MODELOS_CATALOGO},
+    )
+    return Totales(
+        subtotal=datos['suma'] or CERO,
+        lineas=datos['lineas'],
+        unidades=datos['unidades'] or 0,
+        por_tipo={tipo: datos[f'suma_{tipo}'] or CERO for tipo in MODELOS_CATALOGO},
+    )
+
+
+def totales_lineas(lineas, codigo=None, carrito=None):
+    """Totales de líneas ya leídas: el carrito de sesión (ver carritos.py) o las
+    `DetalleCarrito` que se cobran al confirmar (con su `carrito`)."""
+    por_tipo = {tipo: CERO for tipo in MODELOS_CATALOGO}
+    for linea in lineas:
+        por_tipo[linea.tipo_producto] += linea.subtotal
+    totales = Totales(
+        subtotal=sum(por_tipo.values(), CERO),
+        lineas=len(lineas),
+        unidades=sum(linea.cantidad for linea in lineas),
+        por_tipo=por_tipo,
+    )
+    return calcular(totales, {'carrito': carrito, 'codigo': codigo})
+
+
+def clave_cache(carrito, codigo=None):
+    codigo = (codigo or '').strip().upper()
+    return f'precios:carrito:{carrito.pk}:{carrito.version}:{FIRMA_REGLAS}:{codigo}'
+
+
+def totales_carrito(carrito, codigo=None, usar_cache=True):
+    """Totales del carrito con las reglas configuradas.
+
+    Con `usar_cache` se reutiliza el cálculo mientras no cambie `carrito.version`.
+    Dentro de una transacción no se guarda en caché: si se revierte, la misma
+    versión podría volver a usarse con otras líneas.
+    """
+    clave = clave_cache(carrito, codigo)
+    if usar_cache:
+        totales = cache.get(clave)
+        if totales is not None:
+            return totales
+    totales = calcular(agregar_lineas(carrito), {'carrito': carrito, 'codigo': codigo})
+    if usar_cache and not connection.in_atomic_block:
+        cache.set(clave, totales, SEGUNDOS)
+    return totales
@@ -0,0 +1,30 @@
+"""Reportes pesados del panel generados por la cola de tareas (ver `tareas.py`).
+
+Los archivos se guardan en `KASPORTS_REPORTES_DIR` (fuera de MEDIA_ROOT, no
+son públicos) y se descargan desde el panel de tareas.
+"""
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+from . import exportaciones
+from .tareas import PRIORIDAD_BAJA, tarea
+
+almacenamiento = FileSystemStorage(location=getattr(settings, 'KASPORTS_REPORTES_DIR', settings.BASE_DIR / 'reportes'))
+
+
+@tarea(prioridad=PRIORIDAD_BAJA, max_intentos=3)
+def reporte_ventas(desde=None, hasta=None):
+    """CSV de ventas entre dos fechas (texto AAAA-MM-DD, ambas opcionales e inclusivas)."""
+    total = 0
+    # El archivo se arma en disco por partes, igual que la descarga directa del panel
+    with tempfile.TemporaryFile('w+b') as contenido:
+        for parte in exportaciones.exportar('ventas', 'csv', desde=desde, hasta=hasta):
+            contenido.write(parte.encode('utf-8'))
+            total += parte.count('\r\n')
+        contenido.seek(0)
+        nombre = almacenamiento.save(f'ventas_{timezone.localtime():%Y%m%d_%H%M%S}.csv', File(contenido))
+    return {'archivo': nombre, 'filas': total - 1}
@@ -0,0 +1,212 @@
+"""Reservas de stock y descuento atómico de existencias.
+
+- Al agregar al carrito, `reservar()` aparta las unidades con un `UPDATE`
+  condicional (`stock >= cantidad`) sobre el producto, su talla y el catálogo.
+- Al confirmar, `confirmar()` descuenta solo lo que falte por apartar dentro de
+  la transacción del pedido; si alguna línea no alcanza, se lanza
+  `StockInsuficiente` y se revierte el pedido completo.
+- Las reservas vencidas se devuelven al inventario con
+  `python manage.py liberar_reservas`.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .catalogo import MODELOS_CATALOGO
+from .models import Carrito, InventarioTalla, ProductoCatalogo, ReservaStock
+
+# Minutos que dura una reserva hecha al agregar al carrito
+MINUTOS_RESERVA = getattr(settings, 'KASPORTS_RESERVA_MINUTOS', 15)
+
+# Se envía (al confirmar la transacción) cada vez que cambia el stock de un producto
+# con argumentos `tipo` y `producto_id`; los UPDATE condicionales no disparan post_save.
+stock_modificado = Signal()
+
+
+class ErrorReserva(Exception):
+    """No fue posible apartar o confirmar las existencias solicitadas."""
+
+
+class StockInsuficiente(ErrorReserva):
+
+    def __init__(self, modelo, disponible, talla=None):
+        self.modelo = modelo
+        self.disponible = max(0, disponible)
+        self.talla = talla
+        super().__init__(str(self))
+
+    def __str__(self):
+        talla = f' (talla {self.talla})' if self.talla else ''
+        return f'Stock insuficiente para {self.modelo}{talla}. Disponible: {self.disponible}'
+
+
+def _clave(detalle):
+    return (detalle.tipo_producto, detalle.producto.pk, detalle.talla_seleccionada or None)
+
+
+def _descontar(tipo, producto_id, talla, cantidad):
+    """Descuenta `cantidad` solo si hay existencias suficientes; si no, lanza `StockInsuficiente`."""
+    modelo = MODELOS_CATALOGO[tipo]
+    with transaction.atomic():
+        if talla:
+            apartadas = InventarioTalla.objects.filter(
+                tipo=tipo, producto_id=producto_id, talla=talla, stock__gte=cantidad
+            ).update(stock=F('stock') - cantidad)
+            if not apartadas:
+                fila = InventarioTalla.objects.filter(tipo=tipo, producto_id=producto_id, talla=talla).first()
+                if fila is not None or InventarioTalla.objects.filter(tipo=tipo, producto_id=producto_id).exists():
+                    nombre = modelo.objects.filter(pk=producto_id).values_list('modelo', flat=True).first()
+                    raise StockInsuficiente(nombre, fila.stock if fila else 0, talla)
+        if not modelo.objects.filter(pk=producto_id, stock__gte=cantidad).update(stock=F('stock') - cantidad):
+            nombre, disponible = modelo.objects.filter(pk=producto_id).values_list('modelo', 'stock').first() or ('', 0)
+            raise StockInsuficiente(nombre, disponible)
+        ProductoCatalogo.objects.filter(tipo=tipo, producto_id=producto_id).update(stock=F('stock') - cantidad)
+    _notificar(tipo, producto_id)
+
+
+def _notificar(tipo, producto_id):
+    transaction.on_commit(
+        lambda: stock_modificado.send(sender=ReservaStock, tipo=tipo, producto_id=producto_id)
+    )
+
+
+def _devolver(tipo, producto_id, talla, cantidad):
+    """Regresa `cantidad` unidades al producto, su talla y su entrada de catálogo."""
+    modelo = MODELOS_CATALOGO[tipo]
+    if talla:
+        InventarioTalla.objects.filter(tipo=tipo, producto_id=producto_id, talla=talla).update(
+            stock=F('stock') + cantidad
+        )
+    modelo.objects.filter(pk=producto_id).update(stock=F('stock') + cantidad)
+    ProductoCatalogo.objects.filter(tipo=tipo, producto_id=producto_id).update(stock=F('stock') + cantidad)
+    _notificar(tipo, producto_id)
+
+
+def _aplicar(movimientos):
+    """Aplica {(tipo, producto_id, talla): cantidad}; positivo descuenta, negativo devuelve.
+
+    Las claves se procesan en orden fijo para que dos transacciones concurrentes
+    bloqueen las filas en el mismo orden.
+    """
+    for clave in sorted(movimientos, key=lambda c: (c[0], c[1], c[2] or '')):
+        cantidad = movimientos[clave]
+        if cantidad > 0:
+            _descontar(*clave, cantidad)
+        elif cantidad < 0:
+            _devolver(*clave, -cantidad)
+
+
+def expiracion():
+    return timezone.now() + timedelta(minutes=MINUTOS_RESERVA)
+
+
+def reservar(detalle, cantidad):
+    """Ajusta la reserva de una línea de carrito para que aparte exactamente `cantidad`.
+
+    Solo se descuenta (o devuelve) la diferencia con lo ya apartado y se renueva
+    la expiración. Lanza `StockInsuficiente` si no hay existencias libres.
+    """
+    tipo, producto_id, talla = _clave(detalle)
+    with transaction.atomic():
+        reserva = ReservaStock.objects.select_for_update().filter(detalle=detalle).first()
+        movimientos = defaultdict(int)
+        movimientos[(tipo, producto_id, talla)] += cantidad
+        if reserva:
+            movimientos[(reserva.tipo, reserva.producto_id, reserva.talla)] -= reserva.cantidad
+        try:
+            _aplicar(movimientos)
+        except StockInsuficiente as error:
+            # Lo que esta línea ya tenía apartado también está disponible para ella
+            if reserva and (reserva.tipo, reserva.producto_id, reserva.talla) == (tipo, producto_id, talla):
+                error.disponible += reserva.cantidad
+            raise
+
+        if reserva:
+            reserva.tipo, reserva.producto_id, reserva.talla = tipo, producto_id, talla
+            reserva.cantidad = cantidad
+            reserva.expira = expiracion()
+            reserva.save(update_fields=['tipo', 'producto_id', 'talla', 'cantidad', 'expira'])
+        else:
+            reserva = ReservaStock.objects.create(
+                detalle=detalle, tipo=tipo, producto_id=producto_id, talla=talla,
+                cantidad=cantidad, expira=expiracion(),
+            )
+    return reserva
+
+
+def apartadas(tipo, ids):
+    """Unidades apartadas en carritos por producto y talla: {producto_id: {talla o None: cantidad}}."""
+    resultado = defaultdict(dict)
+    filas = (
+        ReservaStock.objects.filter(tipo=tipo, producto_id__in=ids)
+        .values('producto_id', 'talla').annotate(total=Sum('cantidad')).order_by()
+    )
+    for fila in filas:
+        resultado[fila['producto_id']][fila['talla']] = fila['total']
+    return resultado
+
+
+def liberar(detalle):
+    """Devuelve al inventario lo apartado por una línea de carrito."""
+    with transaction.atomic():
+        reserva = ReservaStock.objects.select_for_update().filter(detalle_id=detalle.pk).first()
+        if reserva is None:
+            return 0
+        reserva.delete()
+        _devolver(reserva.tipo, reserva.producto_id, reserva.talla, reserva.cantidad)
+    return reserva.cantidad
+
+
+def confirmar(carrito):
+    """Descuenta de forma definitiva las existencias de un carrito y devuelve sus líneas.
+
+    Debe llamarse dentro del `transaction.atomic()` que crea la venta: marca el
+    carrito como completado (solo si seguía activo), descuenta lo que no estaba
+    apartado y consume las reservas. Cualquier faltante lanza una excepción y
+    revierte todo el pedido.
+
+    Las líneas se leen después de marcar el carrito, así que una línea agregada
+    desde otra pestaña justo antes también se cobra; las que se agreguen después
+    ya van a un carrito nuevo.
+    """
+    if not Carrito.objects.filter(pk=carrito.pk, estado='Activo').update(estado='Completado'):
+        raise ErrorReserva('Este pedido ya fue confirmado')
+    carrito.estado = 'Completado'
+    detalles = list(carrito.detalles.select_related('ropa', 'tenis', 'gorra'))
+    if not detalles:
+        raise ErrorReserva('El carrito está vacío')
+
+    reservas = list(ReservaStock.objects.select_for_update().filter(detalle__carrito=carrito))
+    movimientos = defaultdict(int)
+    for detalle in detalles:
+        movimientos[_clave(detalle)] += detalle.cantidad
+    for reserva in reservas:
+        movimientos[(reserva.tipo, reserva.producto_id, reserva.talla)] -= reserva.cantidad
+    _aplicar(movimientos)
+    ReservaStock.objects.filter(pk__in=[r.pk for r in reservas]).delete()
+    return detalles
+
+
+def liberar_expiradas(ahora=None, tamano_lote=200):
+    """Devuelve al inventario las reservas vencidas. Devuelve cuántas se liberaron."""
+    ahora = ahora or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            lote = list(
+                ReservaStock.objects.select_for_update(skip_locked=True)
+                .filter(expira__lte=ahora).order_by('expira', 'pk')[:tamano_lote]
+            )
+            if not lote:
+                return total
+            movimientos = defaultdict(int)
+            for reserva in lote:
+                movimientos[(reserva.tipo, reserva.producto_id, reserva.talla)] -= reserva.cantidad
+            ReservaStock.objects.filter(pk__in=[r.pk for r in lote]).delete()
+            _aplicar(movimientos)
+        total += len(lote)
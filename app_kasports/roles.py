@@ -0,0 +1,97 @@
+"""Rol del usuario (cliente o administrador) resuelto una vez y guardado en la sesión.
+
+`es_administrador`/`es_cliente` usaban `hasattr(user, 'administrador')`, que
+consulta la relación inversa uno a uno en cada petición (y las plantillas
+vuelven a preguntar por `user.cliente`/`user.administrador`). El middleware
+`rol_en_sesion` (después de `AuthenticationMiddleware`):
+
+- lee de la sesión el rol y los ids de `Cliente`/`Administrador` del usuario;
+  si no están o son de otra versión, los resuelve con una sola consulta;
+- deja `user.rol_kasports` para `es_administrador`/`es_cliente` (views.py) y
+  marca como inexistentes las relaciones que el usuario no tiene, para que
+  `user.cliente`/`user.administrador` en las plantillas no consulten.
+
+La versión de cada usuario es un contador de `cache_tienda`; `signals.py` la
+incrementa al crear, modificar o eliminar su `Cliente` o `Administrador`.
+Además el rol guardado caduca a los `KASPORTS_ROL_SEGUNDOS`: si la caché se
+vacía o un proceso no ve el incremento, un administrador dado de baja pierde
+el acceso a más tardar en ese tiempo.
+"""
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.decorators import sync_and_async_middleware
+
+from . import cache_tienda
+
+CLAVE_SESION = '_kasports_rol'
+ADMINISTRADOR = 'administrador'
+CLIENTE = 'cliente'
+
+
+def _version(usuario_id):
+    return f'rol:{usuario_id}'
+
+
+def invalidar(usuario_id):
+    """Obliga a volver a resolver el rol del usuario en su próxima petición."""
+    cache_tienda.invalidar(_version(usuario_id))
+
+
+def resolver(usuario_id):
+    """{'rol', 'cliente_id', 'administrador_id'} con una sola consulta."""
+    fila = User.objects.filter(pk=usuario_id).values('cliente__id', 'administrador__id').first() or {}
+    cliente_id, administrador_id = fila.get('cliente__id'), fila.get('administrador__id')
+    rol = ADMINISTRADOR if administrador_id else CLIENTE if cliente_id else ''
+    return {'rol': rol, 'cliente_id': cliente_id, 'administrador_id': administrador_id}
+
+
+def aplicar(user, datos):
+    """Anota el rol en el usuario y descarta las relaciones que no tiene."""
+    user.rol_kasports = datos['rol']
+    user.cliente_id_kasports = datos['cliente_id']
+    user.administrador_id_kasports = datos['administrador_id']
+    # Equivale a haber consultado la relación sin encontrar fila: `hasattr` devuelve False
+    if datos['cliente_id'] is None:
+        User.cliente.related.set_cached_value(user, None)
+    if datos['administrador_id'] is None:
+        User.administrador.related.set_cached_value(user, None)
+
+
+def recordar(request, user):
+    """Resuelve el rol de `user` y lo guarda en la sesión (también justo después de `login`)."""
+    version = cache_tienda.versiones([_version(user.pk)])[_version(user.pk)]
+    datos = request.session.get(CLAVE_SESION)
+    ahora = time.time()
+    vigente = datos and ahora - datos.get('resuelto', 0) < getattr(settings, 'KASPORTS_ROL_SEGUNDOS', 60)
+    if not vigente or datos.get('usuario') != user.pk or datos.get('version') != version:
+        datos = dict(resolver(user.pk), usuario=user.pk, version=version, resuelto=ahora)
+        request.session[CLAVE_SESION] = datos
+    aplicar(user, datos)
+    return datos
+
+
+def _recordar_si_autenticado(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        recordar(request, user)
+
+
+@sync_and_async_middleware
+def rol_en_sesion(get_response):
+    """Middleware que resuelve el rol del usuario autenticado una vez por sesión"""
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware_async(request):
+            # Evalúa `request.user` (sesión y usuario) fuera del bucle de eventos; así las
+            # vistas asíncronas ya lo encuentran cargado
+            await sync_to_async(_recordar_si_autenticado)(request)
+            return await get_response(request)
+        return middleware_async
+
+    def middleware(request):
+        _recordar_si_autenticado(request)
+        return get_response(request)
+    return middleware
@@ -0,0 +1,259 @@
+"""Señales de la aplicación KA.Sports.
+
+Mantienen sincronizadas las tablas derivadas (catálogo unificado) con los
+modelos de origen cada vez que se guardan o eliminan, invalidan la caché de la
+tienda, devuelven al inventario las reservas de las líneas de carrito que se
+borran, mantienen los contadores del tablero (`metricas.py`) y encolan la
+generación de miniaturas de las imágenes subidas (`imagenes.py`). El ranking
+de más vendidos (`mas_vendidos.py`) sigue los cambios de estado de las ventas. También
+aplican los PRAGMA de SQLite a cada conexión nueva (`base_datos.py`) e
+invalidan el rol guardado en la sesión (`roles.py`) al cambiar un cliente o
+administrador. Al iniciar sesión, el carrito de sesión se fusiona con el del
+cliente (`carritos.py`).
+"""
+from django.contrib import messages
+from django.contrib.auth.signals import user_logged_in
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import (
+    base_datos, busqueda, cache_tienda, carritos, catalogo, imagenes, mas_vendidos, metricas, reservas, roles, tallas,
+)
+from .models import (
+    Administrador, Carrito, Cliente, DetalleCarrito, DetalleEntrega, MensajeContacto, Proveedor, Ropa, Tenis, Gorra, ProductoCatalogo, Venta,
+)
+
+
+@receiver(post_save, sender=Ropa)
+@receiver(post_save, sender=Tenis)
+@receiver(post_save, sender=Gorra)
+def sincronizar_catalogo(sender, instance, raw=False, **kwargs):
+    """Actualiza tallas, entrada de catálogo e índice de búsqueda al guardar un producto"""
+    if raw:
+        return
+    # Primero las tallas: pueden normalizar `tallas_disponibles` y `stock`
+    tallas.sincronizar_tallas(instance)
+    entrada = catalogo.sincronizar_producto(instance)
+    busqueda.indexar([entrada])
+    cache_tienda.invalidar_producto(entrada.tipo, instance.pk)
+
+
+@receiver(post_delete, sender=Ropa)
+@receiver(post_delete, sender=Tenis)
+@receiver(post_delete, sender=Gorra)
+def eliminar_de_catalogo(sender, instance, **kwargs):
+    """Elimina catálogo, índice de búsqueda y tallas al borrar un producto"""
+    tipo = catalogo.TIPO_POR_MODELO[sender]
+    busqueda.desindexar(
+        ProductoCatalogo.objects.filter(tipo=tipo, producto_id=instance.pk).values_list('pk', flat=True)
+    )
+    catalogo.eliminar_producto(tipo, instance.pk)
+    tallas.eliminar_tallas(tipo, instance.pk)
+    cache_tienda.invalidar_producto(tipo, instance.pk)
+
+
+@receiver(post_save, sender=Proveedor)
+def actualizar_proveedor_catalogo(sender, instance, created=False, raw=False, **kwargs):
+    """Propaga cambios de nombre del proveedor al catálogo"""
+    if raw:
+        return
+    cache_tienda.invalidar_proveedor(instance.pk)
+    if not created:
+        busqueda.indexar(catalogo.actualizar_proveedor(instance))
+
+
+@receiver(post_delete, sender=Proveedor)
+def eliminar_proveedor_cache(sender, instance, **kwargs):
+    """Descarta las páginas cacheadas que mostraban al proveedor"""
+    cache_tienda.invalidar_proveedor(instance.pk)
+
+
+@receiver(reservas.stock_modificado)
+def invalidar_stock(sender, tipo, producto_id, **kwargs):
+    """Las reservas y ventas cambian el stock con UPDATE, sin post_save"""
+    cache_tienda.invalidar_producto(tipo, producto_id)
+
+
+@receiver(pre_delete, sender=DetalleCarrito)
+def liberar_reserva(sender, instance, **kwargs):
+    """Devuelve al inventario lo apartado por una línea de carrito eliminada"""
+    reservas.liberar(instance)
+
+
+@receiver(post_save, sender=DetalleCarrito)
+@receiver(post_delete, sender=DetalleCarrito)
+def nueva_version_carrito(sender, instance, raw=False, **kwargs):
+    """Descarta los totales en caché del carrito (ver precios.py)"""
+    if not raw:
+        Carrito.objects.filter(pk=instance.carrito_id).update(version=F('version') + 1)
+
+
+@receiver(post_save, sender=Ropa)
+@receiver(post_save, sender=Tenis)
+@receiver(post_save, sender=Gorra)
+@receiver(post_save, sender=Proveedor)
+@receiver(post_save, sender=DetalleEntrega)
+def generar_variantes_imagen(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Encola la generación de miniaturas WebP/AVIF de la imagen subida"""
+    campo = 'imagen_evidencia' if sender is DetalleEntrega else 'imagen'
+    if raw or (update_fields is not None and campo not in update_fields):
+        return
+    archivo = getattr(instance, campo)
+    if archivo:
+        imagenes.encolar(archivo.name)
+
+
+# ============================================
+# MÉTRICAS DEL TABLERO
+# ============================================
+
+def _valores_previos(sender, instance, campos):
+    """Valores guardados en la base de datos antes de editar `instance` (None si es nueva)."""
+    if instance.pk is None:
+        return None
+    return sender.objects.filter(pk=instance.pk).values(*campos).first()
+
+
+@receiver(post_save, sender=Cliente)
+def contar_cliente(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        metricas.sumar(clientes=1)
+
+
+@receiver(post_delete, sender=Cliente)
+def descontar_cliente(sender, instance, **kwargs):
+    metricas.sumar(clientes=-1)
+
+
+@receiver(post_save, sender=Ropa)
+@receiver(post_save, sender=Tenis)
+@receiver(post_save, sender=Gorra)
+def contar_producto(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        metricas.sumar(productos=1)
+
+
+@receiver(post_delete, sender=Ropa)
+@receiver(post_delete, sender=Tenis)
+@receiver(post_delete, sender=Gorra)
+def descontar_producto(sender, instance, **kwargs):
+    metricas.sumar(productos=-1)
+
+
+@receiver(pre_save, sender=Venta)
+def recordar_importes_venta(sender, instance, raw=False, **kwargs):
+    if not raw:
+        # `estado` también lo usa el ranking de más vendidos (misma consulta)
+        instance._metricas_previas = _valores_previos(sender, instance, [*metricas.CAMPOS_VENTA.values(), 'estado'])
+
+
+@receiver(post_save, sender=Venta)
+def contar_venta(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    previos = getattr(instance, '_metricas_previas', None)
+    if created or previos is None:
+        metricas.registrar_venta(instance)
+    else:
+        metricas.ajustar_venta(instance, previos)
+
+
+@receiver(pre_delete, sender=Venta)
+def descontar_venta(sender, instance, origin=None, **kwargs):
+    """Resta la venta; sus unidades solo si las líneas del carrito no se borran con ella"""
+    borrado_directo = getattr(origin, 'model', type(origin)) is Venta
+    metricas.registrar_venta(instance, signo=-1, con_unidades=borrado_directo)
+
+
+@receiver(post_save, sender=Venta)
+def ajustar_mas_vendidos(sender, instance, created=False, raw=False, **kwargs):
+    """Resta o vuelve a sumar las unidades cuando la venta se cancela o se reactiva.
+
+    Al crearla aún no tiene líneas: `confirmar_pedido` la suma después de copiarlas.
+    """
+    previos = getattr(instance, '_metricas_previas', None)
+    if raw or created or previos is None:
+        return
+    antes, ahora = previos['estado'] != mas_vendidos.CANCELADO, mas_vendidos.cuenta(instance)
+    if antes != ahora:
+        mas_vendidos.sumar_venta(instance, signo=1 if ahora else -1)
+
+
+@receiver(pre_delete, sender=Venta)
+def descontar_mas_vendidos(sender, instance, **kwargs):
+    if mas_vendidos.cuenta(instance):
+        mas_vendidos.sumar_venta(instance, signo=-1)
+
+
+@receiver(pre_save, sender=DetalleCarrito)
+def recordar_linea(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._metricas_previas = _valores_previos(sender, instance, ['cantidad', 'ropa', 'tenis', 'gorra'])
+
+
+@receiver(post_save, sender=DetalleCarrito)
+def contar_unidades_linea(sender, instance, created=False, raw=False, **kwargs):
+    """Ajusta las unidades vendidas cuando se edita una línea de un carrito ya vendido"""
+    if raw:
+        return
+    previos = getattr(instance, '_metricas_previas', None)
+    if previos:
+        tipo_previo = next((t for t in metricas.TIPOS if previos[t]), None)
+        metricas.ajustar_unidades(instance.carrito_id, tipo_previo, -previos['cantidad'])
+    metricas.ajustar_unidades(instance.carrito_id, instance.tipo_producto, instance.cantidad)
+
+
+@receiver(pre_delete, sender=DetalleCarrito)
+def descontar_unidades_linea(sender, instance, **kwargs):
+    metricas.ajustar_unidades(instance.carrito_id, instance.tipo_producto, -instance.cantidad)
+
+
+@receiver(pre_save, sender=MensajeContacto)
+def recordar_leido(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._metricas_previas = _valores_previos(sender, instance, ['leido'])
+
+
+@receiver(post_save, sender=MensajeContacto)
+def contar_mensaje(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previos = getattr(instance, '_metricas_previas', None)
+    antes = 0 if previos is None else int(not previos['leido'])
+    metricas.sumar(mensajes_sin_leer=int(not instance.leido) - antes)
+
+
+@receiver(post_delete, sender=MensajeContacto)
+def descontar_mensaje(sender, instance, **kwargs):
+    if not instance.leido:
+        metricas.sumar(mensajes_sin_leer=-1)
+
+
+@receiver(connection_created)
+def ajustar_conexion(sender, connection, **kwargs):
+    """PRAGMA del perfil de base de datos (WAL, busy_timeout, ...) en cada conexión nueva"""
+    base_datos.aplicar_pragmas(connection)
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=Administrador)
+@receiver(post_delete, sender=Administrador)
+def invalidar_rol(sender, instance, raw=False, **kwargs):
+    """El rol guardado en la sesión del usuario deja de ser válido"""
+    if not raw:
+        roles.invalidar(instance.user_id)
+
+
+@receiver(user_logged_in)
+def fusionar_carrito(sender, request, user, **kwargs):
+    """Pasa al carrito del cliente lo que agregó antes de iniciar sesión"""
+    if request is None or carritos.CarritoSesion(request).vacio():
+        return
+    cliente = Cliente.objects.filter(user=user).first()
+    if cliente is None:
+        return
+    for aviso in carritos.fusionar(request, cliente):
+        messages.warning(request, aviso, fail_silently=True)
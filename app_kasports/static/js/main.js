@@ -48,3 +48,135 @@ document.addEventListener('click', (e) => {
         dropdown.classList.remove('active');
     }
 });
+
+
+// ============================================
+// Carrito sin recargar la página (API JSON del carrito, ver views.py).
+// Sin JavaScript los formularios siguen enviándose de forma normal.
+// ============================================
+
+const avisoCarrito = document.getElementById('carrito-aviso');
+const botonCantidades = document.getElementById('actualizar-cantidades');
+
+async function enviarCarrito(url, opciones) {
+    const respuesta = await fetch(url, Object.assign({ method: 'POST', credentials: 'same-origin' }, opciones));
+    const datos = await respuesta.json();
+    if (!respuesta.ok && !datos.error) {
+        datos.error = 'No se pudo actualizar el carrito';
+    }
+    return datos;
+}
+
+function mostrarAviso(elemento, texto, esError) {
+    if (!elemento) return;
+    elemento.textContent = texto;
+    elemento.style.color = esError ? 'red' : 'green';
+}
+
+function avisoDeFormulario(form) {
+    // En los listados el aviso va debajo del botón de cada producto
+    let aviso = form.querySelector('.carrito-aviso');
+    if (!aviso) {
+        aviso = document.createElement('small');
+        aviso.className = 'carrito-aviso';
+        aviso.setAttribute('role', 'status');
+        aviso.style.display = 'block';
+        form.appendChild(aviso);
+    }
+    return aviso;
+}
+
+function filaCarrito(id) {
+    return document.querySelector(`.cart-row[data-linea="${id}"]`);
+}
+
+function actualizarFila(linea) {
+    const fila = filaCarrito(linea.id);
+    if (!fila) return;
+    fila.querySelector('.line-subtotal').textContent = linea.subtotal_texto;
+    const cantidad = fila.querySelector('.qty-form input[name="cantidad"]');
+    cantidad.value = linea.cantidad;
+    cantidad.defaultValue = linea.cantidad;
+    const expira = fila.querySelector('.reserva-expira');
+    if (expira) {
+        expira.textContent = linea.apartado_hasta ? `Apartado hasta ${linea.apartado_hasta}` : '';
+    }
+}
+
+function quitarFila(id) {
+    const fila = filaCarrito(id);
+    if (fila) fila.remove();
+}
+
+function actualizarResumen(datos) {
+    const resumen = document.getElementById('resumen-carrito');
+    if (resumen && datos.resumen_html) {
+        resumen.outerHTML = datos.resumen_html;
+    }
+    // El carrito vacío se muestra con la plantilla completa
+    if (datos.lineas === 0 && document.querySelector('.cart-table')) {
+        window.location.reload();
+    }
+}
+
+document.addEventListener('submit', async (e) => {
+    const form = e.target;
+    if (!form.dataset.api || !window.fetch) return;
+    e.preventDefault();
+    const aviso = form.classList.contains('add-form') ? avisoDeFormulario(form) : avisoCarrito;
+    let datos;
+    try {
+        datos = await enviarCarrito(form.dataset.api, { body: new FormData(form) });
+    } catch (error) {
+        form.submit();  // Si la API falla, se usa el formulario normal
+        return;
+    }
+    if (datos.error) {
+        mostrarAviso(aviso, datos.error, true);
+        return;
+    }
+    mostrarAviso(aviso, datos.mensaje, false);
+    if (datos.linea) actualizarFila(datos.linea);
+    if (datos.eliminada) quitarFila(datos.eliminada);
+    actualizarResumen(datos);
+});
+
+if (botonCantidades && window.fetch) {
+    botonCantidades.hidden = false;
+    botonCantidades.addEventListener('click', async () => {
+        const lineas = [];
+        document.querySelectorAll('.cart-row').forEach((fila) => {
+            const cantidad = fila.querySelector('.qty-form input[name="cantidad"]');
+            if (cantidad.value !== cantidad.defaultValue) {
+                lineas.push({ id: Number(fila.dataset.linea), cantidad: Number(cantidad.value) });
+            }
+        });
+        if (!lineas.length) {
+            mostrarAviso(avisoCarrito, 'No hay cantidades por actualizar', false);
+            return;
+        }
+        const token = document.querySelector('input[name="csrfmiddlewaretoken"]');
+        let datos;
+        try {
+            datos = await enviarCarrito(botonCantidades.dataset.api, {
+                headers: { 'Content-Type': 'application/json', 'X-CSRFToken': token ? token.value : '' },
+                body: JSON.stringify({ lineas: lineas }),
+            });
+        } catch (error) {
+            mostrarAviso(avisoCarrito, 'No se pudo actualizar el carrito', true);
+            return;
+        }
+        if (datos.error) {
+            mostrarAviso(avisoCarrito, datos.error, true);
+            return;
+        }
+        datos.actualizadas.forEach(actualizarFila);
+        datos.eliminadas.forEach(quitarFila);
+        if (datos.errores.length) {
+            mostrarAviso(avisoCarrito, datos.errores.map((error) => error.error).join('. '), true);
+        } else {
+            mostrarAviso(avisoCarrito, 'Cantidades actualizadas', false);
+        }
+        actualizarResumen(datos);
+    });
+}
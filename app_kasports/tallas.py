@@ -0,0 +1,183 @@
+"""Matriz de existencias por talla (`InventarioTalla`).
+
+El administrador sigue capturando `tallas_disponibles` como texto separado por
+comas, opcionalmente con existencias explícitas por talla (`"S:4,M:6,L"`).
+Al guardar el producto, `sincronizar_tallas()` convierte ese texto en filas de
+`InventarioTalla` cuya suma coincide con el `stock` del producto; los listados
+y el carrito trabajan sobre esas filas en lugar de volver a partir el texto.
+"""
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .catalogo import tipo_de
+from .models import InventarioTalla
+
+
+def parsear_tallas(texto):
+    """Convierte "S:4,M,L:2" en [('S', 4), ('M', None), ('L', 2)] sin duplicados."""
+    resultado = []
+    vistas = set()
+    for parte in str(texto or '').split(','):
+        parte = parte.strip()
+        if not parte:
+            continue
+        talla, _, cantidad = parte.partition(':')
+        talla = talla.strip()[:20]
+        if not talla or talla in vistas:
+            continue
+        try:
+            cantidad = max(0, int(cantidad)) if cantidad.strip() else None
+        except ValueError:
+            cantidad = None
+        vistas.add(talla)
+        resultado.append((talla, cantidad))
+    return resultado
+
+
+def _repartir(existencias, tallas, diferencia):
+    """Suma (o resta) `diferencia` entre `tallas` de forma equitativa."""
+    if not tallas or not diferencia:
+        return
+    if diferencia > 0:
+        base, resto = divmod(diferencia, len(tallas))
+        for i, talla in enumerate(tallas):
+            existencias[talla] += base + (1 if i < resto else 0)
+        return
+    # Restar primero de las tallas con más existencias
+    pendiente = -diferencia
+    while pendiente > 0:
+        talla = max(tallas, key=lambda t: existencias[t])
+        if existencias[talla] == 0:
+            break
+        existencias[talla] -= 1
+        pendiente -= 1
+
+
+def calcular_existencias(entradas, stock_total, actuales=None):
+    """Calcula {talla: stock} a partir de las entradas parseadas y el stock del producto.
+
+    - Las tallas con cantidad explícita conservan esa cantidad.
+    - Las demás conservan su valor actual (si existía) y absorben la diferencia
+      con `stock_total`.
+    Devuelve (existencias, total) donde `total` es la suma resultante.
+    """
+    actuales = actuales or {}
+    existencias = {}
+    libres = []
+    for talla, cantidad in entradas:
+        if cantidad is None:
+            existencias[talla] = actuales.get(talla, 0)
+            libres.append(talla)
+        else:
+            existencias[talla] = cantidad
+    if libres:
+        _repartir(existencias, libres, stock_total - sum(existencias.values()))
+    return existencias, sum(existencias.values())
+
+
+def sincronizar_tallas(producto):
+    """Actualiza las filas de `InventarioTalla` de un producto a partir de su texto de tallas.
+
+    Si el texto incluía cantidades explícitas, el producto se normaliza
+    (texto solo con nombres de talla y `stock` igual a la suma por talla).
+    """
+    tipo = tipo_de(producto)
+    entradas = parsear_tallas(producto.tallas_disponibles)
+    filas = {f.talla: f for f in InventarioTalla.objects.filter(tipo=tipo, producto_id=producto.pk)}
+
+    if not entradas:
+        if filas:
+            InventarioTalla.objects.filter(tipo=tipo, producto_id=producto.pk).delete()
+        return {}
+
+    existencias, total = calcular_existencias(
+        entradas, producto.stock, {t: f.stock for t, f in filas.items()}
+    )
+
+    eliminar = [f.pk for t, f in filas.items() if t not in existencias]
+    if eliminar:
+        InventarioTalla.objects.filter(pk__in=eliminar).delete()
+    nuevas = [
+        InventarioTalla(tipo=tipo, producto_id=producto.pk, talla=t, stock=n)
+        for t, n in existencias.items() if t not in filas
+    ]
+    if nuevas:
+        InventarioTalla.objects.bulk_create(nuevas)
+    cambiadas = []
+    for talla, fila in filas.items():
+        if talla in existencias and fila.stock != existencias[talla]:
+            fila.stock = existencias[talla]
+            cambiadas.append(fila)
+    if cambiadas:
+        InventarioTalla.objects.bulk_update(cambiadas, ['stock'])
+
+    texto = ','.join(existencias)
+    if texto != producto.tallas_disponibles or total != producto.stock:
+        # update() para no volver a disparar post_save
+        type(producto).objects.filter(pk=producto.pk).update(tallas_disponibles=texto, stock=total)
+        producto.tallas_disponibles = texto
+        producto.stock = total
+    return existencias
+
+
+def eliminar_tallas(tipo, producto_id):
+    InventarioTalla.objects.filter(tipo=tipo, producto_id=producto_id).delete()
+
+
+def tallas_por_producto(pares):
+    """Carga las tallas de varios productos en una sola consulta.
+
+    `pares` es un iterable de (tipo, producto_id). Devuelve {(tipo, id): [InventarioTalla, ...]}.
+    """
+    ids_por_tipo = defaultdict(set)
+    for tipo, producto_id in pares:
+        ids_por_tipo[tipo].add(producto_id)
+    resultado = defaultdict(list)
+    if not ids_por_tipo:
+        return resultado
+    condicion = Q()
+    for tipo, ids in ids_por_tipo.items():
+        condicion |= Q(tipo=tipo, producto_id__in=ids)
+    for fila in InventarioTalla.objects.filter(condicion).order_by('id'):
+        resultado[(fila.tipo, fila.producto_id)].append(fila)
+    return resultado
+
+
+def adjuntar_tallas(productos, tipo=None):
+    """Asigna `producto.tallas` (lista de InventarioTalla) a cada producto con una consulta.
+
+    Sirve tanto para Ropa/Tenis/Gorra (indicando `tipo`) como para entradas de
+    `ProductoCatalogo` (que ya traen `tipo` y `producto_id`).
+    """
+    productos = list(productos)
+
+    def clave(p):
+        return (tipo, p.pk) if tipo else (p.tipo, p.producto_id)
+
+    tallas = tallas_por_producto(clave(p) for p in productos)
+    for producto in productos:
+        producto.tallas = tallas.get(clave(producto), [])
+    return productos
+
+
+def variantes_talla(texto):
+    """Variantes de capitalización de una talla buscada ('xl' -> {'xl', 'XL', 'Xl'})."""
+    texto = (texto or '').strip()
+    return {texto, texto.upper(), texto.capitalize()} - {''}
+
+
+def ids_con_talla(tipo, talla):
+    """Subconsulta con los ids de productos que tienen existencias en la talla exacta."""
+    return InventarioTalla.objects.filter(
+        tipo=tipo, talla__in=variantes_talla(talla), stock__gt=0
+    ).values('producto_id')
+
+
+def existencias_por_talla(tipo, producto_id):
+    """{talla: stock} de un producto; vacío si el producto no maneja tallas."""
+    return dict(
+        InventarioTalla.objects.filter(tipo=tipo, producto_id=producto_id)
+        .order_by('id').values_list('talla', 'stock')
+    )
+
@@ -0,0 +1,275 @@
+"""Cola de tareas en segundo plano guardada en la base de datos.
+
+No necesita un broker externo: `encolar()` inserta una fila de `Tarea` en la
+misma transacción que la origina (si la transacción se revierte, la tarea no
+existe) y uno o más procesos `python manage.py procesar_tareas` la ejecutan.
+
+- Una tarea es una función marcada con `@tarea(...)` que recibe argumentos por
+  nombre serializables a JSON; se guarda su ruta (`modulo.funcion`).
+- Se ejecutan primero las de mayor `prioridad` y, entre iguales, las más antiguas.
+- Cada proceso reclama tareas con un `UPDATE ... WHERE estado = 'Pendiente'`
+  condicional (en PostgreSQL, `SELECT ... FOR UPDATE SKIP LOCKED`), así que dos
+  procesos nunca ejecutan la misma tarea y funciona igual en SQLite.
+- Si la función lanza una excepción se reintenta con espera exponencial
+  (`RETRASO_BASE * 2^(intento - 1)`, con variación aleatoria) hasta
+  `max_intentos`; después queda como fallida para revisarla en el panel.
+- Una tarea que lleva más de `SEGUNDOS_BLOQUEO` en proceso (el proceso murió)
+  vuelve a quedar pendiente.
+
+Con `KASPORTS_TAREAS_SINCRONAS = True` las tareas se ejecutan en el mismo
+proceso al confirmar la transacción (útil en desarrollo sin un proceso aparte).
+"""
+import json
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Tarea
+
+logger = logging.getLogger(__name__)
+
+PRIORIDAD_ALTA = 10
+PRIORIDAD_NORMAL = 0
+PRIORIDAD_BAJA = -10
+
+SINCRONAS = getattr(settings, 'KASPORTS_TAREAS_SINCRONAS', False)
+# Segundos de espera antes del primer reintento (se duplica en cada intento)
+RETRASO_BASE = getattr(settings, 'KASPORTS_TAREAS_RETRASO_BASE', 10)
+RETRASO_MAXIMO = getattr(settings, 'KASPORTS_TAREAS_RETRASO_MAXIMO', 3600)
+SEGUNDOS_BLOQUEO = getattr(settings, 'KASPORTS_TAREAS_SEGUNDOS_BLOQUEO', 900)
+
+
+class TareaDesconocida(Exception):
+    """La ruta guardada no corresponde a una función marcada con `@tarea`."""
+
+
+def tarea(prioridad=PRIORIDAD_NORMAL, max_intentos=5):
+    """Marca una función como tarea y fija su prioridad e intentos por defecto."""
+    def decorador(funcion):
+        funcion.es_tarea = True
+        funcion.prioridad = prioridad
+        funcion.max_intentos = max_intentos
+        return funcion
+    return decorador
+
+
+def ruta(funcion):
+    return f'{funcion.__module__}.{funcion.__qualname__}'
+
+
+def resolver(nombre):
+    try:
+        funcion = import_string(nombre)
+    except ImportError as error:
+        raise TareaDesconocida(nombre) from error
+    if not getattr(funcion, 'es_tarea', False):
+        raise TareaDesconocida(nombre)
+    return funcion
+
+
+# ============================================
+# ENCOLAR
+# ============================================
+
+def encolar(funcion, argumentos=None, prioridad=None, retraso=0):
+    """Crea la tarea `funcion(**argumentos)`; devuelve la `Tarea`.
+
+    `retraso` son los segundos antes de que pueda ejecutarse.
+    """
+    if not getattr(funcion, 'es_tarea', False):
+        raise TareaDesconocida(ruta(funcion))
+    nueva = Tarea.objects.create(
+        funcion=ruta(funcion),
+        argumentos=argumentos or {},
+        prioridad=funcion.prioridad if prioridad is None else prioridad,
+        max_intentos=funcion.max_intentos,
+        disponible_en=timezone.now() + timedelta(seconds=retraso),
+    )
+    if SINCRONAS:
+        transaction.on_commit(lambda: _ejecutar_sincrona(nueva.pk))
+    return nueva
+
+
+def _ejecutar_sincrona(tarea_id):
+    trabajador = nombre_trabajador()
+    if _marcar_en_proceso(tarea_id, trabajador, timezone.now()):
+        ejecutar(Tarea.objects.get(pk=tarea_id))
+
+
+# ============================================
+# EJECUCIÓN
+# ============================================
+
+def nombre_trabajador():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _marcar_en_proceso(tarea_id, trabajador, ahora):
+    return Tarea.objects.filter(pk=tarea_id, estado=Tarea.PENDIENTE).update(
+        estado=Tarea.EN_PROCESO, trabajador=trabajador, fecha_inicio=ahora, intentos=F('intentos') + 1,
+    )
+
+
+def reclamar(trabajador, limite=1):
+    """Marca como en proceso hasta `limite` tareas disponibles y las devuelve."""
+    ahora = timezone.now()
+    disponibles = (
+        Tarea.objects.filter(estado=Tarea.PENDIENTE, disponible_en__lte=ahora)
+        .order_by('-prioridad', 'disponible_en', 'id')
+    )
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(disponibles.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limite])
+            Tarea.objects.filter(pk__in=ids).update(
+                estado=Tarea.EN_PROCESO, trabajador=trabajador, fecha_inicio=ahora, intentos=F('intentos') + 1,
+            )
+    else:
+        # Sin SKIP LOCKED (SQLite) el UPDATE condicional decide qué proceso se queda con
+        # cada tarea; se leen varias candidatas porque otros procesos compiten por las primeras
+        ids = []
+        for tarea_id in disponibles.values_list('pk', flat=True)[:limite + 10]:
+            if _marcar_en_proceso(tarea_id, trabajador, ahora):
+                ids.append(tarea_id)
+                if len(ids) == limite:
+                    break
+    if not ids:
+        return []
+    return list(Tarea.objects.filter(pk__in=ids).order_by('-prioridad', 'disponible_en', 'id'))
+
+
+def retraso(intentos):
+    """Segundos antes del siguiente intento (exponencial con ±20% de variación)."""
+    segundos = min(RETRASO_MAXIMO, RETRASO_BASE * 2 ** max(0, intentos - 1))
+    return segundos * random.uniform(0.8, 1.2)
+
+
+def _serializable(valor):
+    return json.loads(json.dumps(valor, default=str)) if valor is not None else None
+
+
+def ejecutar(registro):
+    """Ejecuta una tarea ya reclamada y guarda su resultado o programa el reintento."""
+    try:
+        funcion = resolver(registro.funcion)
+        resultado = _serializable(funcion(**registro.argumentos))
+    except Exception as error:
+        definitiva = isinstance(error, TareaDesconocida) or registro.intentos >= registro.max_intentos
+        detalle = traceback.format_exc()[-5000:]
+        logger.warning('Tarea %s falló (intento %s): %s', registro, registro.intentos, error)
+        if definitiva:
+            Tarea.objects.filter(pk=registro.pk).update(
+                estado=Tarea.FALLIDA, error=detalle, fecha_fin=timezone.now(),
+            )
+        else:
+            Tarea.objects.filter(pk=registro.pk).update(
+                estado=Tarea.PENDIENTE, error=detalle, trabajador='',
+                disponible_en=timezone.now() + timedelta(seconds=retraso(registro.intentos)),
+            )
+        return False
+    Tarea.objects.filter(pk=registro.pk).update(
+        estado=Tarea.COMPLETADA, resultado=resultado, error='', fecha_fin=timezone.now(),
+    )
+    return True
+
+
+def recuperar_abandonadas(segundos=SEGUNDOS_BLOQUEO):
+    """Devuelve a la cola las tareas en proceso de un trabajador que dejó de responder."""
+    limite = timezone.now() - timedelta(seconds=segundos)
+    abandonadas = Tarea.objects.filter(estado=Tarea.EN_PROCESO, fecha_inicio__lt=limite)
+    agotadas = abandonadas.filter(intentos__gte=F('max_intentos')).update(
+        estado=Tarea.FALLIDA, error='El trabajador dejó de responder', fecha_fin=timezone.now(),
+    )
+    return agotadas + abandonadas.update(estado=Tarea.PENDIENTE, trabajador='', disponible_en=timezone.now())
+
+
+def trabajar(trabajador=None, lote=1, intervalo=1.0, vaciar=False, maximo=None, continuar=lambda: True):
+    """Ciclo de un proceso trabajador; devuelve cuántas tareas ejecutó.
+
+    Con `vaciar` termina cuando no quedan tareas disponibles; `continuar()` se
+    consulta entre tareas para detenerse de forma ordenada.
+    """
+    trabajador = trabajador or nombre_trabajador()
+    ejecutadas = 0
+    ultima_revision = 0
+    while continuar() and (maximo is None or ejecutadas < maximo):
+        try:
+            if time.monotonic() - ultima_revision > 60:
+                recuperar_abandonadas()
+                ultima_revision = time.monotonic()
+            reclamadas = reclamar(trabajador, lote)
+        except OperationalError as error:
+            # SQLite bloqueada por otro proceso: se vuelve a intentar enseguida
+            logger.info('Base de datos ocupada al reclamar tareas: %s', error)
+            time.sleep(random.uniform(0.01, 0.1))
+            continue
+        if not reclamadas:
+            # Otro proceso pudo ganar todas las candidatas: solo se termina si ya no hay disponibles
+            if vaciar and not Tarea.objects.filter(
+                estado=Tarea.PENDIENTE, disponible_en__lte=timezone.now()
+            ).exists():
+                break
+            time.sleep(intervalo)
+            continue
+        for registro in reclamadas:
+            ejecutar(registro)
+            ejecutadas += 1
+    return ejecutadas
+
+
+# ============================================
+# ADMINISTRACIÓN
+# ============================================
+
+def reintentar(tarea_id):
+    """Vuelve a encolar una tarea fallida con sus intentos en cero."""
+    return Tarea.objects.filter(pk=tarea_id, estado=Tarea.FALLIDA).update(
+        estado=Tarea.PENDIENTE, intentos=0, disponible_en=timezone.now(), trabajador='', fecha_fin=None,
+    )
+
+
+def cancelar(tarea_id):
+    """Marca como fallida una tarea que aún no empieza."""
+    return Tarea.objects.filter(pk=tarea_id, estado=Tarea.PENDIENTE).update(
+        estado=Tarea.FALLIDA, error='Cancelada desde el panel', fecha_fin=timezone.now(),
+    )
+
+
+def purgar(dias=7):
+    """Elimina las tareas completadas hace más de `dias` días."""
+    limite = timezone.now() - timedelta(days=dias)
+    return Tarea.objects.filter(estado=Tarea.COMPLETADA, fecha_fin__lt=limite).delete()[0]
+
+
+def resumen():
+    """Conteo por estado, antigüedad de la pendiente más vieja y completadas en la última hora."""
+    ahora = timezone.now()
+    por_estado = dict.fromkeys((e for e, _ in Tarea.ESTADOS), 0)
+    por_estado.update(Tarea.objects.values_list('estado').annotate(total=Count('id')).order_by())
+    mas_antigua = Tarea.objects.filter(estado=Tarea.PENDIENTE, disponible_en__lte=ahora).aggregate(
+        minimo=Min('disponible_en')
+    )['minimo']
+    return {
+        'por_estado': por_estado,
+        'espera_segundos': int((ahora - mas_antigua).total_seconds()) if mas_antigua else 0,
+        'completadas_hora': Tarea.objects.filter(
+            estado=Tarea.COMPLETADA, fecha_fin__gte=ahora - timedelta(hours=1)
+        ).count(),
+    }
+
+
+@tarea(prioridad=PRIORIDAD_BAJA, max_intentos=1)
+def eco(espera_ms=0, **datos):
+    """Tarea de prueba para `benchmark_tareas`: espera `espera_ms` y devuelve sus datos."""
+    if espera_ms:
+        time.sleep(espera_ms / 1000)
+    return datos
@@ -0,0 +1,52 @@
+from django import template
+from django.core.cache import cache
+
+from app_kasports import cache_tienda
+
+register = template.Library()
+
+
+class NodoCacheTarjeta(template.Node):
+    def __init__(self, nodelist, tipo, producto, variaciones):
+        self.nodelist = nodelist
+        self.tipo = tipo
+        self.producto = producto
+        self.variaciones = variaciones
+
+    def render(self, context):
+        clave = cache_tienda.clave_tarjeta(
+            self.tipo.resolve(context),
+            self.producto.resolve(context),
+            [v.resolve(context) for v in self.variaciones],
+        )
+        if clave is None:
+            return self.nodelist.render(context)
+        contenido = cache.get(clave)
+        if contenido is not None:
+            cache_tienda.contar('fragmentos', True)
+            return contenido
+        cache_tienda.contar('fragmentos', False)
+        contenido = self.nodelist.render(context)
+        cache.set(clave, contenido, cache_tienda.SEGUNDOS)
+        return contenido
+
+
+@register.tag
+def cache_tarjeta(parser, token):
+    """Cachea la tarjeta de un producto hasta que cambie el producto o su proveedor.
+
+    Uso: {% cache_tarjeta 'ropa' r campo query %} ... {% endcache_tarjeta %}
+    Los argumentos después del producto son variaciones adicionales de la clave.
+    El producto debe traer `version_cache` (ver `cache_tienda.adjuntar_versiones`).
+    """
+    partes = token.split_contents()
+    if len(partes) < 3:
+        raise template.TemplateSyntaxError(f"'{partes[0]}' requiere al menos el tipo y el producto")
+    nodelist = parser.parse(('endcache_tarjeta',))
+    parser.delete_first_token()
+    return NodoCacheTarjeta(
+        nodelist,
+        parser.compile_filter(partes[1]),
+        parser.compile_filter(partes[2]),
+        [parser.compile_filter(p) for p in partes[3:]],
+    )
@@ -0,0 +1,37 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from app_kasports import imagenes
+
+register = template.Library()
+
+# Ancho con que se muestran las tarjetas del catálogo (3 columnas, máximo 250px)
+SIZES_TARJETA = '(max-width: 600px) 70vw, 250px'
+
+
+@register.simple_tag
+def imagen_responsive(imagen, alt='', sizes=SIZES_TARJETA, clase='', estilo='', carga='lazy'):
+    """`<picture>` con las variantes AVIF/WebP de una imagen y el original como respaldo.
+
+    Uso: {% imagen_responsive r.imagen r.modelo %}
+         {% imagen_responsive p.imagen p.nombre sizes='96px' estilo='height:50px' %}
+    Las imágenes visibles al cargar la página deben usar carga='eager'.
+    Mientras no existan variantes (ver `imagenes.py`) se emite solo el `<img>` original.
+    """
+    if not imagen:
+        return ''
+    atributos = format_html(
+        ' alt="{}" loading="{}" decoding="async"{}{}', alt, carga,
+        format_html(' class="{}"', clase) if clase else '',
+        format_html(' style="{}"', estilo) if estilo else '',
+    )
+    datos = imagenes.variantes(imagen.name)
+    if not datos:
+        return format_html('<img src="{}"{}>', imagen.url, atributos)
+    fuentes = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">', ((tipo, srcset, sizes) for tipo, srcset in datos['fuentes'])
+    )
+    return format_html(
+        '<picture>{}<img src="{}" width="{}" height="{}"{}></picture>',
+        fuentes, imagen.url, datos['ancho'], datos['alto'], atributos,
+    )
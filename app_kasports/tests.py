@@ -1,3 +1,1705 @@
-from django.test import TestCase
+"""Pruebas de la aplicación KA.Sports (`python manage.py test app_kasports`).
 
-# Create your tests here.
+Los comandos `benchmark_*`, `estres_checkout` y `carga_checkout` miden con
+volúmenes grandes; aquí se verifican las mismas garantías con datos pequeños.
+"""
+import asyncio
+import csv
+import importlib
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.template import Context, Template
+from django.test import (
+    AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, reverse
+from django.utils import timezone
+
+from . import (
+    busqueda, cache_tienda, carritos, catalogo, estaticos, exportaciones, facetas, imagenes, importacion,
+    instrumentacion, metricas, paginacion, precios, reservas, roles, tallas, tareas, views, vistas_async,
+)
+from .bench import percentiles, sembrar_cliente, sembrar_productos, sembrar_proveedores
+from .carritos import CarritoCliente, LineaSesion
+from .catalogo import MODELOS_CATALOGO, ORDENES
+from .management.commands.benchmark_tienda import Command as BenchmarkTienda
+from .management.commands.verificar_planes import consultas_de_orden, ordena_sin_indice, plan
+from .models import (
+    Administrador, Carrito, Cliente, ContadorMetrica, DetalleCarrito, DetalleEntrega, InventarioTalla, LineaPedido,
+    MensajeContacto, ProductoCatalogo, ReservaStock, Ropa, Tarea, Venta,
+)
+
+
+def crear_ropa(proveedor, stock, tallas=None, precio=Decimal('500.00'), **campos):
+    return Ropa.objects.create(
+        proveedor=proveedor, modelo=campos.pop('modelo', 'Playera prueba'), color=campos.pop('color', 'Negro'),
+        estilo='Casual', genero=campos.pop('genero', 'Unisex'), precio=precio, stock=stock,
+        tallas_disponibles=tallas, **campos,
+    )
+
+
+# ============================================
+# CATÁLOGO UNIFICADO
+# ============================================
+
+class CatalogoTests(TestCase):
+    """`ProductoCatalogo` sigue a Ropa, Tenis y Gorra y resuelve los listados cruzados."""
+
+    def setUp(self):
+        self.proveedor = sembrar_proveedores(1, prefijo='CATALOGO')[0]
+
+    def crear(self, tipo, precio, stock=5, **campos):
+        extra = {'ropa': {'estilo': 'Casual'}, 'tenis': {'estilo': 'Running'},
+                 'gorra': {'coleccion': 'Base', 'silueta': 'Curva', 'visera': 'Curva', 'broche': 'Velcro'}}[tipo]
+        return MODELOS_CATALOGO[tipo].objects.create(
+            proveedor=self.proveedor, modelo=campos.pop('modelo', f'{tipo} {precio}'), color='Negro', genero='Unisex',
+            precio=Decimal(precio), stock=stock, **extra, **campos,
+        )
+
+    def entrada(self, tipo, producto):
+        return ProductoCatalogo.objects.get(tipo=tipo, producto_id=producto.pk)
+
+    def test_la_entrada_sigue_al_producto_y_al_proveedor(self):
+        gorra = self.crear('gorra', '450.00', tallas_disponibles='U:5')
+        entrada = self.entrada('gorra', gorra)
+        self.assertEqual(
+            (entrada.modelo, entrada.precio, entrada.stock, entrada.proveedor_nombre, entrada.silueta),
+            (gorra.modelo, Decimal('450.00'), 5, self.proveedor.nombre, 'Curva'),
+        )
+
+        gorra.precio, gorra.stock = Decimal('399.00'), 2
+        gorra.save()
+        entrada.refresh_from_db()
+        self.assertEqual((entrada.precio, entrada.stock, entrada.tallas_disponibles), (Decimal('399.00'), 2, 'U'))
+
+        self.proveedor.nombre = 'Marca nueva'
+        self.proveedor.save()
+        self.assertEqual(self.entrada('gorra', gorra).proveedor_nombre, 'Marca nueva')
+
+        gorra.delete()
+        self.assertFalse(ProductoCatalogo.objects.filter(tipo='gorra').exists())
+
+    def test_top_por_tipo_en_una_consulta(self):
+        for tipo in MODELOS_CATALOGO:
+            for precio in ('100.00', '300.00', '200.00', '400.00'):
+                self.crear(tipo, precio)
+            self.crear(tipo, '999.00', stock=0)
+
+        with self.assertNumQueries(1):
+            top = catalogo.top_por_tipo(3)
+
+        for tipo in MODELOS_CATALOGO:
+            with self.subTest(tipo=tipo):
+                self.assertEqual([str(e.precio) for e in top[tipo]], ['400.00', '300.00', '200.00'])
+                self.assertTrue(all(e.tipo == tipo and e.stock > 0 for e in top[tipo]))
+
+    def test_reconstruir_catalogo(self):
+        ropa = self.crear('ropa', '250.00', modelo='Chaleco reconstruido')
+        tenis = self.crear('tenis', '1800.00')
+        ProductoCatalogo.objects.all().delete()
+
+        call_command('reconstruir_catalogo', stdout=io.StringIO())
+
+        self.assertEqual(ProductoCatalogo.objects.count(), 2)
+        self.assertEqual(self.entrada('tenis', tenis).precio, Decimal('1800.00'))
+        # El índice de búsqueda apunta a las entradas nuevas
+        self.assertEqual(busqueda.buscar('chaleco'), [ropa.pk])
+
+
+# ============================================
+# RESERVAS CONCURRENTES
+# ============================================
+
+class ReservasConcurrentesTests(TransactionTestCase):
+    """Muchos carritos apartan a la vez el mismo producto con existencias limitadas."""
+
+    HILOS = 12
+    INTENTOS = 200
+
+    def setUp(self):
+        self.producto = crear_ropa(sembrar_proveedores(1, prefijo='RESERVAS')[0], stock=10, tallas='M:6,L:4')
+        self.detalles = []
+        for i in range(self.HILOS):
+            cliente = sembrar_cliente(f'reservas_{i}')
+            carrito = Carrito.objects.create(cliente=cliente, estado='Activo')
+            self.detalles.append(DetalleCarrito.objects.create(
+                carrito=carrito, ropa=self.producto, talla_seleccionada='M', cantidad=1, subtotal='500.00',
+            ))
+
+    def reservar_en_paralelo(self, cantidades):
+        """Lanza una reserva por hilo y devuelve el total de unidades apartadas."""
+        barrera = threading.Barrier(len(cantidades))
+
+        def reservar(detalle, cantidad):
+            try:
+                barrera.wait(timeout=10)
+                for _ in range(self.INTENTOS):
+                    try:
+                        reservas.reservar(detalle, cantidad)
+                        return cantidad
+                    except reservas.StockInsuficiente:
+                        return 0
+                    except OperationalError:
+                        # SQLite: "database is locked" al pasar de lectura a escritura; la
+                        # transacción se revirtió completa y se vuelve a intentar
+                        time.sleep(0.01)
+                raise AssertionError('La reserva no obtuvo el candado de escritura')
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(cantidades)) as ejecutor:
+            return sum(ejecutor.map(reservar, self.detalles, cantidades))
+
+    def verificar_existencias(self, apartadas, inicial_talla=6, inicial=10):
+        producto = Ropa.objects.get(pk=self.producto.pk)
+        talla = InventarioTalla.objects.get(tipo='ropa', producto_id=self.producto.pk, talla='M')
+        catalogo = ProductoCatalogo.objects.get(tipo='ropa', producto_id=self.producto.pk)
+        en_reservas = sum(ReservaStock.objects.values_list('cantidad', flat=True))
+
+        self.assertGreaterEqual(producto.stock, 0)
+        self.assertGreaterEqual(talla.stock, 0)
+        self.assertEqual(en_reservas, apartadas)
+        self.assertEqual(producto.stock, inicial - apartadas)
+        self.assertEqual(talla.stock, inicial_talla - apartadas)
+        self.assertEqual(catalogo.stock, producto.stock)
+
+    def test_no_se_aparta_mas_que_la_talla(self):
+        apartadas = self.reservar_en_paralelo([1] * self.HILOS)
+        self.assertEqual(apartadas, 6)
+        self.verificar_existencias(apartadas)
+
+    def test_cantidades_distintas_suman_lo_apartado(self):
+        apartadas = self.reservar_en_paralelo([1 + i % 3 for i in range(self.HILOS)])
+        # Cada hilo aparta 1, 2 o 3: al final quedan menos de 3 unidades libres en la talla
+        self.assertGreater(apartadas, 3)
+        self.assertLessEqual(apartadas, 6)
+        self.verificar_existencias(apartadas)
+
+
+# ============================================
+# CONFIRMAR PEDIDO
+# ============================================
+
+class ConfirmarPedidoTests(TestCase):
+    """El pedido cobra, descuenta y copia las líneas que tiene el carrito al completarse."""
+
+    def setUp(self):
+        proveedor = sembrar_proveedores(1, prefijo='CONFIRMAR')[0]
+        self.productos = [crear_ropa(proveedor, stock=10, precio=Decimal(p), modelo=f'Playera {p}')
+                          for p in ('300.00', '450.00', '700.00')]
+        self.cliente = sembrar_cliente('confirmar')
+        self.client.force_login(self.cliente.user)
+        carrito = CarritoCliente(self.cliente)
+        carrito.agregar('ropa', self.productos[0], None, 1)
+        carrito.agregar('ropa', self.productos[1], None, 2)
+
+    def confirmar(self, antes=None):
+        """Confirma el pedido; `antes(carrito)` corre justo antes de completar el carrito."""
+        original = reservas.confirmar
+
+        def confirmar(carrito):
+            if antes:
+                antes(carrito)
+            return original(carrito)
+
+        with mock.patch.object(reservas, 'confirmar', side_effect=confirmar):
+            return self.client.post(reverse('app_kasports:confirmar_pedido'), {'metodo_pago': 'Tarjeta'})
+
+    def test_linea_agregada_antes_de_confirmar_se_cobra(self):
+        # Otra pestaña agrega una línea después de que la vista vio el carrito
+        self.confirmar(antes=lambda carrito: CarritoCliente(self.cliente).agregar('ropa', self.productos[2], None, 3))
+
+        venta = Venta.objects.get(cliente=self.cliente)
+        self.assertEqual(venta.subtotal, Decimal('3300.00'))
+        self.assertEqual(venta.carrito.estado, 'Completado')
+        self.assertEqual(sum(venta.carrito.detalles.values_list('subtotal', flat=True)), venta.subtotal)
+        self.assertEqual(sorted(venta.lineas.values_list('cantidad', flat=True)), [1, 2, 3])
+        self.assertEqual(sum(venta.lineas.values_list('subtotal', flat=True)), venta.subtotal)
+        self.assertEqual([Ropa.objects.get(pk=p.pk).stock for p in self.productos], [9, 8, 7])
+        self.assertFalse(ReservaStock.objects.exists())
+
+    def test_carrito_vaciado_antes_de_confirmar(self):
+        respuesta = self.confirmar(antes=lambda carrito: carrito.detalles.all().delete())
+        self.assertRedirects(respuesta, reverse('app_kasports:carrito'), fetch_redirect_response=False)
+        self.assertFalse(Venta.objects.exists())
+        # La transacción se revirtió: el carrito sigue activo
+        self.assertEqual(Carrito.objects.get(cliente=self.cliente).estado, 'Activo')
+
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_copia_del_pedido_no_cambia_con_el_catalogo(self):
+        self.confirmar()
+        venta = Venta.objects.get(cliente=self.cliente)
+        copia = list(venta.lineas.values_list('nombre', 'precio_unitario', 'cantidad', 'subtotal'))
+        nombres = [n for n, _, _, _ in copia]
+
+        editado, borrado = self.productos[0], self.productos[1]
+        editado.modelo, editado.precio = 'Modelo renombrado', Decimal('999.00')
+        editado.save()
+        borrado_id = borrado.pk
+        borrado.delete()
+
+        self.assertEqual(list(venta.lineas.values_list('nombre', 'precio_unitario', 'cantidad', 'subtotal')), copia)
+        self.assertEqual(LineaPedido.objects.get(venta=venta, nombre=nombres[1]).producto_id, borrado_id)
+        respuesta = self.client.get(reverse('app_kasports:historial_pedidos'))
+        self.assertEqual(respuesta.status_code, 200)
+        for nombre in nombres:
+            self.assertContains(respuesta, nombre)
+        self.assertNotContains(respuesta, 'Modelo renombrado')
+
+
+# ============================================
+# FUSIÓN DEL CARRITO AL INICIAR SESIÓN
+# ============================================
+
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class FusionarCarritoTests(TestCase):
+    """Lo que un visitante agrega antes de iniciar sesión pasa a su carrito y se aparta."""
+
+    def setUp(self):
+        proveedor = sembrar_proveedores(1, prefijo='FUSIONAR')[0]
+        self.playera = crear_ropa(proveedor, stock=10, tallas='M:6,L:4', modelo='Playera fusión')
+        self.sudadera = crear_ropa(proveedor, stock=3, modelo='Sudadera escasa')
+        self.cliente = sembrar_cliente('fusionar')
+        self.cliente.user.set_password('clave-fusionar')
+        self.cliente.user.save()
+
+    def agregar(self, producto, cantidad, talla=''):
+        respuesta = self.client.post(
+            reverse('app_kasports:agregar_carrito', args=['ropa', producto.pk]), {'cantidad': cantidad, 'talla': talla},
+        )
+        self.assertEqual(respuesta.status_code, 302)
+
+    def iniciar_sesion(self):
+        respuesta = self.client.post(
+            reverse('app_kasports:login'), {'username': 'fusionar', 'password': 'clave-fusionar'}, follow=True,
+        )
+        return [str(m) for m in respuesta.context['messages'] if m.level_tag == 'warning']
+
+    def lineas(self):
+        carrito = Carrito.objects.get(cliente=self.cliente, estado='Activo')
+        return {
+            (d.ropa.modelo, d.talla_seleccionada or None): (d.cantidad, d.subtotal, d.reserva.cantidad)
+            for d in carrito.detalles.select_related('ropa', 'reserva')
+        }
+
+    def test_lineas_de_sesion_pasan_al_carrito_del_cliente(self):
+        # Línea que el cliente ya tenía en su carrito (con su reserva)
+        CarritoCliente(self.cliente).agregar('ropa', self.playera, 'M', 1)
+        self.agregar(self.playera, 2, 'M')
+        self.agregar(self.playera, 1, 'L')
+        self.agregar(self.sudadera, 1)
+        # El carrito de sesión no aparta stock
+        self.assertEqual(ReservaStock.objects.count(), 1)
+
+        self.assertEqual(self.iniciar_sesion(), [])
+
+        self.assertEqual(self.lineas(), {
+            ('Playera fusión', 'M'): (3, Decimal('1500.00'), 3),
+            ('Playera fusión', 'L'): (1, Decimal('500.00'), 1),
+            ('Sudadera escasa', None): (1, Decimal('500.00'), 1),
+        })
+        self.assertEqual(Carrito.objects.filter(cliente=self.cliente).count(), 1)
+        self.assertEqual(tallas.existencias_por_talla('ropa', self.playera.pk), {'M': 3, 'L': 3})
+        self.assertEqual(Ropa.objects.get(pk=self.playera.pk).stock, 6)
+        self.assertEqual(Ropa.objects.get(pk=self.sudadera.pk).stock, 2)
+        self.assertNotIn(carritos.SESION_CARRITO, self.client.session)
+
+    def test_sin_stock_suficiente_se_recorta_o_se_quita(self):
+        self.agregar(self.sudadera, 3)
+        self.agregar(self.playera, 4, 'L')
+        # Mientras tanto otros clientes apartan casi todo
+        CarritoCliente(sembrar_cliente('otro_1')).agregar('ropa', self.sudadera, None, 2)
+        CarritoCliente(sembrar_cliente('otro_2')).agregar('ropa', self.playera, 'L', 4)
+
+        avisos = self.iniciar_sesion()
+
+        self.assertEqual(avisos, [
+            'Sudadera escasa: solo quedan 1 disponibles',
+            'Playera fusión se quitó del carrito por falta de stock',
+        ])
+        self.assertEqual(self.lineas(), {('Sudadera escasa', None): (1, Decimal('500.00'), 1)})
+        self.assertEqual(Ropa.objects.get(pk=self.sudadera.pk).stock, 0)
+        self.assertEqual(tallas.existencias_por_talla('ropa', self.playera.pk)['L'], 0)
+        self.assertEqual(sum(ReservaStock.objects.values_list('cantidad', flat=True)), 7)
+
+
+# ============================================
+# PRESUPUESTO DE CONSULTAS
+# ============================================
+
+@override_settings(
+    KASPORTS_INSTRUMENTAR_CONSULTAS=True, KASPORTS_PRESUPUESTO_ESTRICTO=True, KASPORTS_REPORTE_CONSULTAS='',
+    # Sin `collectstatic` no existe el manifiesto de los estáticos con hash
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class PresupuestoConsultasTests(TestCase):
+    """Las vistas principales no rebasan `KASPORTS_PRESUPUESTO_CONSULTAS`.
+
+    Con el modo estricto el middleware lanza `PresupuestoExcedido`, que el
+    cliente de pruebas propaga como error de la prueba.
+    """
+
+    def setUp(self):
+        cache.clear()
+        proveedores = sembrar_proveedores(3, prefijo='PRESUPUESTO')
+        for tipo in ('ropa', 'tenis', 'gorra'):
+            sembrar_productos(30, tipo=tipo, proveedores=proveedores)
+        self.cliente = sembrar_cliente('presupuesto')
+        # El cliente se crea dentro de override_settings para que cargue el middleware
+        self.client = Client()
+        self.client.force_login(self.cliente.user)
+
+    def tearDown(self):
+        instrumentacion.reporte.vistas.clear()
+
+    def consultas(self, respuesta):
+        """Consultas de la petición según la cabecera `Server-Timing` del middleware."""
+        return int(re.search(r'"(\d+) consultas"', respuesta['Server-Timing']).group(1))
+
+    def calentar(self, url):
+        """Primera petición, que llena la caché; el presupuesto es el de las siguientes."""
+        with self.settings(KASPORTS_PRESUPUESTO_ESTRICTO=False):
+            self.client.get(url)
+
+    def llenar_carrito(self, lineas):
+        carrito = CarritoCliente(self.cliente)
+        for producto in Ropa.objects.filter(stock__gt=0)[:lineas]:
+            carrito.agregar('ropa', producto, None, 1)
+
+    def test_listados_en_caliente(self):
+        for nombre in ('index_cliente', 'productos', 'ropa_lista', 'tenis_lista', 'gorras_lista', 'proveedores_lista'):
+            with self.subTest(vista=nombre):
+                url = reverse(f'app_kasports:{nombre}')
+                self.calentar(url)
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_listado_con_facetas_y_orden(self):
+        url = reverse('app_kasports:ropa_lista') + '?genero=Unisex&orden=precio'
+        self.calentar(url)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_carrito_no_depende_del_numero_de_lineas(self):
+        url = reverse('app_kasports:carrito')
+        self.llenar_carrito(1)
+        self.calentar(url)
+        una = self.client.get(url)
+        self.llenar_carrito(6)
+        self.calentar(url)
+        seis = self.client.get(url)
+        self.assertEqual(seis.status_code, 200)
+        self.assertEqual(self.consultas(seis), self.consultas(una))
+
+    def confirmar(self, lineas):
+        self.llenar_carrito(lineas)
+        respuesta = self.client.post(reverse('app_kasports:confirmar_pedido'), {'metodo_pago': 'Tarjeta'})
+        self.assertRedirects(respuesta, reverse('app_kasports:historial_pedidos'), fetch_redirect_response=False)
+        return self.consultas(respuesta)
+
+    def test_confirmar_pedido_no_depende_del_numero_de_lineas(self):
+        # El primer pedido del día crea el resumen diario; se compara desde el segundo.
+        # Los contadores se suman en un solo UPDATE aunque una línea sí cobre envío
+        self.confirmar(1)
+        self.assertEqual(self.confirmar(6), self.confirmar(1))
+        self.assertEqual(sum(Ropa.objects.values_list('ventas_totales', flat=True)), 8)
+
+    def test_presupuesto_excedido(self):
+        with self.settings(KASPORTS_PRESUPUESTO_CONSULTAS={'app_kasports:carrito': 1}):
+            with self.assertRaises(instrumentacion.PresupuestoExcedido):
+                self.client.get(reverse('app_kasports:carrito'))
+
+
+# ============================================
+# MÉTRICAS DEL TABLERO
+# ============================================
+
+class MetricasTests(TestCase):
+    """Los contadores que ajustan las señales coinciden con `reconciliar_metricas`."""
+
+    def setUp(self):
+        proveedor = sembrar_proveedores(1, prefijo='METRICAS')[0]
+        self.ropa = crear_ropa(proveedor, stock=20, precio=Decimal('350.00'))
+        metricas.reconciliar()
+
+    def vender(self, usuario, cantidad):
+        cliente = sembrar_cliente(usuario)
+        self.client.force_login(cliente.user)
+        CarritoCliente(cliente).agregar('ropa', self.ropa, None, cantidad)
+        respuesta = self.client.post(reverse('app_kasports:confirmar_pedido'), {'metodo_pago': 'Tarjeta'})
+        self.assertEqual(respuesta.status_code, 302)
+        return Venta.objects.get(cliente=cliente)
+
+    def verificar(self):
+        calculados, _ = metricas.calcular()
+        guardados = dict(ContadorMetrica.objects.values_list('nombre', 'valor'))
+        self.assertEqual({n: Decimal(v) for n, v in calculados.items()}, guardados)
+        call_command('reconciliar_metricas', verificar=True, stdout=io.StringIO())
+
+    def test_contadores_tras_crear_cancelar_y_borrar_ventas(self):
+        primera = self.vender('metricas_1', 2)
+        segunda = self.vender('metricas_2', 3)
+        self.verificar()
+        self.assertEqual(ContadorMetrica.objects.get(nombre='unidades_ropa').valor, 5)
+
+        primera.estado = 'Cancelado'
+        primera.costo_envio += Decimal('50.00')
+        primera.total += Decimal('50.00')
+        primera.save()
+        self.verificar()
+
+        segunda.delete()
+        self.verificar()
+        self.assertEqual(ContadorMetrica.objects.get(nombre='ventas').valor, 1)
+
+    def test_un_solo_update_para_varios_contadores(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            metricas.sumar(ventas=1, ingresos=Decimal('10.50'), unidades_ropa=0)
+        self.assertEqual(len(capturadas.captured_queries), 1)
+        valores = dict(ContadorMetrica.objects.values_list('nombre', 'valor'))
+        self.assertEqual((valores['ventas'], valores['ingresos'], valores['unidades_ropa']),
+                         (Decimal('1'), Decimal('10.50'), Decimal('0')))
+
+
+# ============================================
+# CARRITO EN LOTE
+# ============================================
+
+class CarritoLoteTests(TestCase):
+    """Cada cambio del lote se aplica o se revierte por separado."""
+
+    def setUp(self):
+        proveedor = sembrar_proveedores(1, prefijo='LOTE')[0]
+        self.cliente = sembrar_cliente('lote')
+        self.client.force_login(self.cliente.user)
+        carrito = CarritoCliente(self.cliente)
+        self.poca = carrito.agregar('ropa', crear_ropa(proveedor, stock=2), None, 1)[0]
+        self.mucha = carrito.agregar('ropa', crear_ropa(proveedor, stock=20), None, 1)[0]
+
+    def lote(self, lineas):
+        return self.client.post(reverse('app_kasports:api_carrito_lote'), {'lineas': lineas},
+                                content_type='application/json').json()
+
+    def test_un_error_no_revierte_las_demas(self):
+        datos = self.lote([{'id': self.mucha.id, 'cantidad': 5}, {'id': self.poca.id, 'cantidad': 9},
+                           {'id': 999999, 'cantidad': 0}])
+        self.assertEqual([l['id'] for l in datos['actualizadas']], [self.mucha.id])
+        self.assertEqual([e['id'] for e in datos['errores']], [self.poca.id, 999999])
+        self.assertEqual(datos['errores'][0]['disponible'], 2)
+
+        self.assertEqual(DetalleCarrito.objects.get(pk=self.mucha.id).cantidad, 5)
+        self.assertEqual(DetalleCarrito.objects.get(pk=self.poca.id).cantidad, 1)
+        self.assertEqual(ReservaStock.objects.get(detalle_id=self.mucha.id).cantidad, 5)
+        self.assertEqual(ReservaStock.objects.get(detalle_id=self.poca.id).cantidad, 1)
+        self.assertEqual(Ropa.objects.get(pk=self.poca.ropa_id).stock, 1)
+
+    def test_quitar_linea(self):
+        datos = self.lote([{'id': self.poca.id, 'cantidad': 0}])
+        self.assertEqual(datos['eliminadas'], [self.poca.id])
+        self.assertFalse(DetalleCarrito.objects.filter(pk=self.poca.id).exists())
+        self.assertEqual(Ropa.objects.get(pk=self.poca.ropa_id).stock, 2)
+
+
+# ============================================
+# API DE PRODUCTOS
+# ============================================
+
+class ApiProductosTests(TestCase):
+    """Filtros de la API de productos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        proveedor = sembrar_proveedores(1, prefijo='API')[0]
+        for precio in ('100.00', '600.00', '1200.00'):
+            crear_ropa(proveedor, stock=3, precio=precio)
+
+    def get(self, **parametros):
+        cabeceras = {k: parametros.pop(k) for k in list(parametros) if k.startswith('HTTP_')}
+        return self.client.get(reverse('app_kasports:api_productos', args=['ropa']), parametros, **cabeceras)
+
+    def test_rango_de_precio(self):
+        datos = self.get(precio_min='500', precio_max='1000', fields='precio').json()
+        self.assertEqual([fila['precio'] for fila in datos['resultados']], ['600.00'])
+
+    def test_precio_no_finito(self):
+        for valor in ('nan', 'NaN', 'sNaN', '-snan', 'inf', '-Infinity', 'abc'):
+            for nombre in ('precio_min', 'precio_max'):
+                with self.subTest(nombre=nombre, valor=valor):
+                    respuesta = self.get(**{nombre: valor})
+                    self.assertEqual(respuesta.status_code, 400)
+                    self.assertIn(nombre, respuesta.json()['error'])
+
+    def test_proveedor_fuera_de_rango(self):
+        for valor in ('1' * 30, f'1,{2 ** 63}', f'-{2 ** 63 + 1}', 'x'):
+            with self.subTest(valor=valor):
+                respuesta = self.get(proveedor=valor)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn('proveedor', respuesta.json()['error'])
+
+    def test_cursor_fuera_de_rango(self):
+        for valores in ([10 ** 30], [2 ** 63], ['5'], [1, 2]):
+            with self.subTest(valores=valores):
+                cursor = paginacion.codificar({'d': paginacion.SIGUIENTE, 'v': valores})
+                respuesta = self.get(cursor=cursor)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertIn('cursor', respuesta.json()['error'])
+
+    def test_cursor_avanza(self):
+        primera = self.get(limite='2', fields='id').json()
+        segunda = self.get(limite='2', fields='id', cursor=primera['siguiente']).json()
+        self.assertEqual(len(primera['resultados']) + len(segunda['resultados']), 3)
+        self.assertGreater(segunda['resultados'][0]['id'], primera['resultados'][-1]['id'])
+
+    def test_etag_cambia_con_la_tabla(self):
+        primera = self.get(fields='precio')
+        self.assertEqual(self.get(fields='precio', HTTP_IF_NONE_MATCH=primera['ETag']).status_code, 304)
+        Ropa.objects.first().save()
+        self.assertEqual(self.get(fields='precio', HTTP_IF_NONE_MATCH=primera['ETag']).status_code, 200)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_sin_etag_con_cache_por_proceso(self):
+        self.assertFalse(self.get().has_header('ETag'))
+
+
+# ============================================
+# FACETAS
+# ============================================
+
+class FacetasTests(TestCase):
+    """Selección y conteo de las facetas del listado de ropa."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.proveedores = sembrar_proveedores(2, prefijo='FACETAS')
+        crear_ropa(cls.proveedores[0], stock=3, genero='Femenino', precio='400.00')
+        crear_ropa(cls.proveedores[0], stock=3, genero='Masculino', precio='1500.00')
+        crear_ropa(cls.proveedores[1], stock=3, genero='Femenino', precio='800.00')
+
+    def setUp(self):
+        cache.clear()
+
+    def filtrar(self, consulta):
+        request = RequestFactory().get('/ropa/?' + consulta)
+        listado, datos = facetas.filtrar(request, 'ropa', Ropa.objects.filter(stock__gt=0))
+        conteos = {g['nombre']: {o['valor']: o['n'] for o in g['opciones']} for g in datos['grupos']}
+        return listado, conteos
+
+    def test_proveedor_no_numerico_se_ignora(self):
+        proveedor = self.proveedores[1].pk
+        for valor in ('²', '١', 'x', '-1', '9' * 30):
+            with self.subTest(valor=valor):
+                seleccion = facetas.Seleccion(RequestFactory().get('/ropa/', {'proveedor': [valor, str(proveedor)]}))
+                esperados = [proveedor] + ([1] if valor == '١' else [])
+                self.assertEqual(seleccion.valores['proveedor'], sorted(esperados))
+
+    def test_cada_faceta_se_cuenta_sin_su_filtro(self):
+        listado, conteos = self.filtrar('genero=Femenino')
+        self.assertEqual(listado.count(), 2)
+        self.assertEqual(conteos['genero'], {'Femenino': 2, 'Masculino': 1})
+        self.assertEqual(conteos['proveedor'], {self.proveedores[0].pk: 1, self.proveedores[1].pk: 1})
+
+
+# ============================================
+# MATRIZ DE TALLAS
+# ============================================
+
+class TallasTests(TestCase):
+    """Texto de tallas, filas de `InventarioTalla` y el filtro por talla."""
+
+    def setUp(self):
+        cache.clear()
+        self.proveedor = sembrar_proveedores(1, prefijo='TALLAS')[0]
+
+    def existencias(self, producto):
+        return tallas.existencias_por_talla('ropa', producto.pk)
+
+    def test_parsear_tallas(self):
+        self.assertEqual(tallas.parsear_tallas('S:4,M'), [('S', 4), ('M', None)])
+        self.assertEqual(
+            tallas.parsear_tallas(' XL : 2 ,, M:x, XL:9, :3, L:-1 '),
+            [('XL', 2), ('M', None), ('L', 0)],
+        )
+        self.assertEqual(tallas.parsear_tallas(None), [])
+
+    def test_guardar_normaliza_texto_y_stock(self):
+        producto = crear_ropa(self.proveedor, stock=10, tallas='S:4,M')
+        producto.refresh_from_db()
+        self.assertEqual((producto.tallas_disponibles, producto.stock), ('S,M', 10))
+        self.assertEqual(self.existencias(producto), {'S': 4, 'M': 6})
+
+        # Ya normalizado, el texto no trae cantidades: el cambio de stock se reparte entre las tallas
+        producto.stock = 12
+        producto.save()
+        self.assertEqual(self.existencias(producto), {'S': 5, 'M': 7})
+
+        # Cantidades explícitas mandan sobre el stock capturado
+        producto.tallas_disponibles, producto.stock = 'S:1,M:2,L', 5
+        producto.save()
+        producto.refresh_from_db()
+        self.assertEqual(self.existencias(producto), {'S': 1, 'M': 2, 'L': 2})
+        self.assertEqual((producto.tallas_disponibles, producto.stock), ('S,M,L', 5))
+        self.assertEqual(ProductoCatalogo.objects.get(tipo='ropa', producto_id=producto.pk).stock, 5)
+
+        # Una talla que se quita del texto pierde su fila
+        producto.tallas_disponibles = 'S,M'
+        producto.save()
+        self.assertEqual(set(self.existencias(producto)), {'S', 'M'})
+        self.assertEqual(sum(self.existencias(producto).values()), Ropa.objects.get(pk=producto.pk).stock)
+
+        producto.tallas_disponibles = ''
+        producto.save()
+        self.assertEqual(self.existencias(producto), {})
+
+    def test_filtro_con_todas_las_tallas(self):
+        ambas = crear_ropa(self.proveedor, stock=4, tallas='S:2,M:2', modelo='Ambas')
+        solo_s = crear_ropa(self.proveedor, stock=3, tallas='S:3', modelo='Solo S')
+        crear_ropa(self.proveedor, stock=2, tallas='S:2,M:0', modelo='M agotada')
+
+        def modelos(consulta):
+            listado, _ = facetas.filtrar(RequestFactory().get('/ropa/?' + consulta), 'ropa', Ropa.objects.all())
+            return set(listado.values_list('modelo', flat=True))
+
+        self.assertEqual(modelos('talla=M'), {ambas.modelo})
+        self.assertEqual(modelos('talla=S&talla=M'), {ambas.modelo, solo_s.modelo, 'M agotada'})
+        self.assertEqual(modelos('talla=S&talla=M&talla_modo=todas'), {ambas.modelo})
+        self.assertEqual(modelos('talla=XL&talla_modo=todas'), set())
+
+
+# ============================================
+# BÚSQUEDA DE TEXTO COMPLETO
+# ============================================
+
+class BusquedaTests(TestCase):
+    """Índice FTS5 del catálogo: acentos, ranking y sincronización con los productos."""
+
+    def setUp(self):
+        self.proveedor = sembrar_proveedores(1, prefijo='BUSQUEDA')[0]
+
+    def test_usa_el_indice_fts_en_sqlite(self):
+        self.assertEqual(busqueda.usa_fts(), connection.vendor == 'sqlite')
+
+    def test_ignora_acentos_y_mayusculas(self):
+        con_acento = crear_ropa(self.proveedor, stock=1, modelo='Camíseta Dry')
+        sin_acento = crear_ropa(self.proveedor, stock=1, modelo='CAMISETA Polo')
+        crear_ropa(self.proveedor, stock=1, modelo='Sudadera')
+        esperados = sorted([con_acento.pk, sin_acento.pk])
+        for consulta in ('camiseta', 'camíseta', 'Camiséta', 'cami'):
+            with self.subTest(consulta=consulta):
+                self.assertEqual(sorted(busqueda.buscar(consulta, tipo='ropa')), esperados)
+        self.assertEqual(busqueda.buscar('camiseta polo'), [sin_acento.pk])
+
+    def test_el_modelo_pesa_mas_que_el_color_y_el_proveedor(self):
+        en_color = crear_ropa(self.proveedor, stock=1, modelo='Sudadera basica', color='Marino')
+        en_modelo = crear_ropa(self.proveedor, stock=1, modelo='Sudadera marino', color='Gris')
+        self.proveedor.nombre = 'Marino Sports'
+        self.proveedor.save()
+        otro = sembrar_proveedores(1, prefijo='OTRO')[0]
+        otro.nombre = 'Marino Textil'
+        otro.save()
+        en_proveedor = crear_ropa(otro, stock=1, modelo='Sudadera lisa', color='Gris')
+
+        ids = busqueda.buscar('marino', tipo='ropa')
+        self.assertEqual(ids[0], en_modelo.pk)
+        self.assertEqual(set(ids), {en_modelo.pk, en_color.pk, en_proveedor.pk})
+        # Sin stock no aparece en los listados públicos
+        Ropa.objects.filter(pk=en_modelo.pk).update(stock=0)
+        ProductoCatalogo.objects.filter(tipo='ropa', producto_id=en_modelo.pk).update(stock=0)
+        self.assertNotIn(en_modelo.pk, busqueda.buscar('marino', tipo='ropa', solo_en_stock=True))
+
+    def test_indice_sigue_a_los_productos(self):
+        producto = crear_ropa(self.proveedor, stock=1, modelo='Chamarra vintage')
+        self.assertEqual(busqueda.buscar('vintage'), [producto.pk])
+
+        producto.modelo = 'Chamarra clásica'
+        producto.save()
+        self.assertEqual(busqueda.buscar('vintage'), [])
+        self.assertEqual(busqueda.buscar('clasica'), [producto.pk])
+
+        self.proveedor.nombre = 'Marca Renombrada'
+        self.proveedor.save()
+        self.assertEqual(busqueda.buscar('renombrada'), [producto.pk])
+
+        producto.delete()
+        self.assertEqual(busqueda.buscar('clasica'), [])
+        self.assertEqual(busqueda.buscar('renombrada'), [])
+
+
+# ============================================
+# CACHÉ DE LA TIENDA
+# ============================================
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class CacheTiendaTests(TestCase):
+    """Versiones de la caché, páginas anónimas, tarjetas y token CSRF de las páginas guardadas."""
+
+    def setUp(self):
+        cache.clear()
+        self.producto = crear_ropa(sembrar_proveedores(1, prefijo='CACHE')[0], stock=5, modelo='Playera original')
+        self.url = reverse('app_kasports:ropa_lista')
+
+    def version(self, nombre):
+        return cache_tienda.versiones([nombre])[nombre]
+
+    def test_guardar_producto_cambia_la_version_de_su_tabla(self):
+        antes = {n: self.version(n) for n in ('tabla:ropa', 'tabla:tenis', 'catalogo')}
+        self.producto.precio = Decimal('610.00')
+        self.producto.save()
+        self.assertNotEqual(self.version('tabla:ropa'), antes['tabla:ropa'])
+        self.assertNotEqual(self.version('catalogo'), antes['catalogo'])
+        self.assertEqual(self.version('tabla:tenis'), antes['tabla:tenis'])
+
+        antes = self.version('tabla:ropa')
+        self.producto.delete()
+        self.assertNotEqual(self.version('tabla:ropa'), antes)
+
+    def test_guardar_producto_invalida_la_pagina_anonima(self):
+        self.assertContains(self.client.get(self.url), 'Playera original')
+        cache_tienda.reiniciar_estadisticas()
+        self.assertContains(self.client.get(self.url), 'Playera original')
+        paginas = next(e for e in cache_tienda.estadisticas() if e['area'] == 'paginas')
+        self.assertEqual((paginas['aciertos'], paginas['fallos']), (1, 0))
+
+        self.producto.modelo = 'Playera renombrada'
+        self.producto.save()
+        respuesta = self.client.get(self.url)
+        self.assertContains(respuesta, 'Playera renombrada')
+        self.assertNotContains(respuesta, 'Playera original')
+
+    def test_guardar_producto_invalida_su_tarjeta(self):
+        # Con sesión la página no se guarda, pero las tarjetas sí
+        self.client.force_login(sembrar_cliente('cache_tarjeta').user)
+        self.assertContains(self.client.get(self.url), 'Stock: 5')
+        cache_tienda.reiniciar_estadisticas()
+        self.client.get(self.url)
+        fragmentos = next(e for e in cache_tienda.estadisticas() if e['area'] == 'fragmentos')
+        self.assertEqual((fragmentos['aciertos'], fragmentos['fallos']), (1, 0))
+
+        self.producto.stock = 2
+        self.producto.save()
+        respuesta = self.client.get(self.url)
+        self.assertContains(respuesta, 'Stock: 2')
+        self.assertNotContains(respuesta, 'Stock: 5')
+
+    def test_pagina_guardada_lleva_el_token_de_quien_la_pide(self):
+        primero, segundo = Client(enforce_csrf_checks=True), Client(enforce_csrf_checks=True)
+        tokens = []
+        for visitante in (primero, segundo):
+            respuesta = visitante.get(self.url)
+            self.assertNotContains(respuesta, cache_tienda.MARCA_CSRF.decode())
+            tokens.append(re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', respuesta.content.decode()).group(1))
+            self.assertIn(settings.CSRF_COOKIE_NAME, visitante.cookies)
+        self.assertNotEqual(segundo.cookies[settings.CSRF_COOKIE_NAME].value,
+                            primero.cookies[settings.CSRF_COOKIE_NAME].value)
+        # La segunda respuesta salió de la caché, con la marca ya sustituida por su propio token
+        paginas = next(e for e in cache_tienda.estadisticas() if e['area'] == 'paginas')
+        self.assertEqual(paginas['aciertos'], 1)
+
+        agregar = reverse('app_kasports:agregar_carrito', args=['ropa', self.producto.pk])
+        respuesta = segundo.post(agregar, {'cantidad': 1, 'csrfmiddlewaretoken': tokens[1]})
+        self.assertEqual(respuesta.status_code, 302)
+        respuesta = segundo.post(agregar, {'cantidad': 1, 'csrfmiddlewaretoken': 'x' * 64})
+        self.assertEqual(respuesta.status_code, 403)
+
+
+# ============================================
+# PAGINACIÓN POR CURSOR
+# ============================================
+
+class CursorAlteradoTests(TestCase):
+    """Un cursor modificado a mano muestra la primera página en lugar de fallar."""
+
+    ORDEN = ('-precio',)
+
+    @classmethod
+    def setUpTestData(cls):
+        proveedor = sembrar_proveedores(1, prefijo='CURSOR')[0]
+        for i in range(12):
+            crear_ropa(proveedor, stock=5, precio=f'{100 + i * 10}.00')
+
+    def pagina(self, datos=None):
+        url = '/ropa/' if datos is None else f'/ropa/?cursor={paginacion.codificar(datos)}'
+        return paginacion.paginar(RequestFactory().get(url), Ropa.objects.all(), self.ORDEN, por_pagina=5)
+
+    def test_cursor_valido_avanza(self):
+        primera = self.pagina()
+        segunda = paginacion.paginar(
+            RequestFactory().get(primera.url_siguiente), Ropa.objects.all(), self.ORDEN, por_pagina=5,
+        )
+        self.assertTrue(segunda.has_previous())
+        self.assertLess(segunda.object_list[0].precio, primera.object_list[-1].precio)
+
+    def test_valores_alterados(self):
+        primera = [r.pk for r in self.pagina()]
+        for valores in (['abc', 1], ['NaN', 1], [[1], 1], [None, 1], ['150.00', 'x'], ['150.00', 10 ** 30],
+                        ['150.00'], 'texto'):
+            for direccion in (paginacion.SIGUIENTE, paginacion.ANTERIOR):
+                with self.subTest(valores=valores, direccion=direccion):
+                    pagina = self.pagina({'d': direccion, 'o': paginacion.firma(self.ORDEN), 'v': valores})
+                    self.assertEqual([r.pk for r in pagina], primera)
+                    self.assertFalse(pagina.has_previous())
+
+    def test_cursor_de_otro_orden(self):
+        siguiente = self.pagina().url_siguiente
+        ascendente = paginacion.paginar(RequestFactory().get(siguiente), Ropa.objects.all(), ('precio',), por_pagina=5)
+        self.assertEqual([r.pk for r in ascendente],
+                         [r.pk for r in Ropa.objects.order_by('precio', 'id')[:5]])
+        self.assertFalse(ascendente.has_previous())
+
+
+# ============================================
+# TOTALES DEL CARRITO
+# ============================================
+
+CODIGOS_PRUEBA = {
+    'KA10': {'porcentaje': '10'},
+    'MENOS500': {'monto': '500'},
+    'ENVIOGRATIS': {'envio_gratis': True, 'minimo': '300'},
+    'TODO': {'porcentaje': '50', 'monto': '100000', 'envio_gratis': True},
+}
+
+
+@mock.patch.dict(precios.CODIGOS_PROMOCIONALES, CODIGOS_PRUEBA)
+class TotalesCarritoTests(TestCase):
+    """Propiedades de `precios.calcular` sobre una tabla de carritos.
+
+    Cada caso se calcula como carrito de sesión (`totales_lineas`) y como
+    carrito de base de datos (`totales_carrito`); ambos deben coincidir.
+    """
+
+    CODIGOS = [None, 'ka10', 'MENOS500', 'ENVIOGRATIS', 'TODO', 'NO-EXISTE']
+    # Subtotales en los límites de los descuentos y las tarifas de envío
+    PRECIOS_LIMITE = ['0.01', '333.33', '1249.99', '1250.00', '2500.00', '2500.01',
+                      '5000.00', '5000.01', '10000.00', '10000.01']
+
+    @classmethod
+    def setUpTestData(cls):
+        proveedores = sembrar_proveedores(2, prefijo='PRECIOS')
+        cls.limites = [crear_ropa(proveedores[0], stock=50, precio=Decimal(p)) for p in cls.PRECIOS_LIMITE]
+        for tipo in MODELOS_CATALOGO:
+            sembrar_productos(6, tipo=tipo, proveedores=proveedores, semilla=9)
+        cls.productos = [(tipo, p) for tipo, modelo in MODELOS_CATALOGO.items() for p in modelo.objects.all()]
+        cls.carrito = Carrito.objects.create(cliente=sembrar_cliente('precios'), estado='Activo')
+
+    def casos(self):
+        """[(líneas [(tipo, producto, cantidad)], código)]: límites más carritos al azar."""
+        casos = [([('ropa', p, 1)], codigo) for p in self.limites for codigo in self.CODIGOS]
+        casos.append(([], None))
+        rnd = random.Random(2024)
+        for _ in range(60):
+            elegidos = rnd.sample(self.productos, rnd.randint(1, 6))
+            casos.append(([(tipo, p, rnd.randint(1, 4)) for tipo, p in elegidos], rnd.choice(self.CODIGOS)))
+        return casos
+
+    def totales_en_base(self, lineas, codigo):
+        DetalleCarrito.objects.filter(carrito=self.carrito).delete()
+        DetalleCarrito.objects.bulk_create(
+            DetalleCarrito(carrito=self.carrito, cantidad=n, subtotal=p.precio * n, **{tipo: p})
+            for tipo, p, n in lineas
+        )
+        return precios.totales_carrito(self.carrito, codigo, usar_cache=False)
+
+    def verificar(self, totales):
+        self.assertGreaterEqual(totales.total, 0)
+        self.assertGreaterEqual(totales.descuento, 0)
+        self.assertLessEqual(totales.descuento, totales.subtotal)
+        self.assertEqual(totales.impuesto, precios.redondear(totales.subtotal_con_descuento * precios.TASA_IMPUESTO))
+        self.assertEqual(totales.total, totales.subtotal_con_descuento + totales.costo_envio + totales.impuesto)
+        self.assertEqual(totales.descuento, sum((m for _, m in totales.aplicadas), precios.CERO))
+        if totales.envio_gratis:
+            self.assertEqual(totales.costo_envio, 0)
+
+    def test_propiedades_y_sesion_igual_a_base(self):
+        for i, (lineas, codigo) in enumerate(self.casos()):
+            with self.subTest(caso=i, codigo=codigo):
+                sesion = precios.totales_lineas(
+                    [LineaSesion(j, tipo, p, None, n) for j, (tipo, p, n) in enumerate(lineas)], codigo,
+                )
+                base = self.totales_en_base(lineas, codigo)
+                self.verificar(sesion)
+                self.verificar(base)
+                self.assertEqual(sesion.subtotal, sum((p.precio * n for _, p, n in lineas), precios.CERO))
+                for campo in ('subtotal', 'descuento', 'costo_envio', 'impuesto', 'total', 'lineas',
+                              'unidades', 'por_tipo', 'codigo', 'aplicadas'):
+                    self.assertEqual(getattr(sesion, campo), getattr(base, campo), campo)
+
+    def test_limites(self):
+        esperados = {
+            # precio: (descuento sin código, envío)
+            '1249.99': ('0.00', '80.00'),
+            '1250.00': ('0.00', '50.00'),
+            '2500.00': ('0.00', '50.00'),
+            '2500.01': ('0.00', '0.00'),
+            '5000.00': ('0.00', '0.00'),
+            '5000.01': ('250.00', '0.00'),
+            '10000.01': ('1000.00', '0.00'),
+        }
+        for producto in self.limites:
+            precio = f'{producto.precio:.2f}'
+            if precio not in esperados:
+                continue
+            with self.subTest(precio=precio):
+                totales = precios.totales_lineas([LineaSesion(1, 'ropa', producto, None, 1)])
+                descuento, envio = esperados[precio]
+                self.assertEqual(totales.descuento, Decimal(descuento))
+                self.assertEqual(totales.costo_envio, Decimal(envio))
+
+
+# ============================================
+# ROL EN SESIÓN
+# ============================================
+
+class RolEnSesionTests(TestCase):
+    """El rol guardado en la sesión se vuelve a resolver al invalidarse o al caducar."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = sembrar_cliente('rol_admin').user
+        self.administrador = Administrador.objects.create(user=self.usuario, telefono='5500000000')
+        self.request = RequestFactory().get('/')
+        self.request.session = {}
+
+    def test_baja_invalida_el_rol(self):
+        self.assertEqual(roles.recordar(self.request, self.usuario)['rol'], roles.ADMINISTRADOR)
+        self.administrador.delete()
+        self.assertEqual(roles.recordar(self.request, self.usuario)['rol'], roles.CLIENTE)
+
+    def test_el_rol_caduca_sin_invalidacion(self):
+        self.assertEqual(roles.recordar(self.request, self.usuario)['rol'], roles.ADMINISTRADOR)
+        # Otro proceso da de baja al administrador y esta caché no se entera
+        with mock.patch.object(roles, 'invalidar'):
+            self.administrador.delete()
+        self.assertEqual(roles.recordar(self.request, self.usuario)['rol'], roles.ADMINISTRADOR)
+        with mock.patch.object(roles.time, 'time', return_value=time.time() + 61):
+            self.assertEqual(roles.recordar(self.request, self.usuario)['rol'], roles.CLIENTE)
+
+
+# ============================================
+# ÍNDICES DE LOS ÓRDENES DEL LISTADO
+# ============================================
+
+@skipUnless(connection.vendor == 'sqlite', 'Planes de EXPLAIN QUERY PLAN de SQLite')
+class IndicesDeOrdenTests(TestCase):
+    """Cada `?orden=` de los listados se lee de su índice parcial, sin ordenar aparte.
+
+    Es la misma revisión que `python manage.py verificar_planes` hace sobre la base real.
+    """
+
+    # Clave de ORDENES -> índice parcial (`<tipo>_<sufijo>_idx`, condición stock > 0)
+    INDICES = {
+        'recientes': 'en_stock',
+        'precio': 'stock_precio',
+        'precio_desc': 'stock_precio',
+        'vendidos': 'stock_vendidos',
+        'existencias': 'stock_cantidad',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        proveedores = sembrar_proveedores(2, prefijo='INDICES')
+        for tipo in MODELOS_CATALOGO:
+            sembrar_productos(30, tipo=tipo, proveedores=proveedores)
+
+    def test_todos_los_ordenes_tienen_indice(self):
+        self.assertEqual(set(self.INDICES), set(ORDENES))
+
+    def test_plan_usa_el_indice_del_orden(self):
+        consultas = consultas_de_orden()
+        # Primera página y página siguiente de cada tipo con cada orden
+        self.assertEqual(len(consultas), 2 * len(MODELOS_CATALOGO) * len(ORDENES))
+        for origen, _, queryset in consultas:
+            tipo, clave = origen.split()[0], origen.split()[1][len('orden='):]
+            with self.subTest(consulta=origen):
+                with CaptureQueriesContext(connection) as capturadas:
+                    list(queryset)
+                # La primera consulta es la del listado; la otra es el prefetch del proveedor
+                lineas = plan(capturadas.captured_queries[0]['sql'])
+                self.assertIn(f'USING INDEX {tipo}_{self.INDICES[clave]}_idx', ' '.join(lineas))
+                self.assertFalse(ordena_sin_indice(lineas), lineas)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class IndicesYRestriccionesTests(TestCase):
+    """Carrito activo único, índices de las consultas por cliente y el comando `verificar_planes`."""
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = sembrar_cliente('indices')
+
+    def plan_de(self, queryset):
+        with CaptureQueriesContext(connection) as capturadas:
+            list(queryset)
+        return ' '.join(plan(capturadas.captured_queries[0]['sql']))
+
+    def test_un_solo_carrito_activo_por_cliente(self):
+        Carrito.objects.create(cliente=self.cliente, estado='Completado')
+        Carrito.objects.create(cliente=self.cliente, estado='Completado')
+        activo = Carrito.objects.create(cliente=self.cliente, estado='Activo')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Carrito.objects.create(cliente=self.cliente, estado='Activo')
+
+        # Otra petición lo creó después de que este carrito leyó que no había ninguno
+        Carrito.objects.filter(pk=activo.pk).update(estado='Cancelado')
+        carrito = CarritoCliente(self.cliente)
+        self.assertIsNone(carrito.carrito)
+        otro = Carrito.objects.create(cliente=self.cliente, estado='Activo')
+        self.assertEqual(carrito.carrito_para_escribir(), otro)
+
+    def test_consultas_por_cliente_usan_sus_indices(self):
+        self.assertIn(
+            'USING INDEX carrito_activo_unico',
+            self.plan_de(Carrito.objects.filter(cliente=self.cliente, estado='Activo')),
+        )
+        self.assertIn(
+            'USING INDEX venta_cliente_fecha_idx',
+            self.plan_de(Venta.objects.filter(cliente=self.cliente).order_by('-fecha_venta', '-id')),
+        )
+        self.assertIn(
+            'USING INDEX mensaje_sin_leer_idx',
+            self.plan_de(MensajeContacto.objects.filter(leido=False).order_by('-fecha_envio')),
+        )
+
+    def test_verificar_planes(self):
+        salida = io.StringIO()
+        call_command('verificar_planes', stdout=salida, stderr=io.StringIO())
+        self.assertIn('Sin recorridos completos', salida.getvalue())
+
+        # Con umbral 0 cualquier recorrido completo de una tabla con filas es un error
+        with self.assertRaisesMessage(CommandError, 'recorrido completo de app_kasports_proveedor'):
+            call_command('verificar_planes', umbral=0, sembrar=5, stdout=io.StringIO(), stderr=io.StringIO())
+
+        # Sin el índice del orden por precio el listado ordena aparte (DDL transaccional en SQLite)
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX ropa_stock_precio_idx')
+        with self.assertRaisesMessage(CommandError, 'ropa orden=precio: ordena app_kasports_ropa sin índice'):
+            call_command('verificar_planes', sembrar=5, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertFalse(Ropa.objects.exists())
+
+
+# ============================================
+# IMPORTACIÓN MASIVA
+# ============================================
+
+class ImportacionTests(TestCase):
+    """Importación por lotes: errores por fila, actualización por `id` y reservas."""
+
+    def setUp(self):
+        self.proveedor = sembrar_proveedores(1, prefijo='IMPORTAR')[0]
+        self.rfc = self.proveedor.rfc_fiscal
+
+    def fila(self, **valores):
+        datos = {
+            'proveedor_rfc': self.rfc, 'modelo': 'Sudadera importada', 'color': 'Gris', 'genero': 'Unisex',
+            'estilo': 'Casual', 'precio': '650.00', 'stock': '5',
+        }
+        datos.update(valores)
+        return datos
+
+    def importar(self, *filas):
+        archivo = io.StringIO()
+        escritor = csv.DictWriter(archivo, importacion.columnas('ropa'))
+        escritor.writeheader()
+        escritor.writerows(filas)
+        archivo.seek(0)
+        return importacion.importar(archivo, 'ropa', 'csv', tamano_lote=2)
+
+    def exportadas(self):
+        texto = ''.join(importacion.exportar('ropa'))
+        return {int(f['id']): f for f in csv.DictReader(io.StringIO(texto))}
+
+    def test_filas_invalidas_se_reportan_sin_detener_la_importacion(self):
+        resultado = self.importar(
+            self.fila(modelo='Primera'),
+            self.fila(precio='caro'),
+            self.fila(proveedor_rfc='NOEXISTE'),
+            self.fila(id='999999', modelo='Sin producto'),
+            self.fila(modelo='Última', stock='2'),
+        )
+        self.assertEqual(resultado.filas, 5)
+        self.assertEqual(resultado.creados, 2)
+        self.assertEqual(resultado.total_errores, 3)
+        # Línea 1 es el encabezado
+        self.assertEqual([linea for linea, _ in resultado.errores], [3, 4, 5])
+        self.assertIn('precio', resultado.errores[0][1])
+        self.assertIn('NOEXISTE', resultado.errores[1][1])
+        self.assertIn('999999', resultado.errores[2][1])
+        self.assertEqual(sorted(Ropa.objects.values_list('modelo', flat=True)), ['Primera', 'Última'])
+        self.assertEqual(ProductoCatalogo.objects.filter(tipo='ropa').count(), 2)
+
+    def test_filas_con_id_actualizan_el_producto(self):
+        producto = crear_ropa(self.proveedor, stock=4, tallas='S,M', modelo='Antes')
+        fila = self.exportadas()[producto.pk]
+        fila.update(modelo='Después', precio='720.00', stock='9', tallas_disponibles='S:3,M:6')
+
+        resultado = self.importar(fila)
+
+        self.assertEqual((resultado.creados, resultado.actualizados, resultado.total_errores), (0, 1, 0))
+        producto.refresh_from_db()
+        self.assertEqual((producto.modelo, producto.precio, producto.stock), ('Después', Decimal('720.00'), 9))
+        self.assertEqual(producto.tallas_disponibles, 'S,M')
+        self.assertEqual(tallas.existencias_por_talla('ropa', producto.pk), {'S': 3, 'M': 6})
+        entrada = ProductoCatalogo.objects.get(tipo='ropa', producto_id=producto.pk)
+        self.assertEqual((entrada.modelo, entrada.stock), ('Después', 9))
+        self.assertEqual(Ropa.objects.count(), 1)
+
+    def test_stock_importado_descuenta_lo_apartado(self):
+        producto = crear_ropa(self.proveedor, stock=10, tallas='M:6,L:4')
+        CarritoCliente(sembrar_cliente('importar')).agregar('ropa', producto, 'M', 2)
+        fila = self.exportadas()[producto.pk]
+        # La exportación muestra las existencias físicas, no solo las libres
+        self.assertEqual(fila['stock'], '10')
+
+        # Reimportar el mismo conteo físico no vuelve a ofrecer lo apartado
+        self.importar(fila)
+        producto.refresh_from_db()
+        self.assertEqual(producto.stock, 8)
+        self.assertEqual(tallas.existencias_por_talla('ropa', producto.pk), {'M': 4, 'L': 4})
+        self.assertEqual(ProductoCatalogo.objects.get(tipo='ropa', producto_id=producto.pk).stock, 8)
+
+        # Un nuevo conteo por talla también respeta lo apartado
+        fila.update(stock='8', tallas_disponibles='M:3,L:5')
+        self.importar(fila)
+        producto.refresh_from_db()
+        self.assertEqual(tallas.existencias_por_talla('ropa', producto.pk), {'M': 1, 'L': 5})
+        self.assertEqual(producto.stock, 6)
+        self.assertEqual(sum(ReservaStock.objects.values_list('cantidad', flat=True)), 2)
+
+    def test_imagenes_importadas_se_encolan(self):
+        producto = crear_ropa(self.proveedor, stock=1)
+        self.importar(
+            self.fila(imagen='productos/importada.jpg'),
+            self.fila(imagen='productos/importada.jpg', modelo='Misma imagen'),
+            self.fila(id=str(producto.pk), imagen='productos/otra.jpg'),
+            self.fila(modelo='Sin imagen'),
+        )
+        encoladas = Tarea.objects.filter(funcion='app_kasports.imagenes.procesar_tarea')
+        self.assertEqual(
+            sorted(t.argumentos['nombre'] for t in encoladas), ['productos/importada.jpg', 'productos/otra.jpg'],
+        )
+
+
+# ============================================
+# VISTAS ASÍNCRONAS
+# ============================================
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class VistasAsincronasTests(TransactionTestCase):
+    """Las vistas de vistas_async.py a través de `AsyncClient`.
+
+    Es `TransactionTestCase` porque el ejecutor compartido usa otras conexiones,
+    que no ven los datos de una transacción de prueba sin confirmar.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.enrutar(vistas_async=True)
+        self.addCleanup(self.enrutar, vistas_async=False)
+        proveedor = sembrar_proveedores(1, prefijo='ASYNC')[0]
+        crear_ropa(proveedor, stock=3, tallas='M,L', modelo='Playera asíncrona')
+
+    def enrutar(self, vistas_async):
+        """Vuelve a cargar urls.py con o sin `KASPORTS_VISTAS_ASYNC`."""
+        from backend_kasports import urls as urls_proyecto
+        from . import urls
+        with self.settings(KASPORTS_VISTAS_ASYNC=vistas_async):
+            importlib.reload(urls)
+            importlib.reload(urls_proyecto)
+        clear_url_caches()
+
+    async def test_listado_corre_en_el_ejecutor_compartido(self):
+        hilos = []
+        original = views.contexto_ropa
+
+        def contexto_ropa(request):
+            hilos.append(threading.current_thread())
+            return original(request)
+
+        hilo_peticion = await sync_to_async(threading.current_thread)()
+        with mock.patch.object(views, 'contexto_ropa', side_effect=contexto_ropa):
+            respuesta = await AsyncClient().get(reverse('app_kasports:ropa_lista'))
+
+        self.assertIs(respuesta.resolver_match.func, vistas_async.ropa_lista)
+        self.assertContains(respuesta, 'Playera asíncrona')
+        self.assertEqual(len(hilos), 1)
+        self.assertIsNot(hilos[0], threading.main_thread())
+        self.assertIsNot(hilos[0], hilo_peticion)
+
+    async def test_paginas_de_lectura(self):
+        cliente = AsyncClient()
+        for nombre in ('index_cliente', 'productos', 'ropa_lista', 'tenis_lista', 'gorras_lista', 'proveedores_lista'):
+            with self.subTest(vista=nombre):
+                respuesta = await cliente.get(reverse(f'app_kasports:{nombre}'))
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertTrue(asyncio.iscoroutinefunction(respuesta.resolver_match.func))
+        self.assertContains(await cliente.get(reverse('app_kasports:proveedores_lista')), 'Marca ASYNC 0')
+
+    async def test_historial_requiere_sesion_de_cliente(self):
+        url = reverse('app_kasports:historial_pedidos')
+        anonimo = await AsyncClient().get(url)
+        self.assertEqual(anonimo.status_code, 302)
+        self.assertIn(reverse('app_kasports:login'), anonimo['Location'])
+
+        cliente = await sync_to_async(sembrar_cliente)('historial_async')
+        conectado = AsyncClient()
+        await sync_to_async(conectado.force_login)(cliente.user)
+        self.assertEqual((await conectado.get(url)).status_code, 200)
+
+
+# ============================================
+# SERVIDOR DE ESTÁTICOS Y MEDIA
+# ============================================
+
+class ServidorArchivosTests(SimpleTestCase):
+    """`ServidorArchivos` (estaticos.py) sobre un STATIC_ROOT y un MEDIA_ROOT temporales."""
+
+    CSS = b'body { color: black; }\n' * 40
+
+    def setUp(self):
+        temporal = tempfile.TemporaryDirectory()
+        self.addCleanup(temporal.cleanup)
+        self.raiz = temporal.name
+        self.escribir('static/css/app.abc123.css', self.CSS)
+        self.escribir('static/css/app.abc123.css.gz', b'gz')
+        self.escribir('static/css/app.abc123.css.br', b'br')
+        self.escribir('static/css/app.css', self.CSS)
+        self.escribir('static/staticfiles.json', json.dumps({'paths': {'css/app.css': 'css/app.abc123.css'}}).encode())
+        self.escribir('media/ropa/playera.jpg', bytes(range(256)) * 4)
+        self.escribir('media/entregas/evidencia.jpg', b'evidencia')
+
+    def escribir(self, relativa, contenido):
+        ruta = os.path.join(self.raiz, relativa)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, 'wb') as archivo:
+            archivo.write(contenido)
+
+    def servidor(self, servir_media=False):
+        def django(environ, start_response):
+            start_response('404 Not Found', [('X-Django', '1')])
+            return [b'django']
+        return estaticos.ServidorArchivos(
+            django, raiz_estaticos=os.path.join(self.raiz, 'static'), url_estaticos='/static/',
+            raiz_media=os.path.join(self.raiz, 'media'), url_media='/media/', servir_media=servir_media,
+        )
+
+    def pedir(self, ruta, servidor=None, **encabezados):
+        """(estado, encabezados, cuerpo) de un GET; las claves de `encabezados` van sin `HTTP_`."""
+        respuesta = {}
+
+        def start_response(estado, lista):
+            respuesta['estado'], respuesta['encabezados'] = int(estado.split()[0]), dict(lista)
+
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': ruta}
+        environ.update({f'HTTP_{nombre.upper()}': valor for nombre, valor in encabezados.items()})
+        cuerpo = b''.join((servidor or self.servidor())(environ, start_response))
+        return respuesta['estado'], respuesta['encabezados'], cuerpo
+
+    def test_nombres_con_hash_son_inmutables(self):
+        _, con_hash, _ = self.pedir('/static/css/app.abc123.css')
+        _, sin_hash, _ = self.pedir('/static/css/app.css')
+        self.assertEqual(con_hash['Cache-Control'], estaticos.CACHE_INMUTABLE)
+        self.assertIn('immutable', con_hash['Cache-Control'])
+        self.assertEqual(sin_hash['Cache-Control'], estaticos.CACHE_ESTATICO)
+
+    def test_etag_y_304(self):
+        estado, encabezados, cuerpo = self.pedir('/static/css/app.css')
+        self.assertEqual((estado, cuerpo), (200, self.CSS))
+        estado, _, cuerpo = self.pedir('/static/css/app.css', if_none_match=encabezados['ETag'])
+        self.assertEqual((estado, cuerpo), (304, b''))
+        estado, _, _ = self.pedir('/static/css/app.css', if_none_match='"otra"')
+        self.assertEqual(estado, 200)
+        estado, _, _ = self.pedir('/static/css/app.css', if_modified_since=encabezados['Last-Modified'])
+        self.assertEqual(estado, 304)
+
+    def test_rangos(self):
+        estado, encabezados, cuerpo = self.pedir('/static/css/app.css', range='bytes=5-9')
+        self.assertEqual((estado, cuerpo), (206, self.CSS[5:10]))
+        self.assertEqual(encabezados['Content-Range'], f'bytes 5-9/{len(self.CSS)}')
+        estado, _, cuerpo = self.pedir('/static/css/app.css', range='bytes=-4')
+        self.assertEqual((estado, cuerpo), (206, self.CSS[-4:]))
+        estado, encabezados, cuerpo = self.pedir('/static/css/app.css', range=f'bytes={len(self.CSS)}-')
+        self.assertEqual((estado, cuerpo), (416, b''))
+        self.assertEqual(encabezados['Content-Range'], f'bytes */{len(self.CSS)}')
+        # If-Range con otra versión: se envía el archivo completo
+        estado, _, cuerpo = self.pedir('/static/css/app.css', range='bytes=5-9', if_range='"vieja"')
+        self.assertEqual((estado, cuerpo), (200, self.CSS))
+
+    def test_copias_comprimidas_segun_accept_encoding(self):
+        ruta = '/static/css/app.abc123.css'
+        for aceptadas, codificacion, cuerpo in (
+            ('gzip, deflate, br', 'br', b'br'),
+            ('gzip', 'gzip', b'gz'),
+            ('identity', None, self.CSS),
+        ):
+            with self.subTest(aceptadas=aceptadas):
+                _, encabezados, recibido = self.pedir(ruta, accept_encoding=aceptadas)
+                self.assertEqual(recibido, cuerpo)
+                self.assertEqual(encabezados.get('Content-Encoding'), codificacion)
+                self.assertEqual(encabezados['Vary'], 'Accept-Encoding')
+        # Las copias tienen su propio ETag; con Range se responde sin comprimir
+        _, br, _ = self.pedir(ruta, accept_encoding='br')
+        _, gz, _ = self.pedir(ruta, accept_encoding='gzip')
+        self.assertNotEqual(br['ETag'], gz['ETag'])
+        estado, encabezados, cuerpo = self.pedir(ruta, accept_encoding='br', range='bytes=0-3')
+        self.assertEqual((estado, cuerpo), (206, self.CSS[:4]))
+        self.assertNotIn('Content-Encoding', encabezados)
+
+    def test_media_solo_si_se_activa(self):
+        estado, encabezados, _ = self.pedir('/media/ropa/playera.jpg')
+        self.assertEqual((estado, encabezados.get('X-Django')), (404, '1'))
+
+        servidor = self.servidor(servir_media=True)
+        estado, encabezados, cuerpo = self.pedir('/media/ropa/playera.jpg', servidor)
+        self.assertEqual((estado, len(cuerpo)), (200, 1024))
+        self.assertEqual(encabezados['Cache-Control'], estaticos.CACHE_MEDIA)
+
+    def test_evidencias_de_entrega_no_se_sirven(self):
+        servidor = self.servidor(servir_media=True)
+        for ruta in ('/media/entregas/evidencia.jpg', '/media/ropa/../entregas/evidencia.jpg',
+                     '/media/../media/entregas/evidencia.jpg'):
+            with self.subTest(ruta=ruta):
+                estado, encabezados, cuerpo = self.pedir(ruta, servidor)
+                self.assertEqual((estado, encabezados.get('X-Django'), cuerpo), (404, '1', b'django'))
+
+
+# ============================================
+# EXPORTACIONES DEL PANEL
+# ============================================
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ExportacionesTests(TestCase):
+    """Las exportaciones aplican los mismos filtros que los listados del panel y se envían en flujo."""
+
+    LISTADOS = {'ventas': 'ver_ventas', 'clientes': 'ver_clientes', 'entregas': 'ver_detalle_entrega'}
+
+    @classmethod
+    def setUpTestData(cls):
+        admin = User.objects.create(username='admin_exportar')
+        Administrador.objects.create(user=admin, telefono='5500000000')
+        cls.admin = admin
+        zona = timezone.get_current_timezone()
+        datos = [
+            ('ana', 'En proceso', 'PayPal', datetime(2026, 3, 1, 23, 30), date(2026, 3, 2)),
+            ('beto', 'Enviado', 'Efectivo', datetime(2026, 3, 2, 0, 30), date(2026, 3, 3)),
+            ('anabel', 'Entregado', 'PayPal', datetime(2026, 3, 5, 12, 0), None),
+            ('carla', 'Cancelado', 'Transferencia', datetime(2026, 4, 1, 9, 0), date(2026, 4, 2)),
+        ]
+        for usuario, estado, metodo, fecha, envio in datos:
+            cliente = sembrar_cliente(usuario)
+            fecha = timezone.make_aware(fecha, zona)
+            Cliente.objects.filter(pk=cliente.pk).update(fecha_registro=fecha)
+            carrito = Carrito.objects.create(cliente=cliente, estado='Completado')
+            venta = Venta.objects.create(
+                cliente=cliente, carrito=carrito, metodo_pago=metodo, estado=estado, subtotal=Decimal('100.00'),
+                impuesto=Decimal('16.00'), total=Decimal('116.00'),
+            )
+            Venta.objects.filter(pk=venta.pk).update(fecha_venta=fecha)
+            DetalleEntrega.objects.create(venta=venta, direccion_entrega='Calle 1', fecha_envio=envio)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def listado(self, nombre, parametros):
+        respuesta = self.client.get(reverse(f'app_kasports:{self.LISTADOS[nombre]}'), parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        return sorted(objeto.pk for objeto in respuesta.context['page_obj'].object_list)
+
+    def exportados(self, nombre, parametros):
+        respuesta = self.client.get(reverse('app_kasports:exportar_reporte', args=[nombre]), parametros)
+        self.assertTrue(respuesta.streaming)
+        texto = b''.join(respuesta.streaming_content).decode('utf-8')
+        return sorted(int(fila['id']) for fila in csv.DictReader(io.StringIO(texto)))
+
+    def test_mismos_resultados_que_el_listado(self):
+        casos = [
+            ('ventas', {}),
+            ('ventas', {'q': 'ana', 'campo': 'cliente'}),
+            ('ventas', {'q': 'paypal', 'campo': 'metodo_pago'}),
+            ('ventas', {'desde': '2026-03-02', 'hasta': '2026-03-31'}),
+            ('ventas', {'q': 'ana', 'campo': 'cliente', 'hasta': '2026-03-01'}),
+            ('ventas', {'desde': 'no-es-fecha'}),
+            ('clientes', {'q': 'ANA', 'campo': 'username'}),
+            ('clientes', {'desde': '2026-03-05'}),
+            ('entregas', {'q': 'carla', 'campo': 'cliente'}),
+            ('entregas', {'desde': '2026-03-03', 'hasta': '2026-04-02'}),
+        ]
+        for nombre, parametros in casos:
+            with self.subTest(nombre=nombre, **parametros):
+                esperados = self.listado(nombre, parametros)
+                self.assertEqual(self.exportados(nombre, {**parametros, 'formato': 'csv'}), esperados)
+        # Los límites del día se toman en la zona local: 23:30 del 1 de marzo no entra desde el 2
+        self.assertEqual(len(self.exportados('ventas', {'desde': '2026-03-02', 'hasta': '2026-03-02'})), 1)
+
+    def test_se_genera_por_partes(self):
+        with CaptureQueriesContext(connection) as capturadas:
+            partes = exportaciones.exportar('ventas', 'csv', tamano_lote=1, query='a', campo='cliente')
+            self.assertEqual(len(capturadas), 0)
+            bloques = list(partes)
+        # Encabezado y un bloque por fila; las filas se leen en una sola consulta
+        self.assertEqual(len(bloques), 1 + 3)
+        self.assertEqual(len(capturadas), 1)
+
+        bloques = list(exportaciones.exportar('ventas', 'xlsx', tamano_lote=1))
+        self.assertGreater(len(bloques), 1)
+        with zipfile.ZipFile(io.BytesIO(b''.join(bloques))) as libro:
+            hoja = libro.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(hoja.count('<row>'), 1 + 4)
+
+        respuesta = self.client.get(reverse('app_kasports:exportar_reporte', args=['ventas']), {'formato': 'xlsx'})
+        self.assertTrue(respuesta.streaming)
+        self.assertNotIn('Content-Length', respuesta)
+        self.assertEqual(respuesta['Content-Type'], exportaciones.TIPOS_CONTENIDO['xlsx'])
+
+
+# ============================================
+# VARIANTES DE IMAGEN
+# ============================================
+
+class ImagenesTests(TestCase):
+    """Variantes WebP/AVIF por contenido, su registro y `{% imagen_responsive %}`."""
+
+    def setUp(self):
+        temporal = tempfile.TemporaryDirectory()
+        self.addCleanup(temporal.cleanup)
+        ajustes = self.settings(MEDIA_ROOT=temporal.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        cache.clear()
+
+    def guardar_imagen(self, nombre, ancho, alto, color=(200, 30, 30)):
+        contenido = io.BytesIO()
+        Image.new('RGB', (ancho, alto), color).save(contenido, 'PNG')
+        return default_storage.save(nombre, ContentFile(contenido.getvalue()))
+
+    def test_genera_variantes_sin_ampliar(self):
+        nombre = self.guardar_imagen('ropa/playera.png', 500, 300)
+        registro = imagenes.procesar(nombre)
+
+        formatos = imagenes.formatos_soportados()
+        self.assertIn('webp', formatos)
+        self.assertEqual((registro.ancho, registro.alto, registro.anchos), (500, 300, '160,320,500'))
+        self.assertEqual(registro.formatos, ','.join(formatos))
+        for ancho in (160, 320, 500):
+            ruta = imagenes.ruta_variante(registro.huella, ancho, 'webp')
+            with default_storage.open(ruta, 'rb') as archivo:
+                self.assertEqual(Image.open(archivo).size, (ancho, round(300 * ancho / 500)))
+        self.assertFalse(default_storage.exists(imagenes.ruta_variante(registro.huella, 640, 'webp')))
+
+        pequena = imagenes.procesar(self.guardar_imagen('ropa/icono.png', 100, 100))
+        self.assertEqual(pequena.anchos, '100')
+
+    def test_mismo_contenido_reutiliza_las_variantes(self):
+        primero = imagenes.procesar(self.guardar_imagen('ropa/a.png', 200, 200))
+        segundo = imagenes.procesar(self.guardar_imagen('tenis/b.png', 200, 200))
+        self.assertEqual(primero.huella, segundo.huella)
+        _, archivos = default_storage.listdir(f'{imagenes.CARPETA}/{primero.huella[:2]}/{primero.huella}')
+        self.assertEqual(len(archivos), len(primero.anchos.split(',')) * len(primero.formatos.split(',')))
+        # Ya procesada: no se vuelve a leer el archivo
+        with mock.patch.object(imagenes, 'huella') as calcular:
+            self.assertEqual(imagenes.procesar('ropa/a.png'), primero)
+        calcular.assert_not_called()
+
+    def test_archivo_que_no_es_imagen(self):
+        nombre = default_storage.save('ropa/no-imagen.png', ContentFile(b'texto'))
+        with self.assertLogs('app_kasports.imagenes', 'WARNING'):
+            self.assertIsNone(imagenes.procesar(nombre))
+        self.assertIsNone(imagenes.procesar('ropa/no-existe.png'))
+        self.assertEqual(imagenes.variantes(nombre), {})
+
+    def test_guardar_producto_encola_y_la_plantilla_usa_las_variantes(self):
+        nombre = self.guardar_imagen('ropa/tarjeta.png', 400, 400)
+        producto = crear_ropa(sembrar_proveedores(1, prefijo='IMAGEN')[0], stock=1, imagen=nombre)
+        tarea = Tarea.objects.get(funcion='app_kasports.imagenes.procesar_tarea')
+        self.assertEqual(tarea.argumentos, {'nombre': nombre, 'forzar': False})
+
+        plantilla = Template('{% load imagenes %}{% imagen_responsive producto.imagen "Tarjeta" %}')
+        html = plantilla.render(Context({'producto': producto}))
+        self.assertTrue(html.startswith('<img src="'))
+
+        resultado = imagenes.procesar_tarea(**tarea.argumentos)
+        self.assertEqual(resultado['anchos'], '160,320,400')
+        html = plantilla.render(Context({'producto': producto}))
+        self.assertTrue(html.startswith('<picture><source type="'))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('320w', html)
+        self.assertIn('width="400" height="400"', html)
+
+
+# ============================================
+# COLA DE TAREAS
+# ============================================
+
+@tareas.tarea(max_intentos=2)
+def tarea_que_falla(**datos):
+    raise ValueError('falla de prueba')
+
+
+class TareasTests(TestCase):
+    """`encolar`, el orden de reclamo, los reintentos y la recuperación de tareas."""
+
+    def test_solo_se_encolan_funciones_marcadas(self):
+        with self.assertRaises(tareas.TareaDesconocida):
+            tareas.encolar(crear_ropa)
+        registro = tareas.encolar(tareas.eco, {'n': 1})
+        self.assertEqual(
+            (registro.funcion, registro.prioridad, registro.max_intentos, registro.estado),
+            ('app_kasports.tareas.eco', tareas.PRIORIDAD_BAJA, 1, Tarea.PENDIENTE),
+        )
+
+    def test_la_tarea_no_existe_si_la_transaccion_se_revierte(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            tareas.encolar(tareas.eco)
+            raise RuntimeError
+        self.assertFalse(Tarea.objects.exists())
+
+    def test_reclama_por_prioridad_y_respeta_el_retraso(self):
+        baja = tareas.encolar(tareas.eco, {'n': 'baja'})
+        alta = tareas.encolar(tareas.eco, {'n': 'alta'}, prioridad=tareas.PRIORIDAD_ALTA)
+        normal = tareas.encolar(tareas.eco, {'n': 'normal'}, prioridad=tareas.PRIORIDAD_NORMAL)
+        tareas.encolar(tareas.eco, {'n': 'despues'}, prioridad=tareas.PRIORIDAD_ALTA, retraso=60)
+
+        reclamadas = tareas.reclamar('prueba', limite=10)
+        self.assertEqual([t.pk for t in reclamadas], [alta.pk, normal.pk, baja.pk])
+        self.assertTrue(all(t.estado == Tarea.EN_PROCESO and t.intentos == 1 for t in reclamadas))
+        # Ya reclamadas no se entregan a otro trabajador
+        self.assertEqual(tareas.reclamar('otro', limite=10), [])
+
+    def test_trabajar_vacia_la_cola_y_guarda_el_resultado(self):
+        registro = tareas.encolar(tareas.eco, {'pedido': 7})
+        self.assertEqual(tareas.trabajar(vaciar=True, intervalo=0), 1)
+        registro.refresh_from_db()
+        self.assertEqual((registro.estado, registro.resultado), (Tarea.COMPLETADA, {'pedido': 7}))
+        self.assertIsNotNone(registro.fecha_fin)
+        self.assertEqual(tareas.resumen()['por_estado'][Tarea.COMPLETADA], 1)
+
+    def test_reintenta_con_espera_y_luego_queda_fallida(self):
+        registro = tareas.encolar(tarea_que_falla)
+        antes = timezone.now()
+        with self.assertLogs('app_kasports.tareas', 'WARNING'):
+            self.assertEqual(tareas.trabajar(vaciar=True, intervalo=0), 1)
+        registro.refresh_from_db()
+        self.assertEqual((registro.estado, registro.intentos), (Tarea.PENDIENTE, 1))
+        self.assertIn('falla de prueba', registro.error)
+        self.assertGreaterEqual(
+            registro.disponible_en, antes + timedelta(seconds=tareas.RETRASO_BASE * 0.8)
+        )
+        self.assertTrue(tareas.RETRASO_BASE * 4 * 0.8 <= tareas.retraso(3) <= tareas.RETRASO_BASE * 4 * 1.2)
+        self.assertLessEqual(tareas.retraso(30), tareas.RETRASO_MAXIMO * 1.2)
+
+        Tarea.objects.filter(pk=registro.pk).update(disponible_en=timezone.now())
+        with self.assertLogs('app_kasports.tareas', 'WARNING'):
+            tareas.trabajar(vaciar=True, intervalo=0)
+        registro.refresh_from_db()
+        self.assertEqual((registro.estado, registro.intentos), (Tarea.FALLIDA, 2))
+
+        self.assertEqual(tareas.reintentar(registro.pk), 1)
+        registro.refresh_from_db()
+        self.assertEqual((registro.estado, registro.intentos), (Tarea.PENDIENTE, 0))
+
+    def test_recupera_las_tareas_de_un_trabajador_caido(self):
+        viva = tareas.encolar(tareas.eco, prioridad=tareas.PRIORIDAD_ALTA)
+        agotada = tareas.encolar(tareas.eco)
+        tareas.reclamar('caido', limite=2)
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        Tarea.objects.update(fecha_inicio=hace_una_hora)
+        Tarea.objects.filter(pk=viva.pk).update(max_intentos=3)
+
+        self.assertEqual(tareas.recuperar_abandonadas(), 2)
+        viva.refresh_from_db()
+        agotada.refresh_from_db()
+        self.assertEqual((viva.estado, viva.trabajador), (Tarea.PENDIENTE, ''))
+        self.assertEqual(agotada.estado, Tarea.FALLIDA)
+
+    def test_sincronas_se_ejecutan_al_confirmar(self):
+        with mock.patch.object(tareas, 'SINCRONAS', True), self.captureOnCommitCallbacks(execute=True):
+            registro = tareas.encolar(tareas.eco, {'n': 1})
+            self.assertEqual(Tarea.objects.get(pk=registro.pk).estado, Tarea.PENDIENTE)
+        registro.refresh_from_db()
+        self.assertEqual((registro.estado, registro.resultado), (Tarea.COMPLETADA, {'n': 1}))
+
+
+# ============================================
+# BENCHMARK DE LA TIENDA
+# ============================================
+
+# El benchmark pide con `HTTP_HOST='localhost'`, que Django acepta con DEBUG y lista vacía
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage', ALLOWED_HOSTS=['localhost'],
+)
+class BenchmarkTiendaTests(TestCase):
+    """`benchmark_tienda` con datos mínimos: siembra, mide cada escenario y guarda el JSON."""
+
+    def setUp(self):
+        cache.clear()
+        temporal = tempfile.TemporaryDirectory()
+        self.addCleanup(temporal.cleanup)
+        self.carpeta = temporal.name
+
+    def correr(self, salida):
+        texto = io.StringIO()
+        call_command(
+            'benchmark_tienda', sin_copia=True, productos=30, proveedores=2, clientes=2, ventas=2,
+            repeticiones=4, hilos=0, salida=salida, stdout=texto, stderr=io.StringIO(),
+        )
+        with open(salida, encoding='utf-8') as archivo:
+            return json.load(archivo), texto.getvalue()
+
+    def test_mide_cada_escenario_y_guarda_el_json(self):
+        resultado, texto = self.correr(os.path.join(self.carpeta, 'base.json'))
+
+        self.assertEqual(resultado['parametros']['productos'], 30)
+        self.assertEqual(resultado['datos'], {'productos': 30, 'clientes': 2, 'ventas': 4})
+        self.assertEqual(resultado['http'], {})
+        self.assertEqual(list(resultado['cliente_pruebas']), [
+            'listado', 'listado_anonimo', 'busqueda', 'agregar_carrito', 'confirmar_pedido', 'historial_pedidos',
+        ])
+        for escenario, datos in resultado['cliente_pruebas'].items():
+            with self.subTest(escenario=escenario):
+                self.assertEqual((datos['n'], datos['errores']), (4, 0), datos['estados'])
+                self.assertLessEqual(datos['p50_ms'], datos['p95_ms'])
+                self.assertLessEqual(datos['p95_ms'], datos['p99_ms'])
+                self.assertGreater(datos['consultas_media'], 0)
+        # Cada confirmación creó un pedido además de los sembrados
+        self.assertEqual(Venta.objects.count(), 4 + 4)
+        self.assertIn('confirmar_pedido', texto)
+
+    def test_compara_con_una_corrida_anterior(self):
+        def corrida(commit, p95, por_segundo):
+            datos = dict(percentiles([0.01, p95]), errores=0, estados={'200': 2}, por_segundo=por_segundo,
+                         consultas_media=3.0)
+            return {'commit': commit, 'datos': {}, 'cliente_pruebas': {'listado': datos}, 'http': {}}
+
+        texto = io.StringIO()
+        comando = BenchmarkTienda(stdout=texto)
+        comando.imprimir(corrida('nuevo', 0.150, 30.0), corrida('abc123', 0.100, 40.0))
+        self.assertRegex(texto.getvalue(), r'listado .*\| p95 \+50%  /s -25%')
+        self.assertIn('diferencias contra el commit abc123', texto.getvalue())
+
+    def test_percentiles(self):
+        self.assertEqual(percentiles([]), {'n': 0})
+        resumen = percentiles([i / 1000 for i in range(1, 101)])
+        self.assertEqual(
+            (resumen['n'], resumen['p50_ms'], resumen['p95_ms'], resumen['p99_ms']), (100, 51.0, 95.0, 99.0),
+        )
@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, vistas_async
 
 app_name = 'app_kasports'
 
+# Páginas de lectura: versión asíncrona bajo ASGI (KASPORTS_VISTAS_ASYNC, ver asgi.py)
+lectura = vistas_async if settings.KASPORTS_VISTAS_ASYNC else views
+
 urlpatterns = [
     # URLs públicas (clientes)
     path('test-static/', views.test_static, name='test_static'),
@@ -10,12 +14,12 @@ urlpatterns = [
     path('html-debug/', views.html_debug, name='html_debug'),
     path('test-css/', views.test_css_simple, name='test_css_simple'),
     path('diagnostico-imagenes/', views.diagnostico_imagenes, name='diagnostico_imagenes'),
-    path('', views.index_cliente, name='index_cliente'),
-    path('productos/', views.productos, name='productos'),
-    path('ropa/', views.ropa_lista, name='ropa_lista'),
-    path('tenis/', views.tenis_lista, name='tenis_lista'),
-    path('gorras/', views.gorras_lista, name='gorras_lista'),
-    path('proveedores/', views.proveedores_lista, name='proveedores_lista'),
+    path('', lectura.index_cliente, name='index_cliente'),
+    path('productos/', lectura.productos, name='productos'),
+    path('ropa/', lectura.ropa_lista, name='ropa_lista'),
+    path('tenis/', lectura.tenis_lista, name='tenis_lista'),
+    path('gorras/', lectura.gorras_lista, name='gorras_lista'),
+    path('proveedores/', lectura.proveedores_lista, name='proveedores_lista'),
     path('contacto/', views.contacto, name='contacto'),
     
     # Autenticación
@@ -23,15 +27,27 @@ urlpatterns = [
     path('registro/', views.registro_view, name='registro'),
     path('logout/', views.logout_view, name='logout'),
     
-    # Carrito (requiere login)
+    # Carrito (de sesión para visitantes anónimos)
     path('carrito/', views.carrito_view, name='carrito'),
+    path('carrito/codigo/', views.aplicar_codigo, name='aplicar_codigo'),
     path('agregar-carrito/<str:tipo>/<int:producto_id>/', views.agregar_carrito, name='agregar_carrito'),
     path('actualizar-carrito/<int:detalle_id>/', views.actualizar_carrito, name='actualizar_carrito'),
     path('eliminar-carrito/<int:detalle_id>/', views.eliminar_carrito, name='eliminar_carrito'),
     path('confirmar-pedido/', views.confirmar_pedido, name='confirmar_pedido'),
+
+    # API JSON del carrito (la usa static/js/main.js)
+    path('api/carrito/', views.api_carrito, name='api_carrito'),
+    path('api/carrito/agregar/<str:tipo>/<int:producto_id>/', views.api_carrito_agregar, name='api_carrito_agregar'),
+    path('api/carrito/lineas/', views.api_carrito_lote, name='api_carrito_lote'),
+    path('api/carrito/lineas/<int:linea_id>/', views.api_carrito_linea, name='api_carrito_linea'),
+    path('api/carrito/lineas/<int:linea_id>/eliminar/', views.api_carrito_eliminar, name='api_carrito_eliminar'),
+
+    # API de lectura del catálogo (ETag y respuestas 304)
+    path('api/productos/<str:recurso>/', views.api_catalogo, name='api_productos'),
+    path('api/proveedores/', views.api_catalogo, {'recurso': 'proveedores'}, name='api_proveedores'),
     
     # Historial y entregas
-    path('historial/', views.historial_pedidos, name='historial_pedidos'),
+    path('historial/', lectura.historial_pedidos, name='historial_pedidos'),
     path('detalle-entrega/<int:venta_id>/', views.detalle_entrega_view, name='detalle_entrega'),
     path('confirmar-entrega/<int:venta_id>/', views.confirmar_entrega, name='confirmar_entrega'),
     path('cancelar-entrega/<int:venta_id>/', views.cancelar_entrega, name='cancelar_entrega'),
@@ -74,6 +90,16 @@ urlpatterns = [
     path('admin-panel/gorras/agregar/', views.agregar_gorra, name='agregar_gorra'),
     path('admin-panel/gorras/actualizar/<int:gorra_id>/', views.actualizar_gorra, name='actualizar_gorra'),
     path('admin-panel/gorras/borrar/<int:gorra_id>/', views.borrar_gorra, name='borrar_gorra'),
+
+    # Importación y exportación masiva de productos
+    path('admin-panel/productos/importar/', views.importar_productos, name='importar_productos'),
+    path('admin-panel/productos/exportar/', views.exportar_productos, name='exportar_productos'),
+
+    # Tareas en segundo plano
+    path('admin-panel/tareas/', views.ver_tareas, name='ver_tareas'),
+    path('admin-panel/tareas/encolar/', views.encolar_tarea_admin, name='encolar_tarea_admin'),
+    path('admin-panel/tareas/<int:tarea_id>/accion/', views.accion_tarea, name='accion_tarea'),
+    path('admin-panel/tareas/<int:tarea_id>/descargar/', views.descargar_reporte, name='descargar_reporte'),
     
     # CRUD Carritos
     path('admin-panel/carritos/', views.ver_carritos, name='ver_carritos'),
@@ -92,7 +118,10 @@ urlpatterns = [
     path('admin-panel/detalle-entrega/agregar/', views.agregar_detalle_entrega, name='agregar_detalle_entrega'),
     path('admin-panel/detalle-entrega/actualizar/<int:detalle_id>/', views.actualizar_detalle_entrega, name='actualizar_detalle_entrega'),
     path('admin-panel/detalle-entrega/borrar/<int:detalle_id>/', views.borrar_detalle_entrega, name='borrar_detalle_entrega'),
-    
+
+    # Exportaciones CSV/XLSX de ventas, clientes y entregas
+    path('admin-panel/exportar/<str:nombre>/', views.exportar_reporte, name='exportar_reporte'),
+
     # CRUD Mensajes de Contacto
     path('admin-panel/mensajes/', views.ver_mensajes, name='ver_mensajes'),
     path('admin-panel/mensajes/agregar/', views.agregar_mensaje_contacto_admin, name='agregar_mensaje_contacto'),
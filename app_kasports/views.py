@@ -1,30 +1,57 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.views.decorators.http import condition, require_GET, require_POST
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
 from django.db.models import Q, Max
 from django.conf import settings
+from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
 from decimal import Decimal
 from datetime import datetime, date
 from functools import wraps
+import io
+import json
 from .models import (
     Cliente, Administrador, Proveedor, Ropa, Tenis, Gorra,
-    Carrito, DetalleCarrito, Venta, DetalleEntrega, MensajeContacto
+    Carrito, Venta, LineaPedido, DetalleEntrega, MensajeContacto,
+    Tarea
 )
+from .busqueda import filtrar_por_relevancia
+from .cache_tienda import adjuntar_versiones, cache_anonimo, estadisticas as estadisticas_cache
+from . import api_productos, carritos, exportaciones, facetas, imagenes, importacion, mas_vendidos, metricas, notificaciones, precios, reportes, reservas, roles, tareas
+from .catalogo import MODELOS_CATALOGO, ORDENES, ordenar, top_por_tipo
+from .paginacion import paginar
+from .reservas import ErrorReserva, StockInsuficiente
+from .templatetags.currency_filters import currency
+from .tallas import adjuntar_tallas, ids_con_talla
 from django import forms
 
 # ============================================
 # FUNCIONES AUXILIARES Y DECORADORES
 # ============================================
 
+# Clave de sesión con el código promocional del carrito (ver precios.py)
+SESION_CODIGO = 'codigo_promocional'
+# Cambios que acepta una sola petición de api_carrito_lote
+MAXIMO_LOTE_CARRITO = getattr(settings, 'KASPORTS_MAXIMO_LOTE_CARRITO', 100)
+
 def es_administrador(user):
     """Verifica si el usuario es administrador"""
+    rol = getattr(user, 'rol_kasports', None)
+    if rol is not None:  # Ya resuelto desde la sesión (roles.rol_en_sesion)
+        return rol == roles.ADMINISTRADOR
     return hasattr(user, 'administrador')
 
 def es_cliente(user):
     """Verifica si el usuario es cliente"""
+    rol = getattr(user, 'rol_kasports', None)
+    if rol is not None:
+        return getattr(user, 'cliente_id_kasports', None) is not None
     return hasattr(user, 'cliente')
 
 def admin_required(view_func):
@@ -39,22 +66,16 @@ def admin_required(view_func):
         return view_func(request, *args, **kwargs)
     return wrapped_view
 
-def obtener_carrito_activo(cliente):
-    """Obtiene o crea un carrito activo para el cliente"""
-    carrito, created = Carrito.objects.get_or_create(
-        cliente=cliente,
-        estado='Activo'
-    )
-    return carrito
-
-def calcular_costo_envio(subtotal):
-    """Calcula el costo de envío según el subtotal"""
-    if subtotal < 1250:
-        return Decimal('80.00')
-    elif subtotal <= 2500:
-        return Decimal('50.00')
-    else:
-        return Decimal('0.00')
+def carrito_de(request):
+    """Carrito del visitante: en la sesión si es anónimo, en la base de datos si es cliente.
+
+    Devuelve None para los usuarios que no son clientes (administradores).
+    """
+    if not request.user.is_authenticated:
+        return carritos.CarritoSesion(request)
+    if es_cliente(request.user):
+        return carritos.CarritoCliente(request.user.cliente)
+    return None
 
 def validar_contrasena(password):
     """
@@ -145,44 +166,52 @@ def diagnostico_imagenes(request):
     }
     return render(request, 'diagnostico_imagenes.html', context)
 
+@cache_anonimo('catalogo')
 def index_cliente(request):
     """Página de inicio para clientes"""
     # Mostrar un producto destacado de cada categoría en la página de inicio
-    featured_ropa = Ropa.objects.filter(stock__gt=0).order_by('-precio').first()
-    featured_tenis = Tenis.objects.filter(stock__gt=0).order_by('-precio').first()
-    featured_gorra = Gorra.objects.filter(stock__gt=0).order_by('-precio').first()
+    # (una sola consulta sobre el catálogo unificado)
+    destacados = top_por_tipo(1)
+    imagenes.precargar(destacados['ropa'] + destacados['tenis'] + destacados['gorra'])
 
     context = {
         'usuario': request.user if request.user.is_authenticated else None,
-        'featured_ropa': featured_ropa,
-        'featured_tenis': featured_tenis,
-        'featured_gorra': featured_gorra,
+        'featured_ropa': next(iter(destacados['ropa']), None),
+        'featured_tenis': next(iter(destacados['tenis']), None),
+        'featured_gorra': next(iter(destacados['gorra']), None),
     }
     return render(request, 'clientes/index.html', context)
 
+@cache_anonimo('catalogo')
 def productos(request):
     """Página de productos con los 3 más caros de cada categoría"""
-    # Obtener los 3 productos más caros de cada categoría
-    top_ropa = Ropa.objects.filter(stock__gt=0).order_by('-precio')[:3]
-    top_tenis = Tenis.objects.filter(stock__gt=0).order_by('-precio')[:3]
-    top_gorras = Gorra.objects.filter(stock__gt=0).order_by('-precio')[:3]
+    # Obtener los 3 productos más caros de cada categoría (una sola consulta)
+    top = top_por_tipo(3)
+    # Tallas de los 9 productos en una sola consulta y versiones para la caché de tarjetas
+    adjuntar_tallas(top['ropa'] + top['tenis'] + top['gorra'])
+    adjuntar_versiones(top['ropa'] + top['tenis'] + top['gorra'])
+    imagenes.precargar(top['ropa'] + top['tenis'] + top['gorra'])
     
     context = {
-        'top_ropa': top_ropa,
-        'top_tenis': top_tenis,
-        'top_gorras': top_gorras,
+        'top_ropa': top['ropa'],
+        'top_tenis': top['tenis'],
+        'top_gorras': top['gorra'],
     }
     return render(request, 'clientes/productos.html', context)
 
-def ropa_lista(request):
-    """Lista completa de ropa con búsqueda y paginación"""
+def contexto_ropa(request):
+    """Contexto de `ropa_lista`; lo comparten las vistas síncronas y las de vistas_async.py"""
     query = request.GET.get('q', '')
-    campo = request.GET.get('campo', 'modelo')
+    campo = request.GET.get('campo', 'todos')
     
-    ropa_list = Ropa.objects.filter(stock__gt=0)
+    # Proveedores en una consulta aparte: sin el JOIN, la página se lee en el orden del índice
+    ropa_list = Ropa.objects.filter(stock__gt=0).prefetch_related('proveedor')
     
     if query:
-        if campo == 'modelo':
+        if campo == 'todos':
+            # Búsqueda multi-campo con el motor de texto completo, ordenada por relevancia
+            ropa_list = filtrar_por_relevancia(ropa_list, query, 'ropa')
+        elif campo == 'modelo':
             ropa_list = ropa_list.filter(modelo__icontains=query)
         elif campo == 'color':
             ropa_list = ropa_list.filter(color__icontains=query)
@@ -191,33 +220,51 @@ def ropa_lista(request):
         elif campo == 'genero':
             ropa_list = ropa_list.filter(genero__icontains=query)
         elif campo == 'talla':
-            # Buscar en la lista CSV de tallas disponibles
-            ropa_list = ropa_list.filter(tallas_disponibles__icontains=query)
+            # Coincidencia exacta e indexada sobre la matriz de tallas
+            ropa_list = ropa_list.filter(id__in=ids_con_talla('ropa', query))
         elif campo == 'proveedor':
             ropa_list = ropa_list.filter(proveedor__nombre__icontains=query)
     
-    paginator = Paginator(ropa_list, 9)  # 9 productos por página (3x3 grid)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Facetas (género, marca, talla, color, precio) con sus conteos en caché
+    ropa_list, facetas_listado = facetas.filtrar(request, 'ropa', ropa_list)
+    
+    ropa_list, orden, campos_orden = ordenar(request, ropa_list)
+    page_obj = paginar(request, ropa_list, campos_orden, por_pagina=9, contar=True)
+    # Tallas de los productos de la página en una sola consulta
+    page_obj.object_list = adjuntar_tallas(page_obj.object_list, 'ropa')
+    adjuntar_versiones(page_obj.object_list, 'ropa')
+    imagenes.precargar(page_obj.object_list)
     
     context = {
         'page_obj': page_obj,
         'query': query,
         'campo': campo,
         'tipo': 'ropa',
+        'facetas': facetas_listado,
+        'orden': orden,
+        'ordenes': ORDENES,
     }
-    return render(request, 'clientes/ropa.html', context)
+    return context
 
-def tenis_lista(request):
-    """Lista completa de tenis con búsqueda y paginación"""
+@cache_anonimo('catalogo')
+def ropa_lista(request):
+    """Lista completa de ropa con búsqueda y paginación"""
+    return render(request, 'clientes/ropa.html', contexto_ropa(request))
+
+def contexto_tenis(request):
+    """Contexto de `tenis_lista`"""
     query = request.GET.get('q', '')
-    campo = request.GET.get('campo', 'modelo')
+    campo = request.GET.get('campo', 'todos')
     
-    tenis_list = Tenis.objects.filter(stock__gt=0)
+    # Proveedores en una consulta aparte: sin el JOIN, la página se lee en el orden del índice
+    tenis_list = Tenis.objects.filter(stock__gt=0).prefetch_related('proveedor')
     talla_error = None
     
     if query:
-        if campo == 'modelo':
+        if campo == 'todos':
+            # Búsqueda multi-campo con el motor de texto completo, ordenada por relevancia
+            tenis_list = filtrar_por_relevancia(tenis_list, query, 'tenis')
+        elif campo == 'modelo':
             tenis_list = tenis_list.filter(modelo__icontains=query)
         elif campo == 'color':
             tenis_list = tenis_list.filter(color__icontains=query)
@@ -226,14 +273,20 @@ def tenis_lista(request):
         elif campo == 'genero':
             tenis_list = tenis_list.filter(genero__icontains=query)
         elif campo == 'talla':
-            # Buscar en la lista CSV de tallas disponibles
-            tenis_list = tenis_list.filter(tallas_disponibles__icontains=query)
+            # Coincidencia exacta e indexada sobre la matriz de tallas
+            tenis_list = tenis_list.filter(id__in=ids_con_talla('tenis', query))
         elif campo == 'proveedor':
             tenis_list = tenis_list.filter(proveedor__nombre__icontains=query)
     
-    paginator = Paginator(tenis_list, 9)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Facetas (género, marca, talla, color, precio) con sus conteos en caché
+    tenis_list, facetas_listado = facetas.filtrar(request, 'tenis', tenis_list)
+    
+    tenis_list, orden, campos_orden = ordenar(request, tenis_list)
+    page_obj = paginar(request, tenis_list, campos_orden, por_pagina=9, contar=True)
+    # Tallas de los productos de la página en una sola consulta
+    page_obj.object_list = adjuntar_tallas(page_obj.object_list, 'tenis')
+    adjuntar_versiones(page_obj.object_list, 'tenis')
+    imagenes.precargar(page_obj.object_list)
     
     context = {
         'page_obj': page_obj,
@@ -241,18 +294,30 @@ def tenis_lista(request):
         'campo': campo,
         'tipo': 'tenis',
         'talla_error': talla_error,
+        'facetas': facetas_listado,
+        'orden': orden,
+        'ordenes': ORDENES,
     }
-    return render(request, 'clientes/tenis.html', context)
+    return context
 
-def gorras_lista(request):
-    """Lista completa de gorras con búsqueda y paginación"""
+@cache_anonimo('catalogo')
+def tenis_lista(request):
+    """Lista completa de tenis con búsqueda y paginación"""
+    return render(request, 'clientes/tenis.html', contexto_tenis(request))
+
+def contexto_gorras(request):
+    """Contexto de `gorras_lista`"""
     query = request.GET.get('q', '')
-    campo = request.GET.get('campo', 'modelo')
+    campo = request.GET.get('campo', 'todos')
     
-    gorras_list = Gorra.objects.filter(stock__gt=0)
+    # Proveedores en una consulta aparte: sin el JOIN, la página se lee en el orden del índice
+    gorras_list = Gorra.objects.filter(stock__gt=0).prefetch_related('proveedor')
     
     if query:
-        if campo == 'modelo':
+        if campo == 'todos':
+            # Búsqueda multi-campo con el motor de texto completo, ordenada por relevancia
+            gorras_list = filtrar_por_relevancia(gorras_list, query, 'gorra')
+        elif campo == 'modelo':
             gorras_list = gorras_list.filter(modelo__icontains=query)
         elif campo == 'color':
             gorras_list = gorras_list.filter(color__icontains=query)
@@ -263,25 +328,41 @@ def gorras_lista(request):
         elif campo == 'genero':
             gorras_list = gorras_list.filter(genero__icontains=query)
         elif campo == 'talla':
-            gorras_list = gorras_list.filter(tallas_disponibles__icontains=query)
+            # Coincidencia exacta e indexada sobre la matriz de tallas
+            gorras_list = gorras_list.filter(id__in=ids_con_talla('gorra', query))
         elif campo == 'proveedor':
             gorras_list = gorras_list.filter(proveedor__nombre__icontains=query)
     
-    paginator = Paginator(gorras_list, 9)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Facetas (género, marca, talla, color, precio) con sus conteos en caché
+    gorras_list, facetas_listado = facetas.filtrar(request, 'gorra', gorras_list)
+    
+    gorras_list, orden, campos_orden = ordenar(request, gorras_list)
+    page_obj = paginar(request, gorras_list, campos_orden, por_pagina=9, contar=True)
+    # Tallas de los productos de la página en una sola consulta
+    page_obj.object_list = adjuntar_tallas(page_obj.object_list, 'gorra')
+    adjuntar_versiones(page_obj.object_list, 'gorra')
+    imagenes.precargar(page_obj.object_list)
     
     context = {
         'page_obj': page_obj,
         'query': query,
         'campo': campo,
         'tipo': 'gorras',
+        'facetas': facetas_listado,
+        'orden': orden,
+        'ordenes': ORDENES,
     }
-    return render(request, 'clientes/gorras.html', context)
+    return context
+
+@cache_anonimo('catalogo')
+def gorras_lista(request):
+    """Lista completa de gorras con búsqueda y paginación"""
+    return render(request, 'clientes/gorras.html', contexto_gorras(request))
 
+@cache_anonimo('proveedores')
 def proveedores_lista(request):
     """Lista de proveedores"""
-    proveedores = Proveedor.objects.all()
+    proveedores = imagenes.precargar(Proveedor.objects.all())
     context = {
         'proveedores': proveedores,
     }
@@ -325,10 +406,14 @@ def login_view(request):
         
         if user is not None:
             login(request, user)
+            roles.recordar(request, user)
             
-            # Redirigir según el tipo de usuario
+            # Redirigir según el tipo de usuario (o de vuelta a la página que pidió iniciar sesión)
+            siguiente = request.GET.get('next', '')
             if es_administrador(user):
                 return redirect('app_kasports:index_admin')
+            elif url_has_allowed_host_and_scheme(siguiente, {request.get_host()}, request.is_secure()):
+                return redirect(siguiente)
             else:
                 return redirect('app_kasports:index_cliente')
         else:
@@ -407,161 +492,80 @@ def logout_view(request):
 # CARRITO DE COMPRAS
 # ============================================
 
-@login_required
 def agregar_carrito(request, tipo, producto_id):
-    """Agregar producto al carrito"""
-    if not es_cliente(request.user):
+    """Agregar producto al carrito (de sesión para visitantes anónimos)"""
+    almacen = carrito_de(request)
+    if almacen is None:
         messages.error(request, 'Solo los clientes pueden agregar productos al carrito')
         return redirect('app_kasports:index_cliente')
     
-    cliente = request.user.cliente
-    carrito = obtener_carrito_activo(cliente)
-    
     # Obtener el producto según el tipo
-    producto = None
-    if tipo == 'ropa':
-        producto = get_object_or_404(Ropa, id=producto_id)
-    elif tipo == 'tenis':
-        producto = get_object_or_404(Tenis, id=producto_id)
-    elif tipo == 'gorra':
-        producto = get_object_or_404(Gorra, id=producto_id)
+    if tipo not in MODELOS_CATALOGO:
+        raise Http404('Tipo de producto no válido')
+    producto = get_object_or_404(MODELOS_CATALOGO[tipo], id=producto_id)
     
-    if producto.stock < 1:
-        messages.error(request, 'Producto sin stock disponible')
+    # Leer talla y cantidad enviadas por el cliente (si las hay)
+    try:
+        talla, cantidad, disponible = carritos.preparar_linea(
+            tipo, producto, request.POST.get('talla'), request.POST.get('cantidad', 1),
+        )
+    except carritos.LineaInvalida as error:
+        messages.error(request, str(error))
         return redirect(request.META.get('HTTP_REFERER', 'app_kasports:productos'))
-    # Leer talla enviada por el cliente (si la hay)
-    talla = None
-    cantidad = 1
-    if request.method == 'POST':
-        talla = request.POST.get('talla')
-        if talla:
-            talla = talla.strip()
-        cantidad_str = request.POST.get('cantidad')
-        try:
-            cantidad = max(1, min(int(cantidad_str), producto.stock))
-        except (TypeError, ValueError):
-            cantidad = 1
-
-    # Si el producto tiene tallas_disponibles y se envió una talla, validar
+    
+    # Si ya está en el carrito (mismo producto y talla) se suma la cantidad
     try:
-        tallas_cfg = getattr(producto, 'tallas_disponibles', None)
-    except Exception:
-        tallas_cfg = None
-
-    if tallas_cfg:
-        # Normalizar lista
-        available = [s.strip() for s in str(tallas_cfg).split(',') if s.strip()]
-        if talla:
-            if talla not in available:
-                messages.error(request, 'Talla inválida para este producto')
-                return redirect(request.META.get('HTTP_REFERER', 'app_kasports:productos'))
+        _, creada = almacen.agregar(tipo, producto, talla, cantidad, disponible)
+        if creada:
+            messages.success(request, 'Producto agregado al carrito')
         else:
-            # Si el administrador definió tallas disponibles, requerimos que el cliente elija
-            messages.error(request, 'Por favor selecciona una talla')
-            return redirect(request.META.get('HTTP_REFERER', 'app_kasports:productos'))
-    
-    # Verificar si ya existe en el carrito (considerando talla seleccionada)
-    detalle = None
-    if tipo == 'ropa':
-        filtro = {'carrito': carrito, 'ropa': producto}
-        if talla:
-            filtro['talla_seleccionada'] = talla
-        detalle = DetalleCarrito.objects.filter(**filtro).first()
-    elif tipo == 'tenis':
-        filtro = {'carrito': carrito, 'tenis': producto}
-        if talla:
-            filtro['talla_seleccionada'] = talla
-        detalle = DetalleCarrito.objects.filter(**filtro).first()
-    elif tipo == 'gorra':
-        filtro = {'carrito': carrito, 'gorra': producto}
-        if talla:
-            filtro['talla_seleccionada'] = talla
-        detalle = DetalleCarrito.objects.filter(**filtro).first()
-    
-    if detalle:
-        # Actualizar cantidad (sumar la nueva cantidad, pero no exceder el stock)
-        nueva_cantidad = detalle.cantidad + cantidad
-        if nueva_cantidad <= producto.stock:
-            detalle.cantidad = nueva_cantidad
-            detalle.subtotal = detalle.cantidad * producto.precio
-            # Si por alguna razón no tenía talla y ahora sí
-            if talla and not detalle.talla_seleccionada:
-                detalle.talla_seleccionada = talla
-            detalle.save()
             messages.success(request, 'Cantidad actualizada en el carrito')
-        else:
-            messages.error(request, 'No hay suficiente stock disponible')
-    else:
-        # Crear nuevo detalle
-        kwargs = {
-            'carrito': carrito,
-            'cantidad': cantidad,
-            'subtotal': producto.precio * cantidad
-        }
-        if tipo == 'ropa':
-            kwargs['ropa'] = producto
-        elif tipo == 'tenis':
-            kwargs['tenis'] = producto
-        elif tipo == 'gorra':
-            kwargs['gorra'] = producto
-        # Guardar talla seleccionada si fue enviada
-        if talla:
-            kwargs['talla_seleccionada'] = talla
-
-        DetalleCarrito.objects.create(**kwargs)
-        messages.success(request, 'Producto agregado al carrito')
+    except StockInsuficiente:
+        messages.error(request, 'No hay suficiente stock disponible')
     
     return redirect(request.META.get('HTTP_REFERER', 'app_kasports:carrito'))
 
-@login_required
 def carrito_view(request):
     """Ver carrito de compras"""
-    if not es_cliente(request.user):
+    almacen = carrito_de(request)
+    if almacen is None:
         messages.error(request, 'Solo los clientes pueden ver el carrito')
         return redirect('app_kasports:index_cliente')
     
-    cliente = request.user.cliente
-    carrito = obtener_carrito_activo(cliente)
-    detalles = carrito.detalles.all()
+    detalles = almacen.lineas()
+    imagenes.precargar([d.producto for d in detalles])
     
-    # Calcular totales y descuento
-    subtotal = sum(d.subtotal for d in detalles)
-    descuento = Decimal('0.00')
-    if subtotal > 10000:
-        descuento = subtotal * Decimal('0.10')
-    elif subtotal > 5000:
-        descuento = subtotal * Decimal('0.05')
-    subtotal_con_descuento = subtotal - descuento
-    costo_envio = calcular_costo_envio(subtotal_con_descuento)
-    impuesto = subtotal_con_descuento * Decimal('0.08')
-    total = subtotal_con_descuento + costo_envio + impuesto
+    # Totales con las reglas de precios (en caché mientras no cambie el carrito)
+    totales = almacen.totales(request.session.get(SESION_CODIGO), lineas=detalles)
 
     context = {
-        'carrito': carrito,
+        'carrito': getattr(almacen, 'carrito', None),
         'detalles': detalles,
-        'subtotal': subtotal,
-        'descuento': descuento,
-        'subtotal_con_descuento': subtotal_con_descuento,
-        'costo_envio': costo_envio,
-        'impuesto': impuesto,
-        'total': total,
+        **totales.como_contexto(),
     }
     return render(request, 'clientes/carrito.html', context)
 
-@login_required
+def aplicar_codigo(request):
+    """Aplicar o quitar un código promocional del carrito"""
+    if request.method == 'POST':
+        codigo = request.POST.get('codigo', '').strip().upper()
+        if not codigo:
+            request.session.pop(SESION_CODIGO, None)
+            messages.success(request, 'Código promocional eliminado')
+        elif precios.promocion(codigo) is None:
+            messages.error(request, 'El código promocional no es válido')
+        else:
+            request.session[SESION_CODIGO] = codigo
+            messages.success(request, f'Código {codigo} aplicado')
+    return redirect('app_kasports:carrito')
+
 def actualizar_carrito(request, detalle_id):
     """Actualizar cantidad de producto en carrito"""
-    if not es_cliente(request.user):
+    almacen = carrito_de(request)
+    if almacen is None:
         messages.error(request, 'Solo los clientes pueden actualizar el carrito')
         return redirect('app_kasports:index_cliente')
     
-    detalle = get_object_or_404(DetalleCarrito, id=detalle_id)
-    
-    # Verificar que el detalle pertenece al carrito del usuario
-    if detalle.carrito.cliente.user != request.user:
-        messages.error(request, 'No tienes permiso para actualizar este elemento')
-        return redirect('app_kasports:carrito')
-    
     if request.method == 'POST':
         cantidad = request.POST.get('cantidad')
         try:
@@ -570,42 +574,210 @@ def actualizar_carrito(request, detalle_id):
                 messages.error(request, 'La cantidad debe ser mayor a 0')
                 return redirect('app_kasports:carrito')
             
-            # Obtener el producto para verificar stock
-            producto = detalle.ropa or detalle.tenis or detalle.gorra
-            
-            if cantidad > producto.stock:
-                messages.error(request, f'Stock insuficiente. Disponible: {producto.stock}')
-                return redirect('app_kasports:carrito')
-            
-            detalle.cantidad = cantidad
-            detalle.subtotal = cantidad * producto.precio
-            detalle.save()
-            messages.success(request, 'Cantidad actualizada')
+            # Solo se encuentran las líneas del carrito propio
+            if almacen.actualizar(detalle_id, cantidad):
+                messages.success(request, 'Cantidad actualizada')
+            else:
+                messages.error(request, 'No tienes permiso para actualizar este elemento')
+        except StockInsuficiente as error:
+            messages.error(request, f'Stock insuficiente. Disponible: {error.disponible}')
         except (ValueError, TypeError):
             messages.error(request, 'Cantidad inválida')
     
     return redirect('app_kasports:carrito')
 
-@login_required
 def eliminar_carrito(request, detalle_id):
     """Eliminar producto del carrito"""
-    if not es_cliente(request.user):
+    almacen = carrito_de(request)
+    if almacen is None:
         messages.error(request, 'Solo los clientes pueden eliminar del carrito')
         return redirect('app_kasports:index_cliente')
     
-    detalle = get_object_or_404(DetalleCarrito, id=detalle_id)
-    
-    # Verificar que el detalle pertenece al carrito del usuario
-    if detalle.carrito.cliente.user != request.user:
+    producto_nombre = almacen.eliminar(detalle_id)
+    if producto_nombre is None:
         messages.error(request, 'No tienes permiso para eliminar este elemento')
-        return redirect('app_kasports:carrito')
-    
-    producto_nombre = detalle.ropa.modelo if detalle.ropa else (detalle.tenis.modelo if detalle.tenis else detalle.gorra.modelo)
-    detalle.delete()
-    messages.success(request, f'{producto_nombre} eliminado del carrito')
+    else:
+        messages.success(request, f'{producto_nombre} eliminado del carrito')
     
     return redirect('app_kasports:carrito')
 
+# ============================================
+# API JSON DEL CARRITO
+# ============================================
+# Las mismas operaciones que los formularios del carrito, pero responden con la
+# línea modificada y los totales recalculados en lugar de redirigir; main.js
+# las usa para actualizar la página sin recargarla.
+
+def _linea_json(linea):
+    producto = linea.producto
+    reserva = getattr(linea, 'reserva', None)
+    return {
+        'id': linea.id,
+        'tipo': linea.tipo_producto,
+        'producto_id': producto.pk,
+        'modelo': producto.modelo,
+        'talla': linea.talla_seleccionada,
+        'cantidad': linea.cantidad,
+        'precio': str(producto.precio),
+        'subtotal': str(linea.subtotal),
+        'subtotal_texto': currency(linea.subtotal),
+        'apartado_hasta': timezone.localtime(reserva.expira).strftime('%H:%M') if reserva else None,
+    }
+
+def _respuesta_carrito(request, almacen, datos=None, status=200):
+    """JSON con `datos` más los totales del carrito y el resumen ya renderizado."""
+    totales = almacen.totales(request.session.get(SESION_CODIGO))
+    contexto = totales.como_contexto()
+    return JsonResponse({
+        **(datos or {}),
+        'lineas': totales.lineas,
+        'unidades': totales.unidades,
+        'totales': {clave: str(contexto[clave]) for clave in (
+            'subtotal', 'descuento', 'subtotal_con_descuento', 'costo_envio', 'impuesto', 'total',
+        )},
+        'resumen_html': render_to_string('clientes/resumen_carrito.html', contexto),
+    }, status=status)
+
+def _error_json(mensaje, status, **extra):
+    return JsonResponse({'error': mensaje, **extra}, status=status)
+
+def con_carrito_json(view_func):
+    """Pasa a la vista el carrito del visitante; responde 403 en JSON a los administradores"""
+    @wraps(view_func)
+    def wrapped_view(request, *args, **kwargs):
+        almacen = carrito_de(request)
+        if almacen is None:
+            return _error_json('Solo los clientes pueden usar el carrito', 403)
+        return view_func(request, almacen, *args, **kwargs)
+    return wrapped_view
+
+def _cantidad_api(valor):
+    """Cantidad entera mayor o igual a 0 (0 quita la línea en el lote); None si no es válida."""
+    try:
+        cantidad = int(valor)
+    except (TypeError, ValueError):
+        return None
+    return cantidad if cantidad >= 0 else None
+
+@require_GET
+@con_carrito_json
+def api_carrito(request, almacen):
+    """Líneas y totales del carrito"""
+    lineas = list(almacen.lineas())
+    return _respuesta_carrito(request, almacen, {'detalles': [_linea_json(l) for l in lineas]})
+
+@require_POST
+@con_carrito_json
+def api_carrito_agregar(request, almacen, tipo, producto_id):
+    """Agregar un producto (mismos campos que el formulario de los listados)"""
+    if tipo not in MODELOS_CATALOGO:
+        return _error_json('Tipo de producto no válido', 404)
+    producto = MODELOS_CATALOGO[tipo].objects.filter(id=producto_id).first()
+    if producto is None:
+        return _error_json('El producto no existe', 404)
+    try:
+        talla, cantidad, disponible = carritos.preparar_linea(
+            tipo, producto, request.POST.get('talla'), request.POST.get('cantidad', 1),
+        )
+        linea, creada = almacen.agregar(tipo, producto, talla, cantidad, disponible)
+    except carritos.LineaInvalida as error:
+        return _error_json(str(error), 400)
+    except StockInsuficiente as error:
+        return _error_json('No hay suficiente stock disponible', 409, disponible=error.disponible)
+    mensaje = 'Producto agregado al carrito' if creada else 'Cantidad actualizada en el carrito'
+    return _respuesta_carrito(request, almacen, {'mensaje': mensaje, 'linea': _linea_json(linea)})
+
+@require_POST
+@con_carrito_json
+def api_carrito_linea(request, almacen, linea_id):
+    """Cambiar la cantidad de una línea"""
+    cantidad = _cantidad_api(request.POST.get('cantidad'))
+    if not cantidad:
+        return _error_json('La cantidad debe ser mayor a 0', 400)
+    try:
+        linea = almacen.actualizar(linea_id, cantidad)
+    except StockInsuficiente as error:
+        return _error_json(f'Stock insuficiente. Disponible: {error.disponible}', 409, disponible=error.disponible)
+    if linea is None:
+        return _error_json('La línea no está en tu carrito', 404)
+    return _respuesta_carrito(request, almacen, {'mensaje': 'Cantidad actualizada', 'linea': _linea_json(linea)})
+
+@require_POST
+@con_carrito_json
+def api_carrito_eliminar(request, almacen, linea_id):
+    """Quitar una línea"""
+    nombre = almacen.eliminar(linea_id)
+    if nombre is None:
+        return _error_json('La línea no está en tu carrito', 404)
+    return _respuesta_carrito(request, almacen, {'mensaje': f'{nombre} eliminado del carrito', 'eliminada': linea_id})
+
+@require_POST
+@con_carrito_json
+def api_carrito_lote(request, almacen):
+    """Cambiar varias líneas en una petición.
+
+    Cuerpo JSON: {"lineas": [{"id": 3, "cantidad": 2}, {"id": 5, "cantidad": 0}]};
+    cantidad 0 quita la línea. Cada línea se aplica por separado: las que fallan
+    se reportan en `errores` sin deshacer las demás. Los totales se calculan una vez.
+    """
+    try:
+        cambios = json.loads(request.body or b'{}').get('lineas')
+    except (ValueError, AttributeError):
+        cambios = None
+    if not isinstance(cambios, list) or len(cambios) > MAXIMO_LOTE_CARRITO:
+        return _error_json(f'Se esperaba {{"lineas": [...]}} con hasta {MAXIMO_LOTE_CARRITO} cambios', 400)
+
+    actualizadas, eliminadas, errores = [], [], []
+    # Una sola transacción (un commit) para todo el lote; cada línea en su propio savepoint
+    with transaction.atomic():
+        for cambio in cambios:
+            linea_id = cambio.get('id') if isinstance(cambio, dict) else None
+            cantidad = _cantidad_api(cambio.get('cantidad')) if isinstance(cambio, dict) else None
+            if not isinstance(linea_id, int) or cantidad is None:
+                errores.append({'id': linea_id, 'error': 'Cambio inválido'})
+                continue
+            try:
+                # Si la línea falla se revierte solo su savepoint, no las anteriores
+                with transaction.atomic():
+                    if cantidad == 0:
+                        resultado = almacen.eliminar(linea_id)
+                    else:
+                        resultado = almacen.actualizar(linea_id, cantidad)
+            except StockInsuficiente as error:
+                errores.append({'id': linea_id, 'error': f'Stock insuficiente. Disponible: {error.disponible}',
+                                'disponible': error.disponible})
+                continue
+            if resultado is None:
+                errores.append({'id': linea_id, 'error': 'La línea no está en tu carrito'})
+            elif cantidad == 0:
+                eliminadas.append(linea_id)
+            else:
+                actualizadas.append(_linea_json(resultado))
+    return _respuesta_carrito(request, almacen, {
+        'actualizadas': actualizadas, 'eliminadas': eliminadas, 'errores': errores,
+    })
+
+# ============================================
+# API DE PRODUCTOS (SOLO LECTURA)
+# ============================================
+
+def _etag_catalogo(request, recurso):
+    if recurso in api_productos.RECURSOS:
+        return api_productos.etag(recurso, request)
+    return None
+
+@require_GET
+@condition(etag_func=_etag_catalogo)
+def api_catalogo(request, recurso):
+    """Productos de un tipo o proveedores en JSON (ver api_productos.py)"""
+    if recurso not in api_productos.RECURSOS:
+        return _error_json('Recurso no válido', 404)
+    try:
+        datos = api_productos.pagina(recurso, request)
+    except api_productos.ParametroInvalido as error:
+        return _error_json(str(error), 400)
+    return JsonResponse(datos)
+
 @login_required
 def confirmar_pedido(request):
     """Confirmar pedido y crear venta"""
@@ -614,93 +786,66 @@ def confirmar_pedido(request):
         return redirect('app_kasports:index_cliente')
     
     cliente = request.user.cliente
-    carrito = obtener_carrito_activo(cliente)
-    detalles = carrito.detalles.all()
+    # Solo se lee el carrito activo: confirmar no crea uno vacío
+    carrito = carritos.CarritoCliente(cliente).carrito
     
-    if not detalles.exists():
+    if carrito is None or not carrito.detalles.exists():
         messages.error(request, 'El carrito está vacío')
         return redirect('app_kasports:carrito')
     
-    if request.method == 'POST':
-        metodo_pago = request.POST.get('metodo_pago')
-        direccion_entrega = request.POST.get('direccion_entrega', cliente.direccion)
-        
-        # Calcular totales y aplicar descuentos
-        subtotal = sum(d.subtotal for d in detalles)
-        descuento = Decimal('0.00')
-        if subtotal > 10000:
-            descuento = subtotal * Decimal('0.10')
-        elif subtotal > 5000:
-            descuento = subtotal * Decimal('0.05')
-        subtotal_con_descuento = subtotal - descuento
-        costo_envio = calcular_costo_envio(subtotal_con_descuento)
-        impuesto = subtotal_con_descuento * Decimal('0.08')
-        total = subtotal_con_descuento + costo_envio + impuesto
-        
-        # Crear venta
-        venta = Venta.objects.create(
-            cliente=cliente,
-            carrito=carrito,
-            metodo_pago=metodo_pago,
-            subtotal=subtotal_con_descuento,
-            impuesto=impuesto,
-            costo_envio=costo_envio,
-            total=total,
-            estado='En proceso'
-        )
-        
-        # Crear detalle de entrega
-        DetalleEntrega.objects.create(
-            venta=venta,
-            direccion_entrega=direccion_entrega,
-            estado_entrega='Pendiente',
-            fecha_envio=date.today()
-        )
-        
-        # Reducir stock de productos
-        for detalle in detalles:
-            if detalle.ropa:
-                detalle.ropa.stock -= detalle.cantidad
-                detalle.ropa.save()
-            elif detalle.tenis:
-                detalle.tenis.stock -= detalle.cantidad
-                detalle.tenis.save()
-            elif detalle.gorra:
-                detalle.gorra.stock -= detalle.cantidad
-                detalle.gorra.save()
-        
-        # Marcar carrito como inactivo
-    carrito.estado = 'Completado'
-    carrito.total = total
-    carrito.save()
+    # El resumen y el formulario de pago se muestran en el carrito
+    if request.method != 'POST':
+        return redirect('app_kasports:carrito')
+
+    metodo_pago = request.POST.get('metodo_pago')
+    direccion_entrega = request.POST.get('direccion_entrega', cliente.direccion)
+    
+    # Descuento de stock, venta y entrega en una sola transacción:
+    # si alguna línea no tiene existencias, no se guarda nada
+    try:
+        with transaction.atomic():
+            # Las líneas se leen ya con el carrito completado: los totales, el stock
+            # y la copia del pedido salen de las mismas líneas
+            detalles = reservas.confirmar(carrito)
+            totales = precios.totales_lineas(detalles, request.session.get(SESION_CODIGO), carrito=carrito)
+            
+            # Crear venta
+            venta = Venta.objects.create(
+                cliente=cliente,
+                carrito=carrito,
+                metodo_pago=metodo_pago,
+                subtotal=totales.subtotal,
+                descuento=totales.descuento,
+                impuesto=totales.impuesto,
+                costo_envio=totales.costo_envio,
+                total=totales.total,
+                estado='En proceso'
+            )
+            # Copia de las líneas: el historial no depende del catálogo actual
+            LineaPedido.objects.bulk_create(LineaPedido.desde_detalle(venta, d) for d in detalles)
+            mas_vendidos.sumar_venta(venta)
+            
+            # Crear detalle de entrega
+            DetalleEntrega.objects.create(
+                venta=venta,
+                direccion_entrega=direccion_entrega,
+                estado_entrega='Pendiente',
+                fecha_envio=date.today()
+            )
+            
+            # Guardar el total del carrito (ya marcado como completado)
+            carrito.total = totales.total
+            carrito.save(update_fields=['total'])
+
+            # El correo se envía desde la cola de tareas solo si el pedido se confirma
+            notificaciones.encolar_confirmacion(venta)
+    except ErrorReserva as error:
+        messages.error(request, str(error))
+        return redirect('app_kasports:carrito')
 
+    request.session.pop(SESION_CODIGO, None)
     messages.success(request, f'¡Pedido confirmado! Tu número de venta es: {venta.id}')
     return redirect('app_kasports:historial_pedidos')
-    
-    # Calcular totales para mostrar
-    subtotal = sum(d.subtotal for d in detalles)
-    descuento = Decimal('0.00')
-    if subtotal > 10000:
-        descuento = subtotal * Decimal('0.10')
-    elif subtotal > 5000:
-        descuento = subtotal * Decimal('0.05')
-    subtotal_con_descuento = subtotal - descuento
-    costo_envio = calcular_costo_envio(subtotal_con_descuento)
-    impuesto = subtotal_con_descuento * Decimal('0.08')
-    total = subtotal_con_descuento + costo_envio + impuesto
-    
-    context = {
-        'carrito': carrito,
-        'detalles': detalles,
-        'subtotal': subtotal,
-        'descuento': descuento,
-        'subtotal_con_descuento': subtotal_con_descuento,
-        'costo_envio': costo_envio,
-        'impuesto': impuesto,
-        'total': total,
-        'cliente': cliente,
-    }
-    return render(request, 'clientes/confirmar_pedido.html', context)
 
 @login_required
 def historial_pedidos(request):
@@ -709,23 +854,20 @@ def historial_pedidos(request):
         messages.error(request, 'Solo los clientes pueden ver su historial')
         return redirect('app_kasports:index_cliente')
     
-    cliente = request.user.cliente
-    # Cargar relaciones relacionadas para evitar consultas N+1 al mostrar productos entregados
+    return render(request, 'clientes/historial.html', contexto_historial(request, request.user.cliente))
+
+def contexto_historial(request, cliente):
+    """Contexto de `historial_pedidos` (una página de ventas del cliente)"""
+    # Las líneas de la página salen de la copia guardada al confirmar (una sola consulta)
     ventas = (
         Venta.objects
         .filter(cliente=cliente)
-        .select_related('carrito', 'detalle_entrega')
-        .prefetch_related(
-            'carrito__detalles__ropa',
-            'carrito__detalles__tenis',
-            'carrito__detalles__gorra',
-        )
+        .select_related('cliente__user', 'detalle_entrega')
+        .prefetch_related('lineas')
         .order_by('-fecha_venta')
     )
     
-    paginator = Paginator(ventas, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar(request, ventas, ('-fecha_venta',), por_pagina=10, contar=True)
     
     context = {
         'page_obj': page_obj,
@@ -734,7 +876,7 @@ def historial_pedidos(request):
         # con el template y soportar paginación.
         'ventas': page_obj,
     }
-    return render(request, 'clientes/historial.html', context)
+    return context
 
 @login_required
 def detalle_entrega_view(request, venta_id):
@@ -785,6 +927,7 @@ def detalle_entrega_view(request, venta_id):
     context = {
         'venta': venta,
         'detalle_entrega': detalle_entrega,
+        'lineas': venta.lineas.all(),
     }
     return render(request, 'clientes/detalle_entrega.html', context)
 
@@ -865,16 +1008,25 @@ def cancelar_entrega(request, venta_id):
 @admin_required
 def index_admin(request):
     """Dashboard principal del administrador"""
-    total_clientes = Cliente.objects.count()
-    total_productos = Ropa.objects.count() + Tenis.objects.count() + Gorra.objects.count()
-    total_ventas = Venta.objects.count()
-    mensajes_sin_leer = MensajeContacto.objects.filter(leido=False).count()
+    # Los totales salen de contadores incrementales (ver metricas.py), no de COUNT(*)
+    dias = request.GET.get('dias', '30')
+    dias = int(dias) if dias in ('7', '30', '90') else 30
+    datos = metricas.tablero(dias)
+    contadores = datos['contadores']
 
     context = {
-        'total_clientes': total_clientes,
-        'total_productos': total_productos,
-        'total_ventas': total_ventas,
-        'mensajes_sin_leer': mensajes_sin_leer,
+        'total_clientes': int(contadores['clientes']),
+        'total_productos': int(contadores['productos']),
+        'total_ventas': int(contadores['ventas']),
+        'ingresos_totales': contadores['ingresos'],
+        'mensajes_sin_leer': int(contadores['mensajes_sin_leer']),
+        'unidades_vendidas': datos['unidades'],
+        'serie_ventas': datos['serie'],
+        'ingresos_periodo': datos['ingresos_periodo'],
+        'ventas_periodo': datos['ventas_periodo'],
+        'dias': dias,
+        # Aciertos y fallos de la caché de la tienda
+        'estadisticas_cache': estadisticas_cache(),
     }
     return render(request, 'administrador/index_admin.html', context)
 
@@ -888,27 +1040,19 @@ def ver_clientes(request):
     """Ver todos los clientes con búsqueda y paginación"""
     query = request.GET.get('q', '').strip()
     campo = request.GET.get('campo', 'username')
+    desde = request.GET.get('desde', '')
+    hasta = request.GET.get('hasta', '')
 
-    clientes = Cliente.objects.select_related('user').all()
+    clientes = exportaciones.filtrar('clientes', Cliente.objects.select_related('user'), query, campo, desde, hasta)
 
-    if query:
-        if campo == 'username':
-            clientes = clientes.filter(user__username__icontains=query)
-        elif campo == 'nombre':
-            clientes = clientes.filter(user__first_name__icontains=query)
-        elif campo == 'correo':
-            clientes = clientes.filter(user__email__icontains=query)
-        elif campo == 'telefono':
-            clientes = clientes.filter(telefono__icontains=query)
-
-    paginator = Paginator(clientes, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar(request, clientes, ('id',), por_pagina=10, contar=True)
 
     context = {
         'page_obj': page_obj,
         'query': query,
         'campo': campo,
+        'desde': desde,
+        'hasta': hasta,
     }
     return render(request, 'administrador/cliente/ver_cliente.html', context)
 
@@ -1029,9 +1173,7 @@ def ver_administradores(request):
         elif campo == 'correo':
             admins = admins.filter(user__email__icontains=query)
 
-    paginator = Paginator(admins, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar(request, admins, ('id',), por_pagina=10, contar=True)
 
     context = {
         'page_obj': page_obj,
@@ -1154,9 +1296,8 @@ def ver_proveedores(request):
         elif campo == 'rfc':
             proveedores = proveedores.filter(rfc_fiscal__icontains=query)
 
-    paginator = Paginator(proveedores, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar(request, proveedores, ('id',), por_pagina=10, contar=True)
+    imagenes.precargar(page_obj.object_list)
 
     context = {
         'page_obj': page_obj,
@@ -1255,9 +1396,8 @@ def ver_ropa(request):
         elif campo == 'proveedor':
             ropa = ropa.filter(proveedor__nombre__icontains=query)
 
-    paginator = Paginator(ropa, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar(request, ropa, ('id',), por_pagina=10, contar=True)
+    imagenes.precargar(page_obj.object_list)
 
     context = {
         'page_obj': page_obj,
@@ -1370,9 +1510,8 @@ def ver_tenis(request):
         elif campo == 'proveedor':
             tenis = tenis.filter(proveedor__nombre__icontains=query)
 
-    paginator = Paginator(tenis, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar(request, tenis, ('id',), por_pagina=10, contar=True)
+    imagenes.precargar(page_obj.object_list)
 
     context = {
         'page_obj': page_obj,
@@ -1485,9 +1624,8 @@ def ver_gorras(request):
         elif campo == 'proveedor':
             gorras = gorras.filter(proveedor__nombre__icontains=query)
 
-    paginator = Paginator(gorras, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar(request, gorras, ('id',), por_pagina=10, contar=True)
+    imagenes.precargar(page_obj.object_list)
 
     context = {
         'page_obj': page_obj,
@@ -1583,6 +1721,160 @@ def borrar_gorra(request, gorra_id):
     return render(request, 'administrador/gorras/borrar_gorra.html', {'gorra': gorra})
 
 
+# ============================================================
+# IMPORTACIÓN Y EXPORTACIÓN DE PRODUCTOS
+# ============================================================
+
+@admin_required
+def importar_productos(request):
+    """Importar productos desde un archivo CSV o JSON Lines"""
+    resultado = None
+    tipo = request.POST.get('tipo', 'ropa')
+
+    if request.method == 'POST':
+        archivo = request.FILES.get('archivo')
+        if tipo not in MODELOS_CATALOGO or archivo is None:
+            messages.error(request, 'Selecciona el tipo de producto y un archivo')
+        else:
+            formato = request.POST.get('formato') or importacion.formato_de(archivo.name)
+            if formato not in importacion.FORMATOS:
+                formato = importacion.formato_de(archivo.name)
+            if request.POST.get('segundo_plano'):
+                guardado = reportes.almacenamiento.save(f'importaciones/{archivo.name}', archivo)
+                tarea = tareas.encolar(
+                    importacion.importar_tarea, {'archivo': guardado, 'tipo': tipo, 'formato': formato}
+                )
+                messages.success(request, f'Importación encolada como tarea #{tarea.id}.')
+                return redirect('app_kasports:ver_tareas')
+            texto = io.TextIOWrapper(archivo.file, encoding='utf-8-sig', newline='')
+            try:
+                resultado = importacion.importar(texto, tipo, formato)
+            except UnicodeDecodeError:
+                messages.error(request, 'El archivo debe estar codificado en UTF-8')
+            else:
+                messages.success(
+                    request,
+                    f'{resultado.creados} creado(s) y {resultado.actualizados} actualizado(s) '
+                    f'de {resultado.filas} fila(s).'
+                )
+
+    context = {
+        'tipos': list(MODELOS_CATALOGO),
+        'tipo': tipo,
+        'formatos': importacion.FORMATOS,
+        'resultado': resultado,
+        'errores': resultado.errores[:100] if resultado else [],
+        'columnas': {t: importacion.columnas(t) for t in MODELOS_CATALOGO},
+    }
+    return render(request, 'administrador/importar_productos.html', context)
+
+@admin_required
+def exportar_productos(request):
+    """Descargar los productos de un tipo en CSV o JSON Lines"""
+    tipo = request.GET.get('tipo', 'ropa')
+    formato = request.GET.get('formato', 'csv')
+    if tipo not in MODELOS_CATALOGO or formato not in importacion.FORMATOS:
+        messages.error(request, 'Tipo o formato de exportación no válido')
+        return redirect('app_kasports:importar_productos')
+
+    tipo_contenido = 'text/csv' if formato == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(
+        importacion.exportar(tipo, formato), content_type=f'{tipo_contenido}; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{tipo}.{formato}"'
+    return response
+
+@admin_required
+def exportar_reporte(request, nombre):
+    """Descargar ventas, clientes o entregas (CSV o XLSX) con la búsqueda y las fechas del listado"""
+    formato = request.GET.get('formato', 'csv')
+    if nombre not in exportaciones.EXPORTACIONES or formato not in exportaciones.FORMATOS:
+        raise Http404('Exportación no válida')
+
+    partes = exportaciones.exportar(
+        nombre, formato,
+        query=request.GET.get('q', '').strip(),
+        campo=request.GET.get('campo', ''),
+        desde=request.GET.get('desde'),
+        hasta=request.GET.get('hasta'),
+    )
+    response = StreamingHttpResponse(partes, content_type=exportaciones.TIPOS_CONTENIDO[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nombre}_{timezone.localdate():%Y%m%d}.{formato}"'
+    return response
+
+
+# ============================================================
+# TAREAS EN SEGUNDO PLANO
+# ============================================================
+
+# Tareas que el administrador puede lanzar desde el panel
+TAREAS_PANEL = {
+    'reporte_ventas': ('Reporte de ventas (CSV)', reportes.reporte_ventas),
+    'reconciliar_metricas': ('Reconciliar métricas del tablero', metricas.reconciliar),
+    'imagenes': ('Generar miniaturas faltantes', imagenes.encolar_pendientes),
+}
+
+@admin_required
+def ver_tareas(request):
+    """Panel de la cola de tareas: totales por estado y tareas recientes"""
+    estado = request.GET.get('estado', '')
+    lista = Tarea.objects.all()
+    if estado in dict(Tarea.ESTADOS):
+        lista = lista.filter(estado=estado)
+
+    page_obj = paginar(request, lista, ('-id',), por_pagina=20)
+
+    context = {
+        'page_obj': page_obj,
+        'estado': estado,
+        'estados': Tarea.ESTADOS,
+        'resumen': tareas.resumen(),
+        'tareas_panel': [(clave, nombre) for clave, (nombre, _) in TAREAS_PANEL.items()],
+    }
+    return render(request, 'administrador/tareas/ver_tareas.html', context)
+
+@admin_required
+def encolar_tarea_admin(request):
+    """Encolar una de las tareas del panel"""
+    if request.method == 'POST':
+        opcion = TAREAS_PANEL.get(request.POST.get('tarea'))
+        if opcion is None:
+            messages.error(request, 'Tarea no válida')
+        else:
+            nombre, funcion = opcion
+            argumentos = {}
+            if funcion is reportes.reporte_ventas:
+                argumentos = {
+                    'desde': request.POST.get('desde') or None,
+                    'hasta': request.POST.get('hasta') or None,
+                }
+            tarea = tareas.encolar(funcion, argumentos)
+            messages.success(request, f'{nombre}: tarea #{tarea.id} encolada.')
+    return redirect('app_kasports:ver_tareas')
+
+@admin_required
+def accion_tarea(request, tarea_id):
+    """Reintentar una tarea fallida o cancelar una pendiente"""
+    if request.method == 'POST':
+        accion = request.POST.get('accion')
+        if accion == 'reintentar' and tareas.reintentar(tarea_id):
+            messages.success(request, f'Tarea #{tarea_id} encolada de nuevo.')
+        elif accion == 'cancelar' and tareas.cancelar(tarea_id):
+            messages.success(request, f'Tarea #{tarea_id} cancelada.')
+        else:
+            messages.error(request, f'La tarea #{tarea_id} ya no admite esa acción.')
+    return redirect('app_kasports:ver_tareas')
+
+@admin_required
+def descargar_reporte(request, tarea_id):
+    """Descargar el archivo generado por una tarea de reporte"""
+    tarea = get_object_or_404(Tarea, id=tarea_id, estado=Tarea.COMPLETADA)
+    archivo = (tarea.resultado or {}).get('archivo') if isinstance(tarea.resultado, dict) else None
+    if not archivo or not reportes.almacenamiento.exists(archivo):
+        raise Http404('El reporte ya no está disponible')
+    return FileResponse(reportes.almacenamiento.open(archivo, 'rb'), as_attachment=True, filename=archivo)
+
+
 # ============================================================
 # CRUD CARRITO (ADMIN)
 # ============================================================
@@ -1603,9 +1895,7 @@ def ver_carritos(request):
         elif campo == 'id':
             carritos = carritos.filter(id__icontains=query)
 
-    paginator = Paginator(carritos, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar(request, carritos, ('-fecha_creacion',), por_pagina=10, contar=True)
 
     context = {
         'page_obj': page_obj,
@@ -1617,7 +1907,7 @@ def ver_carritos(request):
 @admin_required
 def agregar_carrito_admin(request):
     """Agregar carrito manualmente (admin)"""
-    clientes = Cliente.objects.all()
+    clientes = Cliente.objects.select_related('user')
 
     if request.method == 'POST':
         cliente_id = request.POST.get('cliente_id')
@@ -1625,11 +1915,17 @@ def agregar_carrito_admin(request):
 
         cliente = get_object_or_404(Cliente, id=cliente_id)
 
-        Carrito.objects.create(
-            cliente=cliente,
-            estado=estado,
-            total=Decimal('0.00')
-        )
+        try:
+            with transaction.atomic():
+                Carrito.objects.create(
+                    cliente=cliente,
+                    estado=estado,
+                    total=Decimal('0.00')
+                )
+        except IntegrityError:
+            # Restricción carrito_activo_unico
+            messages.error(request, 'El cliente ya tiene un carrito activo.')
+            return render(request, 'administrador/carrito/agregar_carrito.html', {'clientes': clientes})
 
         messages.success(request, 'Carrito creado correctamente.')
         return redirect('app_kasports:ver_carritos')
@@ -1643,7 +1939,12 @@ def actualizar_carrito_admin(request, carrito_id):
 
     if request.method == 'POST':
         carrito.estado = request.POST.get('estado', 'Activo')
-        carrito.save()
+        try:
+            with transaction.atomic():
+                carrito.save()
+        except IntegrityError:
+            messages.error(request, 'El cliente ya tiene otro carrito activo.')
+            return render(request, 'administrador/carrito/actualizar_carrito.html', {'carrito': carrito})
 
         messages.success(request, f'Carrito #{carrito.id} actualizado correctamente.')
         return redirect('app_kasports:ver_carritos')
@@ -1672,35 +1973,29 @@ def ver_ventas(request):
     """Ver todas las ventas con búsqueda y paginación"""
     query = request.GET.get('q', '').strip()
     campo = request.GET.get('campo', 'cliente')
+    desde = request.GET.get('desde', '')
+    hasta = request.GET.get('hasta', '')
 
-    ventas = Venta.objects.select_related('cliente__user', 'carrito').all()
-
-    if query:
-        if campo == 'cliente':
-            ventas = ventas.filter(cliente__user__username__icontains=query)
-        elif campo == 'id':
-            ventas = ventas.filter(id__icontains=query)
-        elif campo == 'estado':
-            ventas = ventas.filter(estado__icontains=query)
-        elif campo == 'metodo_pago':
-            ventas = ventas.filter(metodo_pago__icontains=query)
+    ventas = exportaciones.filtrar(
+        'ventas', Venta.objects.select_related('cliente__user', 'carrito'), query, campo, desde, hasta,
+    )
 
-    paginator = Paginator(ventas, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar(request, ventas, ('-fecha_venta',), por_pagina=10, contar=True)
 
     context = {
         'page_obj': page_obj,
         'query': query,
         'campo': campo,
+        'desde': desde,
+        'hasta': hasta,
     }
     return render(request, 'administrador/venta/ver_venta.html', context)
 
 @admin_required
 def agregar_venta(request):
     """Agregar venta manualmente"""
-    clientes = Cliente.objects.all()
-    carritos = Carrito.objects.all()
+    clientes = Cliente.objects.select_related('user')
+    carritos = Carrito.objects.select_related('cliente__user')
 
     if request.method == 'POST':
         cliente_id = request.POST.get('cliente_id')
@@ -1775,32 +2070,29 @@ def ver_detalle_entrega(request):
     """Ver todos los detalles de entrega con búsqueda y paginación"""
     query = request.GET.get('q', '').strip()
     campo = request.GET.get('campo', 'venta')
+    desde = request.GET.get('desde', '')
+    hasta = request.GET.get('hasta', '')
 
-    detalles = DetalleEntrega.objects.select_related('venta__cliente__user').all()
-
-    if query:
-        if campo == 'venta':
-            detalles = detalles.filter(venta__id__icontains=query)
-        elif campo == 'estado':
-            detalles = detalles.filter(estado_entrega__icontains=query)
-        elif campo == 'cliente':
-            detalles = detalles.filter(venta__cliente__user__username__icontains=query)
+    detalles = exportaciones.filtrar(
+        'entregas', DetalleEntrega.objects.select_related('venta__cliente__user'), query, campo, desde, hasta,
+    )
 
-    paginator = Paginator(detalles, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar(request, detalles, ('-id',), por_pagina=10, contar=True)
+    imagenes.precargar(page_obj.object_list, 'imagen_evidencia')
 
     context = {
         'page_obj': page_obj,
         'query': query,
         'campo': campo,
+        'desde': desde,
+        'hasta': hasta,
     }
     return render(request, 'administrador/detalle_entrega/ver_detalle_entrega.html', context)
 
 @admin_required
 def agregar_detalle_entrega(request):
     """Agregar detalle de entrega"""
-    ventas = Venta.objects.all()
+    ventas = Venta.objects.select_related('cliente__user')
 
     if request.method == 'POST':
         venta_id = request.POST.get('venta_id')
@@ -1895,9 +2187,7 @@ def ver_mensajes(request):
             leido_value = query.lower() in ('sí', 'si', 'yes', 'true', '1')
             mensajes = mensajes.filter(leido=leido_value)
 
-    paginator = Paginator(mensajes, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar(request, mensajes, ('-fecha_envio',), por_pagina=10, contar=True)
 
     context = {
         'page_obj': page_obj,
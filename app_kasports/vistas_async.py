@@ -0,0 +1,111 @@
+"""Vistas asíncronas de lectura de la tienda.
+
+Con `KASPORTS_VISTAS_ASYNC` (lo activa asgi.py) urls.py enruta aquí el inicio,
+los productos, los tres listados, los proveedores y el historial. El trabajo
+síncrono (consultas, contexto de views.py y render) sigue ocupando un hilo
+mientras corre, pero va al ejecutor compartido con `base_datos.en_ejecutor`
+(`thread_sensitive=False`) en lugar del hilo dedicado que `sync_to_async`
+reserva para cada petición; así el número de peticiones en espera no está
+atado al de hilos:
+
+- el inicio y los productos piden las tres categorías con una sola consulta
+  (`catalogo.top_por_tipo`, con función de ventana);
+- los listados y el historial reutilizan el contexto de views.py (búsqueda,
+  paginación por cursor y tallas) en una sola llamada;
+- los proveedores se leen con el ORM asíncrono (`async for`);
+- el render también va al ejecutor: las plantillas consultan `user.cliente` y
+  las tarjetas leen la caché.
+
+`request.user` llega ya evaluado por `roles.rol_en_sesion`, así que leer
+`is_authenticated` y el rol no toca la base de datos dentro del bucle.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import redirect, render
+
+from . import catalogo, imagenes, views
+from .base_datos import en_ejecutor
+from .cache_tienda import adjuntar_versiones, cache_anonimo
+from .models import Proveedor
+from .tallas import adjuntar_tallas
+
+render_async = en_ejecutor(render)
+top_por_tipo = en_ejecutor(catalogo.top_por_tipo)
+
+
+def _preparar_tarjetas(productos):
+    adjuntar_tallas(productos)
+    adjuntar_versiones(productos)
+    imagenes.precargar(productos)
+
+
+@cache_anonimo('catalogo')
+async def index_cliente(request):
+    """Página de inicio para clientes"""
+    destacados = await top_por_tipo(1)
+    await en_ejecutor(imagenes.precargar)(destacados['ropa'] + destacados['tenis'] + destacados['gorra'])
+
+    context = {
+        'usuario': request.user if request.user.is_authenticated else None,
+        'featured_ropa': next(iter(destacados['ropa']), None),
+        'featured_tenis': next(iter(destacados['tenis']), None),
+        'featured_gorra': next(iter(destacados['gorra']), None),
+    }
+    return await render_async(request, 'clientes/index.html', context)
+
+
+@cache_anonimo('catalogo')
+async def productos(request):
+    """Página de productos con los 3 más caros de cada categoría"""
+    top = await top_por_tipo(3)
+    await en_ejecutor(_preparar_tarjetas)(top['ropa'] + top['tenis'] + top['gorra'])
+
+    context = {
+        'top_ropa': top['ropa'],
+        'top_tenis': top['tenis'],
+        'top_gorras': top['gorra'],
+    }
+    return await render_async(request, 'clientes/productos.html', context)
+
+
+@cache_anonimo('catalogo')
+async def ropa_lista(request):
+    """Lista completa de ropa con búsqueda y paginación"""
+    context = await en_ejecutor(views.contexto_ropa)(request)
+    return await render_async(request, 'clientes/ropa.html', context)
+
+
+@cache_anonimo('catalogo')
+async def tenis_lista(request):
+    """Lista completa de tenis con búsqueda y paginación"""
+    context = await en_ejecutor(views.contexto_tenis)(request)
+    return await render_async(request, 'clientes/tenis.html', context)
+
+
+@cache_anonimo('catalogo')
+async def gorras_lista(request):
+    """Lista completa de gorras con búsqueda y paginación"""
+    context = await en_ejecutor(views.contexto_gorras)(request)
+    return await render_async(request, 'clientes/gorras.html', context)
+
+
+@cache_anonimo('proveedores')
+async def proveedores_lista(request):
+    """Lista de proveedores"""
+    proveedores = [proveedor async for proveedor in Proveedor.objects.all()]
+    await en_ejecutor(imagenes.precargar)(proveedores)
+    return await render_async(request, 'clientes/proveedores.html', {'proveedores': proveedores})
+
+
+async def historial_pedidos(request):
+    """Ver historial de pedidos del cliente"""
+    # `login_required` de Django 4.2 no acepta vistas asíncronas
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    if not views.es_cliente(request.user):
+        await sync_to_async(messages.error)(request, 'Solo los clientes pueden ver su historial')
+        return redirect('app_kasports:index_cliente')
+
+    context = await en_ejecutor(views.contexto_historial)(request, request.user.cliente_id_kasports)
+    return await render_async(request, 'clientes/historial.html', context)
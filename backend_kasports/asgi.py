@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_kasports.settings')
+# Bajo un servidor ASGI (uvicorn, daphne) la tienda usa las vistas de app_kasports/vistas_async.py
+os.environ.setdefault('KASPORTS_VISTAS_ASYNC', '1')
 
 application = get_asgi_application()
+
+# /static/ y /media/ los sirve el proxy delante del servidor ASGI (ServidorArchivos es WSGI)
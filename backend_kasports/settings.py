@@ -42,16 +42,21 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Instrumentación de consultas; solo se activa con KASPORTS_INSTRUMENTAR_CONSULTAS
+    'app_kasports.instrumentacion.instrumentar_consultas',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Rol (cliente/administrador) resuelto una vez y guardado en la sesión
+    'app_kasports.roles.rol_en_sesion',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 # Agregar versionado de estáticos
-STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+# Nombres con hash + copias .gz/.br generadas en collectstatic (ver app_kasports/estaticos.py)
+STATICFILES_STORAGE = 'app_kasports.estaticos.AlmacenamientoComprimido'
 
 ROOT_URLCONF = 'backend_kasports.urls'
 
@@ -73,17 +78,72 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend_kasports.wsgi.application'
+ASGI_APPLICATION = 'backend_kasports.asgi.application'
+
+# Vistas de lectura asíncronas (app_kasports/vistas_async.py); asgi.py las activa por defecto
+KASPORTS_VISTAS_ASYNC = os.environ.get('KASPORTS_VISTAS_ASYNC') == '1'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Perfil: KASPORTS_BD = sqlite (por defecto), sqlite_basico o postgres (ver app_kasports/base_datos.py)
+_perfil_bd = os.environ.get('KASPORTS_BD', 'sqlite')
+# Segundos que se reutiliza una conexión entre peticiones (0 = una por petición). En modo
+# asíncrono las consultas corren en hilos del ejecutor y Django recomienda no reutilizarlas.
+_conexion_segundos = int(os.environ.get('KASPORTS_BD_CONN_MAX_AGE', 0 if KASPORTS_VISTAS_ASYNC else 60))
+
+if _perfil_bd == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('KASPORTS_BD_NOMBRE', 'kasports'),
+            'USER': os.environ.get('KASPORTS_BD_USUARIO', 'kasports'),
+            'PASSWORD': os.environ.get('KASPORTS_BD_CONTRASENA', ''),
+            'HOST': os.environ.get('KASPORTS_BD_HOST', 'localhost'),
+            'PORT': os.environ.get('KASPORTS_BD_PUERTO', '5432'),
+            'CONN_MAX_AGE': _conexion_segundos,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'connect_timeout': 5},
+        }
+    }
+    KASPORTS_SQLITE_PRAGMAS = {}
+elif _perfil_bd == 'sqlite_basico':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('KASPORTS_BD_NOMBRE', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+    # WAL queda guardado en el archivo: se regresa explícitamente al diario por defecto
+    KASPORTS_SQLITE_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('KASPORTS_BD_NOMBRE', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': _conexion_segundos,
+            'CONN_HEALTH_CHECKS': True,
+            # Espera del módulo sqlite3 al abrir; busy_timeout cubre cada sentencia
+            'OPTIONS': {'timeout': 20},
+            # Las pruebas con hilos (tests.py) necesitan un archivo: en memoria, las
+            # conexiones compartidas fallan con "table is locked" en lugar de esperar
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        }
+    }
+    # journal_mode=WAL queda escrito en el encabezado del archivo: se activa solo en el
+    # despliegue (o en `carga_checkout`) con KASPORTS_SQLITE_WAL=1, para que los comandos
+    # de desarrollo no modifiquen el db.sqlite3 del repositorio
+    _sqlite_wal = os.environ.get('KASPORTS_SQLITE_WAL') == '1'
+    KASPORTS_SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL' if _sqlite_wal else 'DELETE',
+        # Con WAL solo se pierde la última transacción si se va la luz; sin WAL, NORMAL no es seguro
+        'synchronous': 'NORMAL' if _sqlite_wal else 'FULL',
+        'busy_timeout': 20000,             # Milisegundos que un escritor espera el candado
+        'cache_size': -32000,              # 32 MB de caché de páginas por conexión
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
     }
-}
 
 
 # Password validation
@@ -127,14 +187,135 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# `ServidorArchivos` (app_kasports/estaticos.py, montado en wsgi.py) sirve STATIC_ROOT
+# después de `collectstatic`: los nombres con hash llevan caché inmutable de un año y
+# el resto KASPORTS_CACHE_ESTATICOS. Media solo con KASPORTS_SERVIR_MEDIA=1 y solo las
+# carpetas de KASPORTS_MEDIA_PUBLICA: MEDIA_ROOT también guarda las evidencias de
+# entrega de los clientes (entregas/), que no deben quedar públicas.
+KASPORTS_SERVIR_MEDIA = os.environ.get('KASPORTS_SERVIR_MEDIA') == '1'
+KASPORTS_MEDIA_PUBLICA = ('ropa/', 'tenis/', 'gorras/', 'proveedores/', 'derivadas/')
+KASPORTS_CACHE_ESTATICOS = 'public, max-age=300'
+KASPORTS_CACHE_MEDIA = 'public, max-age=86400'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Sesiones: KASPORTS_SESIONES = cache (caché + base de datos, por defecto), db o firmadas
+# (cookie firmada, sin tabla; el contenido viaja al navegador, no guardar datos sensibles)
+SESSION_ENGINE = {
+    'cache': 'django.contrib.sessions.backends.cached_db',
+    'db': 'django.contrib.sessions.backends.db',
+    'firmadas': 'django.contrib.sessions.backends.signed_cookies',
+}[os.environ.get('KASPORTS_SESIONES', 'cache')]
+
 # Configuración de autenticación
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
+# Caché: KASPORTS_CACHE = archivo (por defecto), base_datos, redis (con KASPORTS_CACHE_URL)
+# o locmem. Las versiones de invalidación, los roles en sesión y los ETag de la API
+# viven en la caché, así que todos los procesos deben compartirla: locmem solo sirve
+# con un único proceso (runserver) y `check --deploy` la rechaza. base_datos requiere
+# `python manage.py createcachetable` y sus lecturas cuentan como consultas.
+_backend_cache = os.environ.get('KASPORTS_CACHE', 'archivo')
+if _backend_cache == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('KASPORTS_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+        }
+    }
+elif _backend_cache == 'base_datos':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'kasports_cache',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+elif _backend_cache == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'kasports',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+else:
+    # Compartida por todos los procesos del mismo servidor, sin servicios extra
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('KASPORTS_CACHE_URL', str(BASE_DIR / 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# Segundos que se conservan las páginas y tarjetas cacheadas de la tienda
+KASPORTS_CACHE_SEGUNDOS = int(os.environ.get('KASPORTS_CACHE_SEGUNDOS', 300))
+
+# Segundos que vale el rol guardado en la sesión antes de volver a consultarlo (roles.py)
+KASPORTS_ROL_SEGUNDOS = 60
+
+# Minutos que se aparta el stock al agregar al carrito (ver `liberar_reservas`)
+KASPORTS_RESERVA_MINUTOS = 15
+
+# Reglas de precios del carrito (ver app_kasports/precios.py); se aplican en orden
+KASPORTS_REGLAS_PRECIO = [
+    'app_kasports.precios.descuento_por_monto',
+    'app_kasports.precios.codigo_promocional',
+    'app_kasports.precios.envio_por_monto',
+]
+# (monto mínimo exclusivo, porcentaje) del mayor al menor
+KASPORTS_DESCUENTOS_POR_MONTO = [('10000', '0.10'), ('5000', '0.05')]
+# (monto máximo inclusivo, costo); arriba del último tramo el envío es gratis
+KASPORTS_TARIFAS_ENVIO = [('1249.99', '80.00'), ('2500.00', '50.00')]
+KASPORTS_TASA_IMPUESTO = '0.08'
+# Ej.: {'KA10': {'porcentaje': '10'}, 'ENVIOGRATIS': {'envio_gratis': True, 'minimo': '500'}}
+KASPORTS_CODIGOS_PROMOCIONALES = {}
+
+# Miniaturas de imágenes subidas (ver app_kasports/imagenes.py)
+KASPORTS_IMAGENES_ANCHOS = (160, 320, 640, 960)
+KASPORTS_IMAGENES_FORMATOS = ('avif', 'webp')
+
+# Cola de tareas en segundo plano (ver app_kasports/tareas.py). Los trabajadores se
+# inician con `python manage.py procesar_tareas`; con KASPORTS_TAREAS_SINCRONAS=1 las
+# tareas se ejecutan dentro de la misma petición (desarrollo sin trabajador).
+KASPORTS_TAREAS_SINCRONAS = os.environ.get('KASPORTS_TAREAS_SINCRONAS') == '1'
+KASPORTS_TAREAS_RETRASO_BASE = 10
+KASPORTS_TAREAS_SEGUNDOS_BLOQUEO = 900
+# Reportes generados por la cola; fuera de MEDIA_ROOT para que no sean públicos
+KASPORTS_REPORTES_DIR = BASE_DIR / 'reportes'
+
+# Correo (confirmaciones de pedido). Por defecto se imprime en la consola.
+EMAIL_BACKEND = os.environ.get('KASPORTS_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('KASPORTS_EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('KASPORTS_EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.environ.get('KASPORTS_EMAIL_USUARIO', '')
+EMAIL_HOST_PASSWORD = os.environ.get('KASPORTS_EMAIL_CONTRASENA', '')
+EMAIL_USE_TLS = os.environ.get('KASPORTS_EMAIL_TLS') == '1'
+DEFAULT_FROM_EMAIL = os.environ.get('KASPORTS_EMAIL_REMITENTE', 'KA.Sports <no-responder@kasports.mx>')
+
+# Instrumentación de consultas por vista (ver app_kasports/instrumentacion.py)
+KASPORTS_INSTRUMENTAR_CONSULTAS = os.environ.get('KASPORTS_INSTRUMENTAR_CONSULTAS') == '1'
+KASPORTS_PRESUPUESTO_ESTRICTO = os.environ.get('KASPORTS_PRESUPUESTO_ESTRICTO') == '1'
+# Vacío para no guardar el reporte (p. ej. el servidor de `benchmark_tienda`)
+KASPORTS_REPORTE_CONSULTAS = os.environ.get('KASPORTS_REPORTE_CONSULTAS', BASE_DIR / 'reporte_consultas.json')
+KASPORTS_PRESUPUESTO_POR_DEFECTO = None
+KASPORTS_PRESUPUESTO_CONSULTAS = {
+    'app_kasports:index_cliente': 6,
+    'app_kasports:productos': 7,
+    'app_kasports:ropa_lista': 8,
+    'app_kasports:tenis_lista': 8,
+    'app_kasports:gorras_lista': 8,
+    'app_kasports:proveedores_lista': 6,
+    'app_kasports:carrito': 7,
+    'app_kasports:confirmar_pedido': 30,
+    'app_kasports:historial_pedidos': 9,
+    'app_kasports:index_admin': 8,
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
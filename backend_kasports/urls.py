@@ -18,24 +18,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.views.decorators.cache import never_cache
-
-def add_cache_headers(get_response):
-    """Middleware para agregar headers de no-caché a archivos estáticos"""
-    def middleware(request):
-        response = get_response(request)
-        if request.path.startswith('/static/'):
-            response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-            response['Pragma'] = 'no-cache'
-            response['Expires'] = '0'
-        return response
-    return middleware
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('app_kasports.urls')),
 ]
 
+# En producción estáticos y media los sirve `ServidorArchivos` (wsgi.py) antes de llegar aquí
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     # Usar str() para convertir Path a string compatible con Windows
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_kasports.settings')
 
 application = get_wsgi_application()
+
+# Sirve /static/ (con caché inmutable y copias comprimidas) y, con KASPORTS_SERVIR_MEDIA,
+# las imágenes públicas de /media/ sin pasar por Django
+from app_kasports.estaticos import ServidorArchivos  # noqa: E402
+
+application = ServidorArchivos(application)